@@ -0,0 +1,91 @@
+# core/activity_log.py
+"""
+Buffer για τις εγγραφές του ActivityLog.
+
+Οι εγγραφές δεν γράφονται μία-μία μέσα στο request. Κρατιούνται στη μνήμη και
+μπαίνουν στο buffer μόνο όταν γίνει commit το transaction τους (μέσω on_commit),
+οπότε όσες ανήκουν σε transaction που έκανε rollback χάνονται μαζί του.
+Στο τέλος του request (ή του `buffered_activity_log()`) γράφονται όλες με ένα bulk_create.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction, IntegrityError
+
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+# Πάνω από αυτό το πλήθος το buffer αδειάζει νωρίτερα, για να μη μεγαλώνει η μνήμη
+FLUSH_THRESHOLD = 500
+
+_state = threading.local()
+
+
+def _pending():
+    return getattr(_state, 'entries', None)
+
+
+def log_activity(**fields):
+    """
+    Καταγράφει μια ενέργεια. Δέχεται τα ίδια πεδία με το ActivityLog.objects.create().
+    """
+    entry = ActivityLog(**fields)
+    # Εκτός atomic block το on_commit εκτελείται αμέσως
+    transaction.on_commit(lambda: _collect(entry))
+    return entry
+
+
+def _collect(entry):
+    entries = _pending()
+    if entries is None:
+        # Fallback (π.χ. management commands, shell): δεν υπάρχει buffer, γράφουμε αμέσως
+        _write([entry])
+        return
+    entries.append(entry)
+    if len(entries) >= FLUSH_THRESHOLD:
+        flush()
+
+
+def flush():
+    """Γράφει ό,τι έχει μαζευτεί στο buffer του τρέχοντος thread."""
+    entries = _pending()
+    if entries:
+        _state.entries = []
+        _write(entries)
+
+
+def _write(entries):
+    try:
+        with transaction.atomic():
+            ActivityLog.objects.bulk_create(entries)
+    except IntegrityError:
+        # Π.χ. ο χρήστης μιας εγγραφής διαγράφηκε στο μεταξύ - σώζουμε όσες γίνεται
+        for entry in entries:
+            try:
+                with transaction.atomic():
+                    entry.save()
+            except IntegrityError:
+                logger.warning("Δεν αποθηκεύτηκε εγγραφή ActivityLog: %s", entry.details)
+
+
+@contextmanager
+def buffered_activity_log():
+    """
+    Ανοίγει buffer για το τρέχον thread και το αδειάζει στο τέλος.
+    Το χρησιμοποιεί το ActivityLogBufferMiddleware, αλλά και όποιο management command
+    θέλει να γράψει τις εγγραφές του μαζικά.
+    """
+    if _pending() is not None:
+        # Ήδη μέσα σε buffer - το εξωτερικό θα κάνει το flush
+        yield
+        return
+    _state.entries = []
+    try:
+        yield
+    finally:
+        try:
+            flush()
+        finally:
+            _state.entries = None
@@ -0,0 +1,117 @@
+# core/aging.py
+"""
+Ενηλικίωση απαιτήσεων (aging).
+
+Το ανεξόφλητο υπόλοιπο κάθε εκδομένου τιμολογίου μπαίνει σε μία κλίμακα ανάλογα με τις
+ημέρες καθυστέρησης από τη λήξη του ως την ημερομηνία αναφοράς. Όλες οι κλίμακες
+υπολογίζονται σε μία ομαδοποιημένη ερώτηση, με σύγκριση ημερομηνιών (όχι αριθμητική
+ημερομηνιών στη βάση), ανά πελάτη, ανά κεντρικό κατάστημα ή ανά πωλητή.
+Τιμολόγιο χωρίς ημερομηνία λήξης θεωρείται τρέχον, όπως στο Invoice.is_overdue.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Customer, Invoice, SalesRepresentative
+
+# (κλειδί, ετικέτα, ελάχιστες ημέρες καθυστέρησης, μέγιστες ημέρες καθυστέρησης)
+BUCKETS = [
+    ('current', 'Τρέχοντα', None, 0),
+    ('days_1_30', '1-30 ημέρες', 1, 30),
+    ('days_31_60', '31-60 ημέρες', 31, 60),
+    ('days_61_90', '61-90 ημέρες', 61, 90),
+    ('days_90_plus', '90+ ημέρες', 91, None),
+]
+
+DIMENSIONS = {
+    'customer': 'Πελάτης',
+    'parent': 'Κεντρικό Κατάστημα',
+    'rep': 'Πωλητής',
+}
+
+_GROUP_KEYS = {
+    'customer': F('customer_id'),
+    'parent': Coalesce('customer__parent_id', 'customer_id'),
+    'rep': Coalesce('customer__sales_rep_id', 'customer__parent__sales_rep_id'),
+}
+
+_MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _bucket_condition(as_of, min_days, max_days):
+    # Καθυστέρηση d ημερών σημαίνει λήξη = as_of - d, οπότε τα όρια ημερών γίνονται όρια ημερομηνιών
+    if min_days is None:
+        return Q(due_date__isnull=True) | Q(due_date__gte=as_of - datetime.timedelta(days=max_days))
+    condition = Q(due_date__lte=as_of - datetime.timedelta(days=min_days))
+    if max_days is not None:
+        condition &= Q(due_date__gte=as_of - datetime.timedelta(days=max_days))
+    return condition
+
+
+def outstanding_invoices():
+    """Τα εκδομένα τιμολόγια με ανεξόφλητο υπόλοιπο, με το υπόλοιπο ως `outstanding`."""
+    return Invoice.objects.filter(status=Invoice.STATUS_ISSUED).annotate(
+        outstanding=F('total_amount') - F('paid_amount')
+    ).filter(outstanding__gt=0)
+
+
+def aging_by(dimension, as_of=None, customer=None):
+    """
+    Οι κλίμακες ενηλικίωσης ανά διάσταση (βλ. DIMENSIONS) σε μία ερώτηση. Επιστρέφει λίστα από
+    dicts με key, label, code, ένα ποσό ανά κλίμακα (βλ. BUCKETS), total, overdue,
+    invoice_count και overdue_count, κατά φθίνον υπόλοιπο.
+    """
+    as_of = as_of or timezone.now().date()
+    invoices = outstanding_invoices()
+    if customer is not None:
+        invoices = invoices.filter(customer=customer)
+
+    amounts = {
+        key: Coalesce(Sum('outstanding', filter=_bucket_condition(as_of, min_days, max_days)), Decimal('0.00'), output_field=_MONEY)
+        for key, _, min_days, max_days in BUCKETS
+    }
+    overdue = Q(due_date__lt=as_of)
+    rows = list(
+        invoices.values(key=_GROUP_KEYS[dimension]).annotate(
+            **amounts,
+            total=Coalesce(Sum('outstanding'), Decimal('0.00'), output_field=_MONEY),
+            overdue=Coalesce(Sum('outstanding', filter=overdue), Decimal('0.00'), output_field=_MONEY),
+            invoice_count=Count('pk'),
+            overdue_count=Count('pk', filter=overdue),
+        ).order_by('-total')
+    )
+    labels = _labels(dimension, [row['key'] for row in rows])
+    for row in rows:
+        row['label'], row['code'] = labels.get(row['key'], ('-', ''))
+    return rows
+
+
+def customer_aging(customer, as_of=None):
+    """Οι κλίμακες ενός πελάτη (μηδενικές αν δεν έχει ανεξόφλητα), για την οικονομική καρτέλα του."""
+    rows = aging_by('customer', as_of=as_of, customer=customer)
+    if rows:
+        return rows[0]
+    empty = {key: Decimal('0.00') for key, _, _, _ in BUCKETS}
+    return dict(empty, key=customer.pk, label=str(customer), code=customer.code,
+                total=Decimal('0.00'), overdue=Decimal('0.00'), invoice_count=0, overdue_count=0)
+
+
+def totals(rows):
+    """Τα σύνολα των γραμμών του aging_by ανά κλίμακα."""
+    names = [key for key, _, _, _ in BUCKETS] + ['total', 'overdue']
+    return {name: sum((row[name] for row in rows), Decimal('0.00')) for name in names}
+
+
+def _labels(dimension, keys):
+    ids = [key for key in keys if key is not None]
+    if dimension == 'rep':
+        found = {pk: (str(rep), '') for pk, rep in SalesRepresentative.objects.select_related('user').in_bulk(ids).items()}
+        found[None] = ('Χωρίς Πωλητή', '')
+        return found
+    return {
+        pk: (str(customer), customer.code)
+        for pk, customer in Customer.objects.select_related('parent').in_bulk(ids).items()
+    }
@@ -0,0 +1,163 @@
+# core/balances.py
+"""
+Υπόλοιπα πελατών ανά περίοδο με μηνιαία στιγμιότυπα.
+
+Το υπόλοιπο έναρξης μιας περιόδου είναι το υπόλοιπο του πιο πρόσφατου κλεισμένου μήνα
+πριν από αυτήν (CustomerBalanceSnapshot) συν τις κινήσεις από το τέλος εκείνου του μήνα ως
+την αρχή της περιόδου. Έτσι το κόστος δεν εξαρτάται από το πόσο παλιός είναι ο πελάτης.
+Χωρίς στιγμιότυπα αθροίζεται όλο το ιστορικό, όπως πριν.
+
+Οι μήνες κλείνουν με την εντολή close_customer_balances. Ένα παραστατικό με ημερομηνία σε
+κλεισμένο μήνα ξαναχτίζει τα στιγμιότυπα του πελάτη του από εκείνον τον μήνα (βλ. signals).
+Χρεώσεις: εκδοθέντα/εξοφλημένα τιμολόγια. Πιστώσεις: ενεργές πληρωμές και εκδοθέντα πιστωτικά.
+"""
+import datetime
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import CreditNote, Customer, CustomerBalanceClose, CustomerBalanceSnapshot, Invoice, Payment
+
+_MONEY = DecimalField(max_digits=14, decimal_places=2)
+_ZERO = Value(Decimal('0.00'), output_field=_MONEY)
+
+# Οι καταστάσεις τιμολογίου που χρεώνουν τον πελάτη
+INVOICE_STATUSES = [Invoice.STATUS_ISSUED, Invoice.STATUS_PAID]
+
+# (όνομα, μοντέλο, πεδίο ποσού, πεδίο ημερομηνίας, φίλτρο, χρέωση;)
+DOCUMENTS = [
+    ('debits', Invoice, 'total_amount', 'issue_date', {'status__in': INVOICE_STATUSES}, True),
+    ('payments', Payment, 'amount_paid', 'payment_date', {'status': Payment.STATUS_ACTIVE}, False),
+    ('credits', CreditNote, 'total_amount', 'issue_date', {'status': CreditNote.Status.ISSUED}, False),
+]
+
+
+def month_end(date):
+    return date.replace(day=1) + relativedelta(months=1) - datetime.timedelta(days=1)
+
+
+def closed_through():
+    """Το τέλος του τελευταίου κλεισμένου μήνα (None αν δεν έχει κλείσει κανένας)."""
+    return CustomerBalanceClose.objects.aggregate(last=Max('month_end'))['last']
+
+
+def _customer_total_subquery(model, amount_field, **filters):
+    """Correlated subquery: το άθροισμα `amount_field` των παραστατικών του πελάτη (0 αν δεν υπάρχουν)."""
+    totals = (
+        model.objects.filter(customer=OuterRef('pk'), **filters)
+        .order_by().values('customer').annotate(total=Sum(amount_field)).values('total')[:1]
+    )
+    return Coalesce(Subquery(totals), _ZERO, output_field=_MONEY)
+
+
+def annotate_opening_balance(customers_qs, date):
+    """
+    Προσθέτει σε κάθε πελάτη opening_balance: το υπόλοιπό του πριν από την `date`, από το πιο
+    πρόσφατο στιγμιότυπο πριν από αυτήν και τις κινήσεις μετά από αυτό.
+    """
+    snapshots = CustomerBalanceSnapshot.objects.filter(customer=OuterRef('pk'), month_end__lt=date).order_by('-month_end')
+    qs = customers_qs.annotate(
+        snapshot_date=Coalesce(Subquery(snapshots.values('month_end')[:1]), Value(datetime.date.min)),
+        snapshot_balance=Coalesce(Subquery(snapshots.values('balance')[:1]), _ZERO, output_field=_MONEY),
+    )
+    since_snapshot = {}
+    for name, model, amount_field, date_field, filters, _ in DOCUMENTS:
+        since_snapshot[f'{name}_before'] = _customer_total_subquery(
+            model, amount_field, **{f'{date_field}__gt': OuterRef('snapshot_date'), f'{date_field}__lt': date}, **filters
+        )
+    return qs.annotate(**since_snapshot).annotate(
+        opening_balance=F('snapshot_balance') + F('debits_before') - F('payments_before') - F('credits_before'),
+    )
+
+
+def annotate_period_balances(customers_qs, date_from, date_to):
+    """
+    Προσθέτει σε κάθε πελάτη opening_balance, debit_in_period, credit_in_period και closing_balance
+    για την περίοδο [date_from, date_to], ως correlated subqueries της ίδιας ερώτησης.
+    """
+    in_period = {
+        f'{name}_in_period': _customer_total_subquery(model, amount_field, **{f'{date_field}__range': [date_from, date_to]}, **filters)
+        for name, model, amount_field, date_field, filters, _ in DOCUMENTS
+    }
+    return annotate_opening_balance(customers_qs, date_from).annotate(**in_period).annotate(
+        debit_in_period=F('debits_in_period'),
+        credit_in_period=F('payments_in_period') + F('credits_in_period'),
+    ).annotate(
+        closing_balance=F('opening_balance') + F('debit_in_period') - F('credit_in_period'),
+    )
+
+
+def opening_balances(customer_ids, date):
+    """{customer_id: υπόλοιπο πριν από την `date`} για τους πελάτες του customer_ids."""
+    return dict(
+        annotate_opening_balance(Customer.objects.filter(pk__in=customer_ids).order_by(), date).values_list('pk', 'opening_balance')
+    )
+
+
+def _monthly_movements(date_from, date_to, customer_ids=None):
+    """{(customer_id, τέλος μήνα): [χρεώσεις, πιστώσεις]} για το διάστημα, με μία ερώτηση ανά είδος παραστατικού."""
+    movements = {}
+    for _, model, amount_field, date_field, filters, is_debit in DOCUMENTS:
+        documents = model.objects.filter(**{f'{date_field}__range': [date_from, date_to]}, **filters)
+        if customer_ids is not None:
+            documents = documents.filter(customer_id__in=customer_ids)
+        rows = documents.annotate(month=TruncMonth(date_field)).values('customer_id', 'month').annotate(
+            total=Sum(amount_field)
+        ).order_by()
+        for row in rows:
+            month = row['month'].date() if isinstance(row['month'], datetime.datetime) else row['month']
+            entry = movements.setdefault((row['customer_id'], month_end(month)), [Decimal('0.00'), Decimal('0.00')])
+            entry[0 if is_debit else 1] += row['total'] or Decimal('0.00')
+    return movements
+
+
+def rebuild(date_from, date_to, customer_ids=None):
+    """
+    Σβήνει και ξαναγράφει τα στιγμιότυπα των μηνών από τον μήνα του date_from ως τον μήνα
+    του date_to, για όλους τους πελάτες ή μόνο για τους customer_ids. Επιστρέφει το πλήθος τους.
+    """
+    start, end = date_from.replace(day=1), month_end(date_to)
+    movements = _monthly_movements(start, end, customer_ids)
+    with transaction.atomic():
+        stale = CustomerBalanceSnapshot.objects.filter(month_end__range=[start, end])
+        if customer_ids is not None:
+            stale = stale.filter(customer_id__in=customer_ids)
+        stale.delete()
+        if not movements:
+            return 0
+        balances = opening_balances({customer_id for customer_id, _ in movements}, start)
+        snapshots = []
+        for (customer_id, month), (debit, credit) in sorted(movements.items()):
+            balances[customer_id] += debit - credit
+            snapshots.append(CustomerBalanceSnapshot(
+                customer_id=customer_id, month_end=month, debit=debit, credit=credit, balance=balances[customer_id]
+            ))
+        CustomerBalanceSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+def close_month(month):
+    """Κλείνει τον μήνα της `month` για όλους τους πελάτες. Επιστρέφει το πλήθος των υπολοίπων."""
+    with transaction.atomic():
+        created = rebuild(month, month)
+        CustomerBalanceClose.objects.update_or_create(month_end=month_end(month))
+    return created
+
+
+def refresh(customer_ids, dates):
+    """
+    Μετά από αλλαγή παραστατικών: αν κάποια από τις `dates` πέφτει σε κλεισμένο μήνα, ξαναχτίζει
+    τα στιγμιότυπα των πελατών από εκείνον τον μήνα ως τον τελευταίο κλεισμένο.
+    Τρέχει μέσα στο transaction του καλούντος, ώστε τα υπόλοιπα να αλλάζουν μαζί με το παραστατικό.
+    """
+    dates = [date.date() if isinstance(date, datetime.datetime) else date for date in dates if date]
+    customer_ids = {customer_id for customer_id in customer_ids if customer_id}
+    if not (dates and customer_ids):
+        return 0
+    last_closed = closed_through()
+    if last_closed is None or min(dates) > last_closed:
+        return 0
+    return rebuild(min(dates), last_closed, customer_ids)
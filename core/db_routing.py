@@ -0,0 +1,110 @@
+# core/db_routing.py
+"""
+Αναγνώσεις αναφορών και εξαγωγών από replica.
+
+Οι report_*/export_* views με τον decorator reporting_database διαβάζουν από τη βάση
+settings.REPORTING_DATABASE (ένα alias του DATABASES), ώστε να μην ανταγωνίζονται την
+καταχώρηση παραγγελιών στην κύρια βάση. Όλες οι εγγραφές πηγαίνουν πάντα στην 'default'.
+
+Ένας χρήστης που μόλις έγραψε κάτι (POST κ.λπ.) διαβάζει από την κύρια βάση για
+REPORTING_DATABASE_STICKY_SECONDS, ώστε να βλέπει τις αλλαγές του πριν φτάσουν στο replica:
+το ReplicaStickinessMiddleware βάζει ένα cookie με αυτή τη διάρκεια ζωής.
+
+Για tests με δύο τοπικές βάσεις: DJANGO_SETTINGS_MODULE=crm_project.test_settings.
+"""
+import contextlib
+import contextvars
+import functools
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'crm_recent_write'
+
+# (alias, βάθος atomic της κύριας βάσης όταν ξεκίνησε η view) όσο τρέχει μια reporting_database view
+_reporting_alias = contextvars.ContextVar('reporting_alias', default=None)
+
+
+def reporting_alias():
+    """Το alias του replica, ή 'default' αν δεν έχει οριστεί (ή δεν υπάρχει στο DATABASES)."""
+    alias = getattr(settings, 'REPORTING_DATABASE', DEFAULT_DB_ALIAS)
+    return alias if alias in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def is_sticky(request):
+    return STICKY_COOKIE in request.COOKIES
+
+
+def reporting_database(view):
+    """
+    Decorator για views που μόνο διαβάζουν: τα GET διαβάζουν από το replica, εκτός αν ο
+    χρήστης έγραψε πρόσφατα. Μπαίνει κάτω από το @login_required.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = reporting_alias()
+        if alias == DEFAULT_DB_ALIAS or request.method not in ('GET', 'HEAD') or is_sticky(request):
+            return view(request, *args, **kwargs)
+        state = (alias, len(connections[DEFAULT_DB_ALIAS].atomic_blocks))
+        token = _reporting_alias.set(state)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _reporting_alias.reset(token)
+        if getattr(response, 'streaming', False):
+            # Το περιεχόμενο ενός streaming response παράγεται μετά την επιστροφή της view
+            response.streaming_content = _read_from(state, response.streaming_content)
+        return response
+    return wrapper
+
+
+@contextlib.contextmanager
+def primary():
+    """
+    Διαβάζει από την κύρια βάση ακόμα και μέσα σε reporting_database view, π.χ. για αποτελέσματα
+    που αποθηκεύονται στο cache των αναφορών και δεν πρέπει να έρθουν από replica που καθυστερεί.
+    """
+    token = _reporting_alias.set(None)
+    try:
+        yield
+    finally:
+        _reporting_alias.reset(token)
+
+
+def _read_from(state, iterator):
+    token = _reporting_alias.set(state)
+    try:
+        yield from iterator
+    finally:
+        _reporting_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Router για το DATABASE_ROUTERS. Εκτός reporting_database δεν αλλάζει τίποτα.
+    """
+    # Γράφονται από τις ίδιες τις αναφορές και πρέπει να διαβάζονται πάντα φρέσκα
+    PRIMARY_ONLY = {'core.reportcacheentry', 'core.reportcachegeneration', 'core.reportjob'}
+
+    def db_for_read(self, model, **hints):
+        state = _reporting_alias.get()
+        if state is None or model._meta.label_lower in self.PRIMARY_ONLY:
+            return None
+        alias, atomic_depth = state
+        if len(connections[DEFAULT_DB_ALIAS].atomic_blocks) > atomic_depth:
+            # Η view άνοιξε transaction στην κύρια βάση: διαβάζει ό,τι μόλις έγραψε
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Και για αντικείμενα που διαβάστηκαν από το replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Το replica έχει τα ίδια δεδομένα με την κύρια βάση
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != DEFAULT_DB_ALIAS and db == reporting_alias():
+            return False
+        return None
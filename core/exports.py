@@ -0,0 +1,181 @@
+# core/exports.py
+"""
+Εξαγωγές λιστών (Excel, CSV, Parquet) με σταθερή μνήμη.
+
+Οι γραμμές διαβάζονται από τη βάση με queryset.iterator() σε κομμάτια των CHUNK_SIZE και
+γράφονται σε write-only workbook του openpyxl, που κρατάει στη μνήμη μόνο την τρέχουσα
+γραμμή (τα υπόλοιπα πάνε σε προσωρινό αρχείο). Το αρχείο στέλνεται με StreamingHttpResponse
+σε κομμάτια, οπότε η μνήμη του worker δεν εξαρτάται από το πλήθος των γραμμών.
+Τα πλάτη των στηλών δηλώνονται μαζί με τις στήλες, αφού τα δεδομένα δεν είναι γνωστά από πριν.
+
+Το CSV στέλνεται γραμμή-γραμμή χωρίς προσωρινό αρχείο. Το Parquet (για BI) γράφεται ανά
+CHUNK_SIZE γραμμές σε row groups και χρειάζεται το pyarrow· χωρίς αυτό PYARROW_AVAILABLE είναι False.
+"""
+import csv
+import datetime
+import io
+import itertools
+import tempfile
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+PARQUET_CONTENT_TYPE = 'application/vnd.apache.parquet'
+
+# Μορφές εξαγωγής (και καταλήξεις των αρχείων)
+FORMATS = ('xlsx', 'csv', 'parquet')
+
+# Είδη στηλών για το Parquet (τα δεκαδικά με 4 ψηφία, αρκετά για ποσά και ποσότητες)
+KINDS = ('text', 'integer', 'decimal', 'date', 'datetime', 'boolean')
+_DECIMAL_PLACES = Decimal('0.0001')
+
+# Γραμμές ανά ερώτηση στη βάση (queryset.iterator)
+CHUNK_SIZE = 2000
+# Bytes ανά κομμάτι της απόκρισης
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+
+def rows_from(queryset, row):
+    """Οι γραμμές ενός queryset, μία-μία: `row(obj)` δίνει τις τιμές των στηλών."""
+    for obj in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield row(obj)
+
+
+def _cell(value):
+    # Το Excel δεν έχει ζώνες ώρας: οι ώρες γράφονται στην τοπική ώρα
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def write_workbook(file, columns, rows, sheet_name):
+    """
+    Γράφει τις γραμμές σε αρχείο xlsx. `columns`: λίστα από (τίτλος, πλάτος) ή απλούς τίτλους
+    (πλάτος ανάλογο του τίτλου). Επιστρέφει το πλήθος των γραμμών.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name[:31])
+    headers = []
+    for index, column in enumerate(columns, start=1):
+        header, width = column if isinstance(column, tuple) else (column, None)
+        headers.append(header)
+        sheet.column_dimensions[get_column_letter(index)].width = width or max(len(header) + 2, 12)
+    sheet.append(headers)
+    count = 0
+    for row in rows:
+        sheet.append([_cell(value) for value in row])
+        count += 1
+    workbook.save(file)
+    return count
+
+
+def _file_response(write, filename, content_type, suffix=None):
+    """
+    StreamingHttpResponse με αρχείο που γράφεται όταν αρχίσει η αποστολή (οι ερωτήσεις τρέχουν
+    τότε) σε προσωρινό αρχείο, που στέλνεται σε κομμάτια και σβήνεται στο τέλος.
+    `write(file)` γράφει στο αρχείο· με `suffix` παίρνει το όνομά του αντί για το αρχείο.
+    """
+    def content():
+        with tempfile.NamedTemporaryFile(suffix=suffix or '') as file:
+            write(file.name if suffix else file)
+            file.seek(0)
+            while chunk := file.read(RESPONSE_CHUNK_SIZE):
+                yield chunk
+
+    response = StreamingHttpResponse(content(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def excel_response(filename, columns, rows, sheet_name='Εξαγωγή'):
+    """StreamingHttpResponse με το xlsx (βλ. write_workbook)."""
+    return _file_response(lambda file: write_workbook(file, columns, rows, sheet_name), filename, XLSX_CONTENT_TYPE)
+
+
+def csv_lines(headers, rows):
+    """Οι γραμμές ως CSV (με BOM, ώστε το Excel να διαβάζει σωστά τα ελληνικά), μία γραμμή τη φορά."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield '\ufeff'
+    for row in itertools.chain([headers], rows):
+        writer.writerow([_cell(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def csv_response(filename, headers, rows):
+    response = StreamingHttpResponse(csv_lines(headers, rows), content_type=CSV_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _arrow_type(kind):
+    return {
+        'text': pyarrow.string(),
+        'integer': pyarrow.int64(),
+        'decimal': pyarrow.decimal128(18, 4),
+        'date': pyarrow.date32(),
+        'datetime': pyarrow.timestamp('us', tz='UTC'),
+        'boolean': pyarrow.bool_(),
+    }[kind]
+
+
+def _arrow_value(value, kind):
+    if value is None or (value == '' and kind != 'text'):
+        return None
+    if kind == 'decimal':
+        return Decimal(value).quantize(_DECIMAL_PLACES)
+    if kind == 'datetime' and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    if kind == 'text' and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def write_parquet(path, columns, rows):
+    """
+    Γράφει τις γραμμές σε αρχείο Parquet. `columns`: λίστα από (όνομα, είδος του KINDS).
+    Κάθε CHUNK_SIZE γραμμές γίνονται ένα row group. Επιστρέφει το πλήθος των γραμμών.
+    """
+    schema = pyarrow.schema([(name, _arrow_type(kind)) for name, kind in columns])
+    kinds = [kind for _, kind in columns]
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == CHUNK_SIZE:
+                writer.write_table(_arrow_table(schema, kinds, batch))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_table(_arrow_table(schema, kinds, batch))
+            count += len(batch)
+    return count
+
+
+def _arrow_table(schema, kinds, batch):
+    arrays = [
+        pyarrow.array([_arrow_value(row[index], kind) for row in batch], type=field.type)
+        for index, (field, kind) in enumerate(zip(schema, kinds))
+    ]
+    return pyarrow.Table.from_arrays(arrays, schema=schema)
+
+
+def parquet_response(filename, columns, rows):
+    """StreamingHttpResponse με το Parquet (βλ. write_parquet). Απαιτεί PYARROW_AVAILABLE."""
+    # Ο ParquetWriter κλείνει ό,τι του δοθεί: γράφει στο όνομα του προσωρινού αρχείου
+    return _file_response(lambda path: write_parquet(path, columns, rows), filename, PARQUET_CONTENT_TYPE, suffix='.parquet')
@@ -114,12 +114,73 @@ class OrderForm(forms.ModelForm):
             if field_name in self.fields:
                 self.fields[field_name].required = True
 
+class PrefetchedProductChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField για προϊόν που κοιτάει πρώτα σε ένα dict ήδη φορτωμένων προϊόντων
+    (το γεμίζει το BaseOrderItemFormSet), ώστε κάθε γραμμή να μην κάνει δικό της query.
+    """
+    prefetched = None
+
+    def to_python(self, value):
+        if self.prefetched is not None and value not in self.empty_values:
+            try:
+                return self.prefetched[int(value)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_python(value)
+
+
+class BaseOrderItemFormSet(forms.BaseInlineFormSet):
+    """
+    Φορτώνει με ένα query όλα τα προϊόντα των γραμμών πριν από την επικύρωση
+    και αποθηκεύει τις αλλαγές μαζικά μέσω του Order.apply_item_changes.
+    """
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if self.is_bound and 'product' in form.fields:
+            form.fields['product'].prefetched = self._prefetched_products()
+        return form
+
+    def _prefetched_products(self):
+        if not hasattr(self, '_product_cache'):
+            product_ids = set()
+            for i in range(self.total_form_count()):
+                value = self.data.get(f'{self.add_prefix(i)}-product')
+                if value and str(value).isdigit():
+                    product_ids.add(int(value))
+            self._product_cache = Product.objects.in_bulk(product_ids) if product_ids else {}
+        return self._product_cache
+
+    def save_items(self):
+        """
+        Αντί για formset.save(): μία μαζική εγγραφή για όλες τις γραμμές. Αν το διαθέσιμο δεν
+        επαρκεί πια (ValidationError του apply_item_changes), το σφάλμα μπαίνει στις γραμμές
+        των προϊόντων και ξανασηκώνεται, ώστε το view να αναιρέσει το transaction.
+        """
+        self.save(commit=False)
+        try:
+            self.instance.apply_item_changes(
+                new_items=self.new_objects,
+                changed_items=[obj for obj, _changed in self.changed_objects],
+                deleted_items=self.deleted_objects,
+            )
+        except forms.ValidationError as error:
+            for product_error in error.error_list:
+                product_id = (product_error.params or {}).get('product_id')
+                for form in self.forms:
+                    product = form.cleaned_data.get('product') if form not in self.deleted_forms else None
+                    if product is not None and product.pk == product_id:
+                        form.add_error('quantity', product_error)
+            raise
+
+
 class OrderItemForm(forms.ModelForm):
     product_search = forms.CharField(label="Προϊόν", required=False, widget=forms.TextInput(attrs={'class': 'form-control form-control-sm'}))
     
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity', 'is_gift', 'unit_price', 'discount_percentage', 'vat_percentage', 'comments']
+        field_classes = {'product': PrefetchedProductChoiceField}
         widgets = {
             'product': forms.HiddenInput(),
             'quantity': forms.NumberInput(attrs={'class': 'form-control form-control-sm text-center', 'style': 'max-width: 90px;', 'max': '999'}),
@@ -130,6 +191,13 @@ class OrderItemForm(forms.ModelForm):
             'comments': forms.Textarea(attrs={'rows': 1, 'class': 'form-control form-control-sm'}),
         }
 
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        # Η ύπαρξη του προϊόντος έχει ήδη ελεγχθεί από το πεδίο της φόρμας -
+        # δεν χρειάζεται ένα ακόμα query ανά γραμμή από το model validation.
+        exclude.add('product')
+        return exclude
+
     def clean(self):
         cleaned_data = super().clean()
         
@@ -141,11 +209,10 @@ class OrderItemForm(forms.ModelForm):
             return cleaned_data
 
         # --- ΕΛΕΓΧΟΣ ΑΠΟΘΕΜΑΤΟΣ ---
-        # Υπολογίζουμε το πραγματικά διαθέσιμο απόθεμα.
-        # Αν επεξεργαζόμαστε ένα υπάρχον είδος, πρέπει να προσθέσουμε πίσω
-        # την ποσότητά του στο απόθεμα πριν κάνουμε τον έλεγχο.
-        available_stock = product.stock_quantity
-        if self.instance and self.instance.pk:
+        # Διαθέσιμο = απόθεμα − δεσμεύσεις άλλων παραγγελιών (στήλη του Product).
+        # Αν επεξεργαζόμαστε ένα υπάρχον είδος, η δική του δέσμευση προστίθεται πίσω.
+        available_stock = product.available_quantity
+        if self.instance and self.instance.pk and self.instance._old_product_id == product.pk:
             available_stock += self.instance._old_quantity # Το _old_quantity το παίρνουμε από το μοντέλο
 
         if quantity > available_stock:
@@ -0,0 +1,178 @@
+# core/journal.py
+"""
+Σταδιακή εξαγωγή λογιστικού ημερολογίου (διπλογραφικές εγγραφές) για τον λογιστή.
+
+Κάθε προορισμός (target) έχει δείκτη (JournalExportCursor): μια εξαγωγή διαβάζει μόνο τα
+τιμολόγια, πιστωτικά και πληρωμές με updated_at μετά από αυτόν (με ευρετήριο στο updated_at),
+οπότε η διάρκειά της εξαρτάται από τις αλλαγές του διαστήματος και όχι από το ιστορικό.
+Για κάθε παραστατικό κρατιέται η εγγραφή με την οποία εξάχθηκε (JournalExportedDocument): αν
+αλλάξει ποσό, ημερομηνία, πελάτης ή κατάσταση (π.χ. ακύρωση), βγαίνει αντιλογισμός της παλιάς
+εγγραφής και η νέα. Αλλαγές χωρίς λογιστική επίπτωση (π.χ. εξόφληση τιμολογίου) δεν βγαίνουν.
+
+Ο δείκτης γυρίζει JOURNAL_EXPORT_OVERLAP_SECONDS πίσω σε κάθε εξαγωγή, ώστε να μη χάνονται
+αλλαγές από transactions που έγιναν commit μετά την προηγούμενη· η σύγκριση με την εξαχθείσα
+εγγραφή εμποδίζει τις διπλές γραμμές.
+"""
+import csv
+import datetime
+import itertools
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CreditNote, Invoice, JournalExportCursor, JournalExportedDocument, Payment
+
+# Η διάταξη του CSV: σταθερή, ώστε να τη διαβάζει το λογιστικό πρόγραμμα
+COLUMNS = [
+    'Άρθρο', 'Ημερομηνία', 'Είδος Παραστατικού', 'Αριθμός', 'Κίνηση', 'Λογαριασμός', 'Χρέωση', 'Πίστωση',
+    'Κωδικός Πελάτη', 'ΑΦΜ Πελάτη', 'Πελάτης', 'Αιτιολογία',
+]
+POSTING, REVERSAL = 'Καταχώρηση', 'Αντιλογισμός'
+
+POSTED_INVOICE_STATUSES = [Invoice.STATUS_ISSUED, Invoice.STATUS_PAID, Invoice.STATUS_CREDITED]
+POSTED_CREDIT_NOTE_STATUSES = [CreditNote.Status.ISSUED, CreditNote.Status.APPLIED]
+
+# Παραστατικά ανά ερώτηση (και ανά αναζήτηση στα εξαχθέντα)
+CHUNK_SIZE = 2000
+
+
+def _account(name):
+    return settings.JOURNAL_ACCOUNTS[name]
+
+
+def _entry(date, number, customer, description, lines):
+    """
+    Η εγγραφή ενός παραστατικού σε μορφή JSON: `lines` είναι (λογαριασμός, χρέωση, πίστωση)·
+    οι μηδενικές γραμμές παραλείπονται. None αν δεν μένει καμία.
+    """
+    lines = [
+        [account, str(Decimal(debit).quantize(Decimal('0.01'))), str(Decimal(credit).quantize(Decimal('0.01')))]
+        for account, debit, credit in lines if debit or credit
+    ]
+    if not lines:
+        return None
+    return {
+        'date': date.isoformat(), 'number': number or '', 'customer_id': customer.pk, 'description': description,
+        'customer': [customer.code or '', customer.vat_number or '', str(customer)], 'lines': lines,
+    }
+
+
+def invoice_entry(invoice):
+    if invoice.status not in POSTED_INVOICE_STATUSES:
+        return None
+    total, vat = invoice.total_amount, invoice.vat_amount
+    return _entry(invoice.issue_date, invoice.invoice_number, invoice.customer, f"Τιμολόγιο πώλησης {invoice.invoice_number}", [
+        (_account('customers'), total, 0), (_account('sales'), 0, total - vat), (_account('vat'), 0, vat),
+    ])
+
+
+def credit_note_entry(credit_note):
+    if credit_note.status not in POSTED_CREDIT_NOTE_STATUSES:
+        return None
+    total, vat = credit_note.total_amount, credit_note.vat_amount
+    return _entry(credit_note.issue_date, credit_note.credit_note_number, credit_note.customer, f"Πιστωτικό {credit_note.credit_note_number}", [
+        (_account('sales'), total - vat, 0), (_account('vat'), vat, 0), (_account('customers'), 0, total),
+    ])
+
+
+def payment_entry(payment):
+    if payment.status != Payment.STATUS_ACTIVE:
+        return None
+    account = _account('cash') if payment.payment_method == 'cash' else _account('bank')
+    return _entry(payment.payment_date, payment.receipt_number, payment.customer,
+                  f"Είσπραξη {payment.receipt_number} ({payment.get_payment_method_display()})", [
+        (account, payment.amount_paid, 0), (_account('customers'), 0, payment.amount_paid),
+    ])
+
+
+# (είδος, μοντέλο, τίτλος, εγγραφή)
+DOCUMENTS = [
+    ('invoice', Invoice, 'Τιμολόγιο', invoice_entry),
+    ('credit_note', CreditNote, 'Πιστωτικό Τιμολόγιο', credit_note_entry),
+    ('payment', Payment, 'Είσπραξη', payment_entry),
+]
+
+
+def _same(old, new):
+    # Τα στοιχεία του πελάτη (όνομα κ.λπ.) δεν αλλάζουν τη λογιστική εγγραφή
+    keys = ('date', 'number', 'customer_id', 'lines')
+    if old is None or new is None:
+        return old is new
+    return all(old[key] == new[key] for key in keys)
+
+
+def _write(writer, article, title, entry, movement, date):
+    for account, debit, credit in entry['lines']:
+        if movement == REVERSAL:
+            debit, credit = credit, debit
+        writer.writerow([article, date, title, entry['number'], movement, account, debit, credit, *entry['customer'], entry['description']])
+    return len(entry['lines'])
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def export(target, file, since=None):
+    """
+    Γράφει στο `file` (κείμενο) ως CSV τις εγγραφές των παραστατικών που άλλαξαν μετά την
+    προηγούμενη εξαγωγή του `target` και προχωράει τον δείκτη, στο ίδιο transaction.
+    `since` (datetime): από πότε ξεκινά η πρώτη εξαγωγή (αλλιώς όλο το ιστορικό).
+    Επιστρέφει (παραστατικά, γραμμές).
+    """
+    until = timezone.now()
+    writer = csv.writer(file)
+    writer.writerow(COLUMNS)
+    documents = lines = 0
+    with transaction.atomic():
+        cursor, _ = JournalExportCursor.objects.select_for_update().get_or_create(target=target)
+        if cursor.exported_until:
+            since = cursor.exported_until - datetime.timedelta(seconds=settings.JOURNAL_EXPORT_OVERLAP_SECONDS)
+
+        for document_type, model, title, entry_for in DOCUMENTS:
+            changed = model.objects.filter(updated_at__lt=until).select_related('customer__parent').order_by('updated_at', 'pk')
+            if since:
+                changed = changed.filter(updated_at__gte=since)
+            for batch in _batches(changed.iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+                exported = dict(JournalExportedDocument.objects.filter(
+                    target=target, document_type=document_type, document_id__in=[document.pk for document in batch]
+                ).values_list('document_id', 'entry'))
+                save, delete = [], []
+                for document in batch:
+                    old = exported.get(document.pk)
+                    new = entry_for(document)
+                    if _same(old, new):
+                        continue
+                    documents += 1
+                    if old:
+                        # Ο αντιλογισμός μπαίνει στην ημερομηνία της αλλαγής (όχι πριν από την αρχική εγγραφή)
+                        changed_on = timezone.localtime(document.updated_at).date().isoformat()
+                        lines += _write(writer, documents, title, old, REVERSAL, max(changed_on, old['date']))
+                    if new:
+                        lines += _write(writer, documents, title, new, POSTING, new['date'])
+                        save.append(JournalExportedDocument(target=target, document_type=document_type, document_id=document.pk, entry=new))
+                    else:
+                        delete.append(document.pk)
+                JournalExportedDocument.objects.bulk_create(
+                    save, update_conflicts=True, unique_fields=['target', 'document_type', 'document_id'],
+                    update_fields=['entry', 'exported_at'],
+                )
+                if delete:
+                    JournalExportedDocument.objects.filter(target=target, document_type=document_type, document_id__in=delete).delete()
+
+        cursor.exported_until = until
+        cursor.last_run_at = timezone.now()
+        cursor.last_documents = documents
+        cursor.save()
+    return documents, lines
+
+
+def reset(target):
+    """Ξεχνάει τι έχει εξαχθεί για το `target`: η επόμενη εξαγωγή ξεκινά από την αρχή."""
+    with transaction.atomic():
+        JournalExportedDocument.objects.filter(target=target).delete()
+        JournalExportCursor.objects.filter(target=target).delete()
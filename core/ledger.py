@@ -0,0 +1,151 @@
+# core/ledger.py
+"""
+Καρτέλα κινήσεων πελάτη (statement of account).
+
+Τιμολόγια, πληρωμές και πιστωτικά μιας περιόδου ενώνονται σε μία ερώτηση UNION ALL και το
+προοδευτικό υπόλοιπο υπολογίζεται στη βάση με window function (SUM ... OVER). Φορτώνεται μόνο
+η σελίδα που εμφανίζεται, οπότε το κόστος δεν εξαρτάται από το πόσο παλιός είναι ο πελάτης.
+Το υπόλοιπο έναρξης της περιόδου το δίνει ο καλών (βλ. balances.annotate_period_balances).
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import Case, CharField, DateField, DecimalField, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce, Concat, NullIf
+from django.utils import timezone
+
+from .models import PAYMENT_METHOD_CHOICES, CreditNote, Invoice, Payment
+
+INVOICE, PAYMENT, CREDIT_NOTE = 1, 2, 3
+
+DOC_TYPES = {
+    INVOICE: 'Τιμολόγιο',
+    PAYMENT: 'Πληρωμή',
+    CREDIT_NOTE: 'Πιστωτικό Τιμολόγιο',
+}
+
+_MONEY = DecimalField(max_digits=14, decimal_places=2)
+_ZERO = Value(Decimal('0.00'), output_field=_MONEY)
+_NO_TEXT = Value(None, output_field=CharField())
+_NO_DATE = Value(None, output_field=DateField())
+_PAYMENT_METHODS = dict(PAYMENT_METHOD_CHOICES)
+
+
+def _entries(customer, date_from, date_to):
+    """
+    Οι κινήσεις της περιόδου ως ένα UNION ALL. Οι στήλες μπαίνουν με την ίδια σειρά στα
+    τρία σκέλη (όλες ως annotations), γιατί το UNION τις ταιριάζει κατά θέση.
+    """
+    branch_name = Case(
+        When(delivery_note__customer__is_branch=True, then=Coalesce(
+            NullIf('delivery_note__customer__company_name', Value('')),
+            Concat('delivery_note__customer__first_name', Value(' '), 'delivery_note__customer__last_name'),
+        )),
+        default=_NO_TEXT, output_field=CharField(),
+    )
+    invoices = Invoice.objects.filter(
+        customer=customer, status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID], issue_date__range=[date_from, date_to]
+    ).annotate(
+        entry_date=F('issue_date'), entry_kind=Value(INVOICE, output_field=IntegerField()), entry_id=F('pk'),
+        entry_number=F('invoice_number'), entry_debit=F('total_amount'), entry_credit=_ZERO,
+        entry_due_date=Case(When(status=Invoice.STATUS_ISSUED, then=F('due_date')), default=_NO_DATE, output_field=DateField()),
+        entry_method=_NO_TEXT, entry_branch=branch_name,
+    )
+    payments = Payment.objects.filter(
+        customer=customer, status=Payment.STATUS_ACTIVE, payment_date__range=[date_from, date_to]
+    ).annotate(
+        entry_date=F('payment_date'), entry_kind=Value(PAYMENT, output_field=IntegerField()), entry_id=F('pk'),
+        entry_number=F('receipt_number'), entry_debit=_ZERO, entry_credit=F('amount_paid'),
+        entry_due_date=_NO_DATE, entry_method=F('payment_method'), entry_branch=_NO_TEXT,
+    )
+    credit_notes = CreditNote.objects.filter(
+        customer=customer, status=CreditNote.Status.ISSUED, issue_date__range=[date_from, date_to]
+    ).annotate(
+        entry_date=F('issue_date'), entry_kind=Value(CREDIT_NOTE, output_field=IntegerField()), entry_id=F('pk'),
+        entry_number=F('credit_note_number'), entry_debit=_ZERO, entry_credit=F('total_amount'),
+        entry_due_date=_NO_DATE, entry_method=_NO_TEXT, entry_branch=_NO_TEXT,
+    )
+    columns = [
+        'entry_date', 'entry_kind', 'entry_id', 'entry_number', 'entry_debit', 'entry_credit',
+        'entry_due_date', 'entry_method', 'entry_branch',
+    ]
+    return invoices.order_by().values(*columns).union(
+        payments.order_by().values(*columns), credit_notes.order_by().values(*columns), all=True
+    )
+
+
+class CustomerStatement:
+    """
+    Οι κινήσεις ενός πελάτη στην περίοδο [date_from, date_to], ταξινομημένες κατά ημερομηνία
+    (τιμολόγια, πληρωμές, πιστωτικά μέσα στην ίδια ημέρα). Μπαίνει απευθείας σε Paginator:
+    το count() και κάθε slice είναι μία ερώτηση.
+    """
+    def __init__(self, customer, date_from, date_to, opening_balance=Decimal('0.00')):
+        self.customer = customer
+        self.date_from = date_from
+        self.date_to = date_to
+        self.opening_balance = opening_balance
+
+    def count(self):
+        return _entries(self.customer, self.date_from, self.date_to).count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        offset = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        return self._fetch(offset, max(stop - offset, 0))
+
+    def _fetch(self, offset, limit):
+        union = _entries(self.customer, self.date_from, self.date_to)
+        connection = connections[union.db]
+        union_sql, params = union.query.get_compiler(union.db).as_sql()
+        sql = (
+            "SELECT entries.*, SUM(entries.entry_debit - entries.entry_credit) OVER ("
+            "ORDER BY entries.entry_date, entries.entry_kind, entries.entry_id "
+            "ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS running_total "
+            f"FROM ({union_sql}) entries "
+            "ORDER BY entries.entry_date, entries.entry_kind, entries.entry_id "
+            "LIMIT %s OFFSET %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit, offset])
+            names = [column[0] for column in cursor.description]
+            return [self._entry(dict(zip(names, row))) for row in cursor.fetchall()]
+
+    def _entry(self, row):
+        kind = row['entry_kind']
+        description = DOC_TYPES[kind]
+        if kind == INVOICE:
+            description = 'Τιμολόγιο Πώλησης'
+            if row['entry_branch']:
+                description = f"Τιμολόγηση Δ.Α. προς: {row['entry_branch'].strip()}"
+        elif kind == PAYMENT:
+            description = f"Πληρωμή ({_PAYMENT_METHODS.get(row['entry_method'], row['entry_method'])})"
+        due_date = _as_date(row['entry_due_date'])
+        return {
+            'date': _as_date(row['entry_date']),
+            'doc_type': DOC_TYPES[kind],
+            'doc_id': row['entry_id'],
+            'doc_number': row['entry_number'],
+            'description': description,
+            'debit': _money(row['entry_debit']),
+            'credit': _money(row['entry_credit']),
+            'running_balance': self.opening_balance + _money(row['running_total']),
+            'is_overdue': bool(due_date and due_date < timezone.now().date()),
+        }
+
+
+def _money(value):
+    # Η SQLite επιστρέφει float από το cursor, η PostgreSQL Decimal
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    return value
@@ -0,0 +1,458 @@
+# core/listings.py
+"""
+Οι λίστες της εφαρμογής και οι εξαγωγές τους, δηλωμένες μία φορά.
+
+Κάθε Listing ορίζει το μοντέλο, τα φίλτρα του GET (τα ίδια για τη σελίδα της λίστας και την
+εξαγωγή της), την ταξινόμηση, ποιοι πωλητές βλέπουν τι, και τις στήλες της εξαγωγής. Οι στήλες
+δίνονται ως διαδρομές πεδίων ('order__order_number', 'get_status_display')· από αυτές
+βγαίνουν τα select_related, ώστε η εξαγωγή να μην κάνει ερωτήσεις ανά γραμμή, και τα είδη των
+στηλών για το Parquet. Οι εξαγωγές γίνονται σε xlsx, CSV ή Parquet (βλ. exports).
+"""
+import datetime
+import re
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from . import exports
+from .models import (
+    CreditNote, Customer, Invoice, Order, Payment, Product, PurchaseOrder, RetailReceipt, SalesRepresentative,
+    StockReceipt, normalize_for_search,
+)
+
+
+# --- Φίλτρα: συναρτήσεις (queryset, params) -> queryset ---
+
+def search(normalized=(), text=(), param='q'):
+    """Αναζήτηση κειμένου: στα `normalized` πεδία χωρίς τόνους/πεζά, στα `text` όπως δόθηκε."""
+    def apply(queryset, params):
+        query = (params.get(param) or '').strip()
+        if not query:
+            return queryset
+        normalized_query = normalize_for_search(query)
+        condition = Q()
+        for field in normalized:
+            condition |= Q(**{f'{field}__icontains': normalized_query})
+        for field in text:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition).distinct()
+    return apply
+
+
+def choice(param, field):
+    """Ίση τιμή· το κενό και το 'all' σημαίνουν χωρίς φίλτρο."""
+    def apply(queryset, params):
+        value = params.get(param)
+        if not value or value == 'all':
+            return queryset
+        return queryset.filter(**{field: value})
+    return apply
+
+
+def related_id(param, field):
+    """Το id ενός συσχετισμένου αντικειμένου (π.χ. customer_filter)· μη έγκυρες τιμές αγνοούνται."""
+    def apply(queryset, params):
+        try:
+            return queryset.filter(**{field: int(params.get(param))})
+        except (TypeError, ValueError):
+            return queryset
+    return apply
+
+
+def parse_date(value):
+    """Ημερομηνία ΕΕΕΕ-ΜΜ-ΗΗ από το GET, ή None αν λείπει ή δεν είναι έγκυρη."""
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def date_range(field, from_param='date_from', to_param='date_to'):
+    def apply(queryset, params):
+        date_from, date_to = parse_date(params.get(from_param)), parse_date(params.get(to_param))
+        if date_from:
+            queryset = queryset.filter(**{f'{field}__gte': date_from})
+        if date_to:
+            queryset = queryset.filter(**{f'{field}__lte': date_to})
+        return queryset
+    return apply
+
+
+def exists(param, relation):
+    """'yes'/'no': αν υπάρχει συσχετισμένο αντικείμενο (π.χ. τιμολόγιο της παραγγελίας)."""
+    def apply(queryset, params):
+        value = params.get(param)
+        if value == 'yes':
+            return queryset.filter(**{f'{relation}__isnull': False}).distinct()
+        if value == 'no':
+            return queryset.filter(**{f'{relation}__isnull': True})
+        return queryset
+    return apply
+
+
+def stock_status(queryset, params):
+    status = params.get('status_filter')
+    if status == 'low':
+        # Απόθεμα μικρότερο ή ίσο του ορίου ασφαλείας
+        return queryset.filter(stock_quantity__lte=models.F('min_stock_level'))
+    if status == 'out_of_stock':
+        return queryset.filter(stock_quantity__lte=0)
+    if status == 'sufficient':
+        return queryset.filter(stock_quantity__gt=models.F('min_stock_level'))
+    return queryset
+
+
+def invoice_due(queryset, params):
+    """Εκδοθέντα τιμολόγια που λήγουν σε 7 ημέρες ('soon') ή έχουν λήξει ('overdue'), κατά ημερομηνία λήξης."""
+    due = params.get('due')
+    today = timezone.now().date()
+    if due == 'soon':
+        return queryset.filter(
+            status=Invoice.STATUS_ISSUED, due_date__gte=today, due_date__lte=today + datetime.timedelta(days=7)
+        ).order_by('due_date')
+    if due == 'overdue':
+        return queryset.filter(status=Invoice.STATUS_ISSUED, due_date__lt=today).order_by('due_date')
+    return queryset
+
+
+def restricted_rep(user):
+    """
+    Ο πωλητής στου οποίου τους πελάτες περιορίζεται ο χρήστης (ομάδα 'Πωλητές'): None αν βλέπει
+    όλους, False αν είναι στην ομάδα αλλά χωρίς προφίλ πωλητή (δεν βλέπει κανέναν).
+    """
+    if user is None or user.is_superuser or not user.groups.filter(name='Πωλητές').exists():
+        return None
+    try:
+        return user.salesrepresentative
+    except SalesRepresentative.DoesNotExist:
+        return False
+
+
+def _scope_key(rep):
+    if rep is None:
+        return 'all'
+    return f'rep:{rep.pk}' if rep else 'none'
+
+
+# --- Στήλες ---
+
+def _kind(field):
+    if isinstance(field, models.GeneratedField):
+        field = field.output_field
+    if isinstance(field, models.DecimalField):
+        return 'decimal'
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return 'integer'
+    if isinstance(field, models.DateTimeField):
+        return 'datetime'
+    if isinstance(field, models.DateField):
+        return 'date'
+    if isinstance(field, models.BooleanField):
+        return 'boolean'
+    return 'text'
+
+
+class Column:
+    """
+    Μια στήλη της εξαγωγής. `source`: διαδρομή με '__' από το αντικείμενο της γραμμής (το
+    τελευταίο κομμάτι μπορεί να είναι μέθοδος, π.χ. get_status_display), ή συνάρτηση του
+    αντικειμένου. Συσχετισμένα αντικείμενα γράφονται με το str() τους και, αν λείπουν, με το
+    `default`. `name` είναι το όνομα της στήλης στο Parquet.
+    """
+    def __init__(self, header, source, width=None, name=None, kind=None, default=None):
+        if callable(source) and not name:
+            raise ValueError(f"Η στήλη '{header}' με συνάρτηση χρειάζεται name.")
+        self.header = header
+        self.source = source
+        self.width = width
+        self.name = name or re.sub(r'get_(\w+)_display$', r'\1', source)
+        self.kind = kind
+        self.default = default
+
+    def bind(self, model):
+        """Βρίσκει τα select_related και το είδος της στήλης από τα πεδία του μοντέλου."""
+        related = []
+        kind = self.kind
+        if not callable(self.source):
+            path = []
+            for part in self.source.split('__'):
+                try:
+                    field = model._meta.get_field(part)
+                except FieldDoesNotExist:
+                    break
+                if field.many_to_one or field.one_to_one:
+                    path.append(part)
+                    related.append('__'.join(path))
+                    model = field.related_model
+                else:
+                    kind = kind or _kind(field)
+                    break
+        self.kind = kind or 'text'
+        if self.default is None and self.kind == 'text':
+            self.default = ''
+        return related
+
+    def value(self, obj):
+        if callable(self.source):
+            value = self.source(obj)
+        else:
+            value = obj
+            for part in self.source.split('__'):
+                value = getattr(value, part, None)
+                if value is None:
+                    break
+            if callable(value):
+                value = value()
+        if isinstance(value, models.Model):
+            value = str(value)
+        return self.default if value is None else value
+
+
+class Listing:
+    """
+    Μια λίστα με τα φίλτρα και την εξαγωγή της. `rep_field`: η διαδρομή προς τον πωλητή, για
+    τους χρήστες της ομάδας 'Πωλητές' που βλέπουν μόνο τους πελάτες τους. `related`: επιπλέον
+    select_related (π.χ. για το str() του πελάτη).
+    """
+    def __init__(self, model, columns, filters=(), ordering=(), rep_field=None, related=(),
+                 filename=None, sheet_name='Εξαγωγή', empty_message="Δεν βρέθηκαν εγγραφές για εξαγωγή."):
+        self.model = model
+        self.columns = columns
+        self.filters = filters
+        self.ordering = ordering
+        self.rep_field = rep_field
+        self.filename = filename or f'{model._meta.model_name}s_export'
+        self.sheet_name = sheet_name
+        self.empty_message = empty_message
+        select = []
+        for column in columns:
+            select.extend(column.bind(model))
+        self.related = sorted(set(select) | set(related))
+
+    def visible_to(self, queryset, user):
+        if not self.rep_field:
+            return queryset
+        rep = restricted_rep(user)
+        if rep is None:
+            return queryset
+        if rep is False:
+            return queryset.none()
+        return queryset.filter(**{self.rep_field: rep})
+
+    def scope(self, user):
+        """Ποια δεδομένα της λίστας βλέπει ο χρήστης: 'all', 'rep:<id>' ή 'none'."""
+        return _scope_key(restricted_rep(user) if self.rep_field else None)
+
+    def queryset(self, params, user=None):
+        """Οι εγγραφές της λίστας για τα φίλτρα του GET (`params`) και τα δικαιώματα του `user`."""
+        queryset = self.visible_to(self.model.objects.select_related(*self.related), user)
+        if self.ordering:
+            queryset = queryset.order_by(*self.ordering)
+        for apply in self.filters:
+            queryset = apply(queryset, params)
+        return queryset
+
+    def rows(self, queryset):
+        return exports.rows_from(queryset, lambda obj: [column.value(obj) for column in self.columns])
+
+    def export(self, queryset, export_format='xlsx'):
+        """StreamingHttpResponse με τις εγγραφές στη μορφή του exports.FORMATS."""
+        filename = f'{self.filename}.{export_format}'
+        rows = self.rows(queryset)
+        if export_format == 'csv':
+            return exports.csv_response(filename, [column.header for column in self.columns], rows)
+        if export_format == 'parquet':
+            return exports.parquet_response(filename, [(column.name, column.kind) for column in self.columns], rows)
+        columns = [(column.header, column.width) for column in self.columns]
+        return exports.excel_response(filename, columns, rows, sheet_name=self.sheet_name)
+
+
+def _stock_status_label(product):
+    if product.stock_quantity <= 0:
+        return 'Εκτός Αποθέματος'
+    if product.stock_quantity <= product.min_stock_level:
+        return 'Χαμηλό Απόθεμα'
+    return 'Επαρκές'
+
+
+_CUSTOMER_NAMES = ('customer__first_name_normalized', 'customer__last_name_normalized', 'customer__company_name_normalized')
+
+LISTINGS = {
+    'customers': Listing(
+        Customer,
+        columns=[
+            Column('Κωδικός', 'code'), Column('Όνομα', 'first_name'), Column('Επώνυμο', 'last_name'),
+            Column('Επωνυμία Εταιρείας', 'company_name', 35), Column('Email', 'email', 30), Column('Τηλέφωνο', 'phone'),
+            Column('Διεύθυνση', 'address', 35), Column('Πόλη', 'city'), Column('Τ.Κ.', 'postal_code'),
+            Column('Α.Φ.Μ.', 'vat_number'), Column('Δ.Ο.Υ.', 'doy'), Column('Υπόλοιπο (€)', 'balance'),
+        ],
+        filters=[search(
+            normalized=('first_name_normalized', 'last_name_normalized', 'company_name_normalized',
+                        'parent__company_name_normalized', 'parent__first_name_normalized', 'parent__last_name_normalized'),
+            text=('code', 'email', 'phone'),
+        )],
+        ordering=('company_name', 'last_name'),
+        rep_field='sales_rep',
+        filename='customers_export', sheet_name='Πελάτες', empty_message="Δεν βρέθηκαν πελάτες για εξαγωγή.",
+    ),
+    'products': Listing(
+        Product,
+        columns=[
+            Column('Κωδικός', 'code'), Column('Barcode', 'barcode'), Column('Όνομα Προϊόντος', 'name', 40),
+            Column('Περιγραφή', 'description', 40),
+            Column('Κατάσταση', lambda product: 'Ενεργό' if product.is_active else 'Ανενεργό', name='status'),
+            Column('Ποσότητα Αποθέματος', 'stock_quantity'), Column('Ελάχιστο Όριο Αποθέματος', 'min_stock_level'),
+            Column('Μονάδα Μέτρησης', 'get_unit_of_measurement_display'), Column('Τιμή Πώλησης (€)', 'price'),
+            Column('Τιμή Κόστους (€)', 'cost_price'),
+        ],
+        filters=[search(normalized=('name_normalized',), text=('code', 'barcode', 'description'))],
+        ordering=('name',),
+        filename='products_export', sheet_name='Προϊόντα', empty_message="Δεν βρέθηκαν προϊόντα για εξαγωγή.",
+    ),
+    'stock_overview': Listing(
+        Product,
+        columns=[
+            Column('Όνομα Προϊόντος', 'name', 40), Column('Κωδικός', 'code'), Column('Τρέχον Απόθεμα', 'stock_quantity'),
+            Column('Ελάχιστο Όριο', 'min_stock_level'), Column('Μονάδα Μέτρησης', 'get_unit_of_measurement_display'),
+            Column('Κατάσταση Αποθέματος', _stock_status_label, name='stock_status'),
+        ],
+        filters=[search(normalized=('name_normalized',), text=('code', 'barcode')), stock_status],
+        ordering=('name',),
+        filename='stock_overview_export', sheet_name='Επισκόπηση Αποθεμάτων',
+        empty_message="Δεν βρέθηκαν προϊόντα για εξαγωγή με βάση τα επιλεγμένα κριτήρια.",
+    ),
+    'orders': Listing(
+        Order,
+        columns=[
+            Column('Αρ. Παραγγελίας', 'order_number'), Column('Ημερομηνία Παραγγελίας', 'order_date', 15),
+            Column('Πελάτης', 'customer', 40, default='[Διαγραμμένος Πελάτης]'), Column('Κατάσταση', 'get_status_display'),
+            Column('Συνολικό Ποσό (€)', 'total_amount'), Column('Ημερομηνία Παράδοσης', 'delivery_date', 15),
+            Column('Σχόλια', 'comments', 40),
+        ],
+        filters=[
+            choice('status', 'status'),
+            related_id('customer_filter', 'customer_id'),
+            date_range('order_date'),
+            search(normalized=_CUSTOMER_NAMES, text=('order_number', 'customer__code')),
+            exists('invoiced', 'invoice'),
+            exists('delivery_note', 'delivery_notes'),
+        ],
+        ordering=('-order_date', '-pk'),
+        rep_field='customer__sales_rep',
+        related=('customer__parent',),
+        filename='orders_export', sheet_name='Παραγγελίες',
+        empty_message="Δεν βρέθηκαν παραγγελίες για εξαγωγή με βάση τα επιλεγμένα κριτήρια.",
+    ),
+    'payments': Listing(
+        Payment,
+        columns=[
+            Column('Αρ. Απόδειξης Συστήματος', 'receipt_number'), Column('Ημερομηνία Πληρωμής', 'payment_date', 15),
+            Column('Πελάτης', 'customer', 40), Column('Ποσό (€)', 'amount_paid'),
+            Column('Τρόπος Πληρωμής', 'get_payment_method_display'), Column('Κατάσταση', 'get_status_display'),
+            Column('Εξωτερικός Αρ. Αναφοράς', 'reference_number'), Column('Ημερομηνία Λήξης/Value', 'value_date', 15),
+            Column('Σχετ. Παραγγελία', 'order__order_number'), Column('Σημειώσεις', 'notes', 40),
+            Column('Λόγος Ακύρωσης', 'cancellation_reason', 30), Column('Καταχωρήθηκε από', 'recorded_by__username'),
+            Column('Ακυρώθηκε από', 'cancelled_by__username'), Column('Ημερομηνία Ακύρωσης', 'cancelled_at', 20),
+        ],
+        filters=[
+            search(text=('receipt_number', 'reference_number', 'notes')),
+            related_id('customer_filter', 'customer_id'),
+            choice('status_filter', 'status'),
+            choice('method_filter', 'payment_method'),
+            date_range('payment_date'),
+            date_range('value_date', 'value_date_from', 'value_date_to'),
+        ],
+        ordering=('-payment_date', '-receipt_number'),
+        related=('customer__parent',),
+        filename='payments_export', sheet_name='Πληρωμές',
+        empty_message="Δεν βρέθηκαν πληρωμές για εξαγωγή με βάση τα επιλεγμένα κριτήρια.",
+    ),
+    'stock_receipts': Listing(
+        StockReceipt,
+        columns=[
+            Column('Προϊόν', 'product__name', 40), Column('Κωδικός Προϊόντος', 'product__code'),
+            Column('Ποσότητα Εισαγωγής', 'quantity_added'),
+            Column('Μονάδα Μέτρησης', 'product__get_unit_of_measurement_display'),
+            Column('Ημερομηνία & Ώρα Παραλαβής', 'date_received', 20),
+            Column('Χρήστης Καταχώρησης', 'user_who_recorded__username'), Column('Σημειώσεις', 'notes', 40),
+        ],
+        filters=[
+            related_id('product_filter', 'product_id'),
+            date_range('date_received__date'),
+            search(normalized=('product__name_normalized',), text=('notes', 'user_who_recorded__username')),
+        ],
+        ordering=('-date_received',),
+        filename='stock_receipts_export', sheet_name='Παραλαβές Αποθέματος',
+        empty_message="Δεν βρέθηκαν παραλαβές για εξαγωγή με βάση τα επιλεγμένα κριτήρια.",
+    ),
+    'invoices': Listing(
+        Invoice,
+        columns=[
+            Column('Αρ. Τιμολογίου', 'invoice_number'), Column('Ημερομηνία Έκδοσης', 'issue_date', 15),
+            Column('Πελάτης', 'customer', 40), Column('Κατάσταση', 'get_status_display'),
+            Column('Υποσύνολο (€)', 'subtotal'), Column('ΦΠΑ (€)', 'vat_amount'), Column('Τελικό Σύνολο (€)', 'total_amount'),
+            Column('Σχετ. Παραγγελία', 'order__order_number'),
+        ],
+        filters=[
+            search(text=('invoice_number',)),
+            related_id('customer_filter', 'customer_id'),
+            choice('status_filter', 'status'),
+            date_range('issue_date'),
+            invoice_due,
+        ],
+        ordering=('-issue_date', '-pk'),
+        rep_field='customer__sales_rep',
+        related=('customer__parent',),
+        filename='invoices_export', sheet_name='Τιμολόγια', empty_message="Δεν βρέθηκαν τιμολόγια για εξαγωγή.",
+    ),
+    'credit_notes': Listing(
+        CreditNote,
+        columns=[
+            Column('Αρ. Πιστωτικού', 'credit_note_number'), Column('Ημερομηνία Έκδοσης', 'issue_date', 20),
+            Column('Πελάτης', 'customer', 40), Column('Αρχικό Τιμολόγιο', 'original_invoice__invoice_number', default='-'),
+            Column('Αιτιολογία', 'reason', 40), Column('Καθαρή Αξία (€)', 'subtotal'), Column('Ποσό ΦΠΑ (€)', 'vat_amount'),
+            Column('Συνολική Πίστωση (€)', 'total_amount'), Column('Κατάσταση', 'get_status_display'),
+        ],
+        ordering=('-issue_date', '-pk'),
+        rep_field='customer__sales_rep',
+        related=('customer__parent',),
+        filename='credit_notes_export', sheet_name='Πιστωτικά Τιμολόγια',
+        empty_message="Δεν βρέθηκαν πιστωτικά τιμολόγια για εξαγωγή.",
+    ),
+    'retail_receipts': Listing(
+        RetailReceipt,
+        columns=[
+            Column('Αρ. Απόδειξης', 'receipt_number'), Column('Ημερομηνία & Ώρα', 'issue_date', 20),
+            Column('Πελάτης', 'customer', 40), Column('Καθαρή Αξία (€)', 'subtotal'), Column('Ποσό ΦΠΑ (€)', 'vat_amount'),
+            Column('Τελικό Ποσό (€)', 'total_amount'), Column('Κατάσταση', 'get_status_display'),
+        ],
+        ordering=('-issue_date', '-pk'),
+        related=('customer__parent',),
+        filename='retail_receipts_export', sheet_name='Αποδείξεις Λιανικής',
+        empty_message="Δεν βρέθηκαν αποδείξεις λιανικής για εξαγωγή.",
+    ),
+    'purchase_orders': Listing(
+        PurchaseOrder,
+        columns=[
+            Column('Αρ. Εντολής', 'po_number'), Column('Ημερομηνία', 'order_date', 15),
+            Column('Προμηθευτής', 'supplier__name', 40), Column('Κατάσταση', 'get_status_display'),
+            Column('Συνολικό Ποσό (€)', 'total_amount'),
+        ],
+        ordering=('-order_date',),
+        filename='purchase_orders_export', sheet_name='Εντολές Αγοράς',
+        empty_message="Δεν βρέθηκαν εντολές αγοράς για εξαγωγή.",
+    ),
+}
+
+
+def scope(name, user):
+    """Το εύρος δεδομένων μιας εξαγωγής για τον χρήστη, π.χ. 'invoices:rep:3' (βλ. ReportJob.scope)."""
+    return f'{name}:{LISTINGS[name].scope(user)}'
+
+
+def scopes(user):
+    """Τα εύρη όλων των λιστών για τον χρήστη: οι εξαγωγές στο παρασκήνιο που μπορεί να δει."""
+    key = _scope_key(restricted_rep(user))
+    return {f'{name}:{key if listing.rep_field else "all"}' for name, listing in LISTINGS.items()}
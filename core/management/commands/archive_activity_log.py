@@ -0,0 +1,112 @@
+# core/management/commands/archive_activity_log.py
+import gzip
+import json
+import os
+import tempfile
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ActivityLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Μεταφέρει τις παλιές εγγραφές του ActivityLog σε συμπιεσμένα αρχεία JSONL "
+        "(ένα ανά μήνα) και τις διαγράφει από τη βάση σε κομμάτια."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int,
+            default=getattr(settings, 'ACTIVITY_LOG_RETENTION_MONTHS', 12),
+            help="Πόσους μήνες (εκτός του τρέχοντος) κρατάμε στη βάση."
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=getattr(settings, 'ACTIVITY_LOG_ARCHIVE_DIR', os.path.join(settings.MEDIA_ROOT, 'activity_log_archive')),
+            help="Φάκελος για τα αρχεία .jsonl.gz."
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Εγγραφές ανά DELETE.")
+        parser.add_argument('--dry-run', action='store_true', help="Μόνο εμφάνιση των μηνών που θα αρχειοθετηθούν.")
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError("Το --months πρέπει να είναι τουλάχιστον 1.")
+
+        now = timezone.localtime()
+        cutoff = (now - relativedelta(months=options['months'])).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        oldest = ActivityLog.objects.order_by('action_time').values_list('action_time', flat=True).first()
+        if oldest is None or oldest >= cutoff:
+            self.stdout.write("Δεν υπάρχουν εγγραφές για αρχειοθέτηση.")
+            return
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        month_start = timezone.localtime(oldest).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while month_start < cutoff:
+            month_end = month_start + relativedelta(months=1)
+            self._archive_month(month_start, month_end, options)
+            month_start = month_end
+
+        self.stdout.write(self.style.SUCCESS("Η αρχειοθέτηση ολοκληρώθηκε."))
+
+    def _archive_month(self, month_start, month_end, options):
+        entries = ActivityLog.objects.filter(action_time__gte=month_start, action_time__lt=month_end)
+        label = month_start.strftime('%Y-%m')
+        if options['dry_run']:
+            self.stdout.write(f"{label}: {entries.count()} εγγραφές (dry run)")
+            return
+
+        path = os.path.join(options['output_dir'], f"activity_log_{month_start:%Y_%m}.jsonl.gz")
+        rows = entries.order_by('id').values(
+            'id', 'user_id', 'user__username', 'action_time', 'action_type',
+            'content_type__app_label', 'content_type__model', 'object_id', 'object_repr', 'details'
+        )
+        # Το αρχείο γράφεται ολόκληρο σε προσωρινό και αντικαθιστά το τελικό με os.replace: μια
+        # διακοπή δεν αφήνει μισό αρχείο. Αν υπάρχει ήδη αρχείο του μήνα (π.χ. η προηγούμενη
+        # εκτέλεση σταμάτησε πριν τη διαγραφή), οι εγγραφές του μεταφέρονται χωρίς διπλές.
+        descriptor, partial = tempfile.mkstemp(dir=options['output_dir'], suffix='.partial')
+        os.close(descriptor)
+        written = 0
+        last_id = None
+        try:
+            with gzip.open(partial, 'wt', encoding='utf-8') as archive:
+                archived_ids = set()
+                if os.path.exists(path):
+                    with gzip.open(path, 'rt', encoding='utf-8') as existing:
+                        for line in existing:
+                            archived_ids.add(json.loads(line)['id'])
+                            archive.write(line)
+                for row in rows.iterator(chunk_size=options['chunk_size']):
+                    last_id = row['id']
+                    if row['id'] in archived_ids:
+                        continue
+                    row['action_time'] = row['action_time'].isoformat()
+                    archive.write(json.dumps(row, ensure_ascii=False) + '\n')
+                    written += 1
+            if last_id is None:
+                # Τίποτα στη βάση για αυτόν τον μήνα: δεν φτιάχνεται (ούτε αλλάζει) αρχείο
+                return
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+        # Μόνο όσες γράφτηκαν στο αρχείο: εγγραφές που προστέθηκαν στο μεταξύ μένουν για την επόμενη εκτέλεση
+        entries = entries.filter(id__lte=last_id)
+
+        # Διαγραφή μόνο αφού γραφτεί ολόκληρο το αρχείο, σε κομμάτια για να μην
+        # κρατάμε μεγάλα locks.
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                chunk_ids = list(entries.order_by('id').values_list('id', flat=True)[:options['chunk_size']])
+                if not chunk_ids:
+                    break
+                deleted += ActivityLog.objects.filter(id__in=chunk_ids).delete()[0]
+
+        self.stdout.write(f"{label}: αρχειοθετήθηκαν {written} και διαγράφηκαν {deleted} εγγραφές → {path}")
@@ -0,0 +1,180 @@
+# core/management/commands/benchmark_views.py
+import json
+import platform
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from core.models import Customer
+
+User = get_user_model()
+
+BENCHMARK_USERNAME = 'benchmark_admin'
+
+
+def percentile(values, fraction):
+    """Percentile με γραμμική παρεμβολή (p50 = 0.5, p95 = 0.95)."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def benchmark_targets():
+    """
+    Οι views που μετράμε, ως (όνομα, url). Όλα τα report_* και export_* χωρίς παραμέτρους
+    βρίσκονται αυτόματα από τα urls, ώστε νέες αναφορές να μπαίνουν στο benchmark χωρίς αλλαγές εδώ.
+    """
+    targets = [
+        ('order_list', reverse('order_list')),
+        ('invoice_list', reverse('invoice_list')),
+        ('search_customers_ajax', reverse('search_customers_ajax') + '?q=παπ'),
+        ('search_products_ajax', reverse('search_products_ajax') + '?q=καλ'),
+    ]
+    busiest_customer = (
+        Customer.objects.annotate(invoice_count=Count('invoices')).order_by('-invoice_count', 'pk').values_list('pk', flat=True).first()
+    )
+    if busiest_customer:
+        targets.append(('customer_financial_detail', reverse('customer_financial_detail', args=[busiest_customer])))
+
+    names = sorted(
+        name for name in get_resolver().reverse_dict
+        if isinstance(name, str) and name.startswith(('report_', 'export_'))
+    )
+    for name in names:
+        try:
+            targets.append((name, reverse(name)))
+        except Exception:
+            continue  # το url θέλει παραμέτρους
+    return targets
+
+
+class Command(BaseCommand):
+    help = (
+        "Μετράει τις βασικές views μέσω του Django test client (πλήθος ερωτήσεων, p50/p95 χρόνος, "
+        "μέγιστη μνήμη σε χωριστό πέρασμα χωρίς χρονομέτρηση) και γράφει JSON baseline. "
+        "Με --compare τυπώνει τις διαφορές από προηγούμενο baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='benchmark_baseline.json', help="Αρχείο JSON αποτελεσμάτων.")
+        parser.add_argument('--repeat', type=int, default=5, help="Επαναλήψεις ανά view (μετά από μία ζέσταμα).")
+        parser.add_argument('--only', nargs='*', default=None, help="Μόνο οι views που ξεκινούν με κάποιο από αυτά τα ονόματα.")
+        parser.add_argument('--compare', default=None, help="Προηγούμενο baseline για σύγκριση.")
+        parser.add_argument('--threshold', type=float, default=20.0, help="Ποσοστό αύξησης p95 που θεωρείται επιδείνωση.")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("Το --repeat πρέπει να είναι τουλάχιστον 1.")
+
+        user, created = User.objects.get_or_create(username=BENCHMARK_USERNAME, defaults={'is_staff': True, 'is_superuser': True})
+        try:
+            results = self._run(user, options)
+        finally:
+            # Ο superuser του benchmark δεν μένει στη βάση (ούτε αν το benchmark διακοπεί)
+            if created:
+                user.delete()
+
+        baseline = {
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(), 'django': django.get_version(),
+                'database': connection.vendor, 'repeat': options['repeat'],
+            },
+            'views': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Τα αποτελέσματα γράφτηκαν στο {options['output']}."))
+
+        if options['compare']:
+            self._compare(options['compare'], results, options['threshold'])
+
+    def _run(self, user, options):
+        # Μια view που σκάει καταγράφεται με status 500 αντί να σταματά όλο το benchmark
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+
+        targets = benchmark_targets()
+        if options['only']:
+            targets = [(name, url) for name, url in targets if name.startswith(tuple(options['only']))]
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, url in targets:
+                results[name] = self._measure(client, url, options['repeat'])
+                row = results[name]
+                self.stdout.write(
+                    f"{name:40} {row['status']:>4} q={row['queries']:<6} p50={row['p50_ms']:>9.1f}ms "
+                    f"p95={row['p95_ms']:>9.1f}ms mem={row['peak_memory_kb']:>9.0f}KB"
+                )
+        return results
+
+    @staticmethod
+    def _get(client, url):
+        response = client.get(url)
+        # Τα streaming responses μετράνε μόνο όταν καταναλωθούν
+        if response.streaming:
+            for _chunk in response.streaming_content:
+                pass
+        return response
+
+    def _measure(self, client, url, repeat):
+        self._get(client, url)  # ζέσταμα: templates, cache των content types κλπ.
+        timings, queries, status = [], 0, None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self._get(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(captured.captured_queries)
+            status = response.status_code
+
+        # Η μνήμη σε χωριστό πέρασμα: το tracemalloc επιβαρύνει κάθε allocation και θα αλλοίωνε τους χρόνους
+        tracemalloc.start()
+        try:
+            self._get(client, url)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'url': url, 'status': status, 'queries': queries,
+            'p50_ms': round(percentile(timings, 0.5), 2), 'p95_ms': round(percentile(timings, 0.95), 2),
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+
+    def _compare(self, path, results, threshold):
+        with open(path, encoding='utf-8') as f:
+            previous = json.load(f)['views']
+        regressions = 0
+        self.stdout.write(f"\nΣύγκριση με {path}:")
+        for name, row in results.items():
+            old = previous.get(name)
+            if not old:
+                self.stdout.write(f"{name:40} (νέα view)")
+                continue
+            change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            line = (
+                f"{name:40} q {old['queries']}→{row['queries']}  p95 {old['p95_ms']:.1f}→{row['p95_ms']:.1f}ms ({change:+.0f}%)  "
+                f"mem {old['peak_memory_kb']:.0f}→{row['peak_memory_kb']:.0f}KB"
+            )
+            if change > threshold or row['queries'] > old['queries']:
+                regressions += 1
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            self.stdout.write(self.style.WARNING(f"{regressions} views χειροτέρεψαν."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Καμία επιδείνωση."))
@@ -0,0 +1,60 @@
+# core/management/commands/close_customer_balances.py
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+from core import balances
+
+
+def parse_month(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Μη έγκυρος μήνας '{value}' (αναμένεται ΕΕΕΕ-ΜΜ).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Κλείνει τους μήνες ως τον --month (προεπιλογή: τον προηγούμενο) γράφοντας το υπόλοιπο κάθε "
+        "πελάτη στο τέλος τους (CustomerBalanceSnapshot). Συνεχίζει από τον τελευταίο κλεισμένο μήνα· "
+        "με --rebuild ξαναχτίζει όλους από το παλαιότερο παραστατικό. Κάθε μήνας σε ξεχωριστό transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=parse_month, default=None, help="Τελευταίος μήνας που κλείνει (ΕΕΕΕ-ΜΜ).")
+        parser.add_argument('--rebuild', action='store_true', help="Ξαναχτίζει και τους ήδη κλεισμένους μήνες.")
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        target = balances.month_end(options['month'] or (today.replace(day=1) - datetime.timedelta(days=1)))
+        if target >= today:
+            raise CommandError("Δεν μπορεί να κλείσει μήνας που δεν έχει τελειώσει.")
+
+        last_closed = None if options['rebuild'] else balances.closed_through()
+        if last_closed:
+            start = last_closed + datetime.timedelta(days=1)
+        else:
+            # Από τον μήνα του παλαιότερου παραστατικού
+            firsts = [
+                model.objects.aggregate(first=Min(date_field))['first']
+                for _, model, _, date_field, _, _ in balances.DOCUMENTS
+            ]
+            firsts = [first for first in firsts if first]
+            if not firsts:
+                self.stdout.write("Δεν υπάρχουν παραστατικά.")
+                return
+            start = min(firsts).replace(day=1)
+        if start > target:
+            self.stdout.write(f"Οι μήνες ως τον {target:%m/%Y} έχουν ήδη κλείσει.")
+            return
+
+        total = 0
+        month = start
+        while month <= target:
+            created = balances.close_month(month)
+            total += created
+            self.stdout.write(f"{month:%Y-%m}: {created} πελάτες")
+            month = balances.month_end(month) + datetime.timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"Έκλεισαν οι μήνες {start:%m/%Y} έως {target:%m/%Y} ({total} υπόλοιπα)."))
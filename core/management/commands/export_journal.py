@@ -0,0 +1,55 @@
+# core/management/commands/export_journal.py
+import datetime
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import journal
+from core.models import JournalExportCursor
+
+
+def parse_day(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Μη έγκυρη ημερομηνία '{value}' (αναμένεται ΕΕΕΕ-ΜΜ-ΗΗ).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Εξάγει σε CSV τις λογιστικές εγγραφές (τιμολόγια, πιστωτικά, εισπράξεις) που άλλαξαν από την "
+        "προηγούμενη εξαγωγή του --target, με αντιλογισμό όσων άλλαξαν ή ακυρώθηκαν μετά την εξαγωγή τους."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='accountant', help="Προορισμός (κάθε προορισμός έχει δικό του δείκτη).")
+        parser.add_argument('--output', default=None, help="Αρχείο CSV (προεπιλογή: η τυπική έξοδος).")
+        parser.add_argument('--since', type=parse_day, default=None, help="Για την πρώτη εξαγωγή: παραστατικά που άλλαξαν από αυτή την ημερομηνία (ΕΕΕΕ-ΜΜ-ΗΗ).")
+        parser.add_argument('--reset', action='store_true', help="Ξεχνάει τις προηγούμενες εξαγωγές του προορισμού.")
+
+    def handle(self, *args, **options):
+        target = options['target']
+        if options['reset']:
+            journal.reset(target)
+        elif options['since'] and JournalExportCursor.objects.filter(target=target).exists():
+            raise CommandError(f"Ο προορισμός '{target}' έχει ήδη εξαγωγές· το --since ισχύει μόνο με --reset.")
+        since = timezone.make_aware(datetime.datetime.combine(options['since'], datetime.time.min)) if options['since'] else None
+
+        if not options['output']:
+            documents, lines = journal.export(target, sys.stdout, since=since)
+            self.stderr.write(f"{documents} παραστατικά, {lines} γραμμές.")
+            return
+
+        # Το αρχείο αντικαθίσταται μόνο αν η εξαγωγή (και ο δείκτης) ολοκληρωθεί
+        path = options['output']
+        partial = f"{path}.partial"
+        try:
+            with open(partial, 'w', encoding='utf-8-sig', newline='') as file:
+                documents, lines = journal.export(target, file, since=since)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        self.stdout.write(self.style.SUCCESS(f"{documents} παραστατικά, {lines} γραμμές στο {path}."))
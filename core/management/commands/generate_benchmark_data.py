@@ -0,0 +1,384 @@
+# core/management/commands/generate_benchmark_data.py
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    normalize_for_search, Customer, Product, SalesRepresentative, UserProfile, Order, OrderItem,
+    Invoice, InvoiceItem, Payment, CreditNote, CreditNoteItem, DeliveryNote, DeliveryNoteItem,
+    StockMovement, DocumentSequence
+)
+
+User = get_user_model()
+
+FIRST_NAMES = ['Γιώργος', 'Μαρία', 'Νίκος', 'Ελένη', 'Κώστας', 'Αικατερίνη', 'Δημήτρης', 'Σοφία', 'Γιάννης', 'Άννα', 'Παναγιώτης', 'Βασιλική']
+LAST_NAMES = ['Παπαδόπουλος', 'Βασιλείου', 'Γεωργίου', 'Νικολάου', 'Δημητρίου', 'Ιωάννου', 'Κωνσταντίνου', 'Αθανασίου', 'Οικονόμου', 'Μακρής']
+COMPANY_SUFFIXES = ['Α.Ε.', 'Ε.Π.Ε.', 'Ο.Ε.', '& ΣΙΑ', 'Ι.Κ.Ε.']
+CITIES = [('Αθήνα', '10', 'Α Αθηνών'), ('Θεσσαλονίκη', '54', 'Δ Θεσσαλονίκης'), ('Πάτρα', '26', 'Πατρών'), ('Ηράκλειο', '71', 'Ηρακλείου'),
+          ('Λάρισα', '41', 'Λάρισας'), ('Βόλος', '38', 'Βόλου'), ('Ιωάννινα', '45', 'Ιωαννίνων'), ('Χανιά', '73', 'Χανίων')]
+PRODUCT_CATEGORIES = ['Καλώδιο', 'Οθόνη', 'Χαρτί', 'Μελάνι', 'Εκτυπωτής', 'Πληκτρολόγιο', 'Ποντίκι', 'Φάκελος', 'Γιαούρτι', 'Ελαιόλαδο']
+PRODUCT_VARIANTS = ['Basic', 'Pro', 'Plus', 'Mini', 'Max', 'Eco']
+UNITS = ['pcs', 'pcs', 'pcs', 'box', 'kg']
+VAT_RATES = [Decimal('24.00'), Decimal('24.00'), Decimal('13.00'), Decimal('6.00')]
+PAYMENT_METHODS = ['bank_transfer', 'cash', 'credit_card', 'cheque']
+PAYMENT_TERMS = ['due_on_receipt', 'net_15', 'net_30', 'net_60']
+
+# Πρόθεμα και πλάτος αρίθμησης ανά παραστατικό - ίδια με αυτά των signals
+NUMBERING = {'ORDER': 4, 'INV': 4, 'PAY': 4, 'CN': 4, 'DN': 5}
+CENT = Decimal('0.01')
+
+
+class Command(BaseCommand):
+    help = (
+        "Δημιουργεί ντετερμινιστικά (με seed) ρεαλιστικό όγκο δεδομένων για benchmarks: πελάτες με "
+        "υποκαταστήματα, προϊόντα, παραγγελίες, τιμολόγια, πληρωμές, πιστωτικά και Δ.Α., με bulk_create ανά chunk. "
+        "Προορίζεται για άδεια βάση."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help="Seed της γεννήτριας (ίδιο seed = ίδια δεδομένα).")
+        parser.add_argument('--scale', type=float, default=1.0, help="Πολλαπλασιαστής όλων των όγκων (π.χ. 0.01 για γρήγορη δοκιμή).")
+        parser.add_argument('--customers', type=int, default=100_000)
+        parser.add_argument('--products', type=int, default=50_000)
+        parser.add_argument('--orders', type=int, default=2_000_000)
+        parser.add_argument('--sales-reps', type=int, default=20)
+        parser.add_argument('--years', type=int, default=3, help="Πόσα χρόνια ιστορικού πίσω από το --end-date.")
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None, help="Τελευταία ημερομηνία (YYYY-MM-DD). Προεπιλογή: σήμερα.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if Customer.objects.exists() or Product.objects.exists() or Order.objects.exists():
+            raise CommandError("Η βάση περιέχει ήδη πελάτες/προϊόντα/παραγγελίες. Η γεννήτρια τρέχει μόνο σε άδεια βάση.")
+
+        self.random = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.counters = {}
+        self.balances = {}
+        self.reserved = {}
+        # Το τρέχον απόθεμα κάθε προϊόντος, όπως προκύπτει από τις κινήσεις που έχουν γραφτεί
+        self.stock = {}
+        self.content_types = {model: ContentType.objects.get_for_model(model) for model in (Order, CreditNote)}
+        scale = options['scale']
+        counts = {
+            name: max(1, int(options[name] * scale)) for name in ('customers', 'products', 'orders', 'sales_reps')
+        }
+        self.end_date = options['end_date'] or date.today()
+        self.start_date = self.end_date - timedelta(days=365 * options['years'])
+
+        sales_rep_ids = self._create_sales_reps(counts['sales_reps'])
+        self.customers = self._create_customers(counts['customers'], sales_rep_ids)
+        self.products = self._create_products(counts['products'])
+        self._create_orders(counts['orders'])
+        self._finalize()
+
+        call_command('seed_document_sequences', force=True, stdout=self.stdout)
+        # Το bulk_create δεν στέλνει signals, οπότε ο πίνακας πωλήσεων χτίζεται εδώ
+        call_command('rebuild_sales_facts', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Δημιουργήθηκαν {counts['customers']} πελάτες, {counts['products']} προϊόντα και {counts['orders']} παραγγελίες (seed {options['seed']})."
+        ))
+
+    # --- Βοηθητικά ---
+
+    def _chunks(self, total):
+        for start in range(0, total, self.chunk_size):
+            yield range(start, min(start + self.chunk_size, total))
+
+    def _next_number(self, prefix, year):
+        value = self.counters.get((prefix, year), 0) + 1
+        self.counters[(prefix, year)] = value
+        return DocumentSequence.format_number(prefix, year, value, NUMBERING[prefix])
+
+    def _add_balance(self, customer_id, amount):
+        self.balances[customer_id] = self.balances.get(customer_id, Decimal('0.00')) + amount
+
+    @staticmethod
+    def _timestamp(day):
+        return timezone.make_aware(datetime.combine(day, time(12, 0)))
+
+    def _movement(self, product_id, quantity, movement_type, day, document=None, document_number='', notes=''):
+        """Μια κίνηση αποθήκης με το υπόλοιπό της, όπως του StockMovement.record_document."""
+        self.stock[product_id] += quantity
+        return StockMovement(
+            product_id=product_id, quantity=quantity, balance_after=self.stock[product_id], movement_type=movement_type,
+            timestamp=self._timestamp(day), document_number=document_number, notes=notes,
+            content_type=self.content_types[type(document)] if document is not None else None,
+            object_id=document.pk if document is not None else None,
+        )
+
+    def _stock_out(self, movements, product_id, quantity, day, document, document_number):
+        """Εξαγωγή παραγγελίας· αν το απόθεμα δεν φτάνει, προηγείται αναπλήρωση (διόρθωση)."""
+        if self.stock[product_id] < quantity:
+            refill = quantity - self.stock[product_id] + Decimal(self.random.randint(50, 500))
+            movements.append(self._movement(product_id, refill, StockMovement.MovementType.ADJUSTMENT, day, notes="Αναπλήρωση αποθέματος"))
+        movements.append(self._movement(product_id, -quantity, StockMovement.MovementType.ORDER, day, document, document_number))
+
+    # --- Κύρια δεδομένα ---
+
+    def _create_sales_reps(self, count):
+        users = User.objects.bulk_create([
+            User(username=f"bench_rep_{n:03d}", first_name=self.random.choice(FIRST_NAMES), last_name=self.random.choice(LAST_NAMES), password='!')
+            for n in range(1, count + 1)
+        ])
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+        reps = SalesRepresentative.objects.bulk_create([
+            SalesRepresentative(user=user, commission_rate=Decimal(self.random.choice(['0.00', '2.50', '5.00']))) for user in users
+        ])
+        return [rep.pk for rep in reps]
+
+    def _build_customer(self, number, sales_rep_ids, parent=None):
+        first_name, last_name = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+        city, postal_prefix, doy = self.random.choice(CITIES)
+        company_name = f"{last_name} {self.random.choice(COMPANY_SUFFIXES)}" if self.random.random() < 0.7 else ''
+        if parent is not None:
+            company_name = f"{parent[1] or last_name} - {city} {number}"
+        return Customer(
+            parent_id=parent[0] if parent else None, is_branch=parent is not None, can_be_invoiced=parent is None,
+            code=f"{number:06d}", first_name=first_name, last_name=last_name, company_name=company_name,
+            first_name_normalized=normalize_for_search(first_name), last_name_normalized=normalize_for_search(last_name),
+            company_name_normalized=normalize_for_search(company_name) if company_name else "",
+            sales_rep_id=self.random.choice(sales_rep_ids) if self.random.random() < 0.8 else None,
+            email=f"customer{number}@example.com", phone=f"210{number:07d}",
+            address=f"Οδός {self.random.randint(1, 200)}", city=city, postal_code=f"{postal_prefix}{self.random.randint(100, 999)}",
+            vat_number=f"{100000000 + number}", doy=f"ΔΟΥ {doy}",
+            payment_method=self.random.choice(PAYMENT_METHODS), payment_terms=self.random.choice(PAYMENT_TERMS),
+            credit_limit=Decimal(self.random.choice(['0.00', '1000.00', '5000.00', '20000.00'])),
+        )
+
+    def _create_customers(self, count, sales_rep_ids):
+        """Το 80% είναι κεντρικά καταστήματα και το υπόλοιπο υποκαταστήματά τους."""
+        head_count = max(1, int(count * 0.8))
+        heads = []
+        for chunk in self._chunks(head_count):
+            created = Customer.objects.bulk_create([self._build_customer(n + 1, sales_rep_ids) for n in chunk])
+            heads.extend((c.pk, c.company_name, None) for c in created)
+        self.stdout.write(f"Κεντρικά καταστήματα: {len(heads)}")
+
+        branches = []
+        for chunk in self._chunks(count - head_count):
+            created = Customer.objects.bulk_create([
+                self._build_customer(head_count + n + 1, sales_rep_ids, parent=self.random.choice(heads)) for n in chunk
+            ])
+            branches.extend((c.pk, c.company_name, c.parent_id) for c in created)
+        self.stdout.write(f"Υποκαταστήματα: {len(branches)}")
+        return heads + branches
+
+    def _create_products(self, count):
+        products = []
+        for chunk in self._chunks(count):
+            batch = []
+            for n in chunk:
+                name = f"{self.random.choice(PRODUCT_CATEGORIES)} {self.random.choice(PRODUCT_VARIANTS)} {n + 1}"
+                price = Decimal(self.random.randint(100, 50000)) / 100
+                batch.append(Product(
+                    name=name, name_normalized=normalize_for_search(name), code=f"P{n + 1:06d}", barcode=f"520{n + 1:010d}",
+                    price=price, cost_price=(price * Decimal(self.random.uniform(0.5, 0.85))).quantize(CENT),
+                    vat_percentage=self.random.choice(VAT_RATES), unit_of_measurement=self.random.choice(UNITS),
+                    stock_quantity=Decimal(self.random.randint(0, 500)), min_stock_level=Decimal(self.random.randint(0, 20)),
+                ))
+            created = Product.objects.bulk_create(batch)
+            # Το αρχικό απόθεμα γράφεται και στο βιβλίο κινήσεων, όπως στο Product.save()
+            self.stock.update((p.pk, Decimal('0.00')) for p in created)
+            StockMovement.objects.bulk_create([
+                self._movement(p.pk, p.stock_quantity, StockMovement.MovementType.ADJUSTMENT, self.start_date, notes="Αρχικό απόθεμα")
+                for p in created if p.stock_quantity
+            ])
+            products.extend((p.pk, p.name, p.price, p.vat_percentage) for p in created)
+        self.stdout.write(f"Προϊόντα: {len(products)}")
+        return products
+
+    # --- Παραστατικά ---
+
+    def _create_orders(self, count):
+        span_days = (self.end_date - self.start_date).days
+        recent_limit = self.end_date - timedelta(days=14)
+        for chunk in self._chunks(count):
+            # Οι ημερομηνίες αυξάνονται μονότονα, ώστε η αρίθμηση να ακολουθεί τη χρονολογική σειρά
+            with transaction.atomic():
+                self._create_order_chunk([
+                    self.start_date + timedelta(days=n * span_days // count) for n in chunk
+                ], recent_limit)
+            self.stdout.write(f"Παραγγελίες: {chunk.stop}/{count}")
+
+    def _order_status(self, order_date, recent_limit):
+        roll = self.random.random()
+        if order_date < recent_limit:
+            return Order.STATUS_CANCELLED if roll < 0.05 else Order.STATUS_COMPLETED
+        if roll < 0.4:
+            return Order.STATUS_PENDING
+        if roll < 0.7:
+            return Order.STATUS_PROCESSING
+        return Order.STATUS_COMPLETED if roll < 0.97 else Order.STATUS_CANCELLED
+
+    def _build_lines(self):
+        lines = []
+        for product in self.random.sample(self.products, min(len(self.products), self.random.randint(1, 6))):
+            product_id, name, price, vat = product
+            is_gift = self.random.random() < 0.02
+            unit_price = Decimal('0.00') if is_gift else price
+            discount = Decimal('0.00') if is_gift else Decimal(self.random.choice(['0', '0', '0', '5', '10']))
+            quantity = Decimal(self.random.randint(1, 10))
+            net = (quantity * unit_price * (1 - discount / 100)).quantize(CENT)
+            lines.append({
+                'product_id': product_id, 'name': name, 'quantity': quantity, 'unit_price': unit_price,
+                'discount': discount, 'vat': vat, 'is_gift': is_gift, 'net': net, 'vat_amount': (net * vat / 100).quantize(CENT),
+            })
+        return lines
+
+    def _create_order_chunk(self, dates, recent_limit):
+        orders, order_lines = [], []
+        for order_date in dates:
+            customer_id, _, parent_id = self.random.choice(self.customers)
+            lines = self._build_lines()
+            status = self._order_status(order_date, recent_limit)
+            orders.append(Order(
+                customer_id=customer_id, order_date=order_date, status=status,
+                order_number=self._next_number('ORDER', order_date.year),
+                total_amount=sum((line['net'] + line['vat_amount'] for line in lines), Decimal('0.00')),
+                shipping_name="Παραλήπτης", shipping_address="Οδός 1", shipping_city=self.random.choice(CITIES)[0],
+                # Οι ολοκληρωμένες παραγγελίες εκτελούνται παρακάτω με Δ.Α. ή τιμολόγιο
+                stock_consumed=status == Order.STATUS_COMPLETED,
+            ))
+            order_lines.append((lines, parent_id))
+        orders = Order.objects.bulk_create(orders)
+
+        items, invoices, invoice_lines, notes, note_lines, movements = [], [], [], [], [], []
+        for order, (lines, parent_id) in zip(orders, order_lines):
+            items.extend(
+                OrderItem(
+                    order_id=order.pk, product_id=line['product_id'], quantity=line['quantity'], is_gift=line['is_gift'],
+                    unit_price=line['unit_price'], discount_percentage=line['discount'], vat_percentage=line['vat'],
+                    total_price=line['net'] + line['vat_amount'],
+                )
+                for line in lines
+            )
+            if order.status in (Order.STATUS_PENDING, Order.STATUS_PROCESSING):
+                for line in lines:
+                    self.reserved[line['product_id']] = self.reserved.get(line['product_id'], Decimal('0.00')) + line['quantity']
+            if order.status != Order.STATUS_COMPLETED:
+                continue
+            # Εκτελεσμένη παραγγελία: η εξαγωγή γράφεται στο βιβλίο κινήσεων, όπως στο Order.consume_stock
+            for line in lines:
+                self._stock_out(movements, line['product_id'], line['quantity'], order.order_date, order, order.order_number)
+
+            # Τα υποκαταστήματα παίρνουν Δ.Α. και τιμολογείται το κεντρικό. Οι υπόλοιποι τιμολογούνται από την παραγγελία.
+            note = None
+            if parent_id or self.random.random() < 0.3:
+                note = DeliveryNote(
+                    order_id=order.pk, customer_id=order.customer_id, issue_date=order.order_date,
+                    delivery_note_number=self._next_number('DN', order.order_date.year),
+                    status=DeliveryNote.Status.DELIVERED, notes=f"Βάσει Παραγγελίας {order.order_number}",
+                )
+                notes.append(note)
+                note_lines.append(lines)
+            invoice = Invoice(
+                customer_id=parent_id or order.customer_id, order_id=None if parent_id else order.pk,
+                issue_date=order.order_date, due_date=order.order_date + timedelta(days=30),
+                invoice_number=self._next_number('INV', order.order_date.year), status=Invoice.STATUS_ISSUED,
+                subtotal=sum((line['net'] for line in lines), Decimal('0.00')),
+                vat_amount=sum((line['vat_amount'] for line in lines), Decimal('0.00')),
+            )
+            invoice.total_amount = invoice.subtotal + invoice.vat_amount
+            invoices.append((invoice, note))
+            invoice_lines.append(lines)
+
+        OrderItem.objects.bulk_create(items)
+        StockMovement.objects.bulk_create(movements)
+        notes = DeliveryNote.objects.bulk_create(notes)
+        DeliveryNoteItem.objects.bulk_create([
+            DeliveryNoteItem(delivery_note_id=note.pk, product_id=line['product_id'], description=line['name'], quantity=line['quantity'])
+            for note, lines in zip(notes, note_lines) for line in lines
+        ])
+        for invoice, note in invoices:
+            invoice.delivery_note_id = note.pk if note is not None and invoice.order_id is None else None
+        invoices = Invoice.objects.bulk_create([invoice for invoice, _ in invoices])
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(
+                invoice_id=invoice.pk, product_id=line['product_id'], description=line['name'], quantity=line['quantity'],
+                unit_price=line['unit_price'], is_gift=line['is_gift'], discount_percentage=line['discount'],
+                vat_percentage=line['vat'], vat_amount=line['vat_amount'], total_price=line['net'],
+            )
+            for invoice, lines in zip(invoices, invoice_lines) for line in lines
+        ])
+        self._settle_invoices(invoices, invoice_lines)
+
+    def _settle_invoices(self, invoices, invoice_lines):
+        """Πληρωμές (πλήρεις ή μερικές) και πιστωτικά για ένα μέρος των τιμολογίων."""
+        payments, paid_invoices, credit_notes, credit_lines, updated = [], [], [], [], []
+        for invoice, lines in zip(invoices, invoice_lines):
+            self._add_balance(invoice.customer_id, invoice.total_amount)
+            roll = self.random.random()
+            if roll < 0.02:
+                credit_notes.append(CreditNote(
+                    customer_id=invoice.customer_id, original_invoice_id=invoice.pk, issue_date=invoice.issue_date + timedelta(days=5),
+                    credit_note_number=self._next_number('CN', invoice.issue_date.year), status=CreditNote.Status.ISSUED,
+                    reason="Επιστροφή προϊόντων", subtotal=invoice.subtotal, vat_amount=invoice.vat_amount, total_amount=invoice.total_amount,
+                ))
+                credit_lines.append(lines)
+                invoice.status = Invoice.STATUS_CREDITED
+                self._add_balance(invoice.customer_id, -invoice.total_amount)
+                updated.append(invoice)
+            elif roll < 0.85 and invoice.due_date <= self.end_date:
+                amount = invoice.total_amount if roll < 0.75 else (invoice.total_amount / 2).quantize(CENT)
+                payment_date = min(invoice.issue_date + timedelta(days=self.random.randint(0, 45)), self.end_date)
+                payments.append(Payment(
+                    customer_id=invoice.customer_id, payment_date=payment_date, amount_paid=amount,
+                    receipt_number=self._next_number('PAY', payment_date.year), payment_method=self.random.choice(PAYMENT_METHODS),
+                ))
+                paid_invoices.append(invoice)
+                invoice.paid_amount = amount
+                invoice.status = Invoice.STATUS_PAID if amount == invoice.total_amount else Invoice.STATUS_ISSUED
+                self._add_balance(invoice.customer_id, -amount)
+                updated.append(invoice)
+
+        payments = Payment.objects.bulk_create(payments)
+        Payment.invoices.through.objects.bulk_create([
+            Payment.invoices.through(payment_id=payment.pk, invoice_id=invoice.pk) for payment, invoice in zip(payments, paid_invoices)
+        ])
+        credit_notes = CreditNote.objects.bulk_create(credit_notes)
+        CreditNoteItem.objects.bulk_create([
+            CreditNoteItem(
+                credit_note_id=note.pk, product_id=line['product_id'], description=line['name'], quantity=line['quantity'],
+                unit_price=line['unit_price'], vat_percentage=line['vat'], total_price=line['net'], vat_amount=line['vat_amount'],
+            )
+            for note, lines in zip(credit_notes, credit_lines) for line in lines
+        ])
+        # Τα είδη του πιστωτικού επιστρέφουν στην αποθήκη
+        StockMovement.objects.bulk_create([
+            self._movement(
+                line['product_id'], line['quantity'], StockMovement.MovementType.CREDIT_RETURN,
+                note.issue_date, note, note.credit_note_number,
+            )
+            for note, lines in zip(credit_notes, credit_lines) for line in lines
+        ])
+        Invoice.objects.bulk_update(updated, ['status', 'paid_amount'], batch_size=1000)
+
+    def _finalize(self):
+        """
+        Υπόλοιπα πελατών, απόθεμα των προϊόντων (το άθροισμα των κινήσεών τους) και δεσμεύσεις
+        των ανοιχτών παραγγελιών, σε chunks.
+        """
+        customers = [Customer(pk=pk, balance=balance) for pk, balance in self.balances.items()]
+        for start in range(0, len(customers), self.chunk_size):
+            Customer.objects.bulk_update(customers[start:start + self.chunk_size], ['balance'], batch_size=1000)
+
+        # Οι ανοιχτές παραγγελίες πρέπει να βρίσκουν διαθέσιμο απόθεμα
+        movements = [
+            self._movement(product_id, quantity - self.stock[product_id], StockMovement.MovementType.ADJUSTMENT, self.end_date, notes="Αναπλήρωση αποθέματος")
+            for product_id, quantity in sorted(self.reserved.items()) if self.stock[product_id] < quantity
+        ]
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+        products = [Product(pk=pk, stock_quantity=stock) for pk, stock in self.stock.items()]
+        for start in range(0, len(products), self.chunk_size):
+            Product.objects.bulk_update(products[start:start + self.chunk_size], ['stock_quantity'], batch_size=1000)
+
+        reserved = sorted(self.reserved.items())
+        for start in range(0, len(reserved), 1000):
+            Product.increment_quantities('reserved_quantity', dict(reserved[start:start + 1000]))
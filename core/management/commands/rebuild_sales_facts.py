@@ -0,0 +1,59 @@
+# core/management/commands/rebuild_sales_facts.py
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min, Max
+
+from core import report_cache
+from core.models import DailySalesFact, Invoice, CreditNote
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Μη έγκυρη ημερομηνία '{value}' (αναμένεται ΕΕΕΕ-ΜΜ-ΗΗ).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Ξαναχτίζει τον πίνακα DailySalesFact από τα τιμολόγια και τα πιστωτικά για το διάστημα "
+        "που δίνεται (προεπιλογή: όλο το ιστορικό). Η δουλειά γίνεται ανά μήνα, σε ξεχωριστό transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=parse_date, default=None, help="Αρχή διαστήματος (ΕΕΕΕ-ΜΜ-ΗΗ).")
+        parser.add_argument('--date-to', type=parse_date, default=None, help="Τέλος διαστήματος (ΕΕΕΕ-ΜΜ-ΗΗ).")
+
+    def handle(self, *args, **options):
+        date_from, date_to = options['date_from'], options['date_to']
+        if not (date_from and date_to):
+            # Χωρίς όρια: από το παλαιότερο ως το νεότερο παραστατικό ή fact (ώστε να σβηστούν και τα ορφανά)
+            bounds = [
+                Invoice.objects.aggregate(first=Min('issue_date'), last=Max('issue_date')),
+                CreditNote.objects.aggregate(first=Min('issue_date'), last=Max('issue_date')),
+                DailySalesFact.objects.aggregate(first=Min('date'), last=Max('date')),
+            ]
+            firsts = [b['first'] for b in bounds if b['first']]
+            lasts = [b['last'] for b in bounds if b['last']]
+            date_from = date_from or (min(firsts) if firsts else None)
+            date_to = date_to or (max(lasts) if lasts else None)
+        if not (date_from and date_to):
+            self.stdout.write("Δεν υπάρχουν παραστατικά.")
+            return
+        if date_from > date_to:
+            raise CommandError("Η αρχή του διαστήματος είναι μετά το τέλος του.")
+
+        total = 0
+        chunk_start = date_from
+        while chunk_start <= date_to:
+            chunk_end = min(chunk_start.replace(day=1) + relativedelta(months=1) - datetime.timedelta(days=1), date_to)
+            created = DailySalesFact.rebuild(chunk_start, chunk_end)
+            total += created
+            self.stdout.write(f"{chunk_start:%Y-%m}: {created} γραμμές")
+            chunk_start = chunk_end + datetime.timedelta(days=1)
+        # Οι αναφορές διαβάζουν από τον πίνακα, οπότε τα αποθηκευμένα αποτελέσματά τους δεν ισχύουν πια
+        report_cache.clear()
+
+        self.stdout.write(self.style.SUCCESS(f"Ο πίνακας πωλήσεων ξαναχτίστηκε ({date_from} έως {date_to}, {total} γραμμές)."))
@@ -0,0 +1,43 @@
+# core/management/commands/rebuild_stock_ledger.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from core.models import Product, StockMovement
+
+
+class Command(BaseCommand):
+    help = (
+        "Ελέγχει ότι το stock_quantity κάθε προϊόντος ισούται με το άθροισμα των κινήσεων "
+        "του StockMovement και γράφει κίνηση διόρθωσης όπου διαφέρουν."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Μόνο αναφορά των διαφορών, χωρίς εγγραφές.")
+
+    def handle(self, *args, **options):
+        ledger_totals = dict(
+            StockMovement.objects.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+        )
+        differences = 0
+        for product_id, name, stock in Product.objects.values_list('id', 'name', 'stock_quantity').iterator():
+            ledger_total = ledger_totals.get(product_id) or 0
+            diff = stock - ledger_total
+            if not diff:
+                continue
+            differences += 1
+            self.stdout.write(f"{name}: απόθεμα {stock}, βιβλίο κινήσεων {ledger_total} (διαφορά {diff})")
+            if not options['check']:
+                with transaction.atomic():
+                    # Το απόθεμα μένει ως έχει - η κίνηση απλά ευθυγραμμίζει το βιβλίο μαζί του
+                    StockMovement.objects.create(
+                        product_id=product_id, movement_type=StockMovement.MovementType.ADJUSTMENT,
+                        quantity=diff, balance_after=stock, notes="Ευθυγράμμιση βιβλίου κινήσεων"
+                    )
+
+        if not differences:
+            self.stdout.write(self.style.SUCCESS("Το βιβλίο κινήσεων συμφωνεί με το απόθεμα όλων των προϊόντων."))
+        elif options['check']:
+            self.stdout.write(self.style.WARNING(f"Βρέθηκαν {differences} προϊόντα με διαφορά."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Γράφτηκαν {differences} κινήσεις διόρθωσης."))
@@ -0,0 +1,81 @@
+# core/management/commands/run_report_jobs.py
+import datetime
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import report_jobs, report_pool
+from core.models import ReportJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker για τις αναφορές στο παρασκήνιο: παίρνει τις εκκρεμείς από τον πίνακα ReportJob και "
+        "τις εκτελεί σε process pool. Τρέχει συνέχεια· με --once τελειώνει μόλις αδειάσει η ουρά."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.REPORT_JOB_WORKERS,
+                            help="Πλήθος processes (0 = εκτέλεση μέσα στο ίδιο process).")
+        parser.add_argument('--once', action='store_true', help="Εκτελεί ό,τι υπάρχει στην ουρά και τερματίζει.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Δευτερόλεπτα ανάμεσα στους ελέγχους της ουράς.")
+        parser.add_argument('--stale-after', type=int, default=60 * 60,
+                            help="Δουλειές που 'τρέχουν' πάνω από τόσα δευτερόλεπτα ξαναμπαίνουν στην ουρά.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 0:
+            raise CommandError("Το --workers δεν μπορεί να είναι αρνητικό.")
+
+        requeued = report_jobs.requeue_stale(datetime.timedelta(seconds=options['stale_after']))
+        purged = report_jobs.purge_old_jobs()
+        if requeued or purged:
+            self.stdout.write(f"Ξανά στην ουρά: {requeued}, διαγράφηκαν παλιές: {purged}.")
+
+        if options['workers'] == 0:
+            self._run_inline(options)
+        else:
+            self._run_pool(options)
+
+    def _run_inline(self, options):
+        while True:
+            claimed = report_jobs.claim_jobs(1)
+            if not claimed:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            self._report(claimed[0], report_jobs.run_job(claimed[0]))
+
+    def _run_pool(self, options):
+        workers = options['workers']
+        # spawn και όχι fork: τα νέα processes ανοίγουν δικές τους συνδέσεις στη βάση
+        # αντί να μοιράζονται τα sockets του γονικού (και δουλεύει και σε Windows)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=report_pool.init_worker) as pool:
+            running = {}
+            try:
+                while True:
+                    for job_id in report_jobs.claim_jobs(workers - len(running)):
+                        running[pool.submit(report_pool.run_job, job_id)] = job_id
+                    if not running:
+                        if options['once']:
+                            return
+                        time.sleep(options['poll_interval'])
+                        continue
+                    done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = running.pop(future)
+                        self._report(job_id, future.result())
+            except BrokenProcessPool:
+                # Κάποιο process του pool πέθανε: οι δουλειές του ξαναμπαίνουν στην ουρά
+                ReportJob.objects.filter(pk__in=running.values(), status=ReportJob.Status.RUNNING).update(
+                    status=ReportJob.Status.QUEUED, progress=0, started_at=None
+                )
+                raise CommandError("Ένα process του pool τερματίστηκε απότομα· οι δουλειές του ξαναμπήκαν στην ουρά.")
+
+    def _report(self, job_id, status):
+        self.stdout.write(f"Αναφορά #{job_id}: {status}")
@@ -0,0 +1,54 @@
+# core/management/commands/seed_document_sequences.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import (
+    Order, CreditNote, Payment, Invoice, RetailReceipt, DeliveryNote,
+    PurchaseOrder, DocumentSequence
+)
+
+# (μοντέλο, πεδίο αριθμού, πρόθεμα) - ίδια με αυτά των signals
+DOCUMENT_NUMBERING = [
+    (Order, 'order_number', 'ORDER'),
+    (CreditNote, 'credit_note_number', 'CN'),
+    (Payment, 'receipt_number', 'PAY'),
+    (Invoice, 'invoice_number', 'INV'),
+    (RetailReceipt, 'receipt_number', 'RETAIL'),
+    (DeliveryNote, 'delivery_note_number', 'DN'),
+    (PurchaseOrder, 'po_number', 'PO'),
+]
+
+
+class Command(BaseCommand):
+    help = "Αρχικοποιεί τους μετρητές DocumentSequence από τους αριθμούς που υπάρχουν ήδη στη βάση."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Αντικαθιστά και μετρητές που είναι ήδη μεγαλύτεροι από τον μέγιστο υπάρχοντα αριθμό."
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        for model, field_name, prefix in DOCUMENT_NUMBERING:
+            years = set()
+            numbers = model.objects.filter(
+                **{f'{field_name}__startswith': f'{prefix}-'}
+            ).values_list(field_name, flat=True)
+            for number in numbers.iterator():
+                parts = number.split('-')
+                if len(parts) >= 3 and parts[1].isdigit():
+                    years.add(int(parts[1]))
+
+            for year in sorted(years):
+                max_value = DocumentSequence.existing_max(model, field_name, prefix, year)
+                with transaction.atomic():
+                    sequence, created = DocumentSequence.objects.select_for_update().get_or_create(
+                        prefix=prefix, year=year, defaults={'last_value': max_value}
+                    )
+                    if not created and (force or sequence.last_value < max_value):
+                        sequence.last_value = max_value
+                        sequence.save(update_fields=['last_value'])
+                self.stdout.write(f"{prefix}-{year}: {sequence.last_value}")
+
+        self.stdout.write(self.style.SUCCESS("Οι μετρητές αρίθμησης ενημερώθηκαν."))
@@ -0,0 +1,280 @@
+# core/metrics.py
+"""
+Μετρήσεις ανά view (χρόνος, πλήθος/χρόνος SQL, επαναλαμβανόμενες ερωτήσεις) σε μορφή Prometheus.
+
+Κάθε worker process κρατάει τα δικά του αθροίσματα στη μνήμη και τα γράφει περιοδικά σε ένα
+αρχείο JSON στο REQUEST_METRICS_DIR. Το /metrics ενώνει τα αρχεία όλων των processes, οπότε
+η μέτρηση είναι σωστή όποιος worker κι αν εξυπηρετήσει το scrape. Τα αρχεία workers που δεν
+τρέχουν πια προστίθενται στο metrics-dead.json και σβήνονται (ο φάκελος είναι ανά μηχάνημα).
+
+Οι ύποπτες για N+1 ερωτήσεις έχουν label ένα σύντομο hash του αποτυπώματος, ώστε το πλήθος των
+σειρών να μένει μικρό· το πλήρες αποτύπωμα γράφεται στο log μαζί με το hash.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # όχι POSIX: τα αρχεία νεκρών workers δεν μαζεύονται
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL_SECONDS = 5
+
+_lock = threading.Lock()
+_state = {'counters': {}, 'histograms': {}}
+_last_flush = 0.0
+
+_PROCESS_FILE_RE = re.compile(r'metrics-(\d+)\.json')
+DEAD_PROCESSES_FILE = 'metrics-dead.json'
+
+_IN_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def enabled():
+    return getattr(settings, 'REQUEST_METRICS_ENABLED', False)
+
+
+def fingerprint(sql):
+    """
+    Κανονικοποιεί ένα SQL ώστε ερωτήσεις που διαφέρουν μόνο στις τιμές να έχουν το ίδιο αποτύπωμα.
+    Οι λίστες IN (%s, %s, ...) μαζεύονται σε μία, ώστε το μέγεθος της λίστας να μη μετράει.
+    """
+    sql = _IN_LIST_RE.sub('(%s...)', sql)
+    sql = _LITERAL_RE.sub('?', sql)
+    return ' '.join(sql.split())
+
+
+def fingerprint_hash(key):
+    """Σύντομο, σταθερό αναγνωριστικό ενός αποτυπώματος (για labels)."""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+class QueryRecorder:
+    """
+    execute_wrapper της σύνδεσης: μετράει ερωτήσεις, χρόνο SQL και επαναλήψεις ανά αποτύπωμα.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            key = fingerprint(sql)
+            self.fingerprints[key] = self.fingerprints.get(key, 0) + 1
+
+    def duplicates(self):
+        """Οι ερωτήσεις που εκτελέστηκαν πάνω από μία φορά, ως {αποτύπωμα: πλήθος}."""
+        return {key: count for key, count in self.fingerprints.items() if count > 1}
+
+
+def record_request(view, method, status, duration, recorder):
+    """Προσθέτει ένα request στα αθροίσματα του process και τα γράφει στο αρχείο αν πέρασε το διάστημα."""
+    threshold = getattr(settings, 'REQUEST_METRICS_N_PLUS_ONE_THRESHOLD', 5)
+    duplicates = recorder.duplicates()
+    suspects = {key: count for key, count in duplicates.items() if count >= threshold}
+    for key, count in suspects.items():
+        logger.warning("Πιθανό N+1 στη view %s: %s φορές η ερώτηση [%s] %s", view, count, fingerprint_hash(key), key)
+
+    with _lock:
+        _inc(('crm_requests_total', (('view', view), ('method', method), ('status', str(status)))), 1)
+        _inc(('crm_request_sql_queries_total', (('view', view),)), recorder.count)
+        _inc(('crm_request_sql_duration_seconds_total', (('view', view),)), recorder.duration)
+        _inc(('crm_request_duplicate_queries_total', (('view', view),)), sum(count - 1 for count in duplicates.values()))
+        for key in suspects:
+            _inc(('crm_request_n_plus_one_total', (('view', view), ('query', fingerprint_hash(key)))), 1)
+        _observe('crm_request_duration_seconds', (('view', view),), duration)
+    flush(force=False)
+
+
+def increment(name, labels=(), value=1):
+    """Αυξάνει έναν μετρητή του process (π.χ. hits/misses του report cache). Τα labels είναι ζεύγη (όνομα, τιμή)."""
+    with _lock:
+        _inc((name, tuple(labels)), value)
+
+
+def _inc(key, value):
+    counters = _state['counters']
+    counters[key] = counters.get(key, 0) + value
+
+
+def _observe(name, labels, value):
+    histograms = _state['histograms']
+    buckets, total, count = histograms.get((name, labels), ([0] * len(DURATION_BUCKETS), 0.0, 0))
+    buckets = [b + (1 if value <= bound else 0) for b, bound in zip(buckets, DURATION_BUCKETS)]
+    histograms[(name, labels)] = (buckets, total + value, count + 1)
+
+
+def _metrics_dir():
+    return getattr(settings, 'REQUEST_METRICS_DIR', None)
+
+
+def _process_file():
+    return os.path.join(_metrics_dir(), f"metrics-{os.getpid()}.json")
+
+
+def flush(force=True):
+    """Γράφει τα αθροίσματα του process στο δικό του αρχείο (atomic rename)."""
+    global _last_flush
+    directory = _metrics_dir()
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush < FLUSH_INTERVAL_SECONDS):
+        return
+    with _lock:
+        _last_flush = now
+        payload = _payload(_state['counters'], _state['histograms'])
+    os.makedirs(directory, exist_ok=True)
+    _write(_process_file(), payload)
+
+
+def _payload(counters, histograms):
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), *values] for (name, labels), values in histograms.items()],
+    }
+
+
+def _write(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # σβήστηκε ή γράφεται εκείνη τη στιγμή
+
+
+def _merge(payload, counters, histograms):
+    for name, labels, value in payload['counters']:
+        key = (name, tuple(tuple(label) for label in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, buckets, total, count in payload['histograms']:
+        key = (name, tuple(tuple(label) for label in labels))
+        old_buckets, old_total, old_count = histograms.get(key, ([0] * len(DURATION_BUCKETS), 0.0, 0))
+        histograms[key] = ([a + b for a, b in zip(old_buckets, buckets)], old_total + total, old_count + count)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # υπάρχει, άλλου χρήστη
+    return True
+
+
+def _fold_dead_processes(directory):
+    """
+    Προσθέτει τα αρχεία των workers που δεν τρέχουν πια (π.χ. μετά από restart) στο
+    metrics-dead.json και τα σβήνει: ο φάκελος δεν μεγαλώνει και οι μετρητές δεν μικραίνουν.
+    """
+    if fcntl is None:
+        return
+    dead = [
+        filename for filename in os.listdir(directory)
+        if (match := _PROCESS_FILE_RE.fullmatch(filename)) and not _alive(int(match.group(1)))
+    ]
+    if not dead:
+        return
+    # Ένα scrape τη φορά: αλλιώς δύο processes θα πρόσθεταν το ίδιο αρχείο
+    with open(os.path.join(directory, 'metrics-dead.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        counters, histograms = {}, {}
+        payload = _read(os.path.join(directory, DEAD_PROCESSES_FILE))
+        if payload:
+            _merge(payload, counters, histograms)
+        folded = []
+        for filename in dead:
+            payload = _read(os.path.join(directory, filename))
+            if payload:  # None: το πρόσθεσε ήδη άλλο scrape
+                _merge(payload, counters, histograms)
+                folded.append(filename)
+        if folded:
+            _write(os.path.join(directory, DEAD_PROCESSES_FILE), _payload(counters, histograms))
+            for filename in folded:
+                os.remove(os.path.join(directory, filename))
+
+
+def collect():
+    """
+    Ενώνει τα αθροίσματα όλων των processes. Χωρίς REQUEST_METRICS_DIR επιστρέφει μόνο του τρέχοντος.
+    """
+    directory = _metrics_dir()
+    if not directory:
+        with _lock:
+            return dict(_state['counters']), dict(_state['histograms'])
+
+    flush(force=True)
+    _fold_dead_processes(directory)
+    counters, histograms = {}, {}
+    for filename in os.listdir(directory):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        payload = _read(os.path.join(directory, filename))
+        if payload:
+            _merge(payload, counters, histograms)
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render_prometheus():
+    """Τα ενωμένα αθροίσματα σε Prometheus text format (0.0.4)."""
+    counters, histograms = collect()
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, cumulative in zip(DURATION_BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Μηδενίζει τα αθροίσματα του process (για tests)."""
+    global _last_flush
+    with _lock:
+        _state['counters'].clear()
+        _state['histograms'].clear()
+        _last_flush = 0.0
@@ -0,0 +1,107 @@
+# core/middleware.py
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import db_routing, metrics
+from .activity_log import buffered_activity_log
+
+
+class ActivityLogBufferMiddleware:
+    """
+    Κρατάει τις εγγραφές του ActivityLog ενός request και τις γράφει μαζί στο τέλος του.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffered_activity_log():
+            return self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Μετράει ανά view τον χρόνο, το πλήθος/χρόνο των SQL και τις επαναλαμβανόμενες ερωτήσεις (N+1).
+    Για streaming αποκρίσεις η μέτρηση κλείνει όταν σταλεί (ή διακοπεί) όλο το σώμα.
+    Με REQUEST_METRICS_ENABLED = False δεν φορτώνεται καθόλου, οπότε δεν κοστίζει τίποτα.
+    """
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = metrics.QueryRecorder()
+        started = time.perf_counter()
+        with _recording(recorder):
+            response = self.get_response(request)
+
+        if response.streaming and not getattr(response, 'is_async', False):
+            # Οι ερωτήσεις ενός StreamingHttpResponse (π.χ. εξαγωγές) τρέχουν όσο στέλνεται το σώμα·
+            # η μέτρηση κλείνει στο close() της απόκρισης (και όταν ο client διακόψει)
+            response.streaming_content = _RecordedStream(
+                response.streaming_content, recorder, lambda: self._record(request, response, recorder, started)
+            )
+        else:
+            self._record(request, response, recorder, started)
+        return response
+
+    @staticmethod
+    def _record(request, response, recorder, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        metrics.record_request(view_name, request.method, response.status_code, duration, recorder)
+
+
+def _recording(recorder):
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+class _RecordedStream:
+    """
+    Το σώμα ενός streaming response με τις ερωτήσεις κάθε κομματιού στον recorder.
+    """
+    def __init__(self, content, recorder, on_close):
+        self._content = iter(content)
+        self._recorder = recorder
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with _recording(self._recorder):
+            return next(self._content)
+
+    def close(self):
+        if self._on_close:
+            on_close, self._on_close = self._on_close, None
+            on_close()
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Μετά από κάθε request που μπορεί να έγραψε (POST κ.λπ.) βάζει το cookie του db_routing, ώστε
+    για REPORTING_DATABASE_STICKY_SECONDS οι αναφορές του χρήστη να διαβάζουν από την κύρια βάση.
+    Χωρίς replica δεν φορτώνεται καθόλου.
+    """
+    def __init__(self, get_response):
+        if db_routing.reporting_alias() == DEFAULT_DB_ALIAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                db_routing.STICKY_COOKIE, '1', max_age=settings.REPORTING_DATABASE_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_attachment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20, verbose_name='Πρόθεμα')),
+                ('year', models.PositiveIntegerField(verbose_name='Έτος')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Τελευταίος Αριθμός')),
+            ],
+            options={
+                'verbose_name': 'Αρίθμηση Παραστατικών',
+                'verbose_name_plural': 'Αριθμήσεις Παραστατικών',
+                'ordering': ['prefix', '-year'],
+                'unique_together': {('prefix', 'year')},
+            },
+        ),
+    ]
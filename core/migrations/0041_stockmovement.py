@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_opening_balances(apps, schema_editor):
+    """Το τρέχον απόθεμα κάθε προϊόντος γίνεται η πρώτη κίνηση του βιβλίου."""
+    Product = apps.get_model('core', 'Product')
+    StockMovement = apps.get_model('core', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                product_id=product_id, movement_type='ADJUSTMENT', quantity=stock,
+                balance_after=stock, notes="Αρχικό υπόλοιπο (μετάπτωση)"
+            )
+            for product_id, stock in Product.objects.exclude(stock_quantity=0).values_list('id', 'stock_quantity').iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0040_activitylog_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Ημερομηνία & Ώρα')),
+                ('movement_type', models.CharField(choices=[('RECEIPT', 'Παραλαβή'), ('RECEIPT_REVERSAL', 'Διαγραφή Παραλαβής'), ('ORDER', 'Παραγγελία'), ('ORDER_RELEASE', 'Ακύρωση/Διαγραφή Παραγγελίας'), ('RETAIL_SALE', 'Πώληση Λιανικής'), ('RETAIL_REVERSAL', 'Διαγραφή Απόδειξης Λιανικής'), ('CREDIT_RETURN', 'Επιστροφή (Πιστωτικό)'), ('ADJUSTMENT', 'Διόρθωση Αποθέματος')], max_length=20, verbose_name='Τύπος Κίνησης')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Ποσότητα')),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Υπόλοιπο μετά την Κίνηση')),
+                ('object_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('document_number', models.CharField(blank=True, max_length=100, verbose_name='Παραστατικό')),
+                ('notes', models.CharField(blank=True, max_length=255, verbose_name='Σημειώσεις')),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='contenttypes.contenttype')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='core.product', verbose_name='Προϊόν')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Χρήστης')),
+            ],
+            options={
+                'verbose_name': 'Κίνηση Αποθήκης',
+                'verbose_name_plural': 'Κινήσεις Αποθήκης',
+                'ordering': ['-timestamp', '-id'],
+                'indexes': [models.Index(fields=['product', 'timestamp'], name='stockmove_product_time_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:34
+
+import django.db.models.expressions
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+
+def convert_open_orders_to_reservations(apps, schema_editor):
+    """
+    Μέχρι τώρα κάθε ενεργή παραγγελία είχε ήδη αφαιρέσει τα είδη της από το απόθεμα.
+    Όσες έχουν Δ.Α. ή τιμολόγιο σημειώνονται ως εκτελεσμένες. Για τις υπόλοιπες η
+    ποσότητα επιστρέφει στο απόθεμα (κίνηση ORDER_RELEASE) και γίνεται δέσμευση.
+    """
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    Product = apps.get_model('core', 'Product')
+    StockMovement = apps.get_model('core', 'StockMovement')
+
+    active_orders = Order.objects.exclude(status='cancelled')
+    active_orders.filter(
+        Q(delivery_notes__isnull=False, delivery_notes__status__in=['PREPARING', 'SHIPPED', 'DELIVERED'])
+        | (Q(invoice__isnull=False) & ~Q(invoice__status='cancelled'))
+    ).update(stock_consumed=True)
+
+    reserved = (
+        OrderItem.objects.filter(order__in=active_orders.filter(stock_consumed=False), product__isnull=False)
+        .values('product_id').annotate(total=Sum('quantity')).exclude(total=0)
+    )
+    now = timezone.now()
+    movements = []
+    for row in reserved.iterator():
+        product = Product.objects.get(pk=row['product_id'])
+        product.stock_quantity += row['total']
+        product.reserved_quantity = row['total']
+        product.save(update_fields=['stock_quantity', 'reserved_quantity'])
+        movements.append(StockMovement(
+            product_id=product.pk, timestamp=now, movement_type='ORDER_RELEASE', quantity=row['total'],
+            balance_after=product.stock_quantity, notes="Μετατροπή ανοιχτών παραγγελιών σε δέσμευση"
+        ))
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_stockmovement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_consumed',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Εξαγωγή Αποθέματος'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reserved_quantity',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10, verbose_name='Δεσμευμένη Ποσότητα'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='available_quantity',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('stock_quantity'), '-', models.F('reserved_quantity')), output_field=models.DecimalField(decimal_places=2, max_digits=10), verbose_name='Διαθέσιμη Ποσότητα'),
+        ),
+        migrations.RunPython(convert_open_orders_to_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:49
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_customer_document_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ημερομηνία')),
+                ('vat_rate', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Ποσοστό ΦΠΑ (%)')),
+                ('net_amount', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14, verbose_name='Καθαρή Αξία (€)')),
+                ('vat_amount', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14, verbose_name='ΦΠΑ (€)')),
+                ('quantity', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14, verbose_name='Ποσότητα')),
+                ('cost_amount', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14, verbose_name='Κόστος (€)')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.customer', verbose_name='Πελάτης')),
+                ('parent_customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.customer', verbose_name='Κεντρικό Κατάστημα')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.product', verbose_name='Προϊόν')),
+                ('sales_rep', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.salesrepresentative', verbose_name='Πωλητής')),
+            ],
+            options={
+                'verbose_name': 'Ημερήσια Πώληση (Αναφορές)',
+                'verbose_name_plural': 'Ημερήσιες Πωλήσεις (Αναφορές)',
+                'indexes': [models.Index(fields=['date'], name='salesfact_date_idx'), models.Index(fields=['customer', 'date'], name='salesfact_customer_date_idx'), models.Index(fields=['sales_rep', 'date'], name='salesfact_rep_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_daily_sales_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(max_length=100, verbose_name='Αναφορά')),
+                ('cache_key', models.CharField(max_length=64, unique=True, verbose_name='Κλειδί')),
+                ('date_from', models.DateField(blank=True, null=True, verbose_name='Από')),
+                ('date_to', models.DateField(blank=True, null=True, verbose_name='Έως')),
+                ('payload', models.BinaryField(verbose_name='Αποτέλεσμα')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(verbose_name='Λήξη')),
+            ],
+            options={
+                'verbose_name': 'Αποθηκευμένη Αναφορά',
+                'verbose_name_plural': 'Αποθηκευμένες Αναφορές',
+                'indexes': [models.Index(fields=['date_from', 'date_to'], name='reportcache_range_idx'), models.Index(fields=['expires_at'], name='reportcache_expires_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_report_cache_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(max_length=100, verbose_name='Αναφορά')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Παράμετροι')),
+                ('status', models.CharField(choices=[('QUEUED', 'Σε αναμονή'), ('RUNNING', 'Εκτελείται'), ('DONE', 'Ολοκληρώθηκε'), ('FAILED', 'Απέτυχε')], default='QUEUED', max_length=10, verbose_name='Κατάσταση')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Πρόοδος (%)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, verbose_name='Σφάλμα')),
+                ('result_html', models.TextField(blank=True, verbose_name='Αποτέλεσμα (HTML)')),
+                ('result_chart', models.JSONField(blank=True, null=True, verbose_name='Δεδομένα Γραφήματος')),
+                ('result_file', models.FileField(blank=True, upload_to='report_jobs/%Y/%m/', verbose_name='Αρχείο Excel')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Χρήστης')),
+            ],
+            options={
+                'verbose_name': 'Αναφορά στο Παρασκήνιο',
+                'verbose_name_plural': 'Αναφορές στο Παρασκήνιο',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='reportjob_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:14
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0047_invoice_status_due_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerBalanceClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_end', models.DateField(unique=True, verbose_name='Τέλος Μήνα')),
+                ('closed_at', models.DateTimeField(auto_now=True, verbose_name='Κλείσιμο')),
+            ],
+            options={
+                'verbose_name': 'Κλεισμένος Μήνας Υπολοίπων',
+                'verbose_name_plural': 'Κλεισμένοι Μήνες Υπολοίπων',
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_end', models.DateField(verbose_name='Τέλος Μήνα')),
+                ('debit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Χρεώσεις Μήνα (€)')),
+                ('credit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Πιστώσεις Μήνα (€)')),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Υπόλοιπο Τέλους Μήνα (€)')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='core.customer', verbose_name='Πελάτης')),
+            ],
+            options={
+                'verbose_name': 'Μηνιαίο Υπόλοιπο Πελάτη',
+                'verbose_name_plural': 'Μηνιαία Υπόλοιπα Πελατών',
+                'indexes': [models.Index(fields=['month_end'], name='balancesnapshot_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('customer', 'month_end'), name='balancesnapshot_customer_month_uniq')],
+            },
+        ),
+    ]
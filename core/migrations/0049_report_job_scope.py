@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0048_customer_balance_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='scope',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Εύρος Δεδομένων'),
+        ),
+        migrations.AlterField(
+            model_name='reportjob',
+            name='result_file',
+            field=models.FileField(blank=True, upload_to='report_jobs/%Y/%m/', verbose_name='Αρχείο'),
+        ),
+    ]
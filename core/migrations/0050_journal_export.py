@@ -0,0 +1,60 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0049_report_job_scope'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalExportCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(max_length=50, unique=True, verbose_name='Προορισμός')),
+                ('exported_until', models.DateTimeField(blank=True, null=True, verbose_name='Εξαγωγή έως')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Τελευταία Εξαγωγή')),
+                ('last_documents', models.PositiveIntegerField(default=0, verbose_name='Παραστατικά Τελευταίας Εξαγωγής')),
+            ],
+            options={
+                'verbose_name': 'Δείκτης Εξαγωγής Ημερολογίου',
+                'verbose_name_plural': 'Δείκτες Εξαγωγής Ημερολογίου',
+            },
+        ),
+        migrations.CreateModel(
+            name='JournalExportedDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(max_length=50, verbose_name='Προορισμός')),
+                ('document_type', models.CharField(max_length=20, verbose_name='Είδος Παραστατικού')),
+                ('document_id', models.PositiveBigIntegerField(verbose_name='Παραστατικό')),
+                ('entry', models.JSONField(verbose_name='Εγγραφή')),
+                ('exported_at', models.DateTimeField(auto_now=True, verbose_name='Εξαγωγή')),
+            ],
+            options={
+                'verbose_name': 'Εξαχθέν Παραστατικό',
+                'verbose_name_plural': 'Εξαχθέντα Παραστατικά',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='creditnote',
+            index=models.Index(fields=['updated_at'], name='creditnote_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['updated_at'], name='invoice_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at'], name='payment_updated_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='journalexporteddocument',
+            constraint=models.UniqueConstraint(fields=('target', 'document_type', 'document_id'), name='journal_exported_document_unique'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:46
+
+from django.db import migrations, models
+
+
+def create_generation(apps, schema_editor):
+    model = apps.get_model('core', 'ReportCacheGeneration')
+    model.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0050_journal_export'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCacheGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.PositiveBigIntegerField(default=0, verbose_name='Γενιά')),
+            ],
+            options={
+                'verbose_name': 'Γενιά Cache Αναφορών',
+                'verbose_name_plural': 'Γενιές Cache Αναφορών',
+            },
+        ),
+        migrations.RunPython(create_generation, migrations.RunPython.noop),
+    ]
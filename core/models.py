@@ -1,12 +1,16 @@
 # core/models.py
-from django.db import models, transaction
+from django.core.exceptions import ValidationError
+from django.db import models, transaction, IntegrityError
 from django.utils import timezone
+import datetime
+import threading
 import unicodedata
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.db.models import Sum
 from decimal import Decimal 
+from crum import get_current_user
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
@@ -105,6 +109,17 @@ class Customer(models.Model):
     created_at = models.DateTimeField("Ημερομηνία Δημιουργίας", auto_now_add=True)
     updated_at = models.DateTimeField("Τελευταία Ενημέρωση", auto_now=True)
 
+    # (πωλητής, κεντρικό) όπως αποτυπώθηκαν τελευταία στο DailySalesFact
+    _sales_fact_state = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.pk:
+            self._sales_fact_state = self.sales_fact_state()
+
+    def sales_fact_state(self):
+        return (self.__dict__.get('sales_rep_id'), self.__dict__.get('parent_id'))
+
     class Meta:
         verbose_name = "Πελάτης"
         verbose_name_plural = "Πελάτες"
@@ -187,6 +202,10 @@ class PurchaseOrder(models.Model):
 
         
 
+def _format_quantity(quantity):
+    return int(quantity) if quantity % 1 == 0 else quantity
+
+
 class Product(models.Model):
     name = models.CharField("Όνομα Προϊόντος", max_length=200)
     name_normalized = models.CharField("Κανονικοποιημένο Όνομα", max_length=200, blank=True, null=True, db_index=True, editable=False)
@@ -199,6 +218,14 @@ class Product(models.Model):
     cost_price = models.DecimalField("Τιμή Κόστους (€)", max_digits=10, decimal_places=2, blank=True, null=True, default=Decimal('0.00'))
     unit_of_measurement = models.CharField("Μονάδα Μέτρησης", max_length=50, choices=UNIT_CHOICES, default='pcs')
     stock_quantity = models.DecimalField("Ποσότητα στο Απόθεμα", max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    # Δεσμευμένη από ανοιχτές παραγγελίες. Συντηρείται μόνο μέσω του Product.adjust_reserved.
+    reserved_quantity = models.DecimalField("Δεσμευμένη Ποσότητα", max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False)
+    available_quantity = models.GeneratedField(
+        expression=models.F('stock_quantity') - models.F('reserved_quantity'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+        verbose_name="Διαθέσιμη Ποσότητα",
+    )
     min_stock_level = models.DecimalField("Ελάχιστο Όριο Αποθέματος", max_digits=10, decimal_places=2, default=Decimal('0.00'))
     batch_number = models.CharField("Αριθμός Παρτίδας", max_length=100, blank=True, null=True)
     expiry_date = models.DateField("Ημερομηνία Λήξης", null=True, blank=True)
@@ -214,9 +241,102 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Μέσω __dict__ ώστε ένα queryset με .only()/.defer() να μην κάνει μία ερώτηση ανά γραμμή
+        self._original_stock = self.__dict__.get('stock_quantity')
+        self._profitability_cost_price = self.__dict__.get('cost_price')
+
     def save(self, *args, **kwargs):
+        # Το stock_quantity είναι υλοποίηση του StockMovement: δεν γράφεται ποτέ απευθείας
+        # σε υπάρχον προϊόν. Μια αλλαγή του (π.χ. από τη φόρμα) καταγράφεται ως κίνηση διόρθωσης.
         self.name_normalized = normalize_for_search(self.name)
-        super().save(*args, **kwargs)
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            initial_stock = Decimal(str(self.stock_quantity or 0))
+            if initial_stock:
+                StockMovement.objects.create(
+                    product=self, quantity=initial_stock, balance_after=initial_stock,
+                    movement_type=StockMovement.MovementType.ADJUSTMENT, notes="Αρχικό απόθεμα"
+                )
+        else:
+            # Χωρίς φορτωμένο αρχικό απόθεμα (deferred πεδίο) δεν υπάρχει διαφορά να καταγραφεί
+            stock_diff = 0
+            if self._original_stock is not None and 'stock_quantity' in self.__dict__:
+                stock_diff = Decimal(str(self.stock_quantity or 0)) - Decimal(str(self._original_stock))
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+            kwargs['update_fields'] = [f for f in update_fields if f not in self.MAINTAINED_QUANTITY_FIELDS]
+            super().save(*args, **kwargs)
+            if stock_diff:
+                StockMovement.record(self, stock_diff, StockMovement.MovementType.ADJUSTMENT, notes="Διόρθωση αποθέματος")
+        self._original_stock = self.__dict__.get('stock_quantity')
+
+    # Πεδία που αλλάζουν μόνο με ατομικό UPDATE (increment_quantities), ποτέ από το save()
+    MAINTAINED_QUANTITY_FIELDS = ('stock_quantity', 'reserved_quantity', 'available_quantity')
+
+    @classmethod
+    def increment_quantities(cls, field_name, deltas, check_available=False):
+        """
+        Προσθέτει τις μεταβολές {product_id: ποσότητα} στο `field_name` με ένα UPDATE ... CASE.
+        Τα προϊόντα κλειδώνονται πάντα με σειρά pk, ώστε δύο παραστατικά με κοινά προϊόντα
+        να μην κάνουν deadlock. Επιστρέφει dict {product_id: νέα τιμή}.
+        Με `check_available`, αν ένα προϊόν του οποίου το διαθέσιμο μειώνεται μείνει με αρνητικό
+        διαθέσιμο, η αλλαγή αναιρείται και σηκώνεται ValidationError (ένα μήνυμα ανά προϊόν, με
+        params['product_id']). Ο έλεγχος γίνεται υπό το lock, οπότε ισχύει και για ταυτόχρονες αλλαγές.
+        """
+        product_ids = sorted(deltas)
+        with transaction.atomic():
+            list(cls.objects.select_for_update().filter(pk__in=product_ids).order_by('pk').values_list('pk', flat=True))
+            cls.objects.filter(pk__in=product_ids).update(**{
+                field_name: models.F(field_name) + models.Case(
+                    *[models.When(pk=product_id, then=models.Value(delta)) for product_id, delta in deltas.items()],
+                    default=models.Value(Decimal('0.00')),
+                    output_field=models.DecimalField(max_digits=10, decimal_places=2),
+                ),
+                'updated_at': timezone.now(),
+            })
+            values = dict(cls.objects.filter(pk__in=product_ids).values_list('pk', field_name))
+            if check_available:
+                # Το διαθέσιμο μειώνεται όταν αυξάνεται η δέσμευση ή μειώνεται το απόθεμα
+                sign = 1 if field_name == 'reserved_quantity' else -1
+                decreasing = {product_id: sign * delta for product_id, delta in deltas.items() if sign * delta > 0}
+                short = cls.objects.filter(pk__in=decreasing, available_quantity__lt=0).order_by('pk')
+                errors = [
+                    ValidationError(
+                        "Δεν υπάρχει επαρκές απόθεμα για «%(name)s». Διαθέσιμο: %(available)s %(unit)s.",
+                        code='insufficient_stock',
+                        params={
+                            'product_id': product.pk, 'name': product.name, 'unit': product.get_unit_of_measurement_display(),
+                            'available': _format_quantity(product.available_quantity + decreasing[product.pk]),
+                        },
+                    )
+                    for product in short.only('name', 'unit_of_measurement', 'available_quantity')
+                ]
+                if errors:
+                    raise ValidationError(errors)
+        missing = set(product_ids) - set(values)
+        if missing:
+            raise cls.DoesNotExist(f"Δεν βρέθηκαν τα προϊόντα: {sorted(missing)}")
+        return values
+
+    @classmethod
+    def adjust_reserved(cls, lines, check_available=False):
+        """
+        Αλλάζει τη δεσμευμένη ποσότητα για (προϊόν ή pk, ποσότητα) γραμμές: θετική ποσότητα
+        δεσμεύει, αρνητική αποδεσμεύει. Το διαθέσιμο (stock − reserved) ακολουθεί αυτόματα.
+        `check_available`: βλ. increment_quantities.
+        """
+        deltas = {}
+        for product, quantity in lines:
+            if not quantity:
+                continue
+            product_id = product.pk if isinstance(product, Product) else product
+            deltas[product_id] = deltas.get(product_id, Decimal('0.00')) + Decimal(str(quantity))
+        if not deltas:
+            return {}
+        return cls.increment_quantities('reserved_quantity', deltas, check_available=check_available)
 class PurchaseOrderItem(models.Model):
     purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='items', verbose_name="Εντολή Αγοράς")
     product = models.ForeignKey(Product, on_delete=models.PROTECT, verbose_name="Προϊόν")
@@ -254,6 +374,8 @@ class Order(models.Model):
     total_amount = models.DecimalField("Συνολικό Ποσό (€)", max_digits=10, decimal_places=2, default=Decimal('0.00'))
     comments = models.TextField("Σχόλια Παραγγελίας", blank=True, null=True)
     order_number = models.CharField("Αριθμός Παραγγελίας", max_length=100, unique=True, blank=True, null=True)
+    # False: τα είδη είναι δεσμευμένα. True: έχουν εξαχθεί από την αποθήκη (Δ.Α. ή τιμολόγιο).
+    stock_consumed = models.BooleanField("Εξαγωγή Αποθέματος", default=False, editable=False)
     created_at = models.DateTimeField("Ημερομηνία Δημιουργίας", auto_now_add=True)
     updated_at = models.DateTimeField("Τελευταία Ενημέρωση", auto_now=True)
 
@@ -282,21 +404,100 @@ class Order(models.Model):
         
         super().save(*args, **kwargs)
 
-        if not is_new and self._original_status != self.status and self.status == self.STATUS_CANCELLED:
-            for item in self.items.all():
-                if item.product:
-                    item.product.stock_quantity += item.quantity
-                    item.product.save(update_fields=['stock_quantity', 'updated_at'])
+        if not is_new and self._original_status != self.status:
+            if self.status == self.STATUS_CANCELLED:
+                self._release_stock()
+            elif self._original_status == self.STATUS_CANCELLED:
+                self._hold_stock()
         self._original_status = self.status
 
     def delete(self, *args, **kwargs):
         if self.status != self.STATUS_CANCELLED:
-            for item in self.items.all():
-                if item.product:
-                    item.product.stock_quantity += item.quantity
-                    item.product.save(update_fields=['stock_quantity', 'updated_at'])
+            self._release_stock()
         super().delete(*args, **kwargs)
 
+    def apply_item_changes(self, new_items=(), changed_items=(), deleted_items=()):
+        """
+        Αποθηκεύει μαζικά τις αλλαγές στα είδη της παραγγελίας (π.χ. από το OrderItemFormSet):
+        bulk_create/bulk_update/delete των γραμμών, όλες οι διαφορές αποθέματος σε ένα UPDATE
+        και ένας μόνο υπολογισμός του total_amount. Ο αριθμός ερωτήσεων δεν εξαρτάται
+        από το πλήθος των γραμμών.
+        Αν το διαθέσιμο κάποιου προϊόντος δεν φτάνει πια (το ελέγχει η φόρμα, αλλά στο μεταξύ
+        μπορεί να το δέσμευσε άλλη παραγγελία), ValidationError και καμία αλλαγή.
+        """
+        new_items, changed_items, deleted_items = list(new_items), list(changed_items), list(deleted_items)
+        stock_lines = []
+
+        for item in new_items + changed_items:
+            item.order = self
+            item.calculate_total_price()
+            stock_lines.extend(item.stock_changes())
+
+        # Στη διαγραφή γραμμής η ποσότητα επιστρέφει. Μια ακυρωμένη παραγγελία δεν κρατάει απόθεμα.
+        stock_lines.extend((item.product_id, item.quantity) for item in deleted_items if item.product_id)
+        if self.status == self.STATUS_CANCELLED:
+            stock_lines = []
+
+        with transaction.atomic():
+            if deleted_items:
+                OrderItem.objects.filter(pk__in=[item.pk for item in deleted_items]).delete()
+            if new_items:
+                OrderItem.objects.bulk_create(new_items)
+            if changed_items:
+                OrderItem.objects.bulk_update(changed_items, OrderItem.EDITABLE_FIELDS)
+            self._apply_stock_lines(stock_lines, StockMovement.MovementType.ORDER, check_available=True)
+            self.calculate_and_save()
+
+        for item in new_items + changed_items:
+            item.mark_stock_applied()
+
+    def consume_stock(self):
+        """
+        Εξαγωγή από την αποθήκη κατά την έκδοση Δ.Α. ή τιμολογίου: η δέσμευση μετατρέπεται σε
+        κίνηση ORDER στο StockMovement. Εκτελείται μία φορά ανά παραγγελία.
+        """
+        if self.stock_consumed or self.status == self.STATUS_CANCELLED:
+            return
+        with transaction.atomic():
+            # Το υπό όρους UPDATE εμποδίζει δύο ταυτόχρονα παραστατικά να κάνουν διπλή εξαγωγή
+            if not Order.objects.filter(pk=self.pk, stock_consumed=False).update(stock_consumed=True):
+                self.stock_consumed = True
+                return
+            lines = list(self.items.filter(product__isnull=False).values_list('product_id', 'quantity'))
+            Product.adjust_reserved((product_id, -quantity) for product_id, quantity in lines)
+            StockMovement.record_document(
+                [(product_id, -quantity) for product_id, quantity in lines], StockMovement.MovementType.ORDER,
+                document=self, document_number=self.order_number or ''
+            )
+        self.stock_consumed = True
+
+    def _apply_stock_lines(self, lines, movement_type, check_available=False):
+        """
+        Εφαρμόζει μεταβολές (product_id, ποσότητα) της παραγγελίας, όπου αρνητική ποσότητα
+        σημαίνει ότι η παραγγελία παίρνει απόθεμα. Πριν την εξαγωγή αλλάζει μόνο η δέσμευση
+        (με `check_available`, μόνο αν επαρκεί το διαθέσιμο). Μετά την εξαγωγή γράφεται κίνηση στο StockMovement.
+        """
+        if self.stock_consumed:
+            StockMovement.record_document(
+                lines, movement_type, document=self, document_number=self.order_number or ''
+            )
+        else:
+            Product.adjust_reserved(((product_id, -quantity) for product_id, quantity in lines), check_available=check_available)
+
+    def _hold_stock(self):
+        """Ξαναδεσμεύει τα είδη μιας παραγγελίας που βγαίνει από την κατάσταση 'Ακυρωμένη'."""
+        self._apply_stock_lines(
+            [(product_id, -quantity) for product_id, quantity in self.items.filter(product__isnull=False).values_list('product_id', 'quantity')],
+            StockMovement.MovementType.ORDER,
+        )
+
+    def _release_stock(self):
+        """Αποδεσμεύει (ή, αν έχουν εξαχθεί, επιστρέφει στο απόθεμα) όλα τα είδη της παραγγελίας."""
+        self._apply_stock_lines(
+            self.items.filter(product__isnull=False).values_list('product_id', 'quantity'),
+            StockMovement.MovementType.ORDER_RELEASE,
+        )
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, verbose_name="Παραγγελία", related_name="items", on_delete=models.CASCADE)
@@ -309,15 +510,23 @@ class OrderItem(models.Model):
     total_price = models.DecimalField("Συνολική Τιμή Είδους (με ΦΠΑ)", max_digits=10, decimal_places=2, default=Decimal('0.00'))
     comments = models.TextField("Σχόλια Είδους", blank=True, null=True)
 
+    # Τα πεδία που γράφει το Order.apply_item_changes με bulk_update
+    EDITABLE_FIELDS = ['product', 'quantity', 'is_gift', 'unit_price', 'discount_percentage', 'vat_percentage', 'total_price', 'comments']
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._old_quantity = self.quantity if self.pk else Decimal('0.00')
+        self.mark_stock_applied()
 
     class Meta:
         verbose_name = "Είδος Παραγγελίας"
         verbose_name_plural = "Είδη Παραγγελίας"
 
-    def save(self, *args, **kwargs):
+    def mark_stock_applied(self):
+        """Η τρέχουσα ποσότητα/προϊόν έχουν ήδη δεσμευτεί (ή αφαιρεθεί από το απόθεμα)."""
+        self._old_quantity = self.quantity if self.pk else Decimal('0.00')
+        self._old_product_id = self.product_id if self.pk else None
+
+    def calculate_total_price(self):
         if self.is_gift:
             self.unit_price = Decimal('0.00')
             self.discount_percentage = Decimal('0.00')
@@ -329,22 +538,32 @@ class OrderItem(models.Model):
         price_after_discount = self.unit_price * (Decimal('1') - (self.discount_percentage / Decimal('100')))
         price_with_vat = price_after_discount * (Decimal('1') + (self.vat_percentage / Decimal('100')))
         self.total_price = self.quantity * price_with_vat
+
+    def stock_changes(self):
+        """
+        Οι κινήσεις αποθέματος (product_id, ποσότητα) που απαιτεί η αποθήκευση της γραμμής.
+        Αν άλλαξε το προϊόν, επιστρέφεται η παλιά ποσότητα στο παλιό προϊόν.
+        """
+        if self._old_product_id and self._old_product_id != self.product_id:
+            changes = [(self._old_product_id, self._old_quantity)]
+            if self.product_id:
+                changes.append((self.product_id, -self.quantity))
+            return changes
+        quantity_diff = self.quantity - self._old_quantity
+        if self.product_id and quantity_diff:
+            return [(self.product_id, -quantity_diff)]
+        return []
+
+    def save(self, *args, **kwargs):
+        self.calculate_total_price()
         
         # --- ΛΟΓΙΚΗ ΑΠΟΘΕΜΑΤΟΣ ---
-        if self.product:
-            try:
-                with transaction.atomic():
-                    # Κλειδώνουμε το προϊόν για να αποφύγουμε race conditions
-                    product = Product.objects.select_for_update().get(pk=self.product.pk)
-                    quantity_diff = self.quantity - self._old_quantity
-                    product.stock_quantity -= quantity_diff # Αφαιρούμε τη διαφορά
-                    product.save(update_fields=['stock_quantity', 'updated_at'])
-            except Product.DoesNotExist:
-                # Handle case where product might have been deleted, though PROTECT should prevent this
-                pass
+        # Δεσμεύουμε μόνο τη διαφορά ποσότητας (με lock στο προϊόν)
+        if self.order.status != Order.STATUS_CANCELLED:
+            self.order._apply_stock_lines(self.stock_changes(), StockMovement.MovementType.ORDER)
 
         super().save(*args, **kwargs) # Αποθηκεύουμε το OrderItem
-        self._old_quantity = self.quantity # Ενημερώνουμε την "παλιά" ποσότητα
+        self.mark_stock_applied() # Ενημερώνουμε την "παλιά" ποσότητα
         
         if self.order_id:
             transaction.on_commit(self.order.calculate_and_save)        
@@ -353,9 +572,8 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.product.name if self.product else 'No Product'} in Order {self.order.pk}"
 
     def delete(self, *args, **kwargs):
-        if self.order.status != Order.STATUS_CANCELLED and self.product:
-            self.product.stock_quantity += self.quantity
-            self.product.save(update_fields=['stock_quantity', 'updated_at'])
+        if self.order.status != Order.STATUS_CANCELLED and self.product_id:
+            self.order._apply_stock_lines([(self.product_id, self.quantity)], StockMovement.MovementType.ORDER_RELEASE)
         order_to_update = self.order
         super().delete(*args, **kwargs)
         # Re-fetch the order to ensure it exists before trying to update it
@@ -457,9 +675,114 @@ class StockReceipt(models.Model):
     def save(self, *args, **kwargs):
         is_new = self._state.adding
         super().save(*args, **kwargs)
-        if is_new and self.product:
-            self.product.stock_quantity += self.quantity_added
-            self.product.save(update_fields=['stock_quantity', 'updated_at'])
+        if is_new and self.product_id:
+            StockMovement.record(
+                self.product, self.quantity_added, StockMovement.MovementType.RECEIPT,
+                document=self, document_number=f"Παραλαβή #{self.pk}",
+                user=self.user_who_recorded, timestamp=self.date_received
+            )
+
+
+class StockMovement(models.Model):
+    """
+    Βιβλίο κινήσεων αποθήκης (append-only). Κάθε αλλαγή αποθέματος γράφεται εδώ και
+    το Product.stock_quantity είναι απλά το τρέχον άθροισμα των κινήσεων.
+    """
+    class MovementType(models.TextChoices):
+        RECEIPT = 'RECEIPT', 'Παραλαβή'
+        RECEIPT_REVERSAL = 'RECEIPT_REVERSAL', 'Διαγραφή Παραλαβής'
+        ORDER = 'ORDER', 'Παραγγελία'
+        ORDER_RELEASE = 'ORDER_RELEASE', 'Ακύρωση/Διαγραφή Παραγγελίας'
+        RETAIL_SALE = 'RETAIL_SALE', 'Πώληση Λιανικής'
+        RETAIL_REVERSAL = 'RETAIL_REVERSAL', 'Διαγραφή Απόδειξης Λιανικής'
+        CREDIT_RETURN = 'CREDIT_RETURN', 'Επιστροφή (Πιστωτικό)'
+        ADJUSTMENT = 'ADJUSTMENT', 'Διόρθωση Αποθέματος'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements', verbose_name="Προϊόν")
+    timestamp = models.DateTimeField("Ημερομηνία & Ώρα", default=timezone.now)
+    movement_type = models.CharField("Τύπος Κίνησης", max_length=20, choices=MovementType.choices)
+    quantity = models.DecimalField("Ποσότητα", max_digits=10, decimal_places=2)
+    balance_after = models.DecimalField("Υπόλοιπο μετά την Κίνηση", max_digits=12, decimal_places=2)
+
+    # Το παραστατικό που προκάλεσε την κίνηση. Ο αριθμός κρατιέται και ως κείμενο,
+    # ώστε το ιστορικό να μη χρειάζεται να φορτώσει κάθε παραστατικό.
+    content_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True, blank=True)
+    object_id = models.PositiveIntegerField(null=True, blank=True)
+    document = GenericForeignKey('content_type', 'object_id')
+    document_number = models.CharField("Παραστατικό", max_length=100, blank=True)
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Χρήστης")
+    notes = models.CharField("Σημειώσεις", max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = "Κίνηση Αποθήκης"
+        verbose_name_plural = "Κινήσεις Αποθήκης"
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            models.Index(fields=['product', 'timestamp'], name='stockmove_product_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity} x {self.product} ({self.document_number or '-'})"
+
+    @classmethod
+    def record(cls, product, quantity, movement_type, document=None, document_number='', user=None, timestamp=None, notes=''):
+        """
+        Γράφει μια κίνηση και ενημερώνει ατομικά το stock_quantity του προϊόντος.
+        Το `product` μπορεί να είναι αντικείμενο ή pk. Επιστρέφει την κίνηση.
+        """
+        movements, balances = cls._apply(
+            [(product, quantity)], movement_type, document, document_number, user, timestamp, notes
+        )
+        if isinstance(product, Product):
+            product.stock_quantity = balances[product.pk]
+            product._original_stock = product.stock_quantity
+        return movements[0]
+
+    @classmethod
+    def record_document(cls, lines, movement_type, document=None, document_number='', user=None, timestamp=None, notes=''):
+        """
+        Εφαρμόζει όλες τις γραμμές ενός παραστατικού μαζί: ένα UPDATE με CASE για όλα τα
+        προϊόντα και ένα bulk_create για τις κινήσεις. Το `lines` είναι λίστα από
+        (προϊόν ή pk, ποσότητα). Επιστρέφει dict {product_id: νέο απόθεμα}.
+        """
+        return cls._apply(lines, movement_type, document, document_number, user, timestamp, notes)[1]
+
+    @classmethod
+    def _apply(cls, lines, movement_type, document, document_number, user, timestamp, notes):
+        lines = [
+            (product.pk if isinstance(product, Product) else product, Decimal(str(quantity)))
+            for product, quantity in lines if quantity
+        ]
+        if not lines:
+            return [], {}
+
+        deltas = {}
+        for product_id, quantity in lines:
+            deltas[product_id] = deltas.get(product_id, Decimal('0.00')) + quantity
+
+        if user is None:
+            current_user = get_current_user()
+            user = current_user if current_user and current_user.is_authenticated else None
+        content_type = ContentType.objects.get_for_model(document) if document is not None else None
+        timestamp = timestamp or timezone.now()
+
+        with transaction.atomic():
+            balances = Product.increment_quantities('stock_quantity', deltas)
+
+            # Το υπόλοιπο κάθε γραμμής υπολογίζεται προς τα πίσω από το τελικό υπόλοιπο
+            running = {product_id: balances[product_id] - delta for product_id, delta in deltas.items()}
+            movements = []
+            for product_id, quantity in lines:
+                running[product_id] += quantity
+                movements.append(cls(
+                    product_id=product_id, timestamp=timestamp, movement_type=movement_type,
+                    quantity=quantity, balance_after=running[product_id],
+                    content_type=content_type, object_id=document.pk if document is not None else None,
+                    document_number=document_number, user=user, notes=notes,
+                ))
+            movements = cls.objects.bulk_create(movements)
+        return movements, balances
 
 
 class ActivityLog(models.Model):
@@ -483,6 +806,12 @@ class ActivityLog(models.Model):
         verbose_name = "Καταγραφή Ενέργειας"
         verbose_name_plural = "Καταγραφές Ενεργειών"
         ordering = ['-action_time']
+        # Εξυπηρετούν τη λίστα του ιστορικού (φίλτρα + ταξινόμηση κατά χρόνο) και το archive_activity_log
+        indexes = [
+            models.Index(fields=['action_time'], name='actlog_time_idx'),
+            models.Index(fields=['user', 'action_time'], name='actlog_user_time_idx'),
+            models.Index(fields=['action_type', 'action_time'], name='actlog_type_time_idx'),
+        ]
 
     def __str__(self):
         user_display = str(self.user) if self.user else 'Σύστημα'
@@ -518,16 +847,29 @@ class Payment(models.Model):
     updated_at = models.DateTimeField("Τελευταία Ενημέρωση Εγγραφής", auto_now=True)
 
     _original_status = None
+    # (ημερομηνία, πελάτης) όπως αποτυπώθηκαν τελευταία στο CustomerBalanceSnapshot
+    _balance_state = None
+    # Η ημερομηνία όπως ακυρώθηκε τελευταία στο cache των αναφορών (βλ. signals)
+    _report_cache_date = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.pk:
             self._original_status = self.status
+            self._balance_state = self.balance_state()
+            self._report_cache_date = self.__dict__.get('payment_date')
+
+    def balance_state(self):
+        return (self.__dict__.get('payment_date'), self.__dict__.get('customer_id'))
 
     class Meta:
         verbose_name = "Πληρωμή"
         verbose_name_plural = "Πληρωμές"
         ordering = ['-payment_date', '-receipt_number']
+        indexes = [
+            models.Index(fields=['customer', 'payment_date'], name='payment_customer_date_idx'),
+            models.Index(fields=['updated_at'], name='payment_updated_idx'),
+        ]
 
     def __str__(self):
         status_display = f" ({self.get_status_display()})" if self.status != self.STATUS_ACTIVE else ""
@@ -619,11 +961,27 @@ class Invoice(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     _original_status = None
+    # (ημερομηνία, πελάτης, κατάσταση) όπως αποτυπώθηκαν τελευταία στο CustomerBalanceSnapshot
+    _balance_state = None
+    # (κατάσταση, ημερομηνία, πελάτης) όπως αποτυπώθηκαν τελευταία στο DailySalesFact
+    _sales_fact_state = None
+    # Η ημερομηνία όπως ακυρώθηκε τελευταία στο cache των αναφορών (βλ. signals)
+    _report_cache_date = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.pk:
             self._original_status = self.status
+            self._balance_state = self.balance_state()
+            self._sales_fact_state = self.sales_fact_state()
+            self._report_cache_date = self.__dict__.get('issue_date')
+
+    def balance_state(self):
+        return (self.__dict__.get('issue_date'), self.__dict__.get('customer_id'), self.__dict__.get('status'))
+
+    def sales_fact_state(self):
+        # Μέσω __dict__ ώστε ένα queryset με .only() να μην κάνει επιπλέον ερωτήσεις
+        return (self.__dict__.get('status'), self.__dict__.get('issue_date'), self.__dict__.get('customer_id'))
 
     @property
     def outstanding_amount(self):
@@ -640,6 +998,11 @@ class Invoice(models.Model):
         verbose_name = "Τιμολόγιο"
         verbose_name_plural = "Τιμολόγια"
         ordering = ['-issue_date', '-invoice_number']
+        indexes = [
+            models.Index(fields=['customer', 'issue_date'], name='invoice_customer_date_idx'),
+            models.Index(fields=['status', 'due_date'], name='invoice_status_due_idx'),
+            models.Index(fields=['updated_at'], name='invoice_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Τιμολόγιο {self.invoice_number} - {self.customer}"
@@ -756,11 +1119,35 @@ class CreditNote(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # (ημερομηνία, πελάτης) όπως αποτυπώθηκαν τελευταία στο CustomerBalanceSnapshot
+    _balance_state = None
+    # (κατάσταση, ημερομηνία, πελάτης) όπως αποτυπώθηκαν τελευταία στο DailySalesFact
+    _sales_fact_state = None
+    # Η ημερομηνία όπως ακυρώθηκε τελευταία στο cache των αναφορών (βλ. signals)
+    _report_cache_date = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.pk:
+            self._balance_state = self.balance_state()
+            self._sales_fact_state = self.sales_fact_state()
+            self._report_cache_date = self.__dict__.get('issue_date')
+
+    def balance_state(self):
+        return (self.__dict__.get('issue_date'), self.__dict__.get('customer_id'))
+
+    def sales_fact_state(self):
+        return (self.__dict__.get('status'), self.__dict__.get('issue_date'), self.__dict__.get('customer_id'))
     
     class Meta:
         verbose_name = "Πιστωτικό Τιμολόγιο"
         verbose_name_plural = "Πιστωτικά Τιμολόγια"
         ordering = ['-issue_date']
+        indexes = [
+            models.Index(fields=['customer', 'issue_date'], name='creditnote_customer_date_idx'),
+            models.Index(fields=['updated_at'], name='creditnote_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Πιστωτικό {self.credit_note_number} για πελάτη {self.customer}"
@@ -784,6 +1171,351 @@ class CreditNoteItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.description} στο Πιστωτικό {self.credit_note.credit_note_number}"
+
+
+# Ανά thread: {alias σύνδεσης: (ids τιμολογίων, ids πιστωτικών)} που περιμένουν refresh μετά το commit
+_pending_refresh = threading.local()
+
+
+class DailySalesFact(models.Model):
+    """
+    Συγκεντρωτικός πίνακας πωλήσεων για τις αναφορές, με grain (ημέρα, πελάτης, κεντρικό,
+    πωλητής, προϊόν, ΦΠΑ). Είναι παράγωγος: κάθε (ημέρα, πελάτης) ξαναχτίζεται από τα
+    τιμολόγια και τα πιστωτικά του όταν αλλάζει κάποιο παραστατικό (βλ. signals), ενώ η
+    εντολή rebuild_sales_facts ξαναχτίζει οποιοδήποτε διάστημα.
+
+    Τα ποσά είναι προσημασμένα: τα πιστωτικά γράφονται με αρνητικό πρόσημο, οπότε το
+    άθροισμα δίνει τις καθαρές πωλήσεις. Η έκπτωση τιμολογίου έχει ήδη μοιραστεί στις γραμμές.
+    Ο πωλητής και το κεντρικό είναι τα τρέχοντα του πελάτη: όταν αλλάξουν, ξαναχτίζονται όλες
+    οι γραμμές του πελάτη και των υποκαταστημάτων του (refresh_customers).
+    """
+    # Καταστάσεις τιμολογίου που μετράνε ως πώληση. Το πιστωμένο τιμολόγιο μένει πώληση -
+    # την αφαίρεση την κάνει το ίδιο το πιστωτικό.
+    INVOICE_STATUSES = ('issued', 'paid', 'credited')
+
+    date = models.DateField("Ημερομηνία")
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', verbose_name="Πελάτης")
+    parent_customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', verbose_name="Κεντρικό Κατάστημα")
+    sales_rep = models.ForeignKey(SalesRepresentative, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Πωλητής")
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Προϊόν")
+    vat_rate = models.DecimalField("Ποσοστό ΦΠΑ (%)", max_digits=5, decimal_places=2)
+
+    net_amount = models.DecimalField("Καθαρή Αξία (€)", max_digits=14, decimal_places=4, default=Decimal('0'))
+    vat_amount = models.DecimalField("ΦΠΑ (€)", max_digits=14, decimal_places=4, default=Decimal('0'))
+    quantity = models.DecimalField("Ποσότητα", max_digits=14, decimal_places=2, default=Decimal('0'))
+    cost_amount = models.DecimalField("Κόστος (€)", max_digits=14, decimal_places=4, default=Decimal('0'))
+
+    class Meta:
+        verbose_name = "Ημερήσια Πώληση (Αναφορές)"
+        verbose_name_plural = "Ημερήσιες Πωλήσεις (Αναφορές)"
+        indexes = [
+            models.Index(fields=['date'], name='salesfact_date_idx'),
+            models.Index(fields=['customer', 'date'], name='salesfact_customer_date_idx'),
+            models.Index(fields=['sales_rep', 'date'], name='salesfact_rep_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.customer_id}/{self.product_id} ΦΠΑ {self.vat_rate}%: {self.net_amount}"
+
+    @classmethod
+    def refresh(cls, slices):
+        """
+        Ξαναχτίζει τις γραμμές των ζευγών (ημερομηνία, customer_id) του `slices`.
+        Τρέχει μέσα στο transaction του καλούντος, ώστε τα facts να αλλάζουν μαζί με το παραστατικό.
+        """
+        slices = {
+            (date.date() if isinstance(date, datetime.datetime) else date, customer_id)
+            for date, customer_id in slices if date and customer_id
+        }
+        if not slices:
+            return 0
+        condition, invoice_condition, credit_condition = models.Q(), models.Q(), models.Q()
+        for date, customer_id in slices:
+            condition |= models.Q(date=date, customer_id=customer_id)
+            invoice_condition |= models.Q(invoice__issue_date=date, invoice__customer_id=customer_id)
+            credit_condition |= models.Q(credit_note__issue_date=date, credit_note__customer_id=customer_id)
+
+        with transaction.atomic():
+            cls.objects.filter(condition).delete()
+            return cls._build(invoice_condition, credit_condition)
+
+    @classmethod
+    def refresh_documents_on_commit(cls, invoice_ids=(), credit_note_ids=()):
+        """
+        Μετά το commit, ξαναχτίζει τα (ημερομηνία, πελάτης) των τιμολογίων/πιστωτικών που μετράνε
+        ως πώληση, για αλλαγές στις γραμμές τους. Οι γραμμές ενός παραστατικού γράφονται συνήθως
+        μαζί (π.χ. τιμολόγηση παραγγελίας): μαζεύονται σε ένα refresh ανά transaction.
+        """
+        alias = transaction.get_connection().alias
+        if not hasattr(_pending_refresh, 'documents'):
+            _pending_refresh.documents = {}
+        pending = _pending_refresh.documents.setdefault(alias, (set(), set()))
+        pending[0].update(invoice_ids)
+        pending[1].update(credit_note_ids)
+
+        def refresh():
+            # Το πρώτο callback μετά το commit παίρνει όλα τα ids και τα υπόλοιπα δεν βρίσκουν τίποτα.
+            # Ids που έμειναν από savepoint ή transaction με rollback απλώς ξαναχτίζονται από τα τρέχοντα δεδομένα.
+            invoices, credit_notes = _pending_refresh.documents.pop(alias, ((), ()))
+            if not invoices and not credit_notes:
+                return
+            cls.refresh(list(Invoice.objects.filter(
+                pk__in=invoices, status__in=cls.INVOICE_STATUSES
+            ).values_list('issue_date', 'customer_id')) + list(CreditNote.objects.filter(
+                pk__in=credit_notes, status=CreditNote.Status.ISSUED
+            ).values_list('issue_date', 'customer_id')))
+        transaction.on_commit(refresh)
+
+    @classmethod
+    def refresh_customers(cls, customer_ids):
+        """Ξαναχτίζει όλες τις γραμμές των πελατών (π.χ. μετά από αλλαγή πωλητή ή κεντρικού)."""
+        customer_ids = list(customer_ids)
+        with transaction.atomic():
+            cls.objects.filter(customer_id__in=customer_ids).delete()
+            return cls._build(
+                models.Q(invoice__customer_id__in=customer_ids), models.Q(credit_note__customer_id__in=customer_ids)
+            )
+
+    @classmethod
+    def rebuild(cls, date_from=None, date_to=None):
+        """Σβήνει και ξαναχτίζει όλες τις γραμμές του διαστήματος (κενό όριο = χωρίς όριο). Επιστρέφει το πλήθος τους."""
+        condition, invoice_condition, credit_condition = models.Q(), models.Q(), models.Q()
+        if date_from:
+            condition &= models.Q(date__gte=date_from)
+            invoice_condition &= models.Q(invoice__issue_date__gte=date_from)
+            credit_condition &= models.Q(credit_note__issue_date__gte=date_from)
+        if date_to:
+            condition &= models.Q(date__lte=date_to)
+            invoice_condition &= models.Q(invoice__issue_date__lte=date_to)
+            credit_condition &= models.Q(credit_note__issue_date__lte=date_to)
+
+        with transaction.atomic():
+            cls.objects.filter(condition).delete()
+            return cls._build(invoice_condition, credit_condition)
+
+    @staticmethod
+    def customer_dimensions(customer_ids):
+        """
+        {customer_id: (κεντρικός πελάτης, πωλητής)} όπως γράφονται στον πίνακα: ο πωλητής είναι ο
+        τρέχων του πελάτη ή, αν δεν έχει, του κεντρικού του. Το ίδιο και σε άλλες αναφορές ανά πωλητή.
+        """
+        return {
+            row['pk']: (row['parent_id'] or row['pk'], row['sales_rep_id'] or row['parent__sales_rep_id'])
+            for row in Customer.objects.filter(pk__in=customer_ids).values('pk', 'parent_id', 'sales_rep_id', 'parent__sales_rep_id')
+        }
+
+    @classmethod
+    def _build(cls, invoice_condition, credit_condition):
+        decimal_field = models.DecimalField(max_digits=14, decimal_places=4)
+        # Η έκπτωση τιμολογίου (ποσοστό στο σύνολο) μοιράζεται αναλογικά σε κάθε γραμμή
+        invoice_factor = models.Value(Decimal('1')) - models.F('invoice__discount_percentage') * models.Value(Decimal('0.01'))
+        invoice_rows = InvoiceItem.objects.filter(
+            invoice_condition, invoice__status__in=cls.INVOICE_STATUSES
+        ).values(
+            day=models.F('invoice__issue_date'), customer_id=models.F('invoice__customer_id'),
+            product_ref=models.F('product_id'), rate=models.F('vat_percentage'),
+        ).annotate(
+            net=Sum(models.F('total_price') * invoice_factor, output_field=decimal_field),
+            vat=Sum(models.F('vat_amount') * invoice_factor, output_field=decimal_field),
+            qty=Sum('quantity'),
+            cost=Sum(models.F('quantity') * models.F('product__cost_price'), output_field=decimal_field),
+        ).order_by()
+        credit_rows = CreditNoteItem.objects.filter(
+            credit_condition, credit_note__status=CreditNote.Status.ISSUED
+        ).values(
+            day=models.F('credit_note__issue_date'), customer_id=models.F('credit_note__customer_id'),
+            product_ref=models.F('product_id'), rate=models.F('vat_percentage'),
+        ).annotate(
+            net=Sum('total_price'), vat=Sum('vat_amount'), qty=Sum('quantity'),
+            cost=Sum(models.F('quantity') * models.F('product__cost_price'), output_field=decimal_field),
+        ).order_by()
+
+        totals = {}
+        for sign, rows in ((1, invoice_rows), (-1, credit_rows)):
+            for row in rows:
+                key = (row['day'], row['customer_id'], row['product_ref'], row['rate'])
+                measures = totals.setdefault(key, [Decimal('0')] * 4)
+                for index, name in enumerate(('net', 'vat', 'qty', 'cost')):
+                    measures[index] += sign * (row[name] or Decimal('0'))
+        if not totals:
+            return 0
+
+        customers = cls.customer_dimensions({customer_id for _, customer_id, _, _ in totals})
+        facts = []
+        for (day, customer_id, product_id, rate), (net, vat, qty, cost) in totals.items():
+            parent_customer_id, sales_rep_id = customers[customer_id]
+            facts.append(cls(
+                date=day, customer_id=customer_id,
+                parent_customer_id=parent_customer_id, sales_rep_id=sales_rep_id,
+                product_id=product_id, vat_rate=rate,
+                net_amount=net, vat_amount=vat, quantity=qty, cost_amount=cost,
+            ))
+        cls.objects.bulk_create(facts, batch_size=1000)
+        return len(facts)
+class CustomerBalanceSnapshot(models.Model):
+    """
+    Το υπόλοιπο ενός πελάτη στο τέλος ενός κλεισμένου μήνα (βλ. core/balances.py και
+    close_customer_balances), ώστε το υπόλοιπο έναρξης μιας περιόδου να βγαίνει από το πιο
+    πρόσφατο στιγμιότυπο και τις λίγες κινήσεις μετά από αυτό. Γράφεται μόνο για μήνες με
+    κινήσεις· ποιοι μήνες έχουν κλείσει φαίνεται στο CustomerBalanceClose. Ένα παραστατικό με
+    ημερομηνία σε κλεισμένο μήνα ξαναχτίζει τα στιγμιότυπα του πελάτη από εκείνον τον μήνα (βλ. signals).
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='balance_snapshots', verbose_name="Πελάτης")
+    month_end = models.DateField("Τέλος Μήνα")
+    debit = models.DecimalField("Χρεώσεις Μήνα (€)", max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    credit = models.DecimalField("Πιστώσεις Μήνα (€)", max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    balance = models.DecimalField("Υπόλοιπο Τέλους Μήνα (€)", max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name = "Μηνιαίο Υπόλοιπο Πελάτη"
+        verbose_name_plural = "Μηνιαία Υπόλοιπα Πελατών"
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'month_end'], name='balancesnapshot_customer_month_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['month_end'], name='balancesnapshot_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} {self.month_end}: {self.balance}"
+
+
+class CustomerBalanceClose(models.Model):
+    """Μήνας που έχει κλείσει με την close_customer_balances (ακόμη κι αν δεν είχε κινήσεις)."""
+    month_end = models.DateField("Τέλος Μήνα", unique=True)
+    closed_at = models.DateTimeField("Κλείσιμο", auto_now=True)
+
+    class Meta:
+        verbose_name = "Κλεισμένος Μήνας Υπολοίπων"
+        verbose_name_plural = "Κλεισμένοι Μήνες Υπολοίπων"
+
+    def __str__(self):
+        return f"{self.month_end:%m/%Y}"
+
+
+class ReportCacheEntry(models.Model):
+    """
+    Αποθηκευμένο αποτέλεσμα αναφοράς (βλ. core/report_cache.py). Το διάστημα [date_from, date_to]
+    είναι οι ημερομηνίες παραστατικών από τις οποίες εξαρτάται· κενό όριο σημαίνει χωρίς όριο.
+    """
+    report = models.CharField("Αναφορά", max_length=100)
+    cache_key = models.CharField("Κλειδί", max_length=64, unique=True)
+    date_from = models.DateField("Από", null=True, blank=True)
+    date_to = models.DateField("Έως", null=True, blank=True)
+    payload = models.BinaryField("Αποτέλεσμα")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField("Λήξη")
+
+    class Meta:
+        verbose_name = "Αποθηκευμένη Αναφορά"
+        verbose_name_plural = "Αποθηκευμένες Αναφορές"
+        indexes = [
+            models.Index(fields=['date_from', 'date_to'], name='reportcache_range_idx'),
+            models.Index(fields=['expires_at'], name='reportcache_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report} ({self.date_from or '…'} - {self.date_to or '…'})"
+
+
+class ReportCacheGeneration(models.Model):
+    """
+    Μετρητής ακυρώσεων του cache των αναφορών (μία γραμμή): αυξάνεται σε κάθε ακύρωση, ώστε ένα
+    αποτέλεσμα που υπολογιζόταν την ώρα της ακύρωσης να μην αποθηκευτεί (βλ. core/report_cache.py).
+    """
+    generation = models.PositiveBigIntegerField("Γενιά", default=0)
+
+    class Meta:
+        verbose_name = "Γενιά Cache Αναφορών"
+        verbose_name_plural = "Γενιές Cache Αναφορών"
+
+    def __str__(self):
+        return str(self.generation)
+
+
+class JournalExportCursor(models.Model):
+    """
+    Ως πού έχει εξαχθεί το λογιστικό ημερολόγιο για έναν προορισμό (βλ. core/journal.py):
+    η επόμενη εξαγωγή ψάχνει μόνο παραστατικά με updated_at μετά από το exported_until.
+    """
+    target = models.CharField("Προορισμός", max_length=50, unique=True)
+    exported_until = models.DateTimeField("Εξαγωγή έως", null=True, blank=True)
+    last_run_at = models.DateTimeField("Τελευταία Εξαγωγή", null=True, blank=True)
+    last_documents = models.PositiveIntegerField("Παραστατικά Τελευταίας Εξαγωγής", default=0)
+
+    class Meta:
+        verbose_name = "Δείκτης Εξαγωγής Ημερολογίου"
+        verbose_name_plural = "Δείκτες Εξαγωγής Ημερολογίου"
+
+    def __str__(self):
+        return f"{self.target} έως {self.exported_until:%d/%m/%Y %H:%M}" if self.exported_until else self.target
+
+
+class JournalExportedDocument(models.Model):
+    """
+    Πώς εξάχθηκε τελευταία ένα παραστατικό σε έναν προορισμό (ημερομηνία, πελάτης, γραμμές),
+    ώστε μια αλλαγή του να βγει ως αντιλογισμός των παλιών γραμμών και καταχώρηση των νέων.
+    """
+    target = models.CharField("Προορισμός", max_length=50)
+    document_type = models.CharField("Είδος Παραστατικού", max_length=20)
+    document_id = models.PositiveBigIntegerField("Παραστατικό")
+    entry = models.JSONField("Εγγραφή")
+    exported_at = models.DateTimeField("Εξαγωγή", auto_now=True)
+
+    class Meta:
+        verbose_name = "Εξαχθέν Παραστατικό"
+        verbose_name_plural = "Εξαχθέντα Παραστατικά"
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'document_type', 'document_id'], name='journal_exported_document_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.target}: {self.document_type} #{self.document_id}"
+
+
+class ReportJob(models.Model):
+    """
+    Αναφορά που εκτελείται στο παρασκήνιο (βλ. core/report_jobs.py και run_report_jobs).
+    Η ουρά είναι ο ίδιος ο πίνακας: ο worker παίρνει τις εκκρεμείς με ένα υπό συνθήκη UPDATE.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Σε αναμονή'
+        RUNNING = 'RUNNING', 'Εκτελείται'
+        DONE = 'DONE', 'Ολοκληρώθηκε'
+        FAILED = 'FAILED', 'Απέτυχε'
+
+    report = models.CharField("Αναφορά", max_length=100)  # όνομα url της view
+    params = models.JSONField("Παράμετροι", default=dict, blank=True)
+    status = models.CharField("Κατάσταση", max_length=10, choices=Status.choices, default=Status.QUEUED)
+    progress = models.PositiveSmallIntegerField("Πρόοδος (%)", default=0)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='report_jobs', verbose_name="Χρήστης")
+    # Εξαγωγές: ποια δεδομένα βλέπει ο χρήστης (βλ. listings.scope)· η δουλειά μοιράζεται με όσους έχουν το ίδιο
+    scope = models.CharField("Εύρος Δεδομένων", max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField("Σφάλμα", blank=True)
+
+    result_html = models.TextField("Αποτέλεσμα (HTML)", blank=True)
+    result_chart = models.JSONField("Δεδομένα Γραφήματος", null=True, blank=True)
+    result_file = models.FileField("Αρχείο", upload_to='report_jobs/%Y/%m/', blank=True)
+
+    class Meta:
+        verbose_name = "Αναφορά στο Παρασκήνιο"
+        verbose_name_plural = "Αναφορές στο Παρασκήνιο"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+
 class UserProfile(models.Model):
     # Σύνδεση ένα-προς-ένα με τον χρήστη του Django
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
@@ -890,4 +1622,104 @@ class Attachment(models.Model):
         return os.path.basename(self.file.name)        
 
 
-                                    
\ No newline at end of file
+                                    
+
+class DocumentSequence(models.Model):
+    """
+    Μετρητής αρίθμησης παραστατικών ανά πρόθεμα και έτος (π.χ. INV/2025).
+    Η αύξηση γίνεται με κλείδωμα της γραμμής, ώστε δύο ταυτόχρονες αποθηκεύσεις
+    να μην πάρουν ποτέ τον ίδιο αριθμό.
+    """
+    prefix = models.CharField("Πρόθεμα", max_length=20)
+    year = models.PositiveIntegerField("Έτος")
+    last_value = models.PositiveIntegerField("Τελευταίος Αριθμός", default=0)
+
+    class Meta:
+        verbose_name = "Αρίθμηση Παραστατικών"
+        verbose_name_plural = "Αριθμήσεις Παραστατικών"
+        unique_together = ('prefix', 'year')
+        ordering = ['prefix', '-year']
+
+    def __str__(self):
+        return f"{self.prefix}-{self.year}: {self.last_value}"
+
+    @staticmethod
+    def format_number(prefix, year, value, width):
+        return f"{prefix}-{year}-{value:0{width}d}"
+
+    @staticmethod
+    def existing_max(model, field_name, prefix, year):
+        """
+        Βρίσκει τον μεγαλύτερο αριθμό που έχει ήδη δοθεί σε ένα μοντέλο για το
+        συγκεκριμένο πρόθεμα/έτος. Χρησιμοποιείται για την αρχικοποίηση του μετρητή.
+        """
+        max_value = 0
+        numbers = model.objects.filter(
+            **{f'{field_name}__startswith': f'{prefix}-{year}-'}
+        ).values_list(field_name, flat=True)
+        for number in numbers.iterator():
+            try:
+                max_value = max(max_value, int(number.split('-')[-1]))
+            except (ValueError, IndexError, AttributeError):
+                continue
+        return max_value
+
+    @classmethod
+    def next_value(cls, prefix, year, initial=None):
+        """
+        Επιστρέφει τον επόμενο αριθμό της ακολουθίας.
+        Το `initial` είναι callable που δίνει την αρχική τιμή, αν ο μετρητής δεν υπάρχει ακόμα.
+        Εκτελείται μέσα στο transaction του καλούντος, οπότε σε rollback δεν μένει κενό.
+        """
+        return cls.reserve(prefix, year, 1, initial=initial)[0]
+
+    @classmethod
+    def reserve(cls, prefix, year, count, initial=None):
+        """
+        Δεσμεύει `count` συνεχόμενους αριθμούς με ένα μόνο UPDATE (που κρατάει το lock
+        της γραμμής μέχρι το τέλος του transaction) και επιστρέφει το range τους.
+        Αν το batch κάνει rollback, γυρίζει πίσω και ο μετρητής.
+        """
+        if count < 1:
+            return range(0)
+        sequences = cls.objects.filter(prefix=prefix, year=year)
+        with transaction.atomic():
+            if not sequences.update(last_value=models.F('last_value') + count):
+                cls._create_if_missing(prefix, year, initial)
+                sequences.update(last_value=models.F('last_value') + count)
+            last_value = sequences.values_list('last_value', flat=True).get()
+        return range(last_value - count + 1, last_value + 1)
+
+    @classmethod
+    def assign_numbers(cls, instances, field_name, prefix, date_field, width):
+        """
+        Συμπληρώνει αριθμούς σε λίστα αντικειμένων πριν από ένα bulk_create
+        (το οποίο δεν στέλνει pre_save signals). Γίνεται μία δέσμευση ανά έτος.
+        """
+        pending = {}
+        for instance in instances:
+            if getattr(instance, field_name):
+                continue
+            date_value = getattr(instance, date_field)
+            year = date_value.year if date_value else timezone.now().year
+            pending.setdefault(year, []).append(instance)
+
+        for year, year_instances in pending.items():
+            model = type(year_instances[0])
+            numbers = cls.reserve(
+                prefix, year, len(year_instances),
+                initial=lambda: cls.existing_max(model, field_name, prefix, year)
+            )
+            for instance, value in zip(year_instances, numbers):
+                setattr(instance, field_name, cls.format_number(prefix, year, value, width))
+        return instances
+
+    @classmethod
+    def _create_if_missing(cls, prefix, year, initial=None):
+        start = initial() if initial else 0
+        try:
+            with transaction.atomic():
+                cls.objects.create(prefix=prefix, year=year, last_value=start)
+        except IntegrityError:
+            # Κάποια άλλη σύνδεση το δημιούργησε ταυτόχρονα - το UPDATE που ακολουθεί θα περιμένει το lock της
+            pass
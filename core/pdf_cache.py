@@ -0,0 +1,117 @@
+# core/pdf_cache.py
+"""
+Cache στον δίσκο για τα PDF των παραστατικών.
+
+Ένα PDF αποθηκεύεται με κλειδί (είδος, id, updated_at, κατάσταση, hash του template, hash του
+COMPANY_INFO, updated_at του πελάτη/προμηθευτή που τυπώνεται): αν αλλάξει κάτι από αυτά, το κλειδί αλλάζει και το PDF ξαναφτιάχνεται, οπότε
+το WeasyPrint τρέχει μία φορά ανά έκδοση του παραστατικού. Τα αρχεία ενός παραστατικού σβήνονται
+σε κάθε αποθήκευση του ίδιου ή των γραμμών του (βλ. signals): έτσι πιάνονται και αλλαγές που δεν
+αγγίζουν το updated_at (π.χ. save(update_fields=['status']), μαζικές αλλαγές γραμμών) και δεν
+μένουν παλιές εκδόσεις στον δίσκο.
+
+Το κλειδί είναι και το ETag: με If-None-Match ο browser παίρνει 304 χωρίς σώμα, εφόσον το αρχείο
+υπάρχει ακόμα στο cache (αλλιώς το παραστατικό μπορεί να άλλαξε με το ίδιο κλειδί).
+
+Τα αρχεία είναι στο PDF_CACHE_DIR/<είδος>/<id>/<κλειδί>.pdf· κοινός φάκελος για όλους τους
+workers, με ατομική εγγραφή (os.replace).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.template.loader import get_template
+
+# {διαδρομή template: (mtime, hash)}
+_template_hashes = {}
+
+
+def enabled():
+    return getattr(settings, 'PDF_CACHE_ENABLED', True)
+
+
+def _directory(document):
+    return os.path.join(settings.PDF_CACHE_DIR, document._meta.model_name, str(document.pk))
+
+
+def template_hash(template_name):
+    """Hash του αρχείου του template (ξαναδιαβάζεται μόνο αν αλλάξει το mtime του)."""
+    path = get_template(template_name).origin.name
+    mtime = os.path.getmtime(path)
+    cached = _template_hashes.get(path)
+    if not cached or cached[0] != mtime:
+        with open(path, 'rb') as file:
+            cached = (mtime, hashlib.sha256(file.read()).hexdigest())
+        _template_hashes[path] = cached
+    return cached[1]
+
+
+def company_hash():
+    info = json.dumps(getattr(settings, 'COMPANY_INFO', {}), sort_keys=True, default=str)
+    return hashlib.sha256(info.encode('utf-8')).hexdigest()
+
+
+def make_key(document, template_name, depends_on=()):
+    parts = [
+        document._meta.label, document.pk, getattr(document, 'updated_at', None), getattr(document, 'status', None),
+        template_hash(template_name), company_hash(),
+        [(obj._meta.label, obj.pk, obj.updated_at) for obj in depends_on if obj is not None],
+    ]
+    return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()[:32]
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return header.strip() == '*' or etag in [value.strip() for value in header.split(',')]
+
+
+def _path(document, key):
+    return os.path.join(_directory(document), f'{key}.pdf')
+
+
+def get_or_render(document, key, render):
+    """Τα bytes του PDF (κλειδί `key`) από τον δίσκο, ή καλεί το `render()` και τα αποθηκεύει."""
+    if not enabled():
+        return render()
+    directory, path = _directory(document), _path(document, key)
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        pass
+
+    pdf_bytes = render()
+    os.makedirs(directory, exist_ok=True)
+    descriptor, partial = tempfile.mkstemp(dir=directory, suffix='.partial')
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(pdf_bytes)
+    os.replace(partial, path)
+    return pdf_bytes
+
+
+def pdf_response(request, document, template_name, render, filename, depends_on=()):
+    """
+    Η απόκριση με το PDF του `document` (inline), από το cache ή με `render()` (bytes).
+    `depends_on`: άλλα αντικείμενα (με updated_at) που τυπώνονται στο PDF, π.χ. ο πελάτης.
+    Αν ο browser έχει ήδη αυτή την έκδοση (If-None-Match), 304 χωρίς να διαβαστεί το αρχείο.
+    """
+    key = make_key(document, template_name, depends_on)
+    etag = f'"{key}"'
+    if enabled() and _etag_matches(request, etag) and os.path.exists(_path(document, key)):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(get_or_render(document, key, render), content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['ETag'] = etag
+    # Ο browser ξαναρωτάει κάθε φορά (τα δικαιώματα ελέγχονται στο view) και παίρνει 304 αν δεν άλλαξε
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def invalidate(model, pk):
+    """Σβήνει τα αποθηκευμένα PDF ενός παραστατικού."""
+    if pk is not None:
+        shutil.rmtree(os.path.join(settings.PDF_CACHE_DIR, model._meta.model_name, str(pk)), ignore_errors=True)
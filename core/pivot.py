@@ -0,0 +1,225 @@
+# core/pivot.py
+"""
+Ad-hoc pivot πάνω στις πωλήσεις.
+
+Οι διαστάσεις και τα μεγέθη επιλέγονται από λίστες επιτρεπτών τιμών (DIMENSIONS, MEASURES),
+οπότε το GROUP BY χτίζεται μόνο από γνωστές εκφράσεις. Οι γραμμές τιμολογίων και πιστωτικών
+ομαδοποιούνται στη βάση με μία ερώτηση η καθεμία και ενώνονται εδώ (τα πιστωτικά με αρνητικό
+πρόσημο), όπως στο DailySalesFact: η έκπτωση τιμολογίου μοιράζεται αναλογικά στις γραμμές.
+
+Για το περιθώριο, οι ποσότητες ομαδοποιούνται επιπλέον ανά ημέρα και προϊόν και κοστολογούνται
+όπως στην αναφορά κερδοφορίας (βλ. core/profitability.py): μέσο σταθμικό κόστος των παραλαβών
+μέχρι την ημέρα της πώλησης, αλλιώς το τρέχον κόστος του προϊόντος. Γραμμές χωρίς κόστος
+μετράνε στο περιθώριο με όλη την αξία τους.
+"""
+import datetime
+import json
+from decimal import Decimal
+
+import pandas as pd
+
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncQuarter
+
+from . import exports, profitability
+from .models import CreditNote, CreditNoteItem, Customer, DailySalesFact, InvoiceItem, Product, Purpose, SalesRepresentative
+
+DIMENSIONS = {
+    'month': 'Μήνας',
+    'quarter': 'Τρίμηνο',
+    'city': 'Πόλη',
+    'rep': 'Πωλητής',
+    'customer': 'Πελάτης',
+    'product': 'Προϊόν',
+    'vat_rate': 'ΦΠΑ (%)',
+    'purpose': 'Σκοπός Διακίνησης',
+}
+
+MEASURES = {
+    'net': 'Καθαρή Αξία (€)',
+    'vat': 'ΦΠΑ (€)',
+    'quantity': 'Ποσότητα',
+    'margin': 'Περιθώριο (€)',
+    'documents': 'Παραστατικά',
+}
+
+_MONEY = DecimalField(max_digits=14, decimal_places=4)
+
+# (γραμμές, παραστατικό, πρόσημο)
+_SOURCES = [
+    (InvoiceItem, 'invoice', 1),
+    (CreditNoteItem, 'credit_note', -1),
+]
+
+
+def validate(dimensions, measures):
+    """Ελέγχει τις επιλογές του χρήστη· ValueError με μήνυμα για τον χρήστη αν κάτι δεν επιτρέπεται."""
+    if not measures:
+        raise ValueError("Επιλέξτε τουλάχιστον ένα μέγεθος.")
+    for kind, values, allowed in (('διάσταση', dimensions, DIMENSIONS), ('μέγεθος', measures, MEASURES)):
+        unknown = [value for value in values if value not in allowed]
+        if unknown:
+            raise ValueError(f"Άγνωστη {kind}: {', '.join(unknown)}. Επιτρέπονται: {', '.join(allowed)}.")
+        if len(set(values)) != len(values):
+            raise ValueError(f"Η ίδια {kind} δόθηκε δύο φορές.")
+    if 'month' in dimensions and 'quarter' in dimensions:
+        raise ValueError("Επιλέξτε μήνα ή τρίμηνο, όχι και τα δύο.")
+
+
+def _dimension(name, document):
+    customer = f'{document}__customer'
+    if name == 'month':
+        return TruncMonth(f'{document}__issue_date')
+    if name == 'quarter':
+        return TruncQuarter(f'{document}__issue_date')
+    if name == 'city':
+        return F(f'{customer}__city')
+    if name == 'rep':
+        return Coalesce(f'{customer}__sales_rep_id', f'{customer}__parent__sales_rep_id')
+    if name == 'customer':
+        return F(f'{document}__customer_id')
+    if name == 'product':
+        return F('product_id')
+    if name == 'vat_rate':
+        return F('vat_percentage')
+    # Το πιστωτικό δεν έχει δικό του σκοπό: παίρνει του τιμολογίου που πιστώνει
+    return F('invoice__purpose') if document == 'invoice' else F('credit_note__original_invoice__purpose')
+
+
+def _aggregates(measures, document):
+    net, vat = F('total_price'), F('vat_amount')
+    if document == 'invoice':
+        factor = Value(Decimal('1')) - F('invoice__discount_percentage') * Value(Decimal('0.01'))
+        net, vat = net * factor, vat * factor
+    aggregates = {}
+    if 'net' in measures or 'margin' in measures:
+        aggregates['sum_net'] = Sum(net, output_field=_MONEY)
+    if 'vat' in measures:
+        aggregates['sum_vat'] = Sum(vat, output_field=_MONEY)
+    if 'quantity' in measures:
+        aggregates['sum_quantity'] = Sum('quantity')
+    if 'documents' in measures:
+        aggregates['sum_documents'] = Count(document, distinct=True)
+    return aggregates
+
+
+def pivot(dimensions, measures, date_from, date_to):
+    """
+    Τα μεγέθη ανά συνδυασμό διαστάσεων για τα παραστατικά του [date_from, date_to].
+    Επιστρέφει {'columns': τίτλοι, 'keys': ονόματα, 'rows': [[...], ...]}: πρώτα οι διαστάσεις
+    (ως ετικέτες), μετά τα μεγέθη, με τη σειρά που ζητήθηκαν. Χωρίς διαστάσεις δίνει μία γραμμή
+    με τα σύνολα.
+    """
+    validate(dimensions, measures)
+    totals = {}
+    cost_lines = []
+    for lines_model, document, sign in _SOURCES:
+        filters = {f'{document}__issue_date__range': [date_from, date_to]}
+        if document == 'invoice':
+            filters['invoice__status__in'] = DailySalesFact.INVOICE_STATUSES
+        else:
+            filters['credit_note__status'] = CreditNote.Status.ISSUED
+        dimension_values = {f'dim_{name}': _dimension(name, document) for name in dimensions}
+        rows = lines_model.objects.filter(**filters).values(**dimension_values).annotate(**_aggregates(measures, document)).order_by()
+        if 'margin' in measures:
+            cost_lines.extend(
+                (tuple(_normalize(row[f'dim_{name}']) for name in dimensions), row['day'], row['product_ref'], sign * row['qty'])
+                for row in lines_model.objects.filter(**filters, product__isnull=False).values(
+                    day=F(f'{document}__issue_date'), product_ref=F('product_id'), **dimension_values
+                ).annotate(qty=Sum('quantity')).order_by()
+            )
+
+        for row in rows:
+            key = tuple(_normalize(row[f'dim_{name}']) for name in dimensions)
+            entry = totals.setdefault(key, dict.fromkeys(('net', 'vat', 'quantity', 'cost', 'documents'), Decimal('0')))
+            for name, value in row.items():
+                if not name.startswith('sum_') or value is None:
+                    continue
+                # Τα πιστωτικά αφαιρούνται από τα ποσά, αλλά μετράνε κανονικά ως παραστατικά
+                name = name[len('sum_'):]
+                entry[name] += value if name == 'documents' else sign * value
+
+    for key, cost in _costs_at_date(cost_lines):
+        totals[key]['cost'] += cost
+
+    labels = {name: _labels(name, {key[index] for key in totals}) for index, name in enumerate(dimensions)}
+    result_rows = []
+    for key in sorted(totals, key=lambda key: tuple((value is None, value) for value in key)):
+        entry = totals[key]
+        values = {
+            'net': entry['net'], 'vat': entry['vat'], 'quantity': entry['quantity'],
+            'margin': entry['net'] - entry['cost'], 'documents': int(entry['documents']),
+        }
+        result_rows.append(
+            [labels[name][value] for name, value in zip(dimensions, key)]
+            + [values[name] if name == 'documents' else values[name].quantize(Decimal('0.01')) for name in measures]
+        )
+    return {
+        'columns': [DIMENSIONS[name] for name in dimensions] + [MEASURES[name] for name in measures],
+        'keys': list(dimensions) + list(measures),
+        'rows': result_rows,
+    }
+
+
+def _costs_at_date(lines):
+    """
+    Το κόστος γραμμών (κλειδί, ημέρα, προϊόν, ποσότητα) με το κόστος της ημέρας τους, με τις
+    συναρτήσεις της κερδοφορίας. Επιστρέφει [(κλειδί, κόστος)]· οι γραμμές χωρίς κόστος λείπουν.
+    """
+    if not lines:
+        return []
+    frame = pd.DataFrame({
+        'line': range(len(lines)),
+        'date': pd.to_datetime([day for _, day, _, _ in lines]),
+        'product_id': [product_id for _, _, product_id, _ in lines],
+        'quantity': [float(quantity) for _, _, _, quantity in lines],
+    })
+    timeline = profitability.cost_timeline(frame['product_id'].unique().tolist())
+    costed = profitability.apply_costs(frame, timeline, profitability.current_costs())
+    return [(lines[line][0], Decimal(str(cost))) for line, cost in zip(costed['line'], costed['cost'])]
+
+
+def _normalize(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, Decimal):
+        return value.quantize(Decimal('0.01'))  # 24 και 24.00 στην ίδια ομάδα
+    return value
+
+
+def _labels(dimension, keys):
+    """{τιμή: ετικέτα} για τις τιμές μιας διάστασης."""
+    if dimension == 'month':
+        return {key: key.strftime('%Y-%m') if key else '' for key in keys}
+    if dimension == 'quarter':
+        return {key: f"{key.year}-Q{(key.month - 1) // 3 + 1}" if key else '' for key in keys}
+    if dimension == 'purpose':
+        return {key: Purpose(key).label if key in Purpose.values else (key or '') for key in keys}
+    if dimension == 'vat_rate':
+        return {key: key for key in keys}
+    if dimension == 'city':
+        return {key: key or '' for key in keys}
+    ids = [key for key in keys if key is not None]
+    if dimension == 'rep':
+        found = {pk: str(rep) for pk, rep in SalesRepresentative.objects.select_related('user').in_bulk(ids).items()}
+        found[None] = 'Χωρίς Πωλητή'
+    elif dimension == 'customer':
+        found = {pk: str(customer) for pk, customer in Customer.objects.select_related('parent').in_bulk(ids).items()}
+    else:
+        found = {pk: name for pk, name in Product.objects.filter(pk__in=ids).values_list('pk', 'name')}
+        found[None] = 'Χωρίς Προϊόν'
+    return {key: found.get(key, '-') for key in keys}
+
+
+def json_chunks(result):
+    """Το αποτέλεσμα ως JSON, σε κομμάτια για StreamingHttpResponse (μία γραμμή τη φορά)."""
+    yield '{"columns": %s, "rows": [' % json.dumps(result['keys'], ensure_ascii=False)
+    for index, row in enumerate(result['rows']):
+        record = dict(zip(result['keys'], (float(value) if isinstance(value, Decimal) else value for value in row)))
+        yield (',' if index else '') + '\n' + json.dumps(record, ensure_ascii=False)
+    yield '\n]}\n'
+
+
+def csv_lines(result):
+    """Το αποτέλεσμα ως CSV (με BOM, ώστε το Excel να διαβάζει σωστά τα ελληνικά), μία γραμμή τη φορά."""
+    return exports.csv_lines(result['columns'], result['rows'])
@@ -0,0 +1,207 @@
+# core/profitability.py
+"""
+Κερδοφορία με το κόστος της ημέρας της πώλησης.
+
+Για κάθε προϊόν χτίζεται ένα χρονολόγιο μέσου σταθμικού κόστους από τις παραλαβές
+(StockReceipt) με την τιμή κόστους της γραμμής εντολής αγοράς τους. Κάθε γραμμή
+τιμολογίου (και πιστωτικού, με αρνητικό πρόσημο) παίρνει το κόστος που ίσχυε την ημέρα
+έκδοσής της· αν δεν υπάρχει παραλαβή μέχρι τότε, το τρέχον Product.cost_price.
+Γραμμές χωρίς κανένα κόστος δεν μετράνε, όπως και πριν.
+
+Οι γραμμές διαβάζονται σε παρτίδες των BATCH_SIZE και κάθε παρτίδα συμπτύσσεται αμέσως
+στο grain (μήνας, προϊόν, πελάτης), οπότε η μνήμη δεν εξαρτάται από το πλήθος των γραμμών.
+Ο πωλητής κάθε πελάτη προστίθεται στο τέλος με τον κανόνα του DailySalesFact, ώστε η
+κερδοφορία ανά πωλητή να συμφωνεί με τις πωλήσεις ανά πωλητή. Όλοι οι υπολογισμοί γίνονται
+στήλη-στήλη με pandas/NumPy· τα αποτελέσματα της margin_by είναι Decimal στρογγυλεμένα στα δύο δεκαδικά.
+"""
+import itertools
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, TruncDate
+
+from .models import CreditNote, CreditNoteItem, Customer, DailySalesFact, InvoiceItem, Product, SalesRepresentative, StockReceipt
+
+BATCH_SIZE = 100_000
+
+DIMENSIONS = {
+    'product': 'Προϊόν',
+    'customer': 'Πελάτης',
+    'rep': 'Πωλητής',
+    'month': 'Μήνας',
+}
+
+_LINE_GRAIN = ['month', 'product_id', 'customer_id']
+_GRAIN = _LINE_GRAIN + ['sales_rep_id']
+_MEASURES = ['quantity', 'revenue', 'cost']
+_LINE_COLUMNS = ['date', 'product_id', 'customer_id', 'quantity', 'revenue']
+
+
+def cost_timeline(product_ids=None):
+    """
+    Το μέσο σταθμικό κόστος κάθε προϊόντος μετά από κάθε ημέρα με παραλαβή:
+    DataFrame με στήλες product_id, date, unit_cost (ταξινομημένο κατά date).
+    """
+    receipts = StockReceipt.objects.filter(purchase_order_item__isnull=False, quantity_added__gt=0)
+    if product_ids is not None:
+        receipts = receipts.filter(product_id__in=product_ids)
+    rows = receipts.annotate(
+        day=TruncDate('date_received'),
+        qty=Cast('quantity_added', FloatField()),
+        unit=Cast('purchase_order_item__cost_price', FloatField()),
+    ).values_list('product_id', 'day', 'qty', 'unit')
+
+    df = pd.DataFrame.from_records(list(rows), columns=['product_id', 'date', 'qty', 'unit'])
+    if df.empty:
+        return pd.DataFrame({
+            'product_id': pd.Series(dtype='int64'), 'date': pd.Series(dtype='datetime64[ns]'),
+            'unit_cost': pd.Series(dtype='float64'),
+        })
+    df['date'] = pd.to_datetime(df['date'])
+    df['value'] = df['qty'] * df['unit']
+    daily = df.groupby(['product_id', 'date'], sort=True)[['qty', 'value']].sum().reset_index()
+    cumulative = daily.groupby('product_id')[['qty', 'value']].cumsum()
+    daily['unit_cost'] = cumulative['value'] / cumulative['qty']
+    return daily[['product_id', 'date', 'unit_cost']].sort_values('date', kind='stable').reset_index(drop=True)
+
+
+def current_costs():
+    """Το τρέχον Product.cost_price (όσων έχουν) ως Series ανά product_id, για γραμμές πριν από κάθε παραλαβή."""
+    return pd.Series(dict(
+        Product.objects.filter(cost_price__gt=0).annotate(
+            unit=Cast('cost_price', FloatField())
+        ).values_list('pk', 'unit')
+    ), dtype='float64')
+
+
+def _line_batches(date_from, date_to, product_id=None, batch_size=BATCH_SIZE):
+    """Οι γραμμές πωλήσεων του διαστήματος ως DataFrames των έως batch_size γραμμών (πιστωτικά αρνητικά)."""
+    # Η έκπτωση τιμολογίου μοιράζεται αναλογικά στις γραμμές, όπως στο DailySalesFact
+    invoice_factor = Value(Decimal('1')) - F('invoice__discount_percentage') * Value(Decimal('0.01'))
+    invoice_lines = InvoiceItem.objects.filter(
+        invoice__issue_date__range=[date_from, date_to],
+        invoice__status__in=DailySalesFact.INVOICE_STATUSES,
+        product__isnull=False,
+    ).annotate(
+        day=F('invoice__issue_date'), customer=F('invoice__customer_id'),
+        qty=Cast('quantity', FloatField()),
+        net=Cast(F('total_price') * invoice_factor, FloatField()),
+    )
+    credit_lines = CreditNoteItem.objects.filter(
+        credit_note__issue_date__range=[date_from, date_to],
+        credit_note__status=CreditNote.Status.ISSUED,
+        product__isnull=False,
+    ).annotate(
+        day=F('credit_note__issue_date'), customer=F('credit_note__customer_id'),
+        qty=Cast('quantity', FloatField()),
+        net=Cast('total_price', FloatField()),
+    )
+    if product_id:
+        invoice_lines = invoice_lines.filter(product_id=product_id)
+        credit_lines = credit_lines.filter(product_id=product_id)
+
+    for sign, lines in ((1, invoice_lines), (-1, credit_lines)):
+        rows = lines.values_list('day', 'product_id', 'customer', 'qty', 'net').iterator(chunk_size=batch_size)
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                break
+            df = pd.DataFrame.from_records(chunk, columns=_LINE_COLUMNS)
+            df['date'] = pd.to_datetime(df['date'])
+            if sign < 0:
+                df[['quantity', 'revenue']] *= -1
+            yield df
+
+
+def apply_costs(lines, timeline, current_costs):
+    """
+    Προσθέτει στις γραμμές (στήλες date, product_id, quantity) το κόστος τους (ποσότητα x κόστος
+    μονάδας της ημέρας) και πετάει όσες δεν έχουν. Οι υπόλοιπες στήλες μένουν ως έχουν.
+    """
+    lines = lines.sort_values('date', kind='stable')
+    if timeline.empty:
+        lines = lines.assign(unit_cost=np.nan)
+    else:
+        lines = pd.merge_asof(lines, timeline, on='date', by='product_id', direction='backward')
+    unit_cost = lines['unit_cost'].fillna(lines['product_id'].map(current_costs))
+    lines = lines.assign(unit_cost=unit_cost)[unit_cost.notna()]
+    return lines.assign(
+        cost=lines['quantity'] * lines['unit_cost'],
+        month=lines['date'].values.astype('datetime64[M]'),
+    )
+
+
+def margin_cube(date_from, date_to, product_id=None, batch_size=BATCH_SIZE):
+    """
+    Τζίρος, κόστος και ποσότητα στο grain (μήνας, προϊόν, πελάτης, πωλητής) για το διάστημα.
+    Από αυτό βγαίνουν όλες οι διαστάσεις της margin_by.
+    """
+    timeline = cost_timeline([product_id] if product_id else None)
+    costs = current_costs()
+
+    partials = []
+    for lines in _line_batches(date_from, date_to, product_id, batch_size):
+        costed = apply_costs(lines, timeline, costs)
+        partials.append(costed.groupby(_LINE_GRAIN)[_MEASURES].sum().reset_index())
+    if not partials:
+        return pd.DataFrame(columns=_GRAIN + _MEASURES)
+    cube = pd.concat(partials, ignore_index=True).groupby(_LINE_GRAIN)[_MEASURES].sum().reset_index()
+    reps = {
+        customer_id: sales_rep_id
+        for customer_id, (_, sales_rep_id) in DailySalesFact.customer_dimensions(cube['customer_id'].unique().tolist()).items()
+    }
+    cube['sales_rep_id'] = cube['customer_id'].map(reps)
+    return cube[_GRAIN + _MEASURES]
+
+
+def margin_by(cube, dimension):
+    """
+    Συμπτύσσει το margin_cube σε μία διάσταση (βλ. DIMENSIONS). Επιστρέφει λίστα από dicts με
+    label, code, total_quantity, total_revenue, total_cost, total_profit και profit_margin (%),
+    κατά φθίνον κέρδος (οι μήνες χρονολογικά).
+    """
+    key = {'product': 'product_id', 'customer': 'customer_id', 'rep': 'sales_rep_id', 'month': 'month'}[dimension]
+    if cube.empty:
+        return []
+    grouped = cube.groupby(key, dropna=False)[_MEASURES].sum()
+    grouped['profit'] = grouped['revenue'] - grouped['cost']
+    revenue = grouped['revenue'].to_numpy()
+    grouped['margin'] = np.divide(
+        grouped['profit'].to_numpy() * 100, revenue, out=np.zeros(len(grouped)), where=revenue > 0
+    )
+    grouped = grouped.sort_index() if dimension == 'month' else grouped.sort_values('profit', ascending=False)
+
+    labels = _labels(dimension, grouped.index)
+    return [
+        {
+            'label': label, 'code': code,
+            'total_quantity': _decimal(row.quantity), 'total_revenue': _decimal(row.revenue),
+            'total_cost': _decimal(row.cost), 'total_profit': _decimal(row.profit),
+            'profit_margin': _decimal(row.margin),
+        }
+        for (label, code), row in zip(labels, grouped.itertuples(index=False))
+    ]
+
+
+def _decimal(value):
+    # Μέσω str: η συντομότερη αναπαράσταση του float, όχι το ακριβές δυαδικό του ανάπτυγμα
+    return Decimal(str(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _labels(dimension, keys):
+    """Λίστα από (ετικέτα, κωδικός) για τις τιμές μιας διάστασης, με τη σειρά του `keys`."""
+    if dimension == 'month':
+        return [(pd.Timestamp(key).strftime('%m/%Y'), '') for key in keys]
+    ids = [int(key) for key in keys if pd.notna(key)]
+    if dimension == 'product':
+        found = {pk: (name, code or '') for pk, name, code in Product.objects.filter(pk__in=ids).values_list('pk', 'name', 'code')}
+    elif dimension == 'customer':
+        found = {
+            pk: (str(customer), customer.code)
+            for pk, customer in Customer.objects.select_related('parent').in_bulk(ids).items()
+        }
+    else:
+        found = {pk: (str(rep), '') for pk, rep in SalesRepresentative.objects.select_related('user').in_bulk(ids).items()}
+    return [found.get(int(key), ('-', '')) if pd.notna(key) else ('Χωρίς Πωλητή', '') for key in keys]
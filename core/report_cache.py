@@ -0,0 +1,156 @@
+# core/report_cache.py
+"""
+Cache αποτελεσμάτων για τις αναφορές.
+
+Μια εγγραφή κλειδώνεται με (αναφορά, κανονικοποιημένες παράμετροι, εμβέλεια χρήστη) και κρατάει
+το διάστημα ημερομηνιών παραστατικών από το οποίο εξαρτάται. Όταν αλλάξει τιμολόγιο, πιστωτικό,
+πληρωμή ή προμήθεια, σβήνονται μόνο οι εγγραφές που το διάστημά τους περιέχει την ημερομηνία
+του (βλ. signals). Οι εγγραφές ζουν στη βάση, ώστε η ακύρωση να ισχύει για όλους τους workers.
+
+Τα αποτελέσματα που αποθηκεύονται υπολογίζονται πάντα στην κύρια βάση (και μέσα σε
+reporting_database view): ένα replica που καθυστερεί θα μπορούσε να δώσει δεδομένα πριν από
+μια αλλαγή της οποίας η ακύρωση έχει ήδη τρέξει, και αυτά θα έμεναν στο cache ως το timeout.
+
+Κάθε ακύρωση αυξάνει έναν κοινό μετρητή (ReportCacheGeneration) στο ίδιο transaction με τη
+διαγραφή. Ένα αποτέλεσμα αποθηκεύεται μόνο αν ο μετρητής δεν άλλαξε όσο υπολογιζόταν: μια
+ακύρωση που έτρεξε στο μεταξύ δεν βρήκε ακόμα την εγγραφή για να τη σβήσει.
+
+Τα hits/misses μετράνε στο /metrics ως crm_report_cache_requests_total{report,result}.
+"""
+import datetime
+import hashlib
+import json
+import pickle
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import db_routing, metrics
+from .models import ReportCacheEntry, ReportCacheGeneration
+
+
+def enabled():
+    return getattr(settings, 'REPORT_CACHE_ENABLED', True)
+
+
+def user_scope(user):
+    """
+    Η εμβέλεια δεδομένων του χρήστη, ως μέρος του κλειδιού. Σήμερα όλοι οι χρήστες βλέπουν τα ίδια
+    στοιχεία στις αναφορές· αν κάποια αναφορά φιλτράρει ανά χρήστη/πωλητή, η διάκριση μπαίνει εδώ.
+    """
+    return 'all'
+
+
+def make_key(report, params, scope):
+    normalized = json.dumps(
+        {'report': report, 'params': {k: v for k, v in params.items() if v not in (None, '')}, 'scope': scope},
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _generation(lock=False):
+    rows = ReportCacheGeneration.objects.filter(pk=1)
+    if lock:
+        rows = rows.select_for_update()
+    return rows.values_list('generation', flat=True).first() or 0
+
+
+def _next_generation():
+    """Αυξάνει τον μετρητή ακυρώσεων· καλείται μέσα στο transaction της ακύρωσης, πριν από τη διαγραφή."""
+    if not ReportCacheGeneration.objects.filter(pk=1).update(generation=F('generation') + 1):
+        ReportCacheGeneration.objects.get_or_create(pk=1, defaults={'generation': 1})
+
+
+def _as_date(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(value)
+
+
+def get_or_compute(report, params, compute, date_from=None, date_to=None, user=None):
+    """
+    Επιστρέφει το αποθηκευμένο αποτέλεσμα της αναφοράς ή καλεί το `compute()` και το αποθηκεύει.
+    Το [date_from, date_to] είναι το διάστημα ημερομηνιών παραστατικών που επηρεάζει το αποτέλεσμα
+    (None = χωρίς όριο, π.χ. ένα υπόλοιπο έναρξης εξαρτάται από όλο το παρελθόν).
+    Το αποτέλεσμα πρέπει να γίνεται pickle: λίστες/dicts, όχι ανοιχτά querysets.
+    """
+    if not enabled():
+        return compute()
+
+    key = make_key(report, params, user_scope(user))
+    now = timezone.now()
+    payload = ReportCacheEntry.objects.filter(cache_key=key, expires_at__gt=now).values_list('payload', flat=True).first()
+    if payload is not None:
+        metrics.increment('crm_report_cache_requests_total', (('report', report), ('result', 'hit')))
+        return pickle.loads(payload)
+
+    metrics.increment('crm_report_cache_requests_total', (('report', report), ('result', 'miss')))
+    generation = _generation()
+    with db_routing.primary():
+        result = compute()
+    try:
+        with transaction.atomic():
+            # Κλειδωμένος ως το commit: μια ακύρωση που ξεκινά τώρα περιμένει και σβήνει και αυτή την εγγραφή
+            if _generation(lock=True) != generation:
+                return result
+            ReportCacheEntry.objects.filter(expires_at__lte=now).delete()
+            ReportCacheEntry.objects.update_or_create(cache_key=key, defaults={
+                'report': report, 'date_from': _as_date(date_from), 'date_to': _as_date(date_to),
+                'payload': pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+                'expires_at': now + datetime.timedelta(seconds=settings.REPORT_CACHE_TIMEOUT),
+            })
+    except IntegrityError:
+        # Άλλο request αποθήκευσε το ίδιο κλειδί ταυτόχρονα
+        pass
+    return result
+
+
+def invalidate(dates):
+    """Σβήνει τις εγγραφές που το διάστημά τους περιέχει κάποια από τις ημερομηνίες. Επιστρέφει το πλήθος τους."""
+    dates = {_as_date(value) for value in dates if value}
+    if not dates:
+        return 0
+    condition = Q()
+    for value in dates:
+        condition |= (
+            (Q(date_from__isnull=True) | Q(date_from__lte=value))
+            & (Q(date_to__isnull=True) | Q(date_to__gte=value))
+        )
+    with transaction.atomic():
+        _next_generation()
+        deleted, _ = ReportCacheEntry.objects.filter(condition).delete()
+    if deleted:
+        metrics.increment('crm_report_cache_invalidations_total', value=deleted)
+    return deleted
+
+
+def invalidate_on_commit(*dates):
+    """
+    Ακυρώνει μετά το commit, ώστε ένα request που διαβάζει στο μεταξύ να μην ξαναγεμίσει
+    το cache με τα δεδομένα πριν την αλλαγή. Εκτός atomic block εκτελείται αμέσως.
+    """
+    transaction.on_commit(lambda: invalidate(dates))
+
+
+def invalidate_report(report):
+    """Σβήνει όλες τις εγγραφές μιας αναφοράς, για αλλαγές που δεν δένονται με ημερομηνία παραστατικού."""
+    with transaction.atomic():
+        _next_generation()
+        deleted, _ = ReportCacheEntry.objects.filter(report=report).delete()
+    if deleted:
+        metrics.increment('crm_report_cache_invalidations_total', value=deleted)
+    return deleted
+
+
+def clear():
+    """Σβήνει όλες τις εγγραφές (π.χ. μετά από rebuild_sales_facts ή αλλαγή στη λογική μιας αναφοράς)."""
+    with transaction.atomic():
+        _next_generation()
+        ReportCacheEntry.objects.all().delete()
@@ -0,0 +1,179 @@
+# core/report_jobs.py
+"""
+Αναφορές στο παρασκήνιο χωρίς εξωτερικό broker.
+
+Μια report_* view με ?async=1 δεν υπολογίζει τίποτα: γράφει ένα ReportJob και στέλνει τον
+χρήστη στη σελίδα κατάστασης, η οποία ρωτάει το status endpoint μέχρι να τελειώσει.
+Η εντολή run_report_jobs παίρνει τις εκκρεμείς δουλειές από τον πίνακα και τις τρέχει σε
+process pool: κάθε δουλειά καλεί την ίδια view (με RequestFactory και τον χρήστη που τη ζήτησε)
+και κρατάει το HTML, τα δεδομένα του γραφήματος και ένα Excel του βασικού πίνακα.
+
+Οι εξαγωγές λιστών (export_*) μπαίνουν στην ίδια ουρά: ο worker γράφει το αρχείο τους στο
+result_file (MEDIA_ROOT/report_jobs/) και ο χρήστης το κατεβάζει από τη σελίδα της δουλειάς.
+Μια ίδια εξαγωγή από χρήστη με το ίδιο εύρος δεδομένων ξαναχρησιμοποιεί τη δουλειά.
+"""
+import datetime
+import functools
+import io
+import logging
+import re
+import tempfile
+import traceback
+
+import pandas as pd
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import close_old_connections
+from django.db.models import Q
+from django.shortcuts import redirect, render
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+ASYNC_PARAM = 'async'
+
+
+def background_report(view):
+    """
+    Decorator για τις report_* views: με ?async=1 η αναφορά μπαίνει στην ουρά αντί να
+    υπολογιστεί μέσα στο request. Μπαίνει κάτω από το @login_required.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.GET.get(ASYNC_PARAM) == '1' and not getattr(request, 'report_job', None):
+            job = enqueue(request.resolver_match.url_name, request.GET, request.user)
+            return redirect('report_job_detail', pk=job.pk)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def report_response(request, template_name, context, table=None, chart=None):
+    """
+    Κάνει render την αναφορά όπως το render(), κρατώντας στο response τον βασικό πίνακα
+    (στήλες, γραμμές) και τα δεδομένα του γραφήματος, για όταν την τρέχει ο worker.
+    """
+    response = render(request, template_name, context)
+    response.report_table = table
+    response.report_chart = chart
+    return response
+
+
+def enqueue(report, query, user, scope='', fresh_for=None):
+    """
+    Βάζει μια αναφορά στην ουρά. Αν ο ίδιος χρήστης έχει ήδη ζητήσει την ίδια αναφορά με τις ίδιες
+    παραμέτρους και δεν έχει τελειώσει, επιστρέφεται εκείνη η δουλειά. Με `scope` (εξαγωγές) η
+    δουλειά μοιράζεται με όσους βλέπουν τα ίδια δεδομένα, και με `fresh_for` επιστρέφεται και
+    μια ολοκληρωμένη που τελείωσε μέσα σε αυτό το διάστημα.
+    """
+    params = {key: value for key, value in query.items() if key != ASYNC_PARAM and value != ''}
+    jobs = ReportJob.objects.filter(report=report, params=params)
+    jobs = jobs.filter(scope=scope) if scope else jobs.filter(requested_by=user)
+    reusable = Q(status__in=[ReportJob.Status.QUEUED, ReportJob.Status.RUNNING])
+    if fresh_for:
+        reusable |= Q(status=ReportJob.Status.DONE, finished_at__gte=timezone.now() - fresh_for)
+    existing = jobs.filter(reusable).order_by('-created_at').first()
+    return existing or ReportJob.objects.create(report=report, params=params, requested_by=user, scope=scope)
+
+
+def claim_jobs(limit):
+    """
+    Δεσμεύει έως `limit` εκκρεμείς δουλειές (οι παλαιότερες πρώτα) και επιστρέφει τα ids τους.
+    Κάθε δέσμευση είναι ένα υπό συνθήκη UPDATE, οπότε δύο workers δεν παίρνουν την ίδια δουλειά.
+    """
+    if limit < 1:
+        return []
+    candidates = ReportJob.objects.filter(status=ReportJob.Status.QUEUED).order_by('created_at').values_list('pk', flat=True)[:limit]
+    claimed = []
+    for pk in candidates:
+        if ReportJob.objects.filter(pk=pk, status=ReportJob.Status.QUEUED).update(
+            status=ReportJob.Status.RUNNING, started_at=timezone.now(), progress=5
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def requeue_stale(max_age):
+    """Δουλειές που 'τρέχουν' πάνω από max_age (π.χ. worker που σκοτώθηκε) ξαναμπαίνουν στην ουρά."""
+    return ReportJob.objects.filter(
+        status=ReportJob.Status.RUNNING, started_at__lt=timezone.now() - max_age
+    ).update(status=ReportJob.Status.QUEUED, progress=0, started_at=None)
+
+
+def purge_old_jobs():
+    """Σβήνει τις τελειωμένες δουλειές (και τα αρχεία τους) που πέρασαν το REPORT_JOB_RETENTION_DAYS."""
+    cutoff = timezone.now() - datetime.timedelta(days=settings.REPORT_JOB_RETENTION_DAYS)
+    old_jobs = ReportJob.objects.filter(
+        status__in=[ReportJob.Status.DONE, ReportJob.Status.FAILED], finished_at__lt=cutoff
+    )
+    for job in old_jobs.exclude(result_file=''):
+        job.result_file.delete(save=False)
+    return old_jobs.delete()[0]
+
+
+def run_job(job_id):
+    """
+    Εκτελεί μια δεσμευμένη δουλειά. Τρέχει μέσα σε process του pool, αλλά και inline
+    (run_report_jobs --workers 0). Τα σφάλματα γράφονται στη δουλειά, δεν πετιούνται.
+    """
+    close_old_connections()
+    job = ReportJob.objects.select_related('requested_by').get(pk=job_id)
+    try:
+        path = reverse(job.report)
+        request = RequestFactory().get(path, job.params)
+        request.user = job.requested_by
+        request.report_job = job
+        request.resolver_match = resolve(path)
+        response = request.resolver_match.func(request)
+        if response.status_code != 200:
+            raise RuntimeError(f"Η αναφορά επέστρεψε HTTP {response.status_code}.")
+        _set_progress(job, 80)
+
+        if response.streaming:
+            # Εξαγωγή: το αρχείο της απόκρισης είναι το αποτέλεσμα
+            _save_artifact(job, response)
+        else:
+            job.result_html = response.content.decode(response.charset)
+            job.result_chart = getattr(response, 'report_chart', None)
+            table = getattr(response, 'report_table', None)
+            if table:
+                job.result_file.save(f"{job.report}-{job.pk}.xlsx", ContentFile(table_to_excel(*table)), save=False)
+        job.status = ReportJob.Status.DONE
+        job.progress = 100
+    except Exception:
+        logger.exception("Η αναφορά %s (#%s) απέτυχε", job.report, job.pk)
+        job.status = ReportJob.Status.FAILED
+        job.error = traceback.format_exc(limit=5)
+    job.finished_at = timezone.now()
+    job.save()
+    return job.status
+
+
+def _save_artifact(job, response):
+    """Γράφει το περιεχόμενο ενός streaming response στο result_file, χωρίς να το κρατήσει στη μνήμη."""
+    match = re.search(r'filename="[^"]*?(\.\w+)"', response.get('Content-Disposition', ''))
+    with tempfile.TemporaryFile() as file:
+        for chunk in response.streaming_content:
+            file.write(chunk)
+        job.result_file.save(f"{job.report}-{job.pk}{match.group(1) if match else ''}", File(file), save=False)
+
+
+def _set_progress(job, progress):
+    job.progress = progress
+    ReportJob.objects.filter(pk=job.pk).update(progress=progress)
+
+
+def table_to_excel(columns, rows, sheet_name='Αναφορά'):
+    """Ο πίνακας μιας αναφοράς (λίστα στηλών, λίστα γραμμών) ως αρχείο Excel (bytes)."""
+    df = pd.DataFrame(list(rows), columns=columns)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+        worksheet = writer.sheets[sheet_name]
+        for index, column in enumerate(df.columns, start=1):
+            width = max([len(str(column))] + [len(str(value)) for value in df[column].head(500)]) + 2
+            worksheet.column_dimensions[worksheet.cell(row=1, column=index).column_letter].width = min(width, 50)
+    return buffer.getvalue()
@@ -0,0 +1,17 @@
+# core/report_pool.py
+"""
+Σημεία εισόδου για τα processes του pool του run_report_jobs.
+
+Με spawn το νέο process φορτώνει αυτό το module πριν τρέξει το django.setup(), οπότε εδώ
+δεν εισάγεται κανένα μοντέλο στο επίπεδο του module.
+"""
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def run_job(job_id):
+    from .report_jobs import run_job as run
+    return run(job_id)
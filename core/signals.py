@@ -7,18 +7,33 @@ from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth import get_user_model
 from crum import get_current_user
-from django.db.models import Max
+from django.db.models import Max, Q
 from .models import Customer
+from .activity_log import log_activity
+from . import balances, pdf_cache, report_cache
 
 # Βεβαιώσου ότι όλα τα μοντέλα είναι εδώ
 from .models import (
     Customer, Order, Product, StockReceipt, ActivityLog, Payment, 
     Invoice, Commission, CreditNote, UserProfile, RetailReceipt,
-    DeliveryNote, PurchaseOrder
+    DeliveryNote, PurchaseOrder, PurchaseOrderItem, DocumentSequence, StockMovement, DailySalesFact,
+    OrderItem, InvoiceItem, CreditNoteItem, DeliveryNoteItem, RetailReceiptItem
 )
 
 User = get_user_model() # Ορίζουμε το User model μία φορά για χρήση στο αρχείο
 
+
+def next_document_number(model, field_name, prefix, year, width):
+    """
+    Δίνει τον επόμενο αριθμό παραστατικού από το DocumentSequence.
+    Αν ο μετρητής δεν υπάρχει ακόμα, ξεκινάει από τον μεγαλύτερο υπάρχοντα αριθμό.
+    """
+    value = DocumentSequence.next_value(
+        prefix, year,
+        initial=lambda: DocumentSequence.existing_max(model, field_name, prefix, year)
+    )
+    return DocumentSequence.format_number(prefix, year, value, width)
+
 # --- Signal Handlers για Αυτόματους Κωδικούς ---
 
 @receiver(pre_save, sender=Customer)
@@ -44,34 +59,13 @@ def set_customer_code(sender, instance, **kwargs):
 def set_order_number(sender, instance, **kwargs):
     if not instance.order_number:
         current_year = instance.order_date.year if instance.order_date else timezone.now().year
-        prefix = "ORDER"
-        last_order = Order.objects.filter(
-            order_number__startswith=f'{prefix}-{current_year}-'
-        ).order_by('-order_number').first()
-        next_sequence = 1
-        if last_order:
-            try:
-                last_sequence_str = last_order.order_number.split('-')[-1]
-                next_sequence = int(last_sequence_str) + 1
-            except (ValueError, IndexError):
-                next_sequence = 1
-        instance.order_number = f"{prefix}-{current_year}-{next_sequence:04d}"
+        instance.order_number = next_document_number(Order, 'order_number', "ORDER", current_year, 4)
 @receiver(pre_save, sender=CreditNote)
 def set_credit_note_number(sender, instance, **kwargs):
     if not instance.credit_note_number:
         current_year = instance.issue_date.year if instance.issue_date else timezone.now().year
-        prefix = "CN" # CN για Credit Note
-        last_cn = CreditNote.objects.filter(
-            credit_note_number__startswith=f'{prefix}-{current_year}-'
-        ).order_by('-credit_note_number').first()
-        next_sequence = 1
-        if last_cn:
-            try:
-                last_sequence_str = last_cn.credit_note_number.split('-')[-1]
-                next_sequence = int(last_sequence_str) + 1
-            except (ValueError, IndexError):
-                next_sequence = 1
-        instance.credit_note_number = f"{prefix}-{current_year}-{next_sequence:04d}"
+        # CN για Credit Note
+        instance.credit_note_number = next_document_number(CreditNote, 'credit_note_number', "CN", current_year, 4)
 # --- Signal Handlers για το ActivityLog ---
 
 # --- Customer ActivityLog ---
@@ -85,7 +79,7 @@ def log_customer_save(sender, instance, created, **kwargs):
         action = ActivityLog.ACTION_TYPE_UPDATE
         details = f"Ενημερώθηκαν τα στοιχεία του πελάτη: {instance.get_full_name()} (Κωδ: {instance.code})"
 
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=action,
         content_type=ContentType.objects.get_for_model(instance),
@@ -97,7 +91,7 @@ def log_customer_save(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Customer)
 def log_customer_delete(sender, instance, **kwargs):
     current_user = get_current_user()
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=ActivityLog.ACTION_TYPE_DELETE,
         content_type=ContentType.objects.get_for_model(instance),
@@ -127,7 +121,7 @@ def log_order_save(sender, instance, created, update_fields=None, **kwargs):
             action = ActivityLog.ACTION_TYPE_UPDATE
             details = f"Ενημερώθηκε η παραγγελία {instance.order_number}{customer_info}. Τρέχουσα κατάσταση: '{instance.get_status_display()}'."
 
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=action,
         content_type=ContentType.objects.get_for_model(instance),
@@ -143,7 +137,7 @@ def log_order_delete(sender, instance, **kwargs):
     if instance.customer: 
         customer_info = f" του πελάτη {instance.customer.get_full_name() if instance.customer else '[Άγνωστος Πελάτης]'}"
 
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=ActivityLog.ACTION_TYPE_DELETE,
         content_type=ContentType.objects.get_for_model(instance),
@@ -165,7 +159,7 @@ def log_product_save(sender, instance, created, **kwargs):
         details = (f"Ενημερώθηκαν τα στοιχεία του προϊόντος: '{instance.name}' (Κωδ: {instance.code or 'N/A'}). "
                    f"Τρέχουσα τιμή: {instance.price}€, Τρέχον απόθεμα: {instance.stock_quantity} {instance.get_unit_of_measurement_display()}.")
 
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=action,
         content_type=ContentType.objects.get_for_model(instance),
@@ -177,7 +171,7 @@ def log_product_save(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Product)
 def log_product_delete(sender, instance, **kwargs):
     current_user = get_current_user()
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=ActivityLog.ACTION_TYPE_DELETE,
         content_type=ContentType.objects.get_for_model(instance),
@@ -198,7 +192,7 @@ def log_stock_receipt_save(sender, instance, created, **kwargs):
         if instance.notes:
             details += f" Σημειώσεις: {instance.notes}"
 
-        ActivityLog.objects.create(
+        log_activity(
             user=current_user,
             action_type=ActivityLog.ACTION_TYPE_CREATE,
             content_type=ContentType.objects.get_for_model(instance),
@@ -220,11 +214,11 @@ def log_stock_receipt_delete(sender, instance, **kwargs):
 
     if product_affected and quantity_from_receipt is not None:
         try:
-            with transaction.atomic():
-                product_to_update = Product.objects.select_for_update().get(pk=product_affected.pk)
-                product_to_update.stock_quantity -= quantity_from_receipt
-                product_to_update.save(update_fields=['stock_quantity', 'updated_at'])
-                log_details += f" Το απόθεμα του προϊόντος '{product_to_update.name}' ενημερώθηκε σε {product_to_update.stock_quantity}."
+            movement = StockMovement.record(
+                product_affected.pk, -quantity_from_receipt, StockMovement.MovementType.RECEIPT_REVERSAL,
+                document=instance, document_number=f"Παραλαβή #{instance.pk}"
+            )
+            log_details += f" Το απόθεμα του προϊόντος '{product_affected.name}' ενημερώθηκε σε {movement.balance_after}."
         except Product.DoesNotExist:
             log_details += " Το προϊόν δεν βρέθηκε για ενημέρωση αποθέματος."
         except Exception as e:
@@ -233,7 +227,7 @@ def log_stock_receipt_delete(sender, instance, **kwargs):
             # logger = logging.getLogger(__name__)
             # logger.error(f"Error updating stock for product {product_affected.pk if product_affected else 'N/A'} on StockReceipt delete (ID: {instance.pk}): {e}")
     
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=ActivityLog.ACTION_TYPE_DELETE,
         content_type=ContentType.objects.get_for_model(instance),
@@ -245,7 +239,7 @@ def log_stock_receipt_delete(sender, instance, **kwargs):
 # --- Signal Handlers για User Login/Logout ---
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
-    ActivityLog.objects.create(
+    log_activity(
         user=user, 
         action_type=ActivityLog.ACTION_TYPE_LOGIN,
         content_type=None, 
@@ -262,7 +256,7 @@ def log_user_logout(sender, request, user, **kwargs):
 
     if user_to_log and user_to_log.is_authenticated:
         username = user_to_log.username
-        ActivityLog.objects.create(
+        log_activity(
             user=user_to_log, 
             action_type=ActivityLog.ACTION_TYPE_LOGOUT,
             content_type=None,
@@ -272,7 +266,7 @@ def log_user_logout(sender, request, user, **kwargs):
         )
     elif user : 
         username = user.username
-        ActivityLog.objects.create(
+        log_activity(
             user=None, 
             action_type=ActivityLog.ACTION_TYPE_LOGOUT,
             content_type=None,
@@ -281,7 +275,7 @@ def log_user_logout(sender, request, user, **kwargs):
             details=f"Ο χρήστης '{username}' αποσυνδέθηκε (ή η συνεδρία έληξε)."
         )
     else:
-        ActivityLog.objects.create(
+        log_activity(
             user=None,
             action_type=ActivityLog.ACTION_TYPE_LOGOUT,
             details="Έγινε αποσύνδεση (χωρίς προσδιορισμένο χρήστη)."
@@ -312,7 +306,7 @@ def log_user_save(sender, instance, created, **kwargs):
         else:
             details += " (από σύστημα)."
 
-    ActivityLog.objects.create(
+    log_activity(
         user=performing_user, 
         action_type=action,
         content_type=ContentType.objects.get_for_model(instance),
@@ -330,7 +324,7 @@ def log_user_delete(sender, instance, **kwargs):
     else:
         details += " (από σύστημα/διαχειριστική εντολή)."
 
-    ActivityLog.objects.create(
+    log_activity(
         user=performing_user,
         action_type=ActivityLog.ACTION_TYPE_DELETE,
         content_type=ContentType.objects.get_for_model(instance),
@@ -342,23 +336,8 @@ def log_user_delete(sender, instance, **kwargs):
 def set_payment_receipt_number(sender, instance, **kwargs):
     if not instance.receipt_number and not instance.pk: # Μόνο για νέα αντικείμενα που δεν έχουν ήδη αριθμό
         current_year = instance.payment_date.year if instance.payment_date else timezone.now().year
-        prefix = "PAY" # Μπορείς να το αλλάξεις σε "GRM" (Γραμμάτιο) ή "RCPT" (Receipt) αν προτιμάς
-        
-        last_payment_for_year = Payment.objects.filter(
-            receipt_number__startswith=f'{prefix}-{current_year}-'
-        ).order_by('-receipt_number').first()
-        
-        next_sequence = 1
-        if last_payment_for_year and last_payment_for_year.receipt_number:
-            try:
-                last_sequence_str = last_payment_for_year.receipt_number.split('-')[-1]
-                next_sequence = int(last_sequence_str) + 1
-            except (ValueError, IndexError):
-                # Εναλλακτικός τρόπος αν η παραπάνω λογική αποτύχει για κάποιο λόγο
-                # ή αν θέλεις να είσαι πιο ανθεκτικός σε αλλαγές format χειροκίνητα (δεν θα έπρεπε)
-                next_sequence = Payment.objects.filter(receipt_number__startswith=f'{prefix}-{current_year}-').count() + 1
-        
-        instance.receipt_number = f"{prefix}-{current_year}-{next_sequence:04d}" # Π.χ., PAY-2025-0001
+        # Π.χ., PAY-2025-0001
+        instance.receipt_number = next_document_number(Payment, 'receipt_number', "PAY", current_year, 4)
 @receiver(post_save, sender=Payment)
 def log_payment_save(sender, instance, created, **kwargs):
     current_user = get_current_user()
@@ -405,7 +384,7 @@ def log_payment_save(sender, instance, created, **kwargs):
 
 
     if details:
-        ActivityLog.objects.create(
+        log_activity(
             user=user_for_log,
             action_type=action_type,
             content_type=ContentType.objects.get_for_model(instance),
@@ -425,7 +404,7 @@ def log_payment_delete(sender, instance, **kwargs):
                f"ημερ. πληρωμής: {instance.payment_date.strftime('%d/%m/%Y')}). "
                f"Η κατάστασή της κατά τη διαγραφή ήταν: {instance.get_status_display()}.") # Καταγράφουμε και την κατάσταση που είχε
 
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=ActivityLog.ACTION_TYPE_DELETE,
         content_type=ContentType.objects.get_for_model(instance),
@@ -439,25 +418,9 @@ def set_invoice_number(sender, instance, **kwargs):
     if not instance.invoice_number:
         # Παίρνουμε το έτος από την ημερομηνία έκδοσης
         current_year = instance.issue_date.year if instance.issue_date else timezone.now().year
-        prefix = "INV" # Μπορείς να το αλλάξεις σε ό,τι θέλεις, π.χ., "ΤΙΜ"
-
-        # Βρίσκουμε το τελευταίο τιμολόγιο για το τρέχον έτος
-        last_invoice = Invoice.objects.filter(
-            invoice_number__startswith=f'{prefix}-{current_year}-'
-        ).order_by('-invoice_number').first()
-
-        next_sequence = 1
-        if last_invoice:
-            try:
-                # Παίρνουμε τον τελευταίο αριθμό της ακολουθίας και τον αυξάνουμε κατά 1
-                last_sequence_str = last_invoice.invoice_number.split('-')[-1]
-                next_sequence = int(last_sequence_str) + 1
-            except (ValueError, IndexError):
-                # Fallback σε περίπτωση που κάτι πάει στραβά με το format
-                next_sequence = 1
-
-        # Δημιουργούμε το νέο αριθμό τιμολογίου με padding (π.χ., 0001)
-        instance.invoice_number = f"{prefix}-{current_year}-{next_sequence:04d}"
+        # Δημιουργούμε το νέο αριθμό τιμολογίου με padding (π.χ., INV-2025-0001)
+        instance.invoice_number = next_document_number(Invoice, 'invoice_number', "INV", current_year, 4)
+
 @receiver(post_save, sender=Invoice)
 def log_invoice_save(sender, instance, created, **kwargs):
     current_user = get_current_user()
@@ -478,7 +441,7 @@ def log_invoice_save(sender, instance, created, **kwargs):
             details = f"Ενημερώθηκαν τα στοιχεία του τιμολογίου {instance.invoice_number}."
 
     if details: # Δημιουργούμε log μόνο αν έχουμε κάτι να πούμε
-        ActivityLog.objects.create(
+        log_activity(
             user=current_user,
             action_type=action,
             content_type=ContentType.objects.get_for_model(instance),
@@ -490,7 +453,7 @@ def log_invoice_save(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Invoice)
 def log_invoice_delete(sender, instance, **kwargs):
     current_user = get_current_user()
-    ActivityLog.objects.create(
+    log_activity(
         user=current_user,
         action_type=ActivityLog.ACTION_TYPE_DELETE,
         object_repr=str(instance), # Το object δεν υπάρχει πια, χρησιμοποιούμε την αναπαράστασή του
@@ -586,56 +549,205 @@ def create_user_profile(sender, instance, created, **kwargs):
 def set_retail_receipt_number(sender, instance, **kwargs):
     if not instance.receipt_number:
         current_year = instance.issue_date.year if instance.issue_date else timezone.now().year
-        prefix = "RETAIL" # ή ΑΛΠ για Απόδειξη Λιανικής Πώλησης
-
-        last_receipt = RetailReceipt.objects.filter(
-            receipt_number__startswith=f'{prefix}-{current_year}-'
-        ).order_by('-receipt_number').first()
-
-        next_sequence = 1
-        if last_receipt:
-            try:
-                last_sequence_str = last_receipt.receipt_number.split('-')[-1]
-                next_sequence = int(last_sequence_str) + 1
-            except (ValueError, IndexError):
-                next_sequence = 1
-        
-        instance.receipt_number = f"{prefix}-{current_year}-{next_sequence:05d}" # 5 ψηφία για περισσότερες αποδείξεις
+        # 5 ψηφία για περισσότερες αποδείξεις
+        instance.receipt_number = next_document_number(RetailReceipt, 'receipt_number', "RETAIL", current_year, 5)
 @receiver(pre_save, sender=DeliveryNote)
 def set_delivery_note_number(sender, instance, **kwargs):
     if not instance.delivery_note_number:
         current_year = instance.issue_date.year if instance.issue_date else timezone.now().year
-        prefix = "DN" # ή ΔΑ αν προτιμάς
-
-        last_dn = DeliveryNote.objects.filter(
-            delivery_note_number__startswith=f'{prefix}-{current_year}-'
-        ).order_by('-delivery_note_number').first()
-
-        next_sequence = 1
-        if last_dn:
-            try:
-                last_sequence_str = last_dn.delivery_note_number.split('-')[-1]
-                next_sequence = int(last_sequence_str) + 1
-            except (ValueError, IndexError):
-                next_sequence = 1
-
-        instance.delivery_note_number = f"{prefix}-{current_year}-{next_sequence:05d}" # π.χ., DN-2025-00001
+        # π.χ., DN-2025-00001
+        instance.delivery_note_number = next_document_number(DeliveryNote, 'delivery_note_number', "DN", current_year, 5)
 @receiver(pre_save, sender=PurchaseOrder)
 def set_po_number(sender, instance, **kwargs):
     if not instance.po_number:
         current_year = instance.order_date.year if instance.order_date else timezone.now().year
-        prefix = "PO" # PO για Purchase Order
-        
-        last_po = PurchaseOrder.objects.filter(
-            po_number__startswith=f'{prefix}-{current_year}-'
-        ).order_by('-po_number').first()
-        
-        next_sequence = 1
-        if last_po and last_po.po_number:
-            try:
-                last_sequence_str = last_po.po_number.split('-')[-1]
-                next_sequence = int(last_sequence_str) + 1
-            except (ValueError, IndexError):
-                next_sequence = 1
-        
-        instance.po_number = f"{prefix}-{current_year}-{next_sequence:05d}"                                                                                            
\ No newline at end of file
+        # PO για Purchase Order
+        instance.po_number = next_document_number(PurchaseOrder, 'po_number', "PO", current_year, 5)
+@receiver(post_save, sender=DeliveryNote, dispatch_uid="consume_order_stock_on_delivery_note")
+@receiver(post_save, sender=Invoice, dispatch_uid="consume_order_stock_on_invoice")
+def consume_order_stock_on_document(sender, instance, created, **kwargs):
+    """
+    Η έκδοση Δ.Α. ή τιμολογίου για μια παραγγελία εκτελεί τη δέσμευσή της: τα είδη
+    φεύγουν από την αποθήκη. Αν η παραγγελία έχει ήδη εκτελεστεί, δεν γίνεται τίποτα.
+    """
+    if not created:
+        return
+    order = instance.order
+    if order is None and sender is Invoice and instance.delivery_note_id:
+        order = instance.delivery_note.order
+    if order is not None:
+        order.consume_stock()
+
+
+# --- Μηνιαία υπόλοιπα πελατών (CustomerBalanceSnapshot) ---
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=CreditNote)
+@receiver(post_delete, sender=CreditNote)
+def refresh_balance_snapshots_on_document(sender, instance, **kwargs):
+    state = instance.balance_state()
+    previous = instance._balance_state or (None, None, None)
+    # Τα τιμολόγια ξαναχτίζουν μόνο όταν χρεώνουν ή χρέωναν τον πελάτη (όχι τα πρόχειρα)
+    if sender is not Invoice or state[2] in balances.INVOICE_STATUSES or previous[2] in balances.INVOICE_STATUSES:
+        balances.refresh([state[1], previous[1]], [state[0], previous[0]])
+    instance._balance_state = state
+
+
+# --- Συγκεντρωτικός πίνακας πωλήσεων (DailySalesFact) ---
+
+@receiver(post_save, sender=Invoice)
+def refresh_sales_facts_on_invoice(sender, instance, **kwargs):
+    """
+    Ξαναχτίζει τα facts της ημέρας/πελάτη του τιμολογίου (και της παλιάς, αν άλλαξαν)
+    όταν το τιμολόγιο μετράει ή μετρούσε ως πώληση. Τα πρόχειρα δεν αγγίζουν τον πίνακα.
+    """
+    state = instance.sales_fact_state()
+    previous = instance._sales_fact_state
+    counted = DailySalesFact.INVOICE_STATUSES
+    if state[0] in counted or (previous and previous[0] in counted):
+        slices = {state[1:]}
+        if previous:
+            slices.add(previous[1:])
+        DailySalesFact.refresh(slices)
+    instance._sales_fact_state = state
+
+
+@receiver(post_save, sender=CreditNote)
+def refresh_sales_facts_on_credit_note(sender, instance, **kwargs):
+    # Και η παλιά ημέρα/πελάτης, αν άλλαξαν
+    state = instance.sales_fact_state()
+    previous = instance._sales_fact_state
+    slices = {state[1:]}
+    if previous:
+        slices.add(previous[1:])
+    DailySalesFact.refresh(slices)
+    instance._sales_fact_state = state
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def refresh_sales_facts_on_invoice_item(sender, instance, **kwargs):
+    # Αλλαγή γραμμής χωρίς αλλαγή του τιμολογίου (κατάσταση/ημερομηνία/πελάτης)
+    DailySalesFact.refresh_documents_on_commit(invoice_ids=[instance.invoice_id])
+
+
+@receiver(post_save, sender=CreditNoteItem)
+@receiver(post_delete, sender=CreditNoteItem)
+def refresh_sales_facts_on_credit_note_item(sender, instance, **kwargs):
+    DailySalesFact.refresh_documents_on_commit(credit_note_ids=[instance.credit_note_id])
+
+
+@receiver(post_save, sender=Customer)
+def refresh_sales_facts_on_customer(sender, instance, created, **kwargs):
+    """
+    Αλλαγή πωλητή ή κεντρικού: ξαναχτίζονται οι γραμμές του πελάτη και των υποκαταστημάτων
+    του (που παίρνουν τον πωλητή του κεντρικού) και σβήνει το cache των αναφορών.
+    """
+    state = instance.sales_fact_state()
+    if not created and state != instance._sales_fact_state:
+        DailySalesFact.refresh_customers(
+            Customer.objects.filter(Q(pk=instance.pk) | Q(parent_id=instance.pk)).values_list('pk', flat=True)
+        )
+        transaction.on_commit(report_cache.clear)
+    instance._sales_fact_state = state
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=CreditNote)
+def refresh_sales_facts_on_delete(sender, instance, **kwargs):
+    DailySalesFact.refresh([(instance.issue_date, instance.customer_id)])
+
+
+# --- Ακύρωση του cache των αναφορών ---
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=CreditNote)
+@receiver(post_delete, sender=CreditNote)
+def invalidate_report_cache_on_document(sender, instance, **kwargs):
+    # Και η παλιά ημερομηνία, αν άλλαξε: ένα πεδίο που δεν το ξαναγράφει άλλος receiver πριν από αυτόν
+    report_cache.invalidate_on_commit(instance.issue_date, instance._report_cache_date)
+    instance._report_cache_date = instance.issue_date
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_report_cache_on_payment(sender, instance, **kwargs):
+    report_cache.invalidate_on_commit(instance.payment_date, instance._report_cache_date)
+    instance._report_cache_date = instance.payment_date
+
+
+@receiver(post_save, sender=StockReceipt)
+@receiver(post_delete, sender=StockReceipt)
+@receiver(post_save, sender=PurchaseOrderItem)
+@receiver(post_delete, sender=PurchaseOrderItem)
+def invalidate_profitability_cache(sender, instance, **kwargs):
+    # Μια παραλαβή αλλάζει το κόστος όλων των πωλήσεων μετά από αυτήν
+    transaction.on_commit(_invalidate_cost_reports)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_profitability_cache_on_cost_price(sender, instance, created, **kwargs):
+    # Το τρέχον κόστος μετράει για πωλήσεις χωρίς προηγούμενη παραλαβή· οι κινήσεις αποθέματος
+    # και οι άλλες αλλαγές του προϊόντος (που αποθηκεύουν συχνά) δεν αλλάζουν την κερδοφορία
+    cost_price = instance.__dict__.get('cost_price')
+    if not created and cost_price != instance._profitability_cost_price:
+        transaction.on_commit(_invalidate_cost_reports)
+    instance._profitability_cost_price = cost_price
+
+
+def _invalidate_cost_reports():
+    # Η κερδοφορία και το περιθώριο του pivot κοστολογούν με τον ίδιο τρόπο (core/profitability.py)
+    report_cache.invalidate_report('profitability')
+    report_cache.invalidate_report('pivot')
+
+
+@receiver(post_save, sender=Commission)
+@receiver(post_delete, sender=Commission)
+def invalidate_report_cache_on_commission(sender, instance, **kwargs):
+    # Η αναφορά πωλητών φιλτράρει τις προμήθειες με την ημερομηνία του τιμολογίου τους
+    issue_date = Invoice.objects.filter(pk=instance.invoice_id).values_list('issue_date', flat=True).first()
+    report_cache.invalidate_on_commit(issue_date)
+
+
+# --- Ακύρωση των αποθηκευμένων PDF (pdf_cache) ---
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=CreditNote)
+@receiver(post_delete, sender=CreditNote)
+@receiver(post_save, sender=DeliveryNote)
+@receiver(post_delete, sender=DeliveryNote)
+@receiver(post_save, sender=RetailReceipt)
+@receiver(post_delete, sender=RetailReceipt)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_delete, sender=PurchaseOrder)
+def invalidate_pdf_cache_on_document(sender, instance, **kwargs):
+    # Και οι αλλαγές κατάστασης με update_fields=['status'], που δεν αλλάζουν το updated_at
+    pk = instance.pk
+    transaction.on_commit(lambda: pdf_cache.invalidate(sender, pk))
+
+
+# (γραμμή, πεδίο του παραστατικού)
+PDF_DOCUMENT_LINES = [
+    (OrderItem, 'order'), (InvoiceItem, 'invoice'), (CreditNoteItem, 'credit_note'),
+    (DeliveryNoteItem, 'delivery_note'), (RetailReceiptItem, 'receipt'), (PurchaseOrderItem, 'purchase_order'),
+]
+
+
+def invalidate_pdf_cache_on_line(sender, instance, **kwargs):
+    field = sender._meta.get_field(dict(PDF_DOCUMENT_LINES)[sender])
+    pk = getattr(instance, field.attname)
+    transaction.on_commit(lambda: pdf_cache.invalidate(field.related_model, pk))
+
+
+for line_model, _ in PDF_DOCUMENT_LINES:
+    post_save.connect(invalidate_pdf_cache_on_line, sender=line_model, dispatch_uid=f'pdf_cache_{line_model._meta.model_name}_save')
+    post_delete.connect(invalidate_pdf_cache_on_line, sender=line_model, dispatch_uid=f'pdf_cache_{line_model._meta.model_name}_delete')
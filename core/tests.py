@@ -1,13 +1,39 @@
 # core/tests.py
-from django.test import TestCase
+from django.conf import settings
+from django.test import RequestFactory, TestCase, override_settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.contrib.auth import get_user_model
-from django.urls import reverse
+from django.contrib.auth.models import Group
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import models, transaction, connection
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
+import csv
 import datetime
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+from unittest import skipUnless
+from unittest.mock import patch
+from openpyxl import load_workbook
+from dateutil.relativedelta import relativedelta
 
 # Εισάγουμε τα μοντέλα και τις φόρμες που θέλουμε να ελέγξουμε
-from .models import Customer, Product, Invoice, Order, OrderItem
-from .forms import OrderItemForm
+from .models import (
+    Customer, Product, Invoice, InvoiceItem, Payment, Order, OrderItem, DocumentSequence, DeliveryNote, ActivityLog,
+    StockMovement, StockReceipt, CreditNote, CreditNoteItem, DailySalesFact, ReportCacheEntry, ReportJob,
+    Supplier, PurchaseOrder, PurchaseOrderItem, CustomerBalanceSnapshot, SalesRepresentative, JournalExportCursor
+)
+from .activity_log import buffered_activity_log, flush as flush_activity_log
+from . import aging, balances, db_routing, exports, journal, ledger, metrics, pdf_cache, pivot, profitability, report_cache
+from .forms import OrderForm, OrderItemForm
+from .middleware import ReplicaStickinessMiddleware, RequestMetricsMiddleware
 
 User = get_user_model()
 
@@ -189,4 +215,1624 @@ class CoreFunctionalityTests(TestCase):
 
         # Έλεγχος: Ο κωδικός ΔΕΝ πρέπει να είναι κενός
         self.assertIsNotNone(new_customer.code)
-        self.assertNotEqual(new_customer.code, "")
\ No newline at end of file
+        self.assertNotEqual(new_customer.code, "")
+
+
+class DocumentSequenceTests(TestCase):
+    """
+    Tests για την αρίθμηση παραστατικών μέσω του DocumentSequence.
+    """
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Αρίθμησης")
+
+    def test_sequence_continues_from_existing_numbers(self):
+        """
+        Ο μετρητής ξεκινάει από τον μεγαλύτερο υπάρχοντα αριθμό του έτους.
+        """
+        Invoice.objects.create(customer=self.customer, invoice_number="INV-2025-0007", issue_date=datetime.date(2025, 3, 1))
+        invoice = Invoice.objects.create(customer=self.customer, issue_date=datetime.date(2025, 3, 2))
+        self.assertEqual(invoice.invoice_number, "INV-2025-0008")
+        self.assertEqual(DocumentSequence.objects.get(prefix="INV", year=2025).last_value, 8)
+
+    def test_rolled_back_number_is_reused(self):
+        """
+        Αν η αποθήκευση ακυρωθεί (rollback), ο αριθμός δεν "χάνεται".
+        """
+        try:
+            with transaction.atomic():
+                Order.objects.create(customer=self.customer, order_date=datetime.date(2025, 1, 10))
+                raise RuntimeError("rollback")
+        except RuntimeError:
+            pass
+        order = Order.objects.create(customer=self.customer, order_date=datetime.date(2025, 1, 11))
+        self.assertEqual(order.order_number, "ORDER-2025-0001")
+
+    def test_block_reservation_for_bulk_create(self):
+        """
+        Η δέσμευση μπλοκ δίνει συνεχόμενους αριθμούς στο bulk_create και
+        επιστρέφεται πίσω αν το batch κάνει rollback.
+        """
+        try:
+            with transaction.atomic():
+                notes = [DeliveryNote(customer=self.customer, issue_date=datetime.date(2025, 5, 1)) for _ in range(3)]
+                DocumentSequence.assign_numbers(notes, 'delivery_note_number', "DN", 'issue_date', 5)
+                DeliveryNote.objects.bulk_create(notes)
+                raise RuntimeError("rollback")
+        except RuntimeError:
+            pass
+        self.assertFalse(DocumentSequence.objects.filter(prefix="DN", year=2025, last_value__gt=0).exists())
+
+        notes = [DeliveryNote(customer=self.customer, issue_date=datetime.date(2025, 5, 1)) for _ in range(3)]
+        DocumentSequence.assign_numbers(notes, 'delivery_note_number', "DN", 'issue_date', 5)
+        DeliveryNote.objects.bulk_create(notes)
+        self.assertEqual(
+            sorted(DeliveryNote.objects.values_list('delivery_note_number', flat=True)),
+            ["DN-2025-00001", "DN-2025-00002", "DN-2025-00003"]
+        )
+        self.assertEqual(DocumentSequence.reserve("DN", 2025, 2), range(4, 6))
+
+
+class ActivityLogBufferTests(TestCase):
+    """
+    Tests για το buffer του ActivityLog.
+    """
+    def test_entries_written_in_one_batch_after_commit(self):
+        """
+        Οι εγγραφές γράφονται όλες μαζί στο τέλος του buffer και μόνο για transactions που έκαναν commit.
+        """
+        with buffered_activity_log():
+            with self.captureOnCommitCallbacks(execute=True):
+                Customer.objects.create(first_name="Α", last_name="Πελάτης")
+                Customer.objects.create(first_name="Β", last_name="Πελάτης")
+            self.assertEqual(ActivityLog.objects.count(), 0)
+
+            try:
+                with transaction.atomic():
+                    Customer.objects.create(first_name="Γ", last_name="Πελάτης")
+                    raise RuntimeError("rollback")
+            except RuntimeError:
+                pass
+
+            with CaptureQueriesContext(connection) as queries:
+                flush_activity_log()
+            inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+            self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(ActivityLog.objects.count(), 2)
+        self.assertFalse(ActivityLog.objects.filter(details__contains="Γ Πελάτης").exists())
+
+    def test_archive_command_exports_and_deletes_old_months(self):
+        """
+        Το archive_activity_log γράφει τους παλιούς μήνες σε .jsonl.gz και τους σβήνει από τη βάση.
+        """
+        old_entry = ActivityLog.objects.create(action_type=ActivityLog.ACTION_TYPE_LOGIN, details="παλιά εγγραφή")
+        ActivityLog.objects.filter(pk=old_entry.pk).update(action_time=timezone.now() - datetime.timedelta(days=800))
+        ActivityLog.objects.create(action_type=ActivityLog.ACTION_TYPE_LOGIN, details="νέα εγγραφή")
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('archive_activity_log', months=12, output_dir=output_dir, chunk_size=1, stdout=io.StringIO())
+            archived = []
+            for name in os.listdir(output_dir):
+                with gzip.open(os.path.join(output_dir, name), 'rt', encoding='utf-8') as archive:
+                    archived.extend(json.loads(line) for line in archive)
+
+        self.assertEqual([row['details'] for row in archived], ["παλιά εγγραφή"])
+        self.assertEqual(list(ActivityLog.objects.values_list('details', flat=True)), ["νέα εγγραφή"])
+
+    def test_archive_command_merges_existing_archive_and_skips_empty_months(self):
+        """
+        Νέα εκτέλεση μετά από διακοπή: το υπάρχον αρχείο του μήνα συγχωνεύεται χωρίς διπλές εγγραφές
+        και δεν φτιάχνονται αρχεία για μήνες χωρίς εγγραφές.
+        """
+        old_time = timezone.localtime() - relativedelta(months=20)
+        first = ActivityLog.objects.create(action_type=ActivityLog.ACTION_TYPE_LOGIN, details="πρώτη")
+        second = ActivityLog.objects.create(action_type=ActivityLog.ACTION_TYPE_LOGIN, details="δεύτερη")
+        later = ActivityLog.objects.create(action_type=ActivityLog.ACTION_TYPE_LOGIN, details="δύο μήνες μετά")
+        ActivityLog.objects.filter(pk__in=[first.pk, second.pk]).update(action_time=old_time)
+        ActivityLog.objects.filter(pk=later.pk).update(action_time=old_time + relativedelta(months=2))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, f"activity_log_{old_time:%Y_%m}.jsonl.gz")
+            # Η προηγούμενη εκτέλεση έγραψε την πρώτη εγγραφή αλλά δεν πρόλαβε να τη σβήσει
+            with gzip.open(path, 'wt', encoding='utf-8') as archive:
+                archive.write(json.dumps({'id': first.pk, 'details': "πρώτη"}) + '\n')
+
+            call_command('archive_activity_log', months=12, output_dir=output_dir, stdout=io.StringIO())
+            with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                archived = [json.loads(line)['details'] for line in archive]
+            files = sorted(os.listdir(output_dir))
+
+        self.assertEqual(archived, ["πρώτη", "δεύτερη"])
+        self.assertEqual(files, [
+            f"activity_log_{old_time:%Y_%m}.jsonl.gz", f"activity_log_{old_time + relativedelta(months=2):%Y_%m}.jsonl.gz",
+        ])
+        self.assertFalse(ActivityLog.objects.exists())
+
+    def test_activity_log_list_uses_cursor_pagination(self):
+        """
+        Η λίστα του ιστορικού σελιδοποιείται με cursor (χωρίς COUNT).
+        """
+        user = User.objects.create_user(username='auditor', password='password123')
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=user, action_type=ActivityLog.ACTION_TYPE_UPDATE, details=f"εγγραφή {i}") for i in range(30)
+        ])
+        self.client.login(username='auditor', password='password123')
+        response = self.client.get(reverse('activity_log_list'), {'user_filter': user.pk})
+        self.assertEqual(len(response.context['log_entries']), 25)
+        self.assertIsNotNone(response.context['older_cursor'])
+
+        response = self.client.get(reverse('activity_log_list'), {'user_filter': user.pk, 'before': response.context['older_cursor']})
+        self.assertEqual(len(response.context['log_entries']), 5)
+        self.assertIsNone(response.context['older_cursor'])
+        self.assertIsNotNone(response.context['newer_cursor'])
+
+
+class StockMovementTests(TestCase):
+    """
+    Tests για το βιβλίο κινήσεων αποθήκης (StockMovement).
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='storekeeper', password='password123', is_staff=True)
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Αποθήκης")
+        self.product = Product.objects.create(name="Προϊόν Αποθήκης", price=Decimal("10.00"), stock_quantity=Decimal("20.00"))
+
+    def test_stock_changes_are_recorded_in_ledger(self):
+        """
+        Παραλαβή, εξαγωγή παραγγελίας και ακύρωση γράφουν κινήσεις και το απόθεμα ισούται με το άθροισμά τους.
+        """
+        StockReceipt.objects.create(product=self.product, quantity_added=Decimal("5.00"))
+        order = Order.objects.create(customer=self.customer)
+        item = OrderItem.objects.create(order=order, product=self.product, quantity=Decimal("8.00"), unit_price=Decimal("10.00"))
+        order.consume_stock()
+        item.quantity = Decimal("6.00")
+        item.save()
+        order.status = Order.STATUS_CANCELLED
+        order.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, Decimal("25.00"))
+        ledger_total = StockMovement.objects.filter(product=self.product).aggregate(total=models.Sum('quantity'))['total']
+        self.assertEqual(ledger_total, self.product.stock_quantity)
+        self.assertEqual(
+            list(StockMovement.objects.filter(product=self.product).order_by('id').values_list('movement_type', flat=True)),
+            ['ADJUSTMENT', 'RECEIPT', 'ORDER', 'ORDER', 'ORDER_RELEASE']
+        )
+
+    def test_deferred_stock_does_not_query_per_row(self):
+        """
+        Ένα queryset χωρίς το stock_quantity (.only) δεν κάνει επιπλέον ερώτηση ανά προϊόν και το save δεν γράφει κίνηση.
+        """
+        for index in range(4):
+            Product.objects.create(name=f"Προϊόν {index}", price=Decimal("1.00"))
+        with self.assertNumQueries(1):
+            products = list(Product.objects.only('name'))
+        self.assertEqual(len(products), 5)
+        movements = StockMovement.objects.count()
+        products[0].name = "Μετονομασία"
+        products[0].save(update_fields=['name', 'name_normalized'])
+        self.assertEqual(StockMovement.objects.count(), movements)
+
+    def test_product_form_edit_becomes_adjustment(self):
+        """
+        Αλλαγή του αποθέματος μέσω save() του προϊόντος γράφεται ως κίνηση διόρθωσης.
+        """
+        self.product.stock_quantity = Decimal("15.00")
+        self.product.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, Decimal("15.00"))
+        last = StockMovement.objects.filter(product=self.product).order_by('-id').first()
+        self.assertEqual((last.movement_type, last.quantity), ('ADJUSTMENT', Decimal("-5.00")))
+
+    def test_product_history_is_single_query_page(self):
+        """
+        Το ιστορικό προϊόντος διαβάζεται από το StockMovement με σταθερό αριθμό ερωτήσεων.
+        """
+        for _ in range(3):
+            StockReceipt.objects.create(product=self.product, quantity_added=Decimal("1.00"))
+        self.client.login(username='storekeeper', password='password123')
+        url = reverse('ajax_product_history', args=[self.product.pk])
+        self.client.get(url)  # ζέσταμα session/cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Παραλαβή #", response.json()['html'])
+        movement_queries = [q for q in queries.captured_queries if 'core_stockmovement' in q['sql']]
+        self.assertEqual(len(movement_queries), 1)
+
+    def test_record_document_applies_all_lines_in_one_update(self):
+        """
+        Όλες οι γραμμές ενός παραστατικού ενημερώνουν το απόθεμα με ένα UPDATE και επιστρέφονται τα νέα υπόλοιπα.
+        """
+        other = Product.objects.create(name="Δεύτερο Προϊόν", price=Decimal("5.00"), stock_quantity=Decimal("3.00"))
+        with CaptureQueriesContext(connection) as queries:
+            new_stock = StockMovement.record_document(
+                [(self.product, Decimal("-2.00")), (other.pk, Decimal("4.00")), (self.product, Decimal("-1.00"))],
+                StockMovement.MovementType.ADJUSTMENT
+            )
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "core_product"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(new_stock, {self.product.pk: Decimal("17.00"), other.pk: Decimal("7.00")})
+        self.assertEqual(
+            list(StockMovement.objects.filter(product=self.product, notes="").order_by('id').values_list('balance_after', flat=True)),
+            [Decimal("18.00"), Decimal("17.00")]
+        )
+
+
+class StockReservationTests(TestCase):
+    """
+    Tests για τις δεσμεύσεις αποθέματος από παραγγελίες.
+    """
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Δεσμεύσεων", vat_number="123456789")
+        self.product = Product.objects.create(name="Δεσμευμένο Προϊόν", price=Decimal("10.00"), stock_quantity=Decimal("20.00"))
+        self.order = Order.objects.create(customer=self.customer)
+        self.item = OrderItem.objects.create(order=self.order, product=self.product, quantity=Decimal("8.00"), unit_price=Decimal("10.00"))
+
+    def test_pending_order_reserves_and_cancel_releases(self):
+        """
+        Η ανοιχτή παραγγελία δεσμεύει χωρίς να αγγίζει το απόθεμα. Η ακύρωση και η επαναφορά αλλάζουν μόνο τη δέσμευση.
+        """
+        self.product.refresh_from_db()
+        self.assertEqual(
+            (self.product.stock_quantity, self.product.reserved_quantity, self.product.available_quantity),
+            (Decimal("20.00"), Decimal("8.00"), Decimal("12.00"))
+        )
+        self.assertFalse(StockMovement.objects.filter(movement_type='ORDER').exists())
+
+        self.order.status = Order.STATUS_CANCELLED
+        self.order.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, Decimal("0.00"))
+
+        self.order.status = Order.STATUS_PENDING
+        self.order.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, self.product.reserved_quantity), (Decimal("20.00"), Decimal("8.00")))
+
+    def test_delivery_note_consumes_reservation_once(self):
+        """
+        Το Δ.Α. της παραγγελίας εκτελεί τη δέσμευση. Το τιμολόγιο που ακολουθεί δεν αφαιρεί ξανά.
+        """
+        self.order.status = Order.STATUS_COMPLETED
+        self.order.save()
+        dn = DeliveryNote.objects.create(order=self.order, customer=self.customer)
+        Invoice.objects.create(customer=self.customer, order=self.order, delivery_note=dn)
+
+        self.product.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.stock_consumed)
+        self.assertEqual(
+            (self.product.stock_quantity, self.product.reserved_quantity, self.product.available_quantity),
+            (Decimal("12.00"), Decimal("0.00"), Decimal("12.00"))
+        )
+        self.assertEqual(StockMovement.objects.filter(movement_type='ORDER').count(), 1)
+
+
+class OrderBatchSaveTests(TestCase):
+    """
+    Tests για τη μαζική αποθήκευση των ειδών παραγγελίας.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='password123')
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Παραγγελιών")
+        self.products = [
+            Product.objects.create(name=f"Είδος {i}", price=Decimal("10.00"), stock_quantity=Decimal("100.00"))
+            for i in range(40)
+        ]
+        self.client.login(username='seller', password='password123')
+
+    def _post_order(self, line_count):
+        data = {
+            'customer': self.customer.pk, 'order_date': '2025-06-01', 'status': Order.STATUS_PENDING,
+            'shipping_name': 'Παραλήπτης', 'shipping_address': 'Οδός 1', 'shipping_city': 'Αθήνα',
+            'shipping_postal_code': '10000', 'purpose': 'SALE',
+            'items-TOTAL_FORMS': line_count, 'items-INITIAL_FORMS': 0,
+            'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+        }
+        for i, product in enumerate(self.products[:line_count]):
+            data.update({
+                f'items-{i}-product': product.pk, f'items-{i}-quantity': '2',
+                f'items-{i}-unit_price': '10.00', f'items-{i}-discount_percentage': '0',
+                f'items-{i}-vat_percentage': '24',
+            })
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('order_create'), data)
+        self.assertEqual(response.status_code, 302, getattr(response, 'context', None) and response.context['formset'].errors)
+        return len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        """
+        Η δημιουργία παραγγελίας με 5 ή 40 γραμμές κάνει τον ίδιο αριθμό ερωτήσεων.
+        """
+        self._post_order(1)  # ζέσταμα: μετρητής αρίθμησης, cache των content types
+        small = self._post_order(5)
+        large = self._post_order(40)
+        self.assertEqual(small, large)
+
+        order = Order.objects.latest('pk')
+        self.assertEqual(order.items.count(), 40)
+        self.assertEqual(order.total_amount, Decimal("992.00"))
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].reserved_quantity, Decimal("6.00"))  # 3 παραγγελίες x 2
+        self.assertEqual(self.products[0].available_quantity, Decimal("94.00"))
+        self.products[39].refresh_from_db()
+        self.assertEqual(self.products[39].available_quantity, Decimal("98.00"))
+
+    def test_edit_updates_and_deletes_lines_in_batch(self):
+        """
+        Η επεξεργασία αλλάζει/διαγράφει γραμμές και διορθώνει σωστά το απόθεμα.
+        """
+        self._post_order(2)
+        order = Order.objects.latest('pk')
+        first, second = order.items.order_by('pk')
+        data = {
+            'customer': self.customer.pk, 'order_date': '2025-06-01', 'status': Order.STATUS_PENDING,
+            'shipping_name': 'Παραλήπτης', 'shipping_address': 'Οδός 1', 'shipping_city': 'Αθήνα',
+            'shipping_postal_code': '10000', 'purpose': 'SALE',
+            'items-TOTAL_FORMS': 2, 'items-INITIAL_FORMS': 2, 'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+        }
+        for i, (item, quantity, delete) in enumerate([(first, '5', ''), (second, '2', 'on')]):
+            data.update({
+                f'items-{i}-id': item.pk, f'items-{i}-order': order.pk, f'items-{i}-product': item.product_id,
+                f'items-{i}-quantity': quantity, f'items-{i}-unit_price': '10.00',
+                f'items-{i}-discount_percentage': '0', f'items-{i}-vat_percentage': '24', f'items-{i}-DELETE': delete,
+            })
+        response = self.client.post(reverse('order_edit', args=[order.pk]), data)
+        self.assertEqual(response.status_code, 302)
+
+        order.refresh_from_db()
+        self.assertEqual(list(order.items.values_list('quantity', flat=True)), [Decimal("5.00")])
+        self.assertEqual(order.total_amount, Decimal("62.00"))
+        self.products[0].refresh_from_db()
+        self.products[1].refresh_from_db()
+        self.assertEqual(self.products[0].available_quantity, Decimal("95.00"))
+        self.assertEqual(self.products[1].reserved_quantity, Decimal("0.00"))
+
+    def test_stock_reserved_after_validation_is_rechecked_under_lock(self):
+        """
+        Αν άλλη παραγγελία δεσμεύσει το απόθεμα μετά τον έλεγχο της φόρμας, η αποθήκευση
+        αναιρείται και το σφάλμα εμφανίζεται στη γραμμή του προϊόντος.
+        """
+        original_save = OrderForm.save
+
+        def save_after_concurrent_reservation(form, *args, **kwargs):
+            Product.adjust_reserved([(self.products[0], Decimal("99.00"))])
+            return original_save(form, *args, **kwargs)
+
+        data = {
+            'customer': self.customer.pk, 'order_date': '2025-06-01', 'status': Order.STATUS_PENDING,
+            'shipping_name': 'Παραλήπτης', 'shipping_address': 'Οδός 1', 'shipping_city': 'Αθήνα',
+            'shipping_postal_code': '10000', 'purpose': 'SALE',
+            'items-TOTAL_FORMS': 1, 'items-INITIAL_FORMS': 0, 'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+            'items-0-product': self.products[0].pk, 'items-0-quantity': '2', 'items-0-unit_price': '10.00',
+            'items-0-discount_percentage': '0', 'items-0-vat_percentage': '24',
+        }
+        with patch.object(OrderForm, 'save', save_after_concurrent_reservation):
+            response = self.client.post(reverse('order_create'), data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Διαθέσιμο: 1 ", response.context['formset'].forms[0].errors['quantity'][0])
+        self.assertFalse(Order.objects.exists())
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].reserved_quantity, Decimal("0.00"))
+
+
+class BenchmarkToolsTests(TestCase):
+    """
+    Tests για τη γεννήτρια δεδομένων και το benchmark των views.
+    """
+    def test_generator_builds_consistent_data(self):
+        """
+        Η γεννήτρια φτιάχνει τον ζητούμενο όγκο, συνεπή υπόλοιπα πελατών, απόθεμα ίσο με τις
+        κινήσεις αποθήκης και μετρητές αρίθμησης.
+        """
+        call_command(
+            'generate_benchmark_data', customers=20, products=15, orders=60, sales_reps=2,
+            end_date=datetime.date(2025, 6, 30), chunk_size=25, stdout=io.StringIO()
+        )
+        self.assertEqual(Customer.objects.count(), 20)
+        self.assertTrue(Customer.objects.filter(is_branch=True, parent__isnull=False).exists())
+        self.assertEqual(Order.objects.count(), 60)
+        self.assertTrue(Invoice.objects.exists())
+
+        for customer in Customer.objects.all():
+            invoiced = customer.invoices.aggregate(total=models.Sum('total_amount'))['total'] or Decimal('0.00')
+            paid = customer.payments.aggregate(total=models.Sum('amount_paid'))['total'] or Decimal('0.00')
+            credited = customer.credit_notes.aggregate(total=models.Sum('total_amount'))['total'] or Decimal('0.00')
+            self.assertEqual(customer.balance, invoiced - paid - credited)
+
+        self.assertTrue(StockMovement.objects.filter(movement_type=StockMovement.MovementType.ORDER).exists())
+        self.assertFalse(StockMovement.objects.filter(balance_after__lt=0).exists())
+        for product in Product.objects.all():
+            movements = product.stock_movements.order_by('id')
+            self.assertEqual(product.stock_quantity, movements.aggregate(total=models.Sum('quantity'))['total'] or Decimal('0.00'))
+            if movements:
+                self.assertEqual(movements.last().balance_after, product.stock_quantity)
+            self.assertGreaterEqual(product.available_quantity, 0)
+
+        last_order = Order.objects.order_by('-order_date', '-pk').first()
+        sequence = DocumentSequence.objects.get(prefix='ORDER', year=last_order.order_date.year)
+        self.assertEqual(last_order.order_number, DocumentSequence.format_number('ORDER', sequence.year, sequence.last_value, 4))
+
+    def test_benchmark_writes_json_baseline(self):
+        """
+        Το benchmark γράφει για κάθε view πλήθος ερωτήσεων, p50/p95 και μνήμη, και συγκρίνει με προηγούμενο baseline.
+        """
+        Customer.objects.create(first_name="Πελάτης", last_name="Benchmark")
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'baseline.json')
+            call_command('benchmark_views', output=output, repeat=2, only=['order_list', 'search_'], stdout=io.StringIO())
+            self.assertFalse(User.objects.filter(username='benchmark_admin').exists())
+            with open(output, encoding='utf-8') as f:
+                baseline = json.load(f)
+            self.assertEqual(set(baseline['views']), {'order_list', 'search_customers_ajax', 'search_products_ajax'})
+            row = baseline['views']['order_list']
+            self.assertEqual(row['status'], 200)
+            self.assertGreater(row['queries'], 0)
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertGreater(row['peak_memory_kb'], 0)
+
+            out = io.StringIO()
+            call_command('benchmark_views', output=os.path.join(tmp, 'new.json'), repeat=1, only=['order_list'], compare=output, stdout=out)
+            self.assertIn("Σύγκριση με", out.getvalue())
+
+
+class RequestMetricsTests(TestCase):
+    """
+    Tests για το RequestMetricsMiddleware και το /metrics.
+    """
+    def setUp(self):
+        metrics.reset()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.user = User.objects.create_user(username='metrics', password='password123', is_staff=True)
+
+    def test_metrics_record_views_and_flag_n_plus_one(self):
+        """
+        Η view καταγράφεται με χρόνο και SQL, το επαναλαμβανόμενο note.customer σημειώνεται
+        ως N+1 και τα αρχεία όλων των workers αθροίζονται.
+        """
+        customer = Customer.objects.create(first_name="Πελάτης", last_name="Μετρήσεων")
+        for _ in range(3):
+            DeliveryNote.objects.create(customer=customer)
+
+        def view_with_n_plus_one(request):
+            for note in DeliveryNote.objects.all():
+                note.customer
+            return HttpResponse("ok")
+
+        with override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_DIR=self.tmp.name, REQUEST_METRICS_N_PLUS_ONE_THRESHOLD=3):
+            self.client.login(username='metrics', password='password123')
+            self.assertEqual(self.client.get(reverse('customer_financial_detail', args=[customer.pk])).status_code, 200)
+            request = RequestFactory().get(reverse('delivery_note_list'))
+            request.resolver_match = resolve(request.path)
+            with self.assertLogs('core.metrics', level='WARNING') as logs:
+                RequestMetricsMiddleware(view_with_n_plus_one)(request)
+            self.assertIn('core_customer', '\n'.join(logs.output))
+            # Αρχείο ενός άλλου worker, που δεν τρέχει πια
+            with open(os.path.join(self.tmp.name, 'metrics-999999.json'), 'w', encoding='utf-8') as f:
+                json.dump({'counters': [['crm_requests_total', [['view', 'order_list'], ['method', 'GET'], ['status', '200']], 4]], 'histograms': []}, f)
+            body = self.client.get(reverse('metrics')).content.decode()
+            self.assertEqual(sorted(name for name in os.listdir(self.tmp.name) if name.endswith('.json')),
+                             sorted(['metrics-dead.json', f'metrics-{os.getpid()}.json']))
+            self.assertEqual(self.client.get(reverse('metrics')).content.decode().count('order_list",method="GET",status="200"} 4'), 1)
+
+        self.assertIn('crm_requests_total{view="customer_financial_detail",method="GET",status="200"} 1', body)
+        self.assertIn('crm_requests_total{view="order_list",method="GET",status="200"} 4', body)
+        self.assertIn('crm_request_duration_seconds_count{view="customer_financial_detail"} 1', body)
+        # Label: σύντομο hash, με το πλήρες αποτύπωμα στο log
+        query_hash = re.search(r'crm_request_n_plus_one_total\{view="delivery_note_list",query="([0-9a-f]{12})"\}', body).group(1)
+        self.assertIn(f'[{query_hash}] SELECT', '\n'.join(logs.output))
+        self.assertNotIn('crm_request_n_plus_one_total{view="customer_financial_detail"', body)
+
+    def test_metrics_disabled_by_default(self):
+        """
+        Όταν οι μετρήσεις είναι απενεργοποιημένες το /metrics δίνει 404 και δεν καταγράφεται τίποτα.
+        """
+        with override_settings(REQUEST_METRICS_ENABLED=False, REQUEST_METRICS_DIR=self.tmp.name):
+            self.client.login(username='metrics', password='password123')
+            self.client.get(reverse('order_list'))
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertEqual(metrics.collect()[0], {})
+
+    def test_metrics_require_token_or_allowed_ip(self):
+        """
+        Το /metrics απαντά σε επιτρεπόμενες διευθύνσεις ή με το token, όχι ανοιχτά.
+        """
+        with override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_DIR=self.tmp.name, REQUEST_METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+            with override_settings(REQUEST_METRICS_TOKEN=''):
+                self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5').status_code, 401)
+            with override_settings(REQUEST_METRICS_TOKEN='secret'):
+                self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+                self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_streaming_response_queries_are_counted(self):
+        """
+        Οι ερωτήσεις που τρέχουν όσο στέλνεται ένα StreamingHttpResponse μετράνε στη view του.
+        """
+        Customer.objects.create(first_name="Πελάτης", last_name="Ροής")
+
+        def streaming_view(request):
+            return StreamingHttpResponse(str(Customer.objects.count()) for _ in range(3))
+
+        with override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_DIR=None):
+            request = RequestFactory().get(reverse('export_customers_excel'))
+            request.resolver_match = resolve(request.path)
+            response = RequestMetricsMiddleware(streaming_view)(request)
+            self.assertEqual(metrics.collect()[0], {})
+            self.assertEqual(b''.join(response.streaming_content), b'111')
+            response.close()
+            counters = metrics.collect()[0]
+
+        self.assertEqual(counters[('crm_request_sql_queries_total', (('view', 'export_customers_excel'),))], 3)
+
+
+class CustomerBalanceReportTests(TestCase):
+    """
+    Tests για την αναφορά κίνησης πελατών ανά περίοδο.
+    """
+    def test_period_balances_in_single_query(self):
+        """
+        Τα ποσά όλων των πελατών βγαίνουν σωστά με μία ερώτηση, όσοι κι αν είναι οι πελάτες.
+        """
+        user = User.objects.create_user(username='reports', password='password123')
+        customers = [Customer.objects.create(first_name=f"Πελάτης {i}", last_name="Αναφοράς") for i in range(4)]
+        for customer in customers:
+            Invoice.objects.create(customer=customer, status=Invoice.STATUS_ISSUED, issue_date=datetime.date(2025, 1, 10), total_amount=Decimal("100.00"))
+            Invoice.objects.create(customer=customer, status=Invoice.STATUS_ISSUED, issue_date=datetime.date(2025, 2, 10), total_amount=Decimal("50.00"))
+            Invoice.objects.create(customer=customer, status=Invoice.STATUS_CANCELLED, issue_date=datetime.date(2025, 2, 11), total_amount=Decimal("999.00"))
+        Payment.objects.create(customer=customers[0], amount_paid=Decimal("30.00"), payment_date=datetime.date(2025, 1, 20))
+        Payment.objects.create(customer=customers[0], amount_paid=Decimal("20.00"), payment_date=datetime.date(2025, 2, 15))
+
+        self.client.login(username='reports', password='password123')
+        url = reverse('report_customer_balance') + '?date_from=2025-02-01&date_to=2025-02-28'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        invoice_queries = [q for q in queries.captured_queries if 'core_invoice' in q['sql']]
+        self.assertEqual(len(invoice_queries), 1)
+
+        row = next(r for r in response.context['report_data'] if r['customer_id'] == customers[0].pk)
+        self.assertEqual(
+            (row['opening_balance'], row['debit_in_period'], row['credit_in_period'], row['closing_balance']),
+            (Decimal("70.00"), Decimal("50.00"), Decimal("20.00"), Decimal("100.00"))
+        )
+        self.assertEqual(response.context['report_data'][0]['closing_balance'], Decimal("150.00"))
+
+    def test_selected_branch_is_reported(self):
+        """
+        Η επιλογή υποκαταστήματος στο φίλτρο δείχνει τη γραμμή του· χωρίς επιλογή εμφανίζονται μόνο οι κεντρικοί.
+        """
+        User.objects.create_user(username='reports', password='password123')
+        parent = Customer.objects.create(first_name="Κεντρικό", last_name="Αναφοράς")
+        branch = Customer.objects.create(first_name="Υποκατάστημα", last_name="Αναφοράς", parent=parent, is_branch=True)
+        Invoice.objects.create(customer=branch, status=Invoice.STATUS_ISSUED, issue_date=datetime.date(2025, 2, 10), total_amount=Decimal("40.00"))
+
+        self.client.login(username='reports', password='password123')
+        url = reverse('report_customer_balance') + '?date_from=2025-02-01&date_to=2025-02-28'
+        response = self.client.get(f'{url}&customer={branch.pk}')
+        self.assertEqual(
+            [(row['customer_id'], row['debit_in_period']) for row in response.context['report_data']],
+            [(branch.pk, Decimal("40.00"))]
+        )
+        self.assertEqual(response.context['selected_customer'], branch)
+        self.assertEqual([row['customer_id'] for row in self.client.get(url).context['report_data']], [parent.pk])
+
+
+class CustomerBalanceSnapshotTests(TestCase):
+    """
+    Tests για τα μηνιαία στιγμιότυπα υπολοίπων.
+    """
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Στιγμιότυπων")
+        Invoice.objects.create(customer=self.customer, status=Invoice.STATUS_ISSUED, issue_date=datetime.date(2025, 1, 10), total_amount=Decimal("100.00"))
+        Invoice.objects.create(customer=self.customer, status=Invoice.STATUS_PAID, issue_date=datetime.date(2025, 2, 10), total_amount=Decimal("50.00"))
+        self.payment = Payment.objects.create(customer=self.customer, amount_paid=Decimal("30.00"), payment_date=datetime.date(2025, 2, 20))
+        Invoice.objects.create(customer=self.customer, status=Invoice.STATUS_ISSUED, issue_date=datetime.date(2025, 4, 5), total_amount=Decimal("10.00"))
+
+    def _snapshots(self):
+        return list(CustomerBalanceSnapshot.objects.order_by('month_end').values_list('month_end', 'debit', 'credit', 'balance'))
+
+    def _opening(self, date):
+        return balances.opening_balances([self.customer.pk], date)[self.customer.pk]
+
+    def test_close_months_and_opening_balance(self):
+        """
+        Κλείνουν μόνο οι μήνες με κινήσεις και το υπόλοιπο έναρξης βγαίνει ίδιο με και χωρίς στιγμιότυπα.
+        """
+        expected = [self._opening(datetime.date(2025, month, 1)) for month in (2, 3, 5)]
+        call_command('close_customer_balances', '--month=2025-03', stdout=io.StringIO())
+        self.assertEqual(self._snapshots(), [
+            (datetime.date(2025, 1, 31), Decimal("100.00"), Decimal("0.00"), Decimal("100.00")),
+            (datetime.date(2025, 2, 28), Decimal("50.00"), Decimal("30.00"), Decimal("120.00")),
+        ])
+        self.assertEqual([self._opening(datetime.date(2025, month, 1)) for month in (2, 3, 5)], expected)
+        self.assertEqual(expected, [Decimal("100.00"), Decimal("120.00"), Decimal("130.00")])
+
+        out = io.StringIO()
+        call_command('close_customer_balances', '--month=2025-03', stdout=out)
+        self.assertIn('έχουν ήδη κλείσει', out.getvalue())
+
+    def test_back_dated_documents_update_snapshots(self):
+        """
+        Παραστατικά σε κλεισμένους μήνες (νέα ή μετακινημένα) ξαναχτίζουν τα στιγμιότυπα από εκείνον τον μήνα.
+        """
+        call_command('close_customer_balances', '--month=2025-03', stdout=io.StringIO())
+        Invoice.objects.create(customer=self.customer, status=Invoice.STATUS_ISSUED, issue_date=datetime.date(2025, 1, 20), total_amount=Decimal("5.00"))
+        self.payment.payment_date = datetime.date(2025, 3, 3)
+        self.payment.save()
+        self.assertEqual(self._snapshots(), [
+            (datetime.date(2025, 1, 31), Decimal("105.00"), Decimal("0.00"), Decimal("105.00")),
+            (datetime.date(2025, 2, 28), Decimal("50.00"), Decimal("0.00"), Decimal("155.00")),
+            (datetime.date(2025, 3, 31), Decimal("0.00"), Decimal("30.00"), Decimal("125.00")),
+        ])
+        self.assertEqual(self._opening(datetime.date(2025, 5, 1)), Decimal("135.00"))
+
+    def test_moved_invoice_updates_snapshots_and_drafts_do_not(self):
+        """
+        Τιμολόγιο που φεύγει από κλεισμένο μήνα ξαναχτίζει τα στιγμιότυπα· ένα πρόχειρο δεν τα αγγίζει.
+        """
+        call_command('close_customer_balances', '--month=2025-03', stdout=io.StringIO())
+        invoice = Invoice.objects.get(issue_date=datetime.date(2025, 1, 10))
+        invoice.issue_date = datetime.date(2025, 4, 10)
+        invoice.save()
+        self.assertEqual(self._snapshots(), [
+            (datetime.date(2025, 2, 28), Decimal("50.00"), Decimal("30.00"), Decimal("20.00")),
+        ])
+
+        with patch.object(balances, 'rebuild') as rebuild:
+            draft = Invoice.objects.create(customer=self.customer, issue_date=datetime.date(2025, 1, 15), total_amount=Decimal("7.00"))
+            draft.total_amount = Decimal("8.00")
+            draft.save()
+        rebuild.assert_not_called()
+
+
+class DailySalesFactTests(TestCase):
+    """
+    Tests για τον συγκεντρωτικό πίνακα πωλήσεων των αναφορών.
+    """
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Πωλήσεων", city="Πάτρα")
+        self.product = Product.objects.create(name="Προϊόν Πωλήσεων", code="SALES-1", price=Decimal("10.00"), cost_price=Decimal("6.00"))
+        self.day = datetime.date(2025, 3, 5)
+
+    def _issue_invoice(self, quantity, discount=Decimal("0.00")):
+        invoice = Invoice.objects.create(customer=self.customer, issue_date=self.day, discount_percentage=discount)
+        InvoiceItem.objects.create(
+            invoice=invoice, product=self.product, description=self.product.name, quantity=quantity,
+            unit_price=Decimal("10.00"), vat_percentage=Decimal("24.00"),
+            total_price=quantity * Decimal("10.00"), vat_amount=quantity * Decimal("2.40"),
+        )
+        invoice.calculate_totals()
+        invoice.status = Invoice.STATUS_ISSUED
+        invoice.save()
+        return invoice
+
+    def _totals(self):
+        return DailySalesFact.objects.aggregate(
+            net=models.Sum('net_amount'), vat=models.Sum('vat_amount'), qty=models.Sum('quantity'), cost=models.Sum('cost_amount')
+        )
+
+    def test_document_transitions_update_facts(self):
+        """
+        Έκδοση, πίστωση και ακύρωση ενημερώνουν τον πίνακα· το πρόχειρο δεν μετράει.
+        """
+        invoice = self._issue_invoice(Decimal("10"), discount=Decimal("10.00"))
+        Invoice.objects.create(customer=self.customer, issue_date=self.day)  # πρόχειρο
+        totals = self._totals()
+        self.assertEqual((totals['net'], totals['vat'], totals['qty'], totals['cost']),
+                         (Decimal("90.00"), Decimal("21.60"), Decimal("10.00"), Decimal("60.00")))
+
+        credit_note = CreditNote.objects.create(customer=self.customer, original_invoice=invoice, issue_date=self.day)
+        CreditNoteItem.objects.create(
+            credit_note=credit_note, product=self.product, description=self.product.name, quantity=Decimal("2"),
+            unit_price=Decimal("10.00"), vat_percentage=Decimal("24.00"), total_price=Decimal("20.00"), vat_amount=Decimal("4.80"),
+        )
+        credit_note.status = CreditNote.Status.ISSUED
+        credit_note.save()
+        invoice.status = Invoice.STATUS_CREDITED
+        invoice.save(update_fields=['status'])
+        totals = self._totals()
+        self.assertEqual((totals['net'], totals['qty']), (Decimal("70.00"), Decimal("8.00")))
+
+        User.objects.create_user(username='facts', password='password123')
+        self.client.login(username='facts', password='password123')
+        response = self.client.get(reverse('report_vat_analysis') + '?date_from=2025-03-01&date_to=2025-03-31')
+        self.assertEqual(response.context['total_net_value'], Decimal("70.00"))
+        self.assertEqual(response.context['total_vat_value'], Decimal("16.80"))
+
+        credit_note.delete()
+        invoice.status = Invoice.STATUS_CANCELLED
+        invoice.save(update_fields=['status'])
+        self.assertFalse(DailySalesFact.objects.exists())
+
+    def test_line_credit_note_and_customer_changes_refresh_facts(self):
+        """
+        Αλλαγή γραμμής, μετακίνηση πιστωτικού και αλλαγή πωλητή πελάτη ενημερώνουν τον πίνακα.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice = self._issue_invoice(Decimal("10"))
+        item = invoice.items.get()
+        # Ένα refresh ανά transaction, όσες γραμμές κι αν αλλάξουν
+        with patch.object(DailySalesFact, 'refresh', wraps=DailySalesFact.refresh) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                item.quantity, item.total_price = Decimal("5"), Decimal("50.00")
+                item.save()
+                item.quantity, item.total_price = Decimal("4"), Decimal("40.00")
+                item.save()
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(self._totals()['net'], Decimal("40.00"))
+
+        credit_note = CreditNote.objects.create(customer=self.customer, original_invoice=invoice, issue_date=self.day, status=CreditNote.Status.ISSUED)
+        with self.captureOnCommitCallbacks(execute=True):
+            CreditNoteItem.objects.create(
+                credit_note=credit_note, product=self.product, description=self.product.name, quantity=Decimal("1"),
+                unit_price=Decimal("10.00"), vat_percentage=Decimal("24.00"), total_price=Decimal("10.00"), vat_amount=Decimal("2.40"),
+            )
+        credit_note = CreditNote.objects.get(pk=credit_note.pk)
+        credit_note.issue_date = datetime.date(2025, 4, 1)
+        credit_note.save()
+        self.assertEqual(
+            list(DailySalesFact.objects.order_by('date').values_list('date', 'net_amount')),
+            [(self.day, Decimal("40.0000")), (datetime.date(2025, 4, 1), Decimal("-10.0000"))],
+        )
+
+        rep = SalesRepresentative.objects.create(user=User.objects.create_user(username='facts_rep', password='password123'))
+        self.customer.sales_rep = rep
+        self.customer.save()
+        self.assertEqual(set(DailySalesFact.objects.values_list('sales_rep_id', flat=True)), {rep.pk})
+
+        User.objects.create_user(username='facts', password='password123')
+        self.client.login(username='facts', password='password123')
+        response = self.client.get(reverse('report_sales_by_rep') + '?date_from=2025-03-01&date_to=2025-03-31')
+        self.assertEqual([(row['invoice_count'], row['total_net_sales']) for row in response.context['sales_data']], [(1, Decimal("40.0000"))])
+
+    def test_rebuild_command_matches_incremental_facts(self):
+        """
+        Η εντολή rebuild_sales_facts δίνει τα ίδια ποσά με την τμηματική ενημέρωση.
+        """
+        self._issue_invoice(Decimal("3"))
+        self._issue_invoice(Decimal("4"))
+        incremental = self._totals()
+
+        DailySalesFact.objects.update(net_amount=0)
+        call_command('rebuild_sales_facts', '--date-from=2025-03-01', '--date-to=2025-03-31', stdout=io.StringIO())
+        self.assertEqual(self._totals(), incremental)
+        self.assertEqual(DailySalesFact.objects.get().parent_customer, self.customer)
+
+
+class ReportCacheTests(TestCase):
+    """
+    Tests για το cache των αναφορών.
+    """
+    def setUp(self):
+        metrics.reset()
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Cache")
+        User.objects.create_user(username='cache', password='password123')
+        self.client.login(username='cache', password='password123')
+        self.url = reverse('report_sales_by_city') + '?date_from=2025-03-01&date_to=2025-03-31'
+
+    def _issue_invoice(self, issue_date):
+        with self.captureOnCommitCallbacks(execute=True):
+            Invoice.objects.create(customer=self.customer, issue_date=issue_date, status=Invoice.STATUS_ISSUED)
+
+    def test_hits_and_date_range_invalidation(self):
+        """
+        Η δεύτερη κλήση σερβίρεται από το cache· αλλαγή εκτός διαστήματος δεν το ακυρώνει, εντός ναι.
+        """
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse([q for q in queries.captured_queries if 'core_dailysalesfact' in q['sql']])
+
+        self._issue_invoice(datetime.date(2025, 5, 10))
+        self.assertEqual(ReportCacheEntry.objects.count(), 1)
+        self._issue_invoice(datetime.date(2025, 3, 10))
+        self.assertFalse(ReportCacheEntry.objects.exists())
+
+        with override_settings(REQUEST_METRICS_DIR=None):
+            counters = metrics.collect()[0]
+        self.assertEqual(counters[('crm_report_cache_requests_total', (('report', 'sales_by_city'), ('result', 'hit')))], 1)
+        self.assertEqual(counters[('crm_report_cache_requests_total', (('report', 'sales_by_city'), ('result', 'miss')))], 1)
+
+    def test_open_ended_range_is_invalidated_by_any_earlier_date(self):
+        """
+        Ένα υπόλοιπο έναρξης εξαρτάται από όλο το παρελθόν: πληρωμή πριν την περίοδο ακυρώνει το cache.
+        """
+        self.client.get(reverse('report_customer_balance') + '?date_from=2025-03-01&date_to=2025-03-31')
+        entry = ReportCacheEntry.objects.get()
+        self.assertEqual((entry.date_from, entry.date_to), (None, datetime.date(2025, 3, 31)))
+
+        self.assertEqual(report_cache.invalidate([datetime.date(2025, 4, 1)]), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(customer=self.customer, amount_paid=Decimal("5.00"), payment_date=datetime.date(2020, 1, 1))
+        self.assertFalse(ReportCacheEntry.objects.exists())
+
+    def test_invalidation_during_compute_is_not_stored(self):
+        """
+        Αποτέλεσμα που υπολογιζόταν όταν έτρεξε μια ακύρωση δεν αποθηκεύεται· ο επόμενος υπολογισμός ναι.
+        """
+        def compute():
+            report_cache.invalidate([datetime.date(2025, 3, 10)])
+            return ['πριν την αλλαγή']
+
+        self.assertEqual(report_cache.get_or_compute('slow', {}, compute, '2025-03-01', '2025-03-31'), ['πριν την αλλαγή'])
+        self.assertFalse(ReportCacheEntry.objects.exists())
+        report_cache.get_or_compute('slow', {}, lambda: ['μετά την αλλαγή'], '2025-03-01', '2025-03-31')
+        self.assertEqual(report_cache.get_or_compute('slow', {}, compute, '2025-03-01', '2025-03-31'), ['μετά την αλλαγή'])
+
+    def test_moving_a_document_invalidates_its_old_date(self):
+        """
+        Τιμολόγιο, πιστωτικό ή πληρωμή που μετακινείται σε άλλη ημερομηνία ακυρώνει και το διάστημα της παλιάς.
+        """
+        january = reverse('report_sales_by_city') + '?date_from=2025-01-01&date_to=2025-01-31'
+        invoice = Invoice.objects.create(customer=self.customer, issue_date=datetime.date(2025, 1, 10), status=Invoice.STATUS_ISSUED)
+        credit_note = CreditNote.objects.create(customer=self.customer, original_invoice=invoice, issue_date=datetime.date(2025, 1, 12))
+        for document in (Invoice.objects.get(pk=invoice.pk), CreditNote.objects.get(pk=credit_note.pk)):
+            self.client.get(january)
+            self.assertEqual(ReportCacheEntry.objects.count(), 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                document.issue_date = datetime.date(2025, 3, 10)
+                document.save()
+            self.assertFalse(ReportCacheEntry.objects.exists())
+
+        # Η αναφορά υπολοίπων του Μαρτίου εξαρτάται από όλο το παρελθόν ως τις 31/3
+        march_balances = reverse('report_customer_balance') + '?date_from=2025-03-01&date_to=2025-03-31'
+        payment = Payment.objects.create(customer=self.customer, amount_paid=Decimal("5.00"), payment_date=datetime.date(2025, 3, 5))
+        payment = Payment.objects.get(pk=payment.pk)
+        self.client.get(march_balances)
+        self.assertEqual(ReportCacheEntry.objects.count(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.payment_date = datetime.date(2025, 6, 5)
+            payment.save()
+        self.assertFalse(ReportCacheEntry.objects.exists())
+
+
+class ProfitabilityTests(TestCase):
+    """
+    Tests για την κερδοφορία με το κόστος της ημέρας της πώλησης.
+    """
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Κερδοφορίας")
+        self.product = Product.objects.create(name="Προϊόν Κόστους", code="COST-1", price=Decimal("10.00"), cost_price=Decimal("9.00"))
+        self.purchase_order = PurchaseOrder.objects.create(supplier=Supplier.objects.create(name="Προμηθευτής Κόστους"))
+
+    def _receive(self, day, quantity, cost_price):
+        item = PurchaseOrderItem.objects.create(
+            purchase_order=self.purchase_order, product=self.product, quantity=quantity, cost_price=cost_price
+        )
+        StockReceipt.objects.create(
+            product=self.product, quantity_added=quantity, purchase_order_item=item,
+            date_received=timezone.make_aware(datetime.datetime.combine(day, datetime.time(9, 0))),
+        )
+
+    def _sell(self, day, quantity):
+        invoice = Invoice.objects.create(customer=self.customer, issue_date=day)
+        InvoiceItem.objects.create(
+            invoice=invoice, product=self.product, description=self.product.name, quantity=quantity,
+            unit_price=Decimal("10.00"), vat_percentage=Decimal("24.00"),
+            total_price=quantity * Decimal("10.00"), vat_amount=quantity * Decimal("2.40"),
+        )
+        invoice.status = Invoice.STATUS_ISSUED
+        invoice.save()
+        return invoice
+
+    def test_sales_are_costed_at_weighted_average_of_their_date(self):
+        """
+        Κάθε πώληση παίρνει το μέσο σταθμικό κόστος των παραλαβών μέχρι την ημέρα της,
+        και πριν από την πρώτη παραλαβή το τρέχον κόστος του προϊόντος.
+        """
+        self._receive(datetime.date(2025, 1, 10), Decimal("10"), Decimal("4.00"))
+        self._receive(datetime.date(2025, 3, 1), Decimal("10"), Decimal("8.00"))
+        self._sell(datetime.date(2025, 1, 5), Decimal("1"))   # πριν από κάθε παραλαβή: 9.00
+        self._sell(datetime.date(2025, 2, 1), Decimal("2"))   # 4.00
+        invoice = self._sell(datetime.date(2025, 3, 5), Decimal("2"))  # (40 + 80) / 20 = 6.00
+        credit_note = CreditNote.objects.create(customer=self.customer, original_invoice=invoice, issue_date=datetime.date(2025, 3, 6))
+        CreditNoteItem.objects.create(
+            credit_note=credit_note, product=self.product, description=self.product.name, quantity=Decimal("1"),
+            unit_price=Decimal("10.00"), vat_percentage=Decimal("24.00"), total_price=Decimal("10.00"), vat_amount=Decimal("2.40"),
+        )
+        credit_note.status = CreditNote.Status.ISSUED
+        credit_note.save()
+
+        cube = profitability.margin_cube('2025-01-01', '2025-03-31', batch_size=2)
+        months = profitability.margin_by(cube, 'month')
+        self.assertEqual(
+            [(row['label'], row['total_revenue'], row['total_cost']) for row in months],
+            [('01/2025', Decimal("10.00"), Decimal("9.00")), ('02/2025', Decimal("20.00"), Decimal("8.00")), ('03/2025', Decimal("10.00"), Decimal("6.00"))]
+        )
+        [by_product] = profitability.margin_by(cube, 'product')
+        self.assertEqual((by_product['label'], by_product['total_quantity'], by_product['total_profit']), ("Προϊόν Κόστους", Decimal("4.00"), Decimal("17.00")))
+        self.assertEqual(str(by_product['profit_margin']), "42.50")
+        [by_rep] = profitability.margin_by(cube, 'rep')
+        self.assertEqual(by_rep['label'], "Χωρίς Πωλητή")
+
+    def test_rep_dimension_matches_sales_facts(self):
+        """
+        Ο πωλητής ενός υποκαταστήματος χωρίς δικό του είναι του κεντρικού, όπως στο DailySalesFact,
+        και ακολουθεί την αλλαγή του.
+        """
+        head_office = Customer.objects.create(first_name="Κεντρικό", last_name="Κερδοφορίας")
+        self.customer.parent, self.customer.is_branch = head_office, True
+        self.customer.save()
+        self._sell(datetime.date(2025, 2, 1), Decimal("2"))
+        for username in ('first_rep', 'second_rep'):
+            head_office.sales_rep = SalesRepresentative.objects.create(user=User.objects.create_user(username=username, password='password123'))
+            head_office.save()
+            [by_rep] = profitability.margin_by(profitability.margin_cube('2025-02-01', '2025-02-28'), 'rep')
+            self.assertEqual(by_rep['label'], str(head_office.sales_rep))
+            self.assertEqual(set(DailySalesFact.objects.values_list('sales_rep_id', flat=True)), {head_office.sales_rep_id})
+
+    def test_only_cost_price_changes_invalidate_cache(self):
+        """
+        Αποθήκευση προϊόντος χωρίς αλλαγή του κόστους (π.χ. κίνηση αποθέματος) δεν ακυρώνει το cache.
+        """
+        report_cache.get_or_compute('profitability', {}, lambda: [])
+        with self.captureOnCommitCallbacks(execute=True):
+            StockMovement.record(self.product, Decimal("5"), StockMovement.MovementType.ADJUSTMENT)
+            product = Product.objects.get(pk=self.product.pk)
+            product.name = "Νέο Όνομα"
+            product.save()
+        self.assertTrue(ReportCacheEntry.objects.filter(report='profitability').exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.cost_price = Decimal("7.00")
+            product.save()
+        self.assertFalse(ReportCacheEntry.objects.filter(report='profitability').exists())
+
+    def test_report_view_groups_by_customer_and_new_receipt_invalidates_cache(self):
+        """
+        Η αναφορά δείχνει την επιλεγμένη διάσταση· μια νέα παραλαβή ακυρώνει το cache της.
+        """
+        self._sell(datetime.date(2025, 2, 1), Decimal("2"))
+        User.objects.create_user(username='profit', password='password123')
+        self.client.login(username='profit', password='password123')
+        url = reverse('report_profitability') + '?date_from=2025-02-01&date_to=2025-02-28&group_by=customer'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            [row] = self.client.get(url).context['profit_data']
+        self.assertEqual((row['label'], row['total_cost']), ("Πελάτης Κερδοφορίας", Decimal("18.00")))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._receive(datetime.date(2025, 1, 10), Decimal("5"), Decimal("3.00"))
+        self.assertFalse(ReportCacheEntry.objects.filter(report='profitability').exists())
+        [row] = self.client.get(url).context['profit_data']
+        self.assertEqual(row['total_cost'], Decimal("6.00"))
+
+
+class PivotTests(TestCase):
+    """
+    Tests για το ad-hoc pivot πωλήσεων.
+    """
+    def setUp(self):
+        self.product = Product.objects.create(name="Προϊόν Pivot", price=Decimal("10.00"), cost_price=Decimal("6.00"))
+        self.patra = Customer.objects.create(first_name="Πελάτης", last_name="Πάτρας", city="Πάτρα")
+        self.volos = Customer.objects.create(first_name="Πελάτης", last_name="Βόλου", city="Βόλος")
+        invoice = self._invoice(self.patra, datetime.date(2025, 2, 10), Decimal("10"), discount=Decimal("10.00"))
+        self._invoice(self.patra, datetime.date(2025, 5, 10), Decimal("1"))
+        self._invoice(self.volos, datetime.date(2025, 3, 10), Decimal("4"))
+        Invoice.objects.create(customer=self.volos, issue_date=datetime.date(2025, 3, 11))  # πρόχειρο
+        credit_note = CreditNote.objects.create(
+            customer=self.patra, original_invoice=invoice, issue_date=datetime.date(2025, 3, 1), status=CreditNote.Status.ISSUED
+        )
+        CreditNoteItem.objects.create(
+            credit_note=credit_note, product=self.product, description=self.product.name, quantity=Decimal("2"),
+            unit_price=Decimal("10.00"), vat_percentage=Decimal("24.00"), total_price=Decimal("20.00"), vat_amount=Decimal("4.80"),
+        )
+
+    def _invoice(self, customer, day, quantity, discount=Decimal("0.00")):
+        invoice = Invoice.objects.create(customer=customer, issue_date=day, discount_percentage=discount)
+        InvoiceItem.objects.create(
+            invoice=invoice, product=self.product, description=self.product.name, quantity=quantity,
+            unit_price=Decimal("10.00"), vat_percentage=Decimal("24.00"),
+            total_price=quantity * Decimal("10.00"), vat_amount=quantity * Decimal("2.40"),
+        )
+        invoice.calculate_totals()
+        invoice.status = Invoice.STATUS_ISSUED
+        invoice.save()
+        return invoice
+
+    def test_pivot_by_city_and_quarter(self):
+        """
+        Τα μεγέθη ανά πόλη και τρίμηνο, με την έκπτωση μοιρασμένη και τα πιστωτικά αφαιρεμένα.
+        """
+        result = pivot.pivot(['city', 'quarter'], ['net', 'vat', 'quantity', 'margin', 'documents'],
+                             datetime.date(2025, 1, 1), datetime.date(2025, 12, 31))
+        self.assertEqual(result['columns'][:2], ['Πόλη', 'Τρίμηνο'])
+        self.assertEqual(result['rows'], [
+            ['Βόλος', '2025-Q1', Decimal("40.00"), Decimal("9.60"), Decimal("4.00"), Decimal("16.00"), 1],
+            ['Πάτρα', '2025-Q1', Decimal("70.00"), Decimal("16.80"), Decimal("8.00"), Decimal("22.00"), 2],
+            ['Πάτρα', '2025-Q2', Decimal("10.00"), Decimal("2.40"), Decimal("1.00"), Decimal("4.00"), 1],
+        ])
+        [total] = pivot.pivot([], ['net'], datetime.date(2025, 1, 1), datetime.date(2025, 12, 31))['rows']
+        self.assertEqual(total, [Decimal("120.00")])
+        with self.assertRaises(ValueError):
+            pivot.validate(['city; DROP TABLE core_invoice'], ['net'])
+
+    def test_pivot_endpoint_streams_json_and_csv(self):
+        """
+        Το endpoint δίνει JSON ή CSV σε ροή και απορρίπτει διαστάσεις εκτός λίστας.
+        """
+        User.objects.create_user(username='pivot', password='password123')
+        self.client.login(username='pivot', password='password123')
+        url = reverse('report_pivot')
+        params = {'dimensions': 'customer,purpose', 'measures': 'net,documents', 'date_from': '2025-01-01', 'date_to': '2025-12-31'}
+
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['columns'], ['customer', 'purpose', 'net', 'documents'])
+        self.assertIn({'customer': str(self.volos), 'purpose': 'Πώληση', 'net': 40.0, 'documents': 1}, data['rows'])
+
+        response = self.client.get(url, dict(params, format='csv'))
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], 'Πελάτης,Σκοπός Διακίνησης,Καθαρή Αξία (€),Παραστατικά')
+        self.assertEqual(len(lines), 3)
+
+        response = self.client.get(url, dict(params, dimensions='password'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Άγνωστη διάσταση', response.json()['error'])
+
+    def test_margin_uses_cost_of_the_sale_date(self):
+        """
+        Το περιθώριο κοστολογεί όπως η κερδοφορία: οι πωλήσεις μετά από παραλαβή με το κόστος της,
+        οι προηγούμενες με το τρέχον κόστος· νέα παραλαβή ακυρώνει το cache του pivot.
+        """
+        purchase_order = PurchaseOrder.objects.create(supplier=Supplier.objects.create(name="Προμηθευτής Pivot"))
+        item = PurchaseOrderItem.objects.create(purchase_order=purchase_order, product=self.product, quantity=Decimal("10"), cost_price=Decimal("5.00"))
+        report_cache.get_or_compute('pivot', {}, lambda: [])
+        with self.captureOnCommitCallbacks(execute=True):
+            StockReceipt.objects.create(
+                product=self.product, quantity_added=Decimal("10"), purchase_order_item=item,
+                date_received=timezone.make_aware(datetime.datetime(2025, 3, 5, 9, 0)),
+            )
+        self.assertFalse(ReportCacheEntry.objects.filter(report='pivot').exists())
+
+        result = pivot.pivot(['quarter'], ['margin'], datetime.date(2025, 1, 1), datetime.date(2025, 12, 31))
+        # Q1: 90 − 10 x 6 (πριν την παραλαβή) + 40 − 4 x 5 (μετά) − (20 − 2 x 6) (πιστωτικό πριν την παραλαβή) = 42
+        self.assertEqual(result['rows'], [['2025-Q1', Decimal("42.00")], ['2025-Q2', Decimal("5.00")]])
+
+
+class ExcelExportTests(TestCase):
+    """
+    Tests για τις εξαγωγές σε Excel σε ροή.
+    """
+    def setUp(self):
+        User.objects.create_user(username='exports', password='password123')
+        self.client.login(username='exports', password='password123')
+        self.parent = Customer.objects.create(first_name="Κεντρικό", last_name="Εξαγωγών", company_name="Εξαγωγές Α.Ε.")
+        self.branch = Customer.objects.create(first_name="Υποκατάστημα", last_name="Εξαγωγών", parent=self.parent, is_branch=True)
+
+    def _sheet(self, response):
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], exports.XLSX_CONTENT_TYPE)
+        return list(load_workbook(io.BytesIO(b''.join(response.streaming_content))).active.values)
+
+    def test_exports_stream_all_rows(self):
+        """
+        Όλες οι εξαγωγές δίνουν έγκυρο xlsx· οι γραμμές διαβάζονται σε κομμάτια με σταθερό πλήθος ερωτήσεων.
+        """
+        for day in range(1, 6):
+            Order.objects.create(customer=self.branch, order_date=datetime.date(2025, 1, day), total_amount=Decimal("12.50"))
+        with patch.object(exports, 'CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            rows = self._sheet(self.client.get(reverse('export_orders_excel')))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][2], str(self.branch))
+        self.assertEqual(rows[1][4], 12.5)
+        self.assertLess(len(queries), 10)  # όχι μία ερώτηση ανά γραμμή/πελάτη
+
+        Product.objects.create(name="Προϊόν Εξαγωγής", price=Decimal("10.00"))
+        Payment.objects.create(customer=self.branch, amount_paid=Decimal("5.00"))
+        invoice = Invoice.objects.create(customer=self.parent, issue_date=datetime.date(2025, 1, 1))
+        CreditNote.objects.create(customer=self.parent, original_invoice=invoice)
+        PurchaseOrder.objects.create(supplier=Supplier.objects.create(name="Προμηθευτής"))
+        for name in ('export_customers_excel', 'export_products_excel', 'export_payments_excel', 'export_stock_overview_excel',
+                     'export_invoices_excel', 'export_credit_notes_excel', 'export_purchase_orders_excel'):
+            with self.subTest(name):
+                self.assertGreater(len(self._sheet(self.client.get(reverse(name)))), 1)
+
+    def test_empty_export_redirects_with_message(self):
+        """
+        Χωρίς γραμμές δεν βγαίνει αρχείο: επιστροφή στη λίστα με μήνυμα.
+        """
+        response = self.client.get(reverse('export_stock_receipts_excel'), follow=False)
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(reverse('export_retail_receipts_excel'), HTTP_REFERER='/retail-receipts/')
+        self.assertRedirects(response, '/retail-receipts/', fetch_redirect_response=False)
+
+
+class ListingExportTests(TestCase):
+    """
+    Tests για τις κοινές λίστες/εξαγωγές (listings): ίδια φίλτρα, CSV/Parquet, χωρίς ερωτήσεις ανά γραμμή.
+    """
+    def setUp(self):
+        self.rep_user = User.objects.create_user(username='listing_rep', password='password123')
+        self.rep_user.groups.add(Group.objects.create(name='Πωλητές'))
+        rep = SalesRepresentative.objects.create(user=self.rep_user)
+        self.mine = Customer.objects.create(first_name="Δικός", last_name="Πελάτης", sales_rep=rep)
+        self.other = Customer.objects.create(first_name="Άλλος", last_name="Πελάτης")
+        for day in range(1, 5):
+            for customer in (self.mine, self.other):
+                order = Order.objects.create(customer=customer, order_date=datetime.date(2025, 3, day))
+                Invoice.objects.create(
+                    customer=customer, order=order, issue_date=datetime.date(2025, 3, day), total_amount=Decimal("10.00"),
+                    status=Invoice.STATUS_ISSUED if day % 2 else Invoice.STATUS_PAID,
+                )
+
+    def _csv(self, response):
+        self.assertEqual(response['Content-Type'], exports.CSV_CONTENT_TYPE)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+
+    def test_export_uses_list_filters_and_permissions(self):
+        """
+        Η εξαγωγή τιμολογίων δίνει ακριβώς τις γραμμές της λίστας για τα ίδια φίλτρα και τον ίδιο πωλητή.
+        """
+        self.client.login(username='listing_rep', password='password123')
+        params = {'status_filter': Invoice.STATUS_ISSUED, 'date_from': '2025-03-02', 'date_to': '2025-03-31'}
+        listed = [invoice.invoice_number for invoice in self.client.get(reverse('invoice_list'), params).context['invoices']]
+        rows = self._csv(self.client.get(reverse('export_invoices_excel'), {**params, 'format': 'csv'}))
+        self.assertEqual(rows[0][0], 'Αρ. Τιμολογίου')
+        self.assertEqual([row[0] for row in rows[1:]], listed)
+        self.assertEqual(len(listed), 1)  # 3/3, εκδοθέν, του πελάτη του πωλητή
+        self.assertEqual(rows[1][2], str(self.mine))
+
+    def test_export_queries_do_not_grow_with_rows(self):
+        """
+        Οι στήλες φέρνουν πελάτη και παραγγελία με select_related: το πλήθος των ερωτήσεων δεν εξαρτάται από τις γραμμές.
+        """
+        User.objects.create_superuser(username='listing_admin', password='password123')
+        self.client.login(username='listing_admin', password='password123')
+        counts = []
+        for params in ({'date_to': '2025-03-01'}, {}):
+            with CaptureQueriesContext(connection) as queries:
+                rows = self._csv(self.client.get(reverse('export_invoices_excel'), {**params, 'format': 'csv'}))
+            self.assertTrue(all(row[7] for row in rows[1:]))  # Σχετ. Παραγγελία
+            counts.append(len(queries))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(counts[0], counts[1])
+
+    @skipUnless(exports.PYARROW_AVAILABLE, "Χωρίς pyarrow δεν γίνεται εξαγωγή σε Parquet")
+    def test_parquet_export_has_typed_columns(self):
+        """
+        Το Parquet έχει ονόματα πεδίων και τύπους από το μοντέλο (ημερομηνίες, δεκαδικά).
+        """
+        import pyarrow.parquet
+        User.objects.create_superuser(username='listing_admin', password='password123')
+        self.client.login(username='listing_admin', password='password123')
+        response = self.client.get(reverse('export_invoices_excel'), {'format': 'parquet'})
+        table = pyarrow.parquet.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.num_rows, 8)
+        self.assertEqual(table.column('issue_date')[0].as_py(), datetime.date(2025, 3, 4))
+        self.assertEqual(table.column('total_amount')[0].as_py(), Decimal("10.0000"))
+
+
+class CustomerStatementTests(TestCase):
+    """
+    Tests για την καρτέλα κινήσεων πελάτη (UNION ALL με προοδευτικό υπόλοιπο).
+    """
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Καρτέλας")
+        self.user = User.objects.create_user(username='statement', password='password123')
+        # Πριν από την περίοδο: υπόλοιπο έναρξης 100 - 30 = 70
+        Invoice.objects.create(customer=self.customer, issue_date=datetime.date(2024, 12, 1), status=Invoice.STATUS_ISSUED, total_amount=Decimal("100.00"))
+        Payment.objects.create(customer=self.customer, payment_date=datetime.date(2024, 12, 5), amount_paid=Decimal("30.00"))
+        branch = Customer.objects.create(first_name="Υπο", last_name="Κατάστημα", parent=self.customer, is_branch=True)
+        for day in range(1, 6):
+            Invoice.objects.create(
+                customer=self.customer, issue_date=datetime.date(2025, 1, day), status=Invoice.STATUS_ISSUED,
+                total_amount=Decimal("10.00"), delivery_note=DeliveryNote.objects.create(customer=branch),
+            )
+        Payment.objects.create(customer=self.customer, payment_date=datetime.date(2025, 1, 3), amount_paid=Decimal("25.00"))
+        Invoice.objects.create(customer=self.customer, issue_date=datetime.date(2025, 1, 4), status=Invoice.STATUS_DRAFT, total_amount=Decimal("99.00"))
+
+    def test_running_balance_across_pages(self):
+        """
+        Το προοδευτικό υπόλοιπο ξεκινά από το υπόλοιπο έναρξης και συνεχίζει σωστά στη δεύτερη σελίδα.
+        """
+        statement = ledger.CustomerStatement(self.customer, datetime.date(2025, 1, 1), datetime.date(2025, 1, 31), opening_balance=Decimal("70.00"))
+        self.assertEqual(statement.count(), 6)
+        with self.assertNumQueries(1):
+            entries = statement[0:6]
+        self.assertEqual(
+            [(entry['doc_type'], entry['running_balance']) for entry in entries],
+            [('Τιμολόγιο', Decimal("80.00")), ('Τιμολόγιο', Decimal("90.00")), ('Τιμολόγιο', Decimal("100.00")),
+             ('Πληρωμή', Decimal("75.00")), ('Τιμολόγιο', Decimal("85.00")), ('Τιμολόγιο', Decimal("95.00"))]
+        )
+        self.assertEqual(entries[0]['description'], "Τιμολόγηση Δ.Α. προς: Υπο Κατάστημα")
+        self.assertEqual(statement[4:6], entries[4:6])
+
+    def test_financial_detail_view_pages_the_period(self):
+        """
+        Η καρτέλα δείχνει μόνο την περίοδο, σε σελίδες, χωρίς ερώτηση ανά κίνηση.
+        """
+        self.client.login(username='statement', password='password123')
+        url = reverse('customer_financial_detail', args=[self.customer.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'date_from': '2025-01-01', 'date_to': '2025-01-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['period']['opening_balance'], Decimal("70.00"))
+        self.assertEqual(response.context['period']['closing_balance'], Decimal("95.00"))
+        self.assertEqual(len(response.context['transaction_log']), 6)
+        self.assertFalse(any('core_deliverynote' in query['sql'] for query in queries.captured_queries if 'UNION' not in query['sql']))
+
+        with patch('core.views.STATEMENT_PAGE_SIZE', 4):
+            response = self.client.get(url, {'date_from': '2025-01-01', 'date_to': '2025-01-31', 'page': 2})
+        self.assertEqual(response.context['carried_balance'], Decimal("75.00"))
+        self.assertEqual([entry['running_balance'] for entry in response.context['transaction_log']], [Decimal("85.00"), Decimal("95.00")])
+
+
+class AgingTests(TestCase):
+    """
+    Tests για την ενηλικίωση απαιτήσεων.
+    """
+    def setUp(self):
+        self.as_of = datetime.date(2025, 6, 30)
+        self.parent = Customer.objects.create(first_name="Κεντρικό", last_name="Aging")
+        self.branch = Customer.objects.create(first_name="Υποκατάστημα", last_name="Aging", parent=self.parent, is_branch=True)
+
+    def _invoice(self, customer, days_overdue, total, paid=Decimal("0.00"), status=Invoice.STATUS_ISSUED):
+        due_date = self.as_of - datetime.timedelta(days=days_overdue) if days_overdue is not None else None
+        return Invoice.objects.create(
+            customer=customer, issue_date=datetime.date(2025, 1, 1), due_date=due_date,
+            total_amount=total, paid_amount=paid, status=status,
+        )
+
+    def test_buckets_per_customer_and_parent(self):
+        """
+        Κάθε ανεξόφλητο υπόλοιπο μπαίνει στη σωστή κλίμακα· τα υποκαταστήματα αθροίζονται στο κεντρικό.
+        """
+        self._invoice(self.parent, None, Decimal("10.00"))
+        self._invoice(self.parent, 0, Decimal("20.00"))
+        self._invoice(self.parent, 30, Decimal("100.00"), paid=Decimal("40.00"))
+        self._invoice(self.branch, 31, Decimal("50.00"))
+        self._invoice(self.branch, 91, Decimal("70.00"))
+        self._invoice(self.branch, 200, Decimal("5.00"), paid=Decimal("5.00"))  # εξοφλημένο
+        self._invoice(self.branch, 200, Decimal("8.00"), status=Invoice.STATUS_DRAFT)
+
+        with self.assertNumQueries(2):  # κλίμακες + ονόματα
+            rows = aging.aging_by('parent', as_of=self.as_of)
+        [row] = rows
+        self.assertEqual(
+            [row[key] for key, _, _, _ in aging.BUCKETS],
+            [Decimal("30.00"), Decimal("60.00"), Decimal("50.00"), Decimal("0.00"), Decimal("70.00")]
+        )
+        self.assertEqual((row['key'], row['total'], row['overdue_count']), (self.parent.pk, Decimal("210.00"), 3))
+
+        card = aging.customer_aging(self.parent, as_of=self.as_of)
+        self.assertEqual((card['overdue'], card['overdue_count']), (Decimal("60.00"), 1))
+        self.assertEqual(aging.customer_aging(Customer.objects.create(first_name="Χωρίς", last_name="Χρέη"))['total'], Decimal("0.00"))
+
+    def test_report_view_and_excel_export(self):
+        """
+        Η αναφορά δείχνει τα σύνολα ανά πελάτη και κατεβάζει Excel.
+        """
+        self._invoice(self.branch, 45, Decimal("50.00"))
+        User.objects.create_user(username='aging', password='password123')
+        self.client.login(username='aging', password='password123')
+
+        response = self.client.get(reverse('report_aging'), {'as_of': '2025-06-30', 'group_by': 'customer'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['overdue_total'], Decimal("50.00"))
+        self.assertEqual(response.context['aging_rows'][0]['buckets'][2], Decimal("50.00"))
+
+        excel = self.client.get(reverse('report_aging'), {'as_of': '2025-06-30', 'export': 'xlsx'})
+        self.assertEqual(excel['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        sheet = load_workbook(io.BytesIO(excel.content)).active
+        header = [cell.value for cell in sheet[1]]
+        self.assertEqual(sheet.cell(row=2, column=header.index('31-60 ημέρες') + 1).value, 50)
+
+
+class ReportJobTests(TestCase):
+    """
+    Tests για τις αναφορές στο παρασκήνιο.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.user = User.objects.create_user(username='jobs', password='password123')
+        customer = Customer.objects.create(first_name="Πελάτης", last_name="Παρασκηνίου", city="Βόλος")
+        product = Product.objects.create(name="Προϊόν Παρασκηνίου", code="JOB-1", price=Decimal("10.00"))
+        invoice = Invoice.objects.create(customer=customer, issue_date=datetime.date(2025, 3, 5))
+        InvoiceItem.objects.create(
+            invoice=invoice, product=product, description=product.name, quantity=Decimal("2"),
+            unit_price=Decimal("10.00"), vat_percentage=Decimal("24.00"), total_price=Decimal("20.00"), vat_amount=Decimal("4.80"),
+        )
+        invoice.status = Invoice.STATUS_ISSUED
+        invoice.save()
+
+    def test_async_report_runs_in_worker_and_stores_results(self):
+        """
+        Με ?async=1 η αναφορά μπαίνει στην ουρά· ο worker την εκτελεί και κρατάει HTML και Excel.
+        """
+        self.client.login(username='jobs', password='password123')
+        url = reverse('report_sales_by_city') + '?date_from=2025-03-01&date_to=2025-03-31&async=1'
+        response = self.client.get(url)
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, reverse('report_job_detail', args=[job.pk]))
+        self.assertEqual((job.status, job.params), (ReportJob.Status.QUEUED, {'date_from': '2025-03-01', 'date_to': '2025-03-31'}))
+        self.client.get(url)
+        self.assertEqual(ReportJob.objects.count(), 1)  # ίδια εκκρεμής αναφορά: δεν μπαίνει δεύτερη φορά
+
+        with override_settings(MEDIA_ROOT=self.tmp.name):
+            call_command('run_report_jobs', '--once', '--workers=0', stdout=io.StringIO())
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.progress), (ReportJob.Status.DONE, 100))
+            self.assertIn('Βόλος', job.result_html)
+
+            status = self.client.get(reverse('report_job_status', args=[job.pk])).json()
+            self.assertTrue(status['finished'])
+            self.assertEqual(status['excel_url'], reverse('report_job_excel', args=[job.pk]))
+            excel = self.client.get(status['excel_url'])
+            self.assertEqual(excel.status_code, 200)
+            self.assertTrue(b''.join(excel.streaming_content).startswith(b'PK'))
+
+        User.objects.create_user(username='other', password='password123')
+        self.client.login(username='other', password='password123')
+        self.assertEqual(self.client.get(reverse('report_job_status', args=[job.pk])).status_code, 404)
+
+    def test_failed_job_records_error(self):
+        """
+        Μια αναφορά που σκάει σημειώνεται ως αποτυχημένη με το σφάλμα, χωρίς να σταματά ο worker.
+        """
+        job = ReportJob.objects.create(report='report_sales_by_city', params={'date_from': 'όχι-ημερομηνία'}, requested_by=self.user)
+        with self.assertLogs('core.report_jobs', level='ERROR'):
+            call_command('run_report_jobs', '--once', '--workers=0', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.FAILED)
+        self.assertTrue(job.error)
+
+
+class BackgroundExportTests(TestCase):
+    """
+    Tests για τις εξαγωγές στο παρασκήνιο (αρχείο στο result_file, επαναχρησιμοποίηση ίδιων αιτημάτων).
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        group = Group.objects.create(name='Πωλητές')
+        self.reps = []
+        for username in ('rep_a', 'rep_b'):
+            user = User.objects.create_user(username=username, password='password123')
+            user.groups.add(group)
+            self.reps.append(user)
+        rep = SalesRepresentative.objects.create(user=self.reps[0])
+        # Οι rep_a και rep_b δεν έχουν το ίδιο εύρος: ο rep_b δεν έχει προφίλ πωλητή
+        customer = Customer.objects.create(first_name="Πελάτης", last_name="Παρασκηνίου", sales_rep=rep)
+        for day in range(1, 4):
+            Order.objects.create(customer=customer, order_date=datetime.date(2025, 4, day), total_amount=Decimal("7.00"))
+
+    def test_background_export_writes_artifact_and_is_reused(self):
+        """
+        Με ?async=1 η εξαγωγή γράφεται από τον worker σε αρχείο· ίδιο αίτημα με ίδιο εύρος παίρνει την ίδια δουλειά.
+        """
+        url = reverse('export_orders_excel')
+        params = {'date_from': '2025-04-02', 'format': 'csv', 'async': '1', 'page': '3'}
+        self.client.login(username='rep_a', password='password123')
+        response = self.client.get(url, params)
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, reverse('report_job_detail', args=[job.pk]))
+        self.assertEqual((job.scope, job.params), ('orders:rep:%d' % self.reps[0].salesrepresentative.pk, {'date_from': '2025-04-02', 'format': 'csv'}))
+
+        with override_settings(MEDIA_ROOT=self.tmp.name):
+            call_command('run_report_jobs', '--once', '--workers=0', stdout=io.StringIO())
+            job.refresh_from_db()
+            self.assertEqual(job.status, ReportJob.Status.DONE)
+            self.assertTrue(job.result_file.name.endswith('.csv'))
+
+            # Ξανά το ίδιο (και χωρίς async, μέσα στο διάστημα φρεσκάδας): ίδια δουλειά, όχι νέα
+            self.client.get(url, params)
+            self.assertEqual(ReportJob.objects.count(), 1)
+
+            status = self.client.get(reverse('report_job_status', args=[job.pk])).json()
+            self.assertNotIn('result_url', status)
+            self.assertEqual(status['file_format'], 'CSV')
+            download = self.client.get(status['excel_url'])
+            lines = b''.join(download.streaming_content).decode('utf-8-sig').splitlines()
+            self.assertEqual(len(lines), 3)  # τίτλοι + 2 παραγγελίες
+            self.assertIn('.csv', download['Content-Disposition'])
+
+        # Άλλο εύρος δεδομένων: δεν βλέπει τη δουλειά και παίρνει δική του
+        self.client.login(username='rep_b', password='password123')
+        self.assertEqual(self.client.get(reverse('report_job_status', args=[job.pk])).status_code, 404)
+        self.client.get(url, params)
+        self.assertEqual(ReportJob.objects.count(), 2)
+
+    @override_settings(EXPORT_BACKGROUND_ROWS=2, EXPORT_JOB_FRESHNESS_SECONDS=60)
+    def test_large_export_goes_to_background_until_stale(self):
+        """
+        Πάνω από EXPORT_BACKGROUND_ROWS γραμμές η εξαγωγή πάει στο παρασκήνιο· μια παλιά ολοκληρωμένη δεν ξαναχρησιμοποιείται.
+        """
+        self.client.login(username='rep_a', password='password123')
+        url = reverse('export_orders_excel')
+        response = self.client.get(url)
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, reverse('report_job_detail', args=[job.pk]), fetch_redirect_response=False)
+        # Λίγες γραμμές: απευθείας
+        self.assertTrue(self.client.get(url, {'date_from': '2025-04-03'}).streaming)
+
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.Status.DONE, finished_at=timezone.now() - datetime.timedelta(minutes=5)
+        )
+        self.client.get(url)
+        self.assertEqual(ReportJob.objects.count(), 2)
+
+
+
+class JournalExportTests(TestCase):
+    """
+    Tests για τη σταδιακή εξαγωγή λογιστικού ημερολογίου.
+    """
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="Ημερολογίου", vat_number="099999999")
+        self.invoice = Invoice.objects.create(
+            customer=self.customer, status=Invoice.STATUS_ISSUED, issue_date=datetime.date(2025, 5, 2),
+            total_amount=Decimal("124.00"), vat_amount=Decimal("24.00"),
+        )
+        Payment.objects.create(customer=self.customer, amount_paid=Decimal("50.00"), payment_date=datetime.date(2025, 5, 3))
+
+    def _export(self):
+        file = io.StringIO()
+        journal.export('accountant', file)
+        return list(csv.DictReader(io.StringIO(file.getvalue())))
+
+    def test_exports_only_changes_and_reverses_cancellations(self):
+        """
+        Η δεύτερη εξαγωγή δεν ξαναβγάζει τίποτα· η ακύρωση βγάζει αντιλογισμό. Οι εγγραφές ισοσκελίζονται.
+        """
+        rows = self._export()
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(sum(Decimal(row['Χρέωση']) for row in rows), sum(Decimal(row['Πίστωση']) for row in rows))
+        self.assertEqual(
+            [(row['Λογαριασμός'], row['Χρέωση'], row['Πίστωση']) for row in rows if row['Είδος Παραστατικού'] == 'Τιμολόγιο'],
+            [('30.00', '124.00', '0.00'), ('70.00', '0.00', '100.00'), ('54.00', '0.00', '24.00')],
+        )
+        self.assertEqual(self._export(), [])
+
+        self.invoice.status = Invoice.STATUS_PAID
+        self.invoice.save(update_fields=['status', 'updated_at'])
+        self.assertEqual(self._export(), [])
+
+        self.invoice.status = Invoice.STATUS_CANCELLED
+        self.invoice.save(update_fields=['status', 'updated_at'])
+        rows = self._export()
+        self.assertEqual({row['Κίνηση'] for row in rows}, {journal.REVERSAL})
+        self.assertEqual([(row['Λογαριασμός'], row['Πίστωση']) for row in rows][0], ('30.00', '124.00'))
+        self.assertEqual(JournalExportCursor.objects.get(target='accountant').last_documents, 1)
+
+    def test_command_writes_file(self):
+        """
+        Η εντολή export_journal γράφει το CSV και δεν δέχεται --since σε προορισμό με εξαγωγές.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'journal.csv')
+            call_command('export_journal', f'--output={path}', '--since=2025-01-01', stdout=io.StringIO())
+            with open(path, encoding='utf-8-sig') as file:
+                self.assertEqual(len(list(csv.reader(file))), 6)
+            with self.assertRaises(CommandError):
+                call_command('export_journal', f'--output={path}', '--since=2025-01-01', stdout=io.StringIO())
+
+
+class PdfCacheTests(TestCase):
+    """
+    Tests για το cache των PDF στον δίσκο και τα ETag.
+    """
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PDF_CACHE_DIR=directory.name, PDF_CACHE_ENABLED=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.customer = Customer.objects.create(first_name="Πελάτης", last_name="PDF")
+        self.invoice = Invoice.objects.create(customer=self.customer, status=Invoice.STATUS_ISSUED, issue_date=datetime.date(2025, 6, 1))
+        self.renders = 0
+
+    def _get(self, etag=None):
+        def render():
+            self.renders += 1
+            return b'%PDF-' + str(self.renders).encode()
+
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = RequestFactory().get('/invoice/pdf/', **headers)
+        invoice = Invoice.objects.select_related('customer').get(pk=self.invoice.pk)
+        return pdf_cache.pdf_response(request, invoice, 'core/invoice_pdf.html', render, 'invoice.pdf', depends_on=[invoice.customer])
+
+    def test_cached_pdf_and_not_modified(self):
+        """
+        Το PDF φτιάχνεται μία φορά· με το ETag του ο browser παίρνει 304. Η αλλαγή κατάστασης δίνει νέο PDF.
+        """
+        first = self._get()
+        self.assertEqual((first.status_code, first.content), (200, b'%PDF-1'))
+        self.assertEqual(self._get().content, b'%PDF-1')
+        self.assertEqual(self._get(first['ETag']).status_code, 304)
+        self.assertEqual(self.renders, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invoice.status = Invoice.STATUS_PAID
+            self.invoice.save(update_fields=['status'])
+        response = self._get(first['ETag'])
+        self.assertEqual((response.status_code, response.content), (200, b'%PDF-2'))
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_line_change_invalidates_cached_pdf(self):
+        """
+        Αλλαγή σε γραμμή του παραστατικού σβήνει το αποθηκευμένο PDF, οπότε δεν δίνεται 304 με το παλιό ETag.
+        """
+        etag = self._get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(
+                invoice=self.invoice, description="Γραμμή", quantity=Decimal("1"), unit_price=Decimal("10.00"),
+                vat_percentage=Decimal("24.00"), total_price=Decimal("10.00"), vat_amount=Decimal("2.40"),
+            )
+        response = self._get(etag)
+        self.assertEqual((response.status_code, response.content), (200, b'%PDF-2'))
+
+@skipUnless('replica' in settings.DATABASES, "Χρειάζεται δεύτερη βάση 'replica' στο DATABASES.")
+@override_settings(REPORTING_DATABASE='replica')
+class ReplicaRoutingTests(TestCase):
+    """
+    Tests για τη δρομολόγηση των αναφορών στο replica (π.χ. με crm_project.test_settings).
+    """
+    # Το skipUnless δεν εμποδίζει τον test runner να ετοιμάσει τις βάσεις της κλάσης
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def setUp(self):
+        # Υπάρχει μόνο στο "replica", οπότε φαίνεται από ποια βάση διάβασε η view
+        Customer.objects.using('replica').create(first_name="Μόνο", last_name="Replica")
+
+        @db_routing.reporting_database
+        def view(request):
+            Customer.objects.create(first_name="Νέος", last_name="Πελάτης")
+            return HttpResponse(','.join(Customer.objects.order_by('pk').values_list('last_name', flat=True)))
+        self.view = view
+        self.factory = RequestFactory()
+
+    def test_reads_from_replica_and_writes_to_default(self):
+        """
+        Ένα GET διαβάζει από το replica, ενώ η εγγραφή της view πηγαίνει στην κύρια βάση.
+        """
+        response = self.view(self.factory.get('/'))
+        self.assertEqual(response.content.decode(), 'Replica')
+        self.assertEqual(list(Customer.objects.values_list('last_name', flat=True)), ['Πελάτης'])
+
+    def test_recent_write_reads_from_default(self):
+        """
+        Μετά από εγγραφή (cookie) και σε POST, η view διαβάζει από την κύρια βάση.
+        """
+        middleware = ReplicaStickinessMiddleware(lambda request: HttpResponse())
+        response = middleware(self.factory.post('/'))
+        self.assertEqual(response.cookies[db_routing.STICKY_COOKIE]['max-age'], settings.REPORTING_DATABASE_STICKY_SECONDS)
+        self.assertNotIn(db_routing.STICKY_COOKIE, middleware(self.factory.get('/')).cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[db_routing.STICKY_COOKIE] = '1'
+        self.assertEqual(self.view(request).content.decode(), 'Πελάτης')
+        self.assertEqual(self.view(self.factory.post('/')).content.decode(), 'Πελάτης,Πελάτης')
+
+    @override_settings(REPORT_CACHE_ENABLED=False)
+    def test_report_view_reads_from_replica(self):
+        """
+        Οι αναφορές (χωρίς cache) είναι δρομολογημένες στο replica.
+        """
+        Invoice.objects.using('replica').create(
+            customer=Customer.objects.using('replica').get(), issue_date=datetime.date(2025, 1, 1),
+            due_date=datetime.date(2025, 1, 31), total_amount=Decimal("42.00"), status=Invoice.STATUS_ISSUED,
+        )
+        User.objects.create_user(username='replica', password='password123')
+        self.client.login(username='replica', password='password123')
+        response = self.client.get(reverse('report_aging'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Replica')
+
+    def test_cached_results_are_computed_on_primary(self):
+        """
+        Ό,τι αποθηκεύεται στο cache των αναφορών διαβάζεται από την κύρια βάση, όχι από το replica.
+        """
+        @db_routing.reporting_database
+        def view(request):
+            result = report_cache.get_or_compute(
+                'replica_test', {}, lambda: list(Customer.objects.values_list('last_name', flat=True))
+            )
+            return HttpResponse(','.join(result))
+
+        Customer.objects.create(first_name="Μόνο", last_name="Κύρια")
+        self.assertEqual(view(self.factory.get('/')).content.decode(), 'Κύρια')
@@ -124,6 +124,11 @@ urlpatterns = [
     path('reports/profitability/', views.report_profitability_view, name='report_profitability'),
     path('reports/sales-by-rep/', views.report_sales_by_rep_view, name='report_sales_by_rep'),
     path('reports/sales-by-city/', views.report_sales_by_city_view, name='report_sales_by_city'),
+    path('reports/pivot/', views.report_pivot_view, name='report_pivot'),
+    path('reports/jobs/<int:pk>/', views.report_job_detail_view, name='report_job_detail'),
+    path('reports/jobs/<int:pk>/status/', views.report_job_status_view, name='report_job_status'),
+    path('reports/jobs/<int:pk>/result/', views.report_job_result_view, name='report_job_result'),
+    path('reports/jobs/<int:pk>/excel/', views.report_job_excel_view, name='report_job_excel'),
 
     path('retail-receipts/export/excel/', views.export_retail_receipts_to_excel, name='export_retail_receipts_excel'),
     path('pos/', views.retail_pos_view, name='retail_pos'),
@@ -142,6 +147,7 @@ urlpatterns = [
     path('delivery-notes/<int:pk>/cancel/', views.delivery_note_cancel_view, name='delivery_note_cancel'),
     path('invoices/<int:pk>/cancellation-pdf/', views.view_invoice_cancellation_pdf, name='invoice_cancellation_pdf'),
     path('reports/customer-balance/', views.report_customer_balance_view, name='report_customer_balance'),
+    path('reports/aging/', views.report_aging_view, name='report_aging'),
 
     path('orders/<int:pk>/copy/', views.order_copy_view, name='order_copy'),
     path('invoices/<int:pk>/create-order/', views.order_create_from_invoice_view, name='order_create_from_invoice'),
@@ -158,4 +164,7 @@ path('purchase-orders/<int:pk>/edit/', views.purchase_order_edit_view, name='pur
 path('purchase-orders/<int:pk>/delete/', views.purchase_order_delete_view, name='purchase_order_delete'),
 path('purchase-orders/<int:pk>/pdf/', views.purchase_order_pdf_view, name='purchase_order_pdf'),
 path('purchase-orders/export/excel/', views.export_purchase_orders_excel, name='export_purchase_orders_excel'),
+
+    # --- ΜΕΤΡΗΣΕΙΣ (Prometheus) ---
+    path('metrics', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
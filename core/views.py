@@ -1,7 +1,7 @@
 # core/views.py
 # --- 1. Python & Django Standard Libraries ---
 import datetime
-import io
+import os
 import unicodedata
 from collections import defaultdict
 from decimal import Decimal
@@ -11,38 +11,43 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model, logout as auth_logout_function
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db import transaction
 from django.core.mail import EmailMessage
 from django.forms import inlineformset_factory
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, HttpResponse, Http404, FileResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.http import require_POST, require_GET
 from django.http import Http404, JsonResponse
 import json
-from django.db.models.functions import TruncMonth
-from django.db.models import Sum, F, Q, DecimalField, ExpressionWrapper, Case, When, Value, Count
+from urllib.parse import urlencode
+from . import aging, exports, ledger, listings, metrics, pdf_cache, pivot, profitability, report_cache, report_jobs
+from .balances import annotate_period_balances
+from .db_routing import reporting_database
+from .report_jobs import background_report, report_response, table_to_excel
+from django.db.models import Sum, F, Q, Count
 from django.db.models.functions import Coalesce
 from .models import Attachment 
 from .forms import AttachmentForm 
 from django.contrib.contenttypes.models import ContentType
 
 # --- 2. External Libraries ---
-import pandas as pd
 from dateutil.relativedelta import relativedelta
-from openpyxl.utils import get_column_letter
 
 # --- 3. Local Application Imports (From this project) ---
 from .models import (
     Customer, Product, Order, OrderItem, StockReceipt, Payment, ActivityLog, 
     SalesRepresentative, Invoice, InvoiceItem, Commission, UserProfile,
-    CreditNote, CreditNoteItem, RetailReceipt, RetailReceiptItem, DeliveryNote, DeliveryNoteItem, Supplier, PurchaseOrder
+    CreditNote, CreditNoteItem, RetailReceipt, RetailReceiptItem, DeliveryNote, DeliveryNoteItem, Supplier, PurchaseOrder,
+    StockMovement, DailySalesFact, ReportJob
 )
 from .forms import (
-    CustomerForm, ProductForm, OrderForm, OrderItemForm, 
+    CustomerForm, ProductForm, OrderForm, OrderItemForm, BaseOrderItemFormSet,
     StockReceiptForm, PaymentForm, PaymentCancellationForm,
     CustomUserCreationForm, CustomUserChangeForm, MyProfileForm,
     UserProfileForm, CreditNoteForm, CreditNoteItemFormSet,
@@ -75,6 +80,7 @@ def normalize_text(text):
 OrderItemFormSet = inlineformset_factory(
     Order, OrderItem,
     form=OrderItemForm,
+    formset=BaseOrderItemFormSet,
     fields=('product', 'quantity', 'is_gift', 'unit_price', 'discount_percentage', 'vat_percentage', 'comments'),
     extra=1,
     can_delete=True
@@ -133,52 +139,11 @@ def customer_create(request):
     return render(request, 'core/customer_create.html', {'form': form})
 @login_required
 def customer_list(request):
-    user = request.user
-    
-    # Ξεκινάμε με ένα queryset που θα περιέχει όλους τους πελάτες
-    customers_qs = Customer.objects.all()
-
-    # Εφαρμόζουμε τους κανόνες δικαιωμάτων
-    # Αν ο χρήστης ΔΕΝ είναι superuser, τότε εφαρμόζουμε περιορισμούς
-    if not user.is_superuser:
-        # Αν ανήκει στην ομάδα των πωλητών
-        if user.groups.filter(name='Πωλητές').exists():
-            try:
-                # Φιλτράρουμε τους πελάτες ώστε να δει μόνο αυτούς που του ανήκουν
-                customers_qs = customers_qs.filter(sales_rep=user.salesrepresentative)
-            except SalesRepresentative.DoesNotExist:
-                # Αν για κάποιο λόγο είναι στην ομάδα αλλά δεν έχει προφίλ πωλητή, δεν βλέπει κανέναν
-                customers_qs = Customer.objects.none()
-        
-        # Αν ο χρήστης ανήκει στην ομάδα της Αποθήκης (μπορεί να δει πελάτες αλλά όχι οικονομικά)
-        # elif user.groups.filter(name='Αποθήκη').exists():
-        #     customers_qs = Customer.objects.all() # Του επιτρέπουμε να τους δει όλους
-
-        # Αν δεν ανήκει σε καμία ειδική ομάδα (π.χ. απλός χρήστης χωρίς δικαιώματα), δεν βλέπει τίποτα
-        # else:
-        #     customers_qs = Customer.objects.none()
-
-    # Από εδώ και κάτω, η λογική της αναζήτησης και σελιδοποίησης
-    # εφαρμόζεται πάνω στο queryset που έχουμε ήδη φιλτράρει (customers_qs)
+    # Τα φίλτρα και τα δικαιώματα είναι κοινά με την εξαγωγή της λίστας (listings.LISTINGS)
+    customers_qs = listings.LISTINGS['customers'].queryset(request.GET, request.user)
     query_from_request = request.GET.get('q', None)
-    if query_from_request:
-        query = query_from_request.strip()
-        if query:
-            normalized_user_query = normalize_text(query)
-            customers_qs = customers_qs.filter(
-                Q(first_name_normalized__icontains=normalized_user_query) |
-                Q(last_name_normalized__icontains=normalized_user_query) |
-                Q(company_name_normalized__icontains=normalized_user_query) |
-                Q(code__icontains=query) |
-                Q(email__icontains=query) |
-                Q(phone__icontains=query) |
-                # --- ΝΕΑ ΠΡΟΣΘΗΚΗ: ΨΑΞΕ ΚΑΙ ΣΤΟ ΟΝΟΜΑ ΤΟΥ ΚΕΝΤΡΙΚΟΥ ---
-                Q(parent__company_name_normalized__icontains=normalized_user_query) |
-                Q(parent__first_name_normalized__icontains=normalized_user_query) |
-                Q(parent__last_name_normalized__icontains=normalized_user_query)
-            ).distinct()
 
-    paginator = Paginator(customers_qs.order_by('company_name', 'last_name'), 20)
+    paginator = Paginator(customers_qs, 20)
     page_number = request.GET.get('page')
     customers_page = paginator.get_page(page_number)
     
@@ -215,20 +180,8 @@ def customer_delete(request, pk):
 @login_required
 def product_list(request):
     query = request.GET.get('q')
-    
-    # Το αρχικό queryset παραμένει το ίδιο
-    products_qs = Product.objects.all().order_by('name')
-
-    if query:
-        query = query.strip()
-        # Η συνάρτηση normalize_text πρέπει να είναι διαθέσιμη εδώ
-        normalized_query = normalize_text(query)
-        products_qs = products_qs.filter(
-            Q(name_normalized__icontains=normalized_query) |
-            Q(code__icontains=query) |
-            Q(barcode__icontains=query) |
-            Q(description__icontains=query) 
-        ).distinct()
+    # Τα φίλτρα και τα δικαιώματα είναι κοινά με την εξαγωγή της λίστας (listings.LISTINGS)
+    products_qs = listings.LISTINGS['products'].queryset(request.GET)
 
     # --- ΝΕΑ ΛΟΓΙΚΗ ΓΙΑ ΣΕΛΙΔΟΠΟΙΗΣΗ ---
     paginator = Paginator(products_qs, 20) # Π.χ., 20 προϊόντα ανά σελίδα
@@ -312,18 +265,9 @@ def product_delete(request, pk):
 
 @login_required
 def order_list(request):
-    # Η αρχή παραμένει ίδια
-    user = request.user
-    orders_qs = Order.objects.select_related('customer').all()
-
-    if not user.is_superuser:
-        if user.groups.filter(name='Πωλητές').exists():
-            try:
-                orders_qs = orders_qs.filter(customer__sales_rep=user.salesrepresentative)
-            except SalesRepresentative.DoesNotExist:
-                orders_qs = Order.objects.none()
+    # Τα φίλτρα και τα δικαιώματα είναι κοινά με την εξαγωγή της λίστας (listings.LISTINGS)
+    orders_qs = listings.LISTINGS['orders'].queryset(request.GET, request.user)
 
-    # Τα φίλτρα παραμένουν ίδια
     status_filter = request.GET.get('status', 'all')
     query_text = request.GET.get('q', '').strip()
     customer_filter_id = request.GET.get('customer_filter', None)
@@ -332,48 +276,10 @@ def order_list(request):
     invoiced_filter = request.GET.get('invoiced')
     delivery_note_filter = request.GET.get('delivery_note')
 
-    # Η λογική φιλτραρίσματος παραμένει ίδια
-    if status_filter != 'all' and status_filter:
-        orders_qs = orders_qs.filter(status=status_filter)
-    if customer_filter_id:
-        try:
-            orders_qs = orders_qs.filter(customer_id=int(customer_filter_id))
-        except ValueError:
-            customer_filter_id = None
-    if date_from_str:
-        try:
-            orders_qs = orders_qs.filter(order_date__gte=date_from_str)
-        except ValueError:
-            date_from_str = None 
-    if date_to_str:
-        try:
-            orders_qs = orders_qs.filter(order_date__lte=date_to_str)
-        except ValueError:
-            date_to_str = None
-    if query_text:
-        normalized_query = normalize_text(query_text)
-        orders_qs = orders_qs.filter(
-            Q(order_number__icontains=query_text) |
-            Q(customer__first_name_normalized__icontains=normalized_query) |
-            Q(customer__last_name_normalized__icontains=normalized_query) |
-            Q(customer__company_name_normalized__icontains=normalized_query) |
-            Q(customer__code__icontains=query_text)
-        ).distinct()
-
-    if invoiced_filter == 'yes':
-        orders_qs = orders_qs.filter(invoice__isnull=False)
-    elif invoiced_filter == 'no':
-        orders_qs = orders_qs.filter(invoice__isnull=True)
-
-    if delivery_note_filter == 'yes':
-        orders_qs = orders_qs.filter(delivery_notes__isnull=False)
-    elif delivery_note_filter == 'no':
-        orders_qs = orders_qs.filter(delivery_notes__isnull=True)
-
     # --- Η ΓΡΑΜΜΗ ΠΟΥ ΕΛΕΙΠΕ ---
     customers_for_filter = Customer.objects.all().order_by('company_name', 'last_name', 'first_name')
     
-    paginator = Paginator(orders_qs.order_by('-order_date', '-pk'), 15)
+    paginator = Paginator(orders_qs, 15)
     page_number = request.GET.get('page')
     orders_page = paginator.get_page(page_number)
 
@@ -415,13 +321,18 @@ def order_create(request):
         formset = OrderItemFormSet(request.POST, prefix='items')
         
         if form.is_valid() and formset.is_valid():
-            with transaction.atomic():
-                # Η λογική αποθήκευσης παραμένει ως έχει
-                order = form.save()
-                formset.instance = order
-                formset.save()
-            messages.success(request, f'Η παραγγελία {order.order_number} δημιουργήθηκε επιτυχώς.')
-            return redirect('order_detail', pk=order.pk)
+            try:
+                with transaction.atomic():
+                    # Η λογική αποθήκευσης παραμένει ως έχει
+                    order = form.save()
+                    formset.instance = order
+                    formset.save_items()
+            except ValidationError as error:
+                # Το διαθέσιμο άλλαξε μετά τον έλεγχο της φόρμας: τα σφάλματα είναι ήδη στις γραμμές
+                messages.error(request, " ".join(error.messages))
+            else:
+                messages.success(request, f'Η παραγγελία {order.order_number} δημιουργήθηκε επιτυχώς.')
+                return redirect('order_detail', pk=order.pk)
         else:
             messages.error(request, "Η φόρμα περιέχει σφάλματα. Παρακαλώ διορθώστε τα.")
     else:
@@ -466,11 +377,15 @@ def order_edit(request, pk):
         formset = OrderItemFormSet(request.POST, instance=order, prefix='items')
         
         if form.is_valid() and formset.is_valid():
-            with transaction.atomic():
-                form.save()
-                formset.save()
-            messages.success(request, f'Οι αλλαγές στην παραγγελία {order.order_number} αποθηκεύτηκαν επιτυχώς.')
-            return redirect('order_detail', pk=order.pk)
+            try:
+                with transaction.atomic():
+                    form.save()
+                    formset.save_items()
+            except ValidationError as error:
+                messages.error(request, " ".join(error.messages))
+            else:
+                messages.success(request, f'Οι αλλαγές στην παραγγελία {order.order_number} αποθηκεύτηκαν επιτυχώς.')
+                return redirect('order_detail', pk=order.pk)
         else:
             messages.error(request, "Η φόρμα περιέχει σφάλματα. Παρακαλώ διορθώστε τα.")
     else:
@@ -507,14 +422,6 @@ def order_detail(request, pk):
         'is_order_editable': is_order_editable, 
         'can_create_delivery_note': can_create_dn # Χρησιμοποιούμε τη νέα, σωστή μεταβλητή
     }
-     # --- ΠΡΟΣΘΕΣΕ ΑΥΤΟ ΤΟ ΚΟΜΜΑΤΙ ΓΙΑ DEBUG ---
-    print("--- DEBUG VIEW ---")
-    print(f"Order ID: {order.pk}")
-    print(f"Order Status: '{order.status}'")
-    print(f"has_active_delivery_note: {has_active_delivery_note}")
-    print(f"CAN CREATE DN (Final Decision in View): {can_create_dn}")
-    print("------------------")
-    # --- ΤΕΛΟΣ DEBUG ---
     return render(request, 'core/order_detail.html', context)
 
 
@@ -623,6 +530,8 @@ def search_products_ajax(request):
             'text': f"{p.name} ({p.code})",
             'price': float(p.price),
             'stock': p.stock_quantity,
+            'reserved': p.reserved_quantity,
+            'available': p.available_quantity,
             'unit': p.get_unit_of_measurement_display(),
             'unit_key': p.unit_of_measurement,
             'vat': float(p.vat_percentage) # <<< ΝΕΑ ΠΡΟΣΘΗΚΗ
@@ -665,40 +574,8 @@ def stock_receipt_list(request):
     date_from_str = request.GET.get('date_from', None) # Νέα παράμετρος: Ημερομηνία Από (ως string)
     date_to_str = request.GET.get('date_to', None)     # Νέα παράμετρος: Ημερομηνία Έως (ως string)
 
-    receipts = StockReceipt.objects.select_related('product', 'user_who_recorded').all()
-
-    # Φίλτρο βάσει επιλεγμένου προϊόντος
-    if product_filter_id:
-        try:
-            product_filter_id_int = int(product_filter_id)
-            receipts = receipts.filter(product_id=product_filter_id_int)
-        except ValueError:
-            product_filter_id = None 
-
-    # Φίλτρο βάσει Ημερομηνίας Από
-    if date_from_str:
-        try:
-            date_from_obj = datetime.datetime.strptime(date_from_str, '%Y-%m-%d').date()
-            receipts = receipts.filter(date_received__date__gte=date_from_obj)
-        except ValueError:
-            date_from_str = None # Αν η ημερομηνία δεν είναι έγκυρη, την αγνοούμε για το φίλτρο
-
-    # Φίλτρο βάσει Ημερομηνίας Έως
-    if date_to_str:
-        try:
-            date_to_obj = datetime.datetime.strptime(date_to_str, '%Y-%m-%d').date()
-            receipts = receipts.filter(date_received__date__lte=date_to_obj)
-        except ValueError:
-            date_to_str = None # Αν η ημερομηνία δεν είναι έγκυρη, την αγνοούμε για το φίλτρο
-            
-    # Φίλτρο βάσει αναζήτησης κειμένου
-    if query:
-        normalized_query = normalize_text(query) # Βεβαιώσου ότι η normalize_text είναι διαθέσιμη
-        receipts = receipts.filter(
-            Q(product__name_normalized__icontains=normalized_query if hasattr(Product, 'name_normalized') else Q(product__name__icontains=query)) |
-            Q(notes__icontains=query) |
-            Q(user_who_recorded__username__icontains=query)
-        ).distinct()
+    # Τα φίλτρα είναι κοινά με την εξαγωγή της λίστας (listings.LISTINGS)
+    receipts = listings.LISTINGS['stock_receipts'].queryset(request.GET)
 
     # Παίρνουμε όλα τα ενεργά προϊόντα για το dropdown του φίλτρου
     products_for_filter = Product.objects.filter(is_active=True).order_by('name')
@@ -875,32 +752,69 @@ def receive_po_view(request, po_pk):
             'title': f"Παραλαβή Εντολής Αγοράς {po.po_number}"
         }
         return render(request, 'core/receive_po_form.html', context)
+# Μέγεθος σελίδας για το ιστορικό ενεργειών
+ACTIVITY_LOG_PAGE_SIZE = 25
+
+
+def _activity_log_cursor(entry):
+    return f"{entry.action_time.isoformat()}~{entry.pk}"
+
+
+def _parse_activity_log_cursor(value):
+    try:
+        time_str, pk_str = value.rsplit('~', 1)
+        return datetime.datetime.fromisoformat(time_str), int(pk_str)
+    except (AttributeError, ValueError):
+        return None
+
+
 @login_required
 def activity_log_list_view(request):
-    log_entries_list = ActivityLog.objects.select_related('user', 'content_type').all().order_by('-action_time')
+    # Keyset pagination: δεν χρησιμοποιούμε OFFSET ούτε COUNT(*), ώστε η σελίδα να μένει
+    # γρήγορη ανεξάρτητα από το μέγεθος του πίνακα (βλ. indexes του ActivityLog).
+    log_entries_list = ActivityLog.objects.select_related('user', 'content_type')
 
     user_filter_id = request.GET.get('user_filter', None) # Τώρα θα είναι ID
     action_type_filter = request.GET.get('action_type_filter', None)
+    filter_params = {}
     
     # Φίλτρο βάσει επιλεγμένου χρήστη (με ID)
     if user_filter_id:
         try:
             selected_user_id = int(user_filter_id)
             log_entries_list = log_entries_list.filter(user_id=selected_user_id)
+            filter_params['user_filter'] = selected_user_id
         except ValueError:
             user_filter_id = None # Αγνοούμε μη έγκυρες τιμές
 
     if action_type_filter:
         log_entries_list = log_entries_list.filter(action_type=action_type_filter)
-
-    paginator = Paginator(log_entries_list, 25)
-    page_number = request.GET.get('page')
-    try:
-        log_entries = paginator.page(page_number)
-    except PageNotAnInteger:
-        log_entries = paginator.page(1)
-    except EmptyPage:
-        log_entries = paginator.page(paginator.num_pages)
+        filter_params['action_type_filter'] = action_type_filter
+
+    page_size = ACTIVITY_LOG_PAGE_SIZE
+    before_cursor = _parse_activity_log_cursor(request.GET.get('before'))
+    after_cursor = _parse_activity_log_cursor(request.GET.get('after'))
+
+    if after_cursor:
+        # Πηγαίνουμε προς τις νεότερες εγγραφές
+        after_time, after_pk = after_cursor
+        log_entries = list(
+            log_entries_list.filter(Q(action_time__gt=after_time) | Q(action_time=after_time, pk__gt=after_pk))
+            .order_by('action_time', 'id')[:page_size + 1]
+        )
+        has_newer = len(log_entries) > page_size
+        log_entries = log_entries[:page_size][::-1]
+        has_older = True
+    else:
+        if before_cursor:
+            before_time, before_pk = before_cursor
+            log_entries_list = log_entries_list.filter(
+                Q(action_time__lt=before_time) | Q(action_time=before_time, pk__lt=before_pk)
+            )
+        log_entries = list(log_entries_list.order_by('-action_time', '-id')[:page_size + 1])
+        has_older = len(log_entries) > page_size
+        log_entries = log_entries[:page_size]
+        has_newer = before_cursor is not None
 
     all_users = User.objects.all().order_by('username') # Παίρνουμε όλους τους χρήστες για το dropdown
 
@@ -911,6 +825,10 @@ def activity_log_list_view(request):
         'all_users': all_users, # <<< ΝΕΟ: Λίστα χρηστών για το φίλτρο
         'user_filter_id_value': int(user_filter_id) if user_filter_id and user_filter_id.isdigit() else None, # <<< ΝΕΟ: Το επιλεγμένο ID για το template
         'action_type_filter_value': action_type_filter if action_type_filter else '',
+        'filter_query': urlencode(filter_params),
+        'older_cursor': _activity_log_cursor(log_entries[-1]) if log_entries and has_older else None,
+        'newer_cursor': _activity_log_cursor(log_entries[0]) if log_entries and has_newer else None,
+        'is_first_page': not (before_cursor or after_cursor),
     }
     return render(request, 'core/activity_log_list.html', context)
 def custom_logout_view(request):
@@ -1099,6 +1017,9 @@ def payment_create_view(request, customer_pk=None):
     }
     return render(request, 'core/payment_form.html', context)
 
+STATEMENT_PAGE_SIZE = 50
+
+
 @login_required
 def customer_financial_detail_view(request, pk):
     customer = get_object_or_404(Customer, pk=pk)
@@ -1106,75 +1027,41 @@ def customer_financial_detail_view(request, pk):
 
     all_invoices = customer.invoices.filter(status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID])
     all_active_payments = customer.payments.filter(status=Payment.STATUS_ACTIVE)
-    all_issued_credit_notes = customer.credit_notes.filter(status=CreditNote.Status.ISSUED)
 
     total_invoiced = all_invoices.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
     total_paid = all_active_payments.aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
     
-    overdue_invoices = all_invoices.filter(status=Invoice.STATUS_ISSUED, due_date__lt=today)
-    overdue_count = overdue_invoices.count()
-    overdue_amount = sum(inv.outstanding_amount for inv in overdue_invoices)
+    # Εκπρόθεσμα και κλίμακες ενηλικίωσης σε μία ερώτηση (ίδια λογική με την αναφορά aging)
+    customer_aging = aging.customer_aging(customer, as_of=today)
+    overdue_count = customer_aging['overdue_count']
+    overdue_amount = customer_aging['overdue']
     
     credit_percentage = 0
     if customer.credit_limit and customer.credit_limit > 0:
         balance_for_calc = customer.balance if customer.balance > 0 else 0
         credit_percentage = (balance_for_calc / customer.credit_limit) * 100
 
-    transaction_log = []
-
-    # Προσθέτουμε τα τιμολόγια (Χρεώσεις)
-    for invoice in all_invoices:
-        
-        # --- ΝΕΑ ΔΙΟΡΘΩΜΕΝΗ ΛΟΓΙΚΗ ---
-        # Φτιάχνουμε την περιγραφή ξεχωριστά
-        description = 'Τιμολόγιο Πώλησης'
-        if invoice.delivery_note and invoice.delivery_note.customer.is_branch:
-            branch_customer = invoice.delivery_note.customer
-            description = f"Τιμολόγηση Δ.Α. προς: {branch_customer.company_name or branch_customer.get_full_name()}"
-
-        transaction_log.append({
-            'date': invoice.issue_date,
-            'doc_type': 'Τιμολόγιο', # <-- Το κρατάμε σταθερό για τη λογική του link
-            'description': description, # <-- Περνάμε την αναλυτική περιγραφή ξεχωριστά
-            'doc_number': invoice.invoice_number,
-            'debit': invoice.total_amount,
-            'credit': Decimal('0.00'),
-            'obj': invoice,
-            'is_overdue': invoice.is_overdue
-        })
-        
-    # Προσθέτουμε τις πληρωμές (Πιστώσεις)
-    for payment in all_active_payments:
-         transaction_log.append({
-            'date': payment.payment_date,
-            'doc_type': 'Πληρωμή',
-            'description': f"Πληρωμή ({payment.get_payment_method_display()})",
-            'doc_number': payment.receipt_number,
-            'debit': Decimal('0.00'),
-            'credit': payment.amount_paid,
-            'obj': payment,
-            'is_overdue': False
-        })
-
-    # Προσθέτουμε τα Πιστωτικά (Πιστώσεις)
-    for cn in all_issued_credit_notes:
-        transaction_log.append({
-            'date': cn.issue_date,
-            'doc_type': 'Πιστωτικό Τιμολόγιο',
-            'description': 'Πιστωτικό Τιμολόγιο',
-            'doc_number': cn.credit_note_number,
-            'debit': Decimal('0.00'),
-            'credit': cn.total_amount,
-            'obj': cn,
-            'is_overdue': False
-        })
-        
-    transaction_log.sort(key=lambda x: x['date'])
+    # Περίοδος της καρτέλας (προεπιλογή: από την αρχή του έτους)
+    try:
+        date_from = datetime.date.fromisoformat(request.GET.get('date_from', ''))
+    except ValueError:
+        date_from = today.replace(month=1, day=1)
+    try:
+        date_to = datetime.date.fromisoformat(request.GET.get('date_to', ''))
+    except ValueError:
+        date_to = today
 
-    running_balance = Decimal('0.00')
-    for entry in transaction_log:
-        running_balance += entry['debit'] - entry['credit']
-        entry['running_balance'] = running_balance
+    # Υπόλοιπα έναρξης/λήξης της περιόδου σε μία ερώτηση, οι κινήσεις μόνο για τη σελίδα που φαίνεται
+    period = annotate_period_balances(Customer.objects.filter(pk=customer.pk), date_from, date_to).values(
+        'opening_balance', 'debit_in_period', 'credit_in_period', 'closing_balance'
+    ).get()
+    statement = ledger.CustomerStatement(customer, date_from, date_to, opening_balance=period['opening_balance'])
+    transaction_log = Paginator(statement, STATEMENT_PAGE_SIZE).get_page(request.GET.get('page'))
+    # Το υπόλοιπο που μεταφέρεται στην αρχή της σελίδας
+    carried_balance = period['opening_balance']
+    if transaction_log.object_list:
+        first = transaction_log.object_list[0]
+        carried_balance = first['running_balance'] - first['debit'] + first['credit']
 
     context = {
         'customer': customer,
@@ -1183,8 +1070,14 @@ def customer_financial_detail_view(request, pk):
         'total_paid': total_paid,
         'overdue_count': overdue_count,
         'overdue_amount': overdue_amount,
+        'aging_buckets': [(label, customer_aging[key]) for key, label, _, _ in aging.BUCKETS],
         'credit_percentage': credit_percentage,
         'transaction_log': transaction_log,
+        'period': period,
+        'carried_balance': carried_balance,
+        'date_from': date_from,
+        'date_from_value': date_from.strftime('%Y-%m-%d'),
+        'date_to_value': date_to.strftime('%Y-%m-%d'),
     }
     
     return render(request, 'core/customer_financial_detail.html', context)
@@ -1303,25 +1196,12 @@ def view_payment_receipt_pdf(request, pk): # Άλλαξα το όνομα για
         'company_info': company_info_from_settings,
     }
     
-    # Render το HTML template σε string
-    html_string = render_to_string('core/payment_receipt_pdf.html', context)
-    
-    # Δημιουργία του PDF με WeasyPrint
-    # Το base_url είναι σημαντικό αν το HTML template σου έχει εξωτερικούς πόρους (π.χ. εικόνες, CSS αρχεία)
-    # που είναι προσβάσιμοι μέσω URL. Για απλό HTML/CSS μέσα στο template, μπορείς να το παραλείψεις.
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/')) # Αν χρειάζεται base_url
-    html = HTML(string=html_string)
-    
-    # Παράγουμε το PDF ως bytes
-    pdf_bytes = html.write_pdf()
-    
-    # Δημιουργούμε το HttpResponse
-    response = HttpResponse(pdf_bytes, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="receipt_{payment.receipt_number or payment.pk}.pdf"'
-    # Αντί για 'inline', μπορείς να χρησιμοποιήσεις 'attachment' για να γίνει απευθείας download:
-    # response['Content-Disposition'] = f'attachment; filename="receipt_{payment.receipt_number or payment.pk}.pdf"'
-    
-    return response
+    def render_pdf():
+        # Render το HTML template σε string και δημιουργία του PDF με WeasyPrint
+        html_string = render_to_string('core/payment_receipt_pdf.html', context)
+        return HTML(string=html_string).write_pdf()
+
+    return pdf_cache.pdf_response(request, payment, 'core/payment_receipt_pdf.html', render_pdf, f"receipt_{payment.receipt_number or payment.pk}.pdf", depends_on=[payment.customer])
 @login_required
 @require_GET # Αυτή η view θα δέχεται μόνο GET requests
 def get_customer_orders_ajax(request, customer_id):
@@ -1347,9 +1227,8 @@ def get_customer_orders_ajax(request, customer_id):
         return JsonResponse({'results': [], 'error': 'Server error'}, status=500)
 @login_required
 def all_payments_list_view(request):
-    payments_qs = Payment.objects.select_related(
-        'customer', 'order', 'recorded_by', 'cancelled_by'
-    ).all().order_by('-payment_date', '-receipt_number')
+    # Τα φίλτρα είναι κοινά με την εξαγωγή της λίστας (listings.LISTINGS)
+    payments_qs = listings.LISTINGS['payments'].queryset(request.GET)
 
     # Λήψη τιμών φίλτρων από το GET request
     query_text = request.GET.get('q', '').strip()
@@ -1363,54 +1242,6 @@ def all_payments_list_view(request):
     value_date_from_str = request.GET.get('value_date_from', None)
     value_date_to_str = request.GET.get('value_date_to', None)
 
-    # Εφαρμογή φίλτρων
-    if query_text:
-        payments_qs = payments_qs.filter(
-            Q(receipt_number__icontains=query_text) |
-            Q(reference_number__icontains=query_text) |
-            Q(notes__icontains=query_text) # Προσθήκη αναζήτησης και στις σημειώσεις
-        )
-
-    if customer_filter_id:
-        try:
-            payments_qs = payments_qs.filter(customer_id=int(customer_filter_id))
-        except ValueError:
-            customer_filter_id = None # Αγνοούμε μη έγκυρη τιμή
-
-    if status_filter != 'all':
-        payments_qs = payments_qs.filter(status=status_filter)
-
-    if method_filter != 'all':
-        payments_qs = payments_qs.filter(payment_method=method_filter)
-
-    # Φίλτρο Ημερομηνίας Πληρωμής
-    if date_from_str:
-        try:
-            date_from_obj = datetime.datetime.strptime(date_from_str, '%Y-%m-%d').date()
-            payments_qs = payments_qs.filter(payment_date__gte=date_from_obj)
-        except ValueError:
-            date_from_str = None 
-    if date_to_str:
-        try:
-            date_to_obj = datetime.datetime.strptime(date_to_str, '%Y-%m-%d').date()
-            payments_qs = payments_qs.filter(payment_date__lte=date_to_obj)
-        except ValueError:
-            date_to_str = None
-
-    # Φίλτρο Ημερομηνίας Λήξης/Value Date
-    if value_date_from_str:
-        try:
-            value_date_from_obj = datetime.datetime.strptime(value_date_from_str, '%Y-%m-%d').date()
-            payments_qs = payments_qs.filter(value_date__gte=value_date_from_obj)
-        except ValueError:
-            value_date_from_str = None
-    if value_date_to_str:
-        try:
-            value_date_to_obj = datetime.datetime.strptime(value_date_to_str, '%Y-%m-%d').date()
-            payments_qs = payments_qs.filter(value_date__lte=value_date_to_obj)
-        except ValueError:
-            value_date_to_str = None
-            
     # Υπολογισμός συνόλου ενεργών πληρωμών (μετά τα φίλτρα)
     # Αυτό το σύνολο αφορά μόνο τις πληρωμές που εμφανίζονται στην τρέχουσα φιλτραρισμένη λίστα, όχι όλες τις πληρωμές.
     # Αν θέλεις το σύνολο όλων των ενεργών πληρωμών ανεξαρτήτως φίλτρων σελιδοποίησης, υπολόγισέ το πριν τη σελιδοποίηση.
@@ -1460,467 +1291,88 @@ def view_order_pdf(request, pk):
     order = get_object_or_404(Order.objects.select_related('customer'), pk=pk)
     order_items = order.items.select_related('product').all()
 
-    # Λογική για τη σύνοψη ποσοτήτων ανά μονάδα μέτρησης
-    quantity_summary = defaultdict(float)
-    for item in order_items:
-        if item.product:
-            unit_display = item.product.get_unit_of_measurement_display()
-            quantity_summary[unit_display] += float(item.quantity)
-    
-    company_info_from_settings = getattr(settings, 'COMPANY_INFO', {})
-
-    context = {
-        'order': order,
-        'order_items': order_items,
-        'quantity_summary': dict(quantity_summary), # Μετατροπή σε κανονικό dict για το template
-        'company_info': company_info_from_settings,
-    }
-    
-    html_string = render_to_string('core/order_pdf.html', context)
-    
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-    pdf_bytes = html.write_pdf()
-    
-    response = HttpResponse(pdf_bytes, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="order_{order.order_number or order.pk}.pdf"'
-    
-    return response
-@login_required
-def export_customers_to_excel(request):
-    # --- Η λογική για την ανάκτηση και το φιλτράρισμα των πελατών παραμένει ακριβώς ίδια ---
-    query_from_request = request.GET.get('q', None)
-    customers_qs = Customer.objects.all().order_by('company_name', 'last_name')
-
-    if query_from_request:
-        query = query_from_request.strip()
-        if query:
-            normalized_user_query = normalize_text(query)
-            customers_qs = customers_qs.filter(
-                Q(first_name_normalized__icontains=normalized_user_query) |
-                Q(last_name_normalized__icontains=normalized_user_query) |
-                Q(company_name_normalized__icontains=normalized_user_query) |
-                Q(code__icontains=query) |
-                Q(email__icontains=query) |
-                Q(phone__icontains=query)
-            ).distinct()
-
-    # Προετοιμασία δεδομένων για το DataFrame
-    data_for_export = []
-    for customer in customers_qs:
-        data_for_export.append({
-            'Κωδικός': customer.code,
-            'Όνομα': customer.first_name,
-            'Επώνυμο': customer.last_name,
-            'Επωνυμία Εταιρείας': customer.company_name,
-            'Email': customer.email,
-            'Τηλέφωνο': customer.phone,
-            'Διεύθυνση': customer.address,
-            'Πόλη': customer.city,
-            'Τ.Κ.': customer.postal_code,
-            'Α.Φ.Μ.': customer.vat_number,
-            'Δ.Ο.Υ.': customer.doy,
-            'Υπόλοιπο (€)': customer.balance,
-        })
-    
-    # Αν δεν υπάρχουν δεδομένα, επέστρεψε ένα μήνυμα
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν πελάτες για εξαγωγή.")
-        return redirect(request.META.get('HTTP_REFERER', 'customer_list'))
-
-    # Δημιουργία Pandas DataFrame
-    df = pd.DataFrame(data_for_export)
-
-    # Δημιουργία ενός in-memory buffer για το αρχείο Excel
-    excel_buffer = io.BytesIO()
-
-    # --- Χρήση του ExcelWriter για να μπορέσουμε να αλλάξουμε το πλάτος των στηλών ---
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Πελάτες')
+    def render_pdf():
+        # Λογική για τη σύνοψη ποσοτήτων ανά μονάδα μέτρησης
+        quantity_summary = defaultdict(float)
+        for item in order_items:
+            if item.product:
+                unit_display = item.product.get_unit_of_measurement_display()
+                quantity_summary[unit_display] += float(item.quantity)
 
-        # Πρόσβαση στο worksheet του openpyxl
-        worksheet = writer.sheets['Πελάτες']
-        
-        # Εισαγωγή του get_column_letter εδώ για να μην χρειάζεται global import
-        from openpyxl.utils import get_column_letter
-
-        # Loop μέσα από τις στήλες του DataFrame για να ορίσουμε το πλάτος
-        for idx, col in enumerate(df):
-            series = df[col]
-            max_len = max((
-                series.astype(str).map(len).max(),
-                len(str(series.name))
-                )) + 2  # Προσθέτουμε ένα μικρό padding
-            
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
+        context = {
+            'order': order,
+            'order_items': order_items,
+            'quantity_summary': dict(quantity_summary), # Μετατροπή σε κανονικό dict για το template
+            'company_info': getattr(settings, 'COMPANY_INFO', {}),
+        }
+        html_string = render_to_string('core/order_pdf.html', context)
+        return HTML(string=html_string, base_url=request.build_absolute_uri('/')).write_pdf()
 
-    # --- Τέλος νέας λογικής ---
+    return pdf_cache.pdf_response(request, order, 'core/order_pdf.html', render_pdf, f"order_{order.order_number or order.pk}.pdf", depends_on=[order.customer])
+def _export_listing(request, name, list_url):
+    """
+    Η εξαγωγή μιας λίστας του listings.LISTINGS με τα ίδια φίλτρα (GET) και δικαιώματα με τη
+    σελίδα της. Μορφή με ?format=xlsx (προεπιλογή), csv ή parquet. Με ?async=1, ή αν οι γραμμές
+    ξεπερνούν το EXPORT_BACKGROUND_ROWS, γίνεται στο παρασκήνιο (βλ. report_jobs).
+    """
+    listing = listings.LISTINGS[name]
+    export_format = request.GET.get('format') or 'xlsx'
+    if export_format not in exports.FORMATS:
+        raise Http404(f"Άγνωστη μορφή εξαγωγής: {export_format}.")
+    if export_format == 'parquet' and not exports.PYARROW_AVAILABLE:
+        raise Http404("Η βιβλιοθήκη pyarrow λείπει. Η εξαγωγή σε Parquet δεν είναι δυνατή.")
+
+    queryset = listing.queryset(request.GET, request.user)
+    if getattr(request, 'report_job', None):
+        # Στον worker: το αρχείο γράφεται ακόμη κι αν δεν υπάρχουν γραμμές
+        return listing.export(queryset, export_format)
+
+    background = request.GET.get(report_jobs.ASYNC_PARAM) == '1'
+    if not background:
+        limit = settings.EXPORT_BACKGROUND_ROWS
+        rows = queryset.order_by()[:limit + 1].count()
+        if not rows:
+            messages.warning(request, listing.empty_message)
+            return redirect(request.META.get('HTTP_REFERER', list_url))
+        background = rows > limit
+    if background:
+        params = request.GET.copy()
+        params.pop('page', None)
+        job = report_jobs.enqueue(
+            request.resolver_match.url_name, params, request.user, scope=listings.scope(name, request.user),
+            fresh_for=datetime.timedelta(seconds=settings.EXPORT_JOB_FRESHNESS_SECONDS),
+        )
+        return redirect('report_job_detail', pk=job.pk)
+    return listing.export(queryset, export_format)
 
-    # Επιστροφή του buffer ως HTTP response για download
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="customers_export.xlsx"'
 
-    return response
 @login_required
+@reporting_database
+def export_customers_to_excel(request):
+    return _export_listing(request, 'customers', 'customer_list')
+@login_required
+@reporting_database
 def export_products_to_excel(request):
-    # --- Η λογική για την ανάκτηση και το φιλτράρισμα των προϊόντων παραμένει ακριβώς ίδια ---
-    query_from_request = request.GET.get('q', None)
-    products_qs = Product.objects.all().order_by('name')
-    if query_from_request:
-        query = query_from_request.strip()
-        if query:
-            normalized_user_query = normalize_text(query)
-            products_qs = products_qs.filter(
-                Q(name_normalized__icontains=normalized_user_query) |
-                Q(code__icontains=query) |
-                Q(barcode__icontains=query) |
-                Q(description__icontains=query)
-            ).distinct()
-
-    data_for_export = []
-    for product in products_qs:
-        data_for_export.append({
-            'Κωδικός': product.code,
-            'Barcode': product.barcode,
-            'Όνομα Προϊόντος': product.name,
-            'Περιγραφή': product.description,
-            'Κατάσταση': 'Ενεργό' if product.is_active else 'Ανενεργό',
-            'Ποσότητα Αποθέματος': product.stock_quantity,
-            'Ελάχιστο Όριο Αποθέματος': product.min_stock_level,
-            'Μονάδα Μέτρησης': product.get_unit_of_measurement_display(),
-            'Τιμή Πώλησης (€)': product.price,
-            'Τιμή Κόστους (€)': product.cost_price,
-        })
-
-    # --- Από εδώ και κάτω είναι η νέα, βελτιωμένη λογική ---
-    
-    # Αν δεν υπάρχουν δεδομένα, επέστρεψε ένα κενό αρχείο ή ένα μήνυμα
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν προϊόντα για εξαγωγή.")
-        # Επιστρέφουμε στην προηγούμενη σελίδα με βάση το HTTP_REFERER
-        # ή σε μια default σελίδα αν το referer δεν είναι διαθέσιμο
-        return redirect(request.META.get('HTTP_REFERER', 'product_list'))
-
-    df = pd.DataFrame(data_for_export)
-    
-    excel_buffer = io.BytesIO()
-
-    # --- Χρήση του ExcelWriter για να μπορέσουμε να αλλάξουμε το πλάτος των στηλών ---
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Προϊόντα')
-
-        # Πρόσβαση στο worksheet του openpyxl
-        worksheet = writer.sheets['Προϊόντα']
-        
-        # Loop μέσα από τις στήλες του DataFrame για να ορίσουμε το πλάτος
-        for idx, col in enumerate(df):  # df.columns για να πάρουμε τα ονόματα των στηλών
-            series = df[col]
-            max_len = max((
-                series.astype(str).map(len).max(),  # Μέγιστο μήκος δεδομένων στη στήλη
-                len(str(series.name))  # Μήκος του τίτλου της στήλης
-                )) + 2  # Προσθέτουμε ένα μικρό padding
-            
-            # Το idx + 1 αντιστοιχεί στον αριθμό της στήλης στο Excel (που ξεκινάει από 1)
-            # Μετατρέπουμε τον αριθμό σε γράμμα στήλης (π.χ. 1->A, 2->B)
-            # και ορίζουμε το πλάτος.
-            from openpyxl.utils import get_column_letter
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-
-    # --- Τέλος νέας λογικής ---
-
-    # Επιστροφή του buffer ως HTTP response για download
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="products_export.xlsx"'
-
-    return response
+    return _export_listing(request, 'products', 'product_list')
 @login_required
+@reporting_database
 def export_orders_to_excel(request):
-    # Παίρνουμε το ίδιο queryset και τους ίδιους κανόνες φιλτραρίσματος από τη view order_list
-    orders_qs = Order.objects.select_related('customer').all().order_by('-order_date', '-pk')
-
-    # Λήψη τιμών φίλτρων από το GET request
-    status_filter = request.GET.get('status', 'all')
-    query_text = request.GET.get('q', '').strip()
-    customer_filter_id = request.GET.get('customer_filter', None)
-    date_from_str = request.GET.get('date_from', None)
-    date_to_str = request.GET.get('date_to', None)
-
-    # Εφαρμογή φίλτρων (ακριβώς όπως στη view order_list)
-    if status_filter != 'all':
-        orders_qs = orders_qs.filter(status=status_filter)
-    if customer_filter_id:
-        try:
-            orders_qs = orders_qs.filter(customer_id=int(customer_filter_id))
-        except (ValueError, TypeError):
-            pass
-    if date_from_str:
-        try:
-            date_from_obj = datetime.datetime.strptime(date_from_str, '%Y-%m-%d').date()
-            orders_qs = orders_qs.filter(order_date__gte=date_from_obj)
-        except ValueError:
-            pass
-    if date_to_str:
-        try:
-            date_to_obj = datetime.datetime.strptime(date_to_str, '%Y-%m-%d').date()
-            orders_qs = orders_qs.filter(order_date__lte=date_to_obj)
-        except ValueError:
-            pass
-    if query_text:
-        normalized_query = normalize_text(query_text)
-        orders_qs = orders_qs.filter(
-            Q(order_number__icontains=query_text) |
-            Q(customer__first_name_normalized__icontains=normalized_query) |
-            Q(customer__last_name_normalized__icontains=normalized_query) |
-            Q(customer__company_name_normalized__icontains=normalized_query) |
-            Q(customer__code__icontains=query_text)
-        ).distinct()
-    
-    # Προετοιμασία δεδομένων για το DataFrame
-    data_for_export = []
-    for order in orders_qs:
-        data_for_export.append({
-            'Αρ. Παραγγελίας': order.order_number,
-            'Ημερομηνία Παραγγελίας': order.order_date,
-            'Πελάτης': str(order.customer) if order.customer else '[Διαγραμμένος Πελάτης]',
-            'Κατάσταση': order.get_status_display(),
-            'Συνολικό Ποσό (€)': order.total_amount,
-            'Ημερομηνία Παράδοσης': order.delivery_date,
-            'Σχόλια': order.comments,
-        })
-
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν παραγγελίες για εξαγωγή με βάση τα επιλεγμένα κριτήρια.")
-        return redirect(request.META.get('HTTP_REFERER', 'order_list'))
-
-    df = pd.DataFrame(data_for_export)
-
-    excel_buffer = io.BytesIO()
-
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Παραγγελίες')
-        worksheet = writer.sheets['Παραγγελίες']
-        
-        from openpyxl.utils import get_column_letter
-        for idx, col in enumerate(df):
-            series = df[col]
-            # Για τις ημερομηνίες, το str(cell.value) μπορεί να είναι μακρύ, οπότε ορίζουμε ένα σταθερό πλάτος.
-            if 'Ημερομηνία' in str(series.name):
-                max_len = 15
-            else:
-                 max_len = max((
-                    series.astype(str).map(len).max(),
-                    len(str(series.name))
-                    )) + 2
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="orders_export.xlsx"'
-
-    return response
+    return _export_listing(request, 'orders', 'order_list')
 @login_required
+@reporting_database
 def export_payments_to_excel(request):
-    # Παίρνουμε το ίδιο queryset και τους ίδιους κανόνες φιλτραρίσματος από τη view all_payments_list_view
-    payments_qs = Payment.objects.select_related(
-        'customer', 'order', 'recorded_by', 'cancelled_by'
-    ).all().order_by('-payment_date', '-receipt_number')
-
-    # Λήψη τιμών φίλτρων από το GET request
-    query_text = request.GET.get('q', '').strip()
-    customer_filter_id = request.GET.get('customer_filter', None)
-    status_filter = request.GET.get('status_filter', 'all')
-    method_filter = request.GET.get('method_filter', 'all')
-    date_from_str = request.GET.get('date_from', None)
-    date_to_str = request.GET.get('date_to', None)
-    value_date_from_str = request.GET.get('value_date_from', None)
-    value_date_to_str = request.GET.get('value_date_to', None)
-
-    # Εφαρμογή φίλτρων
-    if query_text:
-        payments_qs = payments_qs.filter(
-            Q(receipt_number__icontains=query_text) |
-            Q(reference_number__icontains=query_text) |
-            Q(notes__icontains=query_text)
-        )
-    if customer_filter_id:
-        try:
-            payments_qs = payments_qs.filter(customer_id=int(customer_filter_id))
-        except (ValueError, TypeError): pass
-    if status_filter != 'all':
-        payments_qs = payments_qs.filter(status=status_filter)
-    if method_filter != 'all':
-        payments_qs = payments_qs.filter(payment_method=method_filter)
-    if date_from_str:
-        try:
-            payments_qs = payments_qs.filter(payment_date__gte=datetime.datetime.strptime(date_from_str, '%Y-%m-%d').date())
-        except ValueError: pass
-    if date_to_str:
-        try:
-            payments_qs = payments_qs.filter(payment_date__lte=datetime.datetime.strptime(date_to_str, '%Y-%m-%d').date())
-        except ValueError: pass
-    if value_date_from_str:
-        try:
-            payments_qs = payments_qs.filter(value_date__gte=datetime.datetime.strptime(value_date_from_str, '%Y-%m-%d').date())
-        except ValueError: pass
-    if value_date_to_str:
-        try:
-            payments_qs = payments_qs.filter(value_date__lte=datetime.datetime.strptime(value_date_to_str, '%Y-%m-%d').date())
-        except ValueError: pass
-
-    # Προετοιμασία δεδομένων για το DataFrame
-    data_for_export = []
-    for payment in payments_qs:
-        data_for_export.append({
-            'Αρ. Απόδειξης Συστήματος': payment.receipt_number,
-            'Ημερομηνία Πληρωμής': payment.payment_date,
-            'Πελάτης': str(payment.customer) if payment.customer else '',
-            'Ποσό (€)': payment.amount_paid,
-            'Τρόπος Πληρωμής': payment.get_payment_method_display(),
-            'Κατάσταση': payment.get_status_display(),
-            'Εξωτερικός Αρ. Αναφοράς': payment.reference_number,
-            'Ημερομηνία Λήξης/Value': payment.value_date,
-            'Σχετ. Παραγγελία': payment.order.order_number if payment.order else '',
-            'Σημειώσεις': payment.notes,
-            'Λόγος Ακύρωσης': payment.cancellation_reason,
-            'Καταχωρήθηκε από': payment.recorded_by.username if payment.recorded_by else '',
-            'Ακυρώθηκε από': payment.cancelled_by.username if payment.cancelled_by else '',
-            'Ημερομηνία Ακύρωσης': payment.cancelled_at.strftime('%Y-%m-%d %H:%M:%S') if payment.cancelled_at else '',
-        })
-
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν πληρωμές για εξαγωγή με βάση τα επιλεγμένα κριτήρια.")
-        return redirect(request.META.get('HTTP_REFERER', 'all_payments_list'))
-
-    df = pd.DataFrame(data_for_export)
-
-    excel_buffer = io.BytesIO()
-
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Πληρωμές')
-        worksheet = writer.sheets['Πληρωμές']
-        from openpyxl.utils import get_column_letter
-        for idx, col in enumerate(df):
-            series = df[col]
-            # Για τις ημερομηνίες, το str(cell.value) μπορεί να είναι μακρύ, οπότε ορίζουμε ένα σταθερό πλάτος.
-            if 'Ημερομηνία' in str(series.name):
-                max_len = 15
-            else:
-                max_len = max((
-                    series.astype(str).map(len).max(),
-                    len(str(series.name))
-                    )) + 2
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="payments_export.xlsx"'
-
-    return response
+    return _export_listing(request, 'payments', 'all_payments_list')
 @login_required
+@reporting_database
 def export_stock_receipts_to_excel(request):
-    # Παίρνουμε το ίδιο queryset και τους ίδιους κανόνες φιλτραρίσματος από τη view stock_receipt_list
-    receipts_qs = StockReceipt.objects.select_related('product', 'user_who_recorded').all().order_by('-date_received')
-
-    query = request.GET.get('q', '').strip()
-    product_filter_id = request.GET.get('product_filter', None)
-    date_from_str = request.GET.get('date_from', None)
-    date_to_str = request.GET.get('date_to', None)
-
-    # Εφαρμογή φίλτρων
-    if product_filter_id:
-        try:
-            receipts_qs = receipts_qs.filter(product_id=int(product_filter_id))
-        except (ValueError, TypeError): pass
-    if date_from_str:
-        try:
-            receipts_qs = receipts_qs.filter(date_received__date__gte=datetime.datetime.strptime(date_from_str, '%Y-%m-%d').date())
-        except ValueError: pass
-    if date_to_str:
-        try:
-            receipts_qs = receipts_qs.filter(date_received__date__lte=datetime.datetime.strptime(date_to_str, '%Y-%m-%d').date())
-        except ValueError: pass
-    if query:
-        normalized_query = normalize_text(query)
-        receipts_qs = receipts_qs.filter(
-            Q(product__name_normalized__icontains=normalized_query) |
-            Q(notes__icontains=query) |
-            Q(user_who_recorded__username__icontains=query)
-        ).distinct()
-
-    # Προετοιμασία δεδομένων για το DataFrame
-    data_for_export = []
-    for receipt in receipts_qs:
-        data_for_export.append({
-            'Προϊόν': receipt.product.name if receipt.product else '',
-            'Κωδικός Προϊόντος': receipt.product.code if receipt.product else '',
-            'Ποσότητα Εισαγωγής': receipt.quantity_added,
-            'Μονάδα Μέτρησης': receipt.product.get_unit_of_measurement_display() if receipt.product else '',
-            'Ημερομηνία & Ώρα Παραλαβής': receipt.date_received.strftime('%Y-%m-%d %H:%M:%S') if receipt.date_received else '',
-            'Χρήστης Καταχώρησης': receipt.user_who_recorded.username if receipt.user_who_recorded else '',
-            'Σημειώσεις': receipt.notes,
-        })
-
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν παραλαβές για εξαγωγή με βάση τα επιλεγμένα κριτήρια.")
-        return redirect(request.META.get('HTTP_REFERER', 'stock_receipt_list'))
-
-    df = pd.DataFrame(data_for_export)
-    excel_buffer = io.BytesIO()
-
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Παραλαβές Αποθέματος')
-        worksheet = writer.sheets['Παραλαβές Αποθέματος']
-        from openpyxl.utils import get_column_letter
-        for idx, col in enumerate(df):
-            series = df[col]
-            if 'Ημερομηνία' in str(series.name):
-                max_len = 20
-            else:
-                max_len = max((series.astype(str).map(len).max(), len(str(series.name)))) + 2
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="stock_receipts_export.xlsx"'
-    return response
+    return _export_listing(request, 'stock_receipts', 'stock_receipt_list')
 @login_required
 def stock_overview_list(request):
-    products_qs = Product.objects.all().order_by('name')
-
-    # Φιλτράρισμα
+    # Τα φίλτρα είναι κοινά με την εξαγωγή της λίστας (listings.LISTINGS)
+    products_qs = listings.LISTINGS['stock_overview'].queryset(request.GET)
     status_filter = request.GET.get('status_filter', 'all')
     query_text = request.GET.get('q', '').strip()
 
-    if query_text:
-        normalized_query = normalize_text(query_text)
-        products_qs = products_qs.filter(
-            Q(name_normalized__icontains=normalized_query) |
-            Q(code__icontains=query_text) |
-            Q(barcode__icontains=query_text)
-        ).distinct()
-    
-    if status_filter == 'low':
-        # Προϊόντα όπου το απόθεμα είναι μικρότερο ή ίσο του ορίου ασφαλείας
-        products_qs = products_qs.filter(stock_quantity__lte=models.F('min_stock_level'))
-    elif status_filter == 'out_of_stock':
-        # Προϊόντα όπου το απόθεμα είναι μηδέν ή λιγότερο
-        products_qs = products_qs.filter(stock_quantity__lte=0)
-    elif status_filter == 'sufficient':
-        # Προϊόντα όπου το απόθεμα είναι πάνω από το όριο ασφαλείας
-        products_qs = products_qs.filter(stock_quantity__gt=models.F('min_stock_level'))
-    
-    
     # Σελιδοποίηση
     paginator = Paginator(products_qs, 30) # Π.χ. 30 προϊόντα ανά σελίδα
     page_number = request.GET.get('page')
@@ -1939,74 +1391,9 @@ def stock_overview_list(request):
     }
     return render(request, 'core/stock_overview_list.html', context)
 @login_required
+@reporting_database
 def export_stock_overview_excel(request):
-    # Παίρνουμε το ίδιο queryset και τους ίδιους κανόνες φιλτραρίσματος από τη view stock_overview_list
-    products_qs = Product.objects.all().order_by('name')
-
-    status_filter = request.GET.get('status_filter', 'all')
-    query_text = request.GET.get('q', '').strip()
-
-    if query_text:
-        normalized_user_query = normalize_text(query_text)
-        products_qs = products_qs.filter(
-            Q(name_normalized__icontains=normalized_user_query) |
-            Q(code__icontains=query_text) |
-            Q(barcode__icontains=query_text)
-        ).distinct()
-    
-    if status_filter == 'low':
-        products_qs = products_qs.filter(stock_quantity__lte=models.F('min_stock_level'))
-    elif status_filter == 'out_of_stock':
-        products_qs = products_qs.filter(stock_quantity__lte=0)
-    elif status_filter == 'sufficient':
-        products_qs = products_qs.filter(stock_quantity__gt=models.F('min_stock_level'))
-    
-    # Προετοιμασία δεδομένων για το DataFrame
-    data_for_export = []
-    for product in products_qs:
-        # Υπολογισμός της κατάστασης αποθέματος
-        stock_status = 'Επαρκές'
-        if product.stock_quantity <= 0:
-            stock_status = 'Εκτός Αποθέματος'
-        elif product.stock_quantity <= product.min_stock_level:
-            stock_status = 'Χαμηλό Απόθεμα'
-
-        data_for_export.append({
-            'Όνομα Προϊόντος': product.name,
-            'Κωδικός': product.code,
-            'Τρέχον Απόθεμα': product.stock_quantity,
-            'Ελάχιστο Όριο': product.min_stock_level,
-            'Μονάδα Μέτρησης': product.get_unit_of_measurement_display(),
-            'Κατάσταση Αποθέματος': stock_status,
-        })
-    
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν προϊόντα για εξαγωγή με βάση τα επιλεγμένα κριτήρια.")
-        return redirect(request.META.get('HTTP_REFERER', 'stock_overview_list'))
-
-    df = pd.DataFrame(data_for_export)
-
-    excel_buffer = io.BytesIO()
-
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Επισκόπηση Αποθεμάτων')
-        worksheet = writer.sheets['Επισκόπηση Αποθεμάτων']
-        from openpyxl.utils import get_column_letter
-        for idx, col in enumerate(df):
-            series = df[col]
-            max_len = max((
-                series.astype(str).map(len).max(),
-                len(str(series.name))
-                )) + 2
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-    
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="stock_overview_export.xlsx"'
-
-    return response
+    return _export_listing(request, 'stock_overview', 'stock_overview_list')
 @login_required
 @require_POST
 def order_create_invoice_view(request, order_pk):
@@ -2090,58 +1477,14 @@ def order_create_invoice_view(request, order_pk):
         messages.error(request, f"Προέκυψε ένα μη αναμενόμενο σφάλμα: {e}")
         return redirect('order_detail', pk=order.pk)
 def invoice_list_view(request):
-    user = request.user
-    
-    # Ξεκινάμε με το βασικό queryset
-    invoices_qs = Invoice.objects.select_related('customer', 'order')
+    # Τα φίλτρα και τα δικαιώματα είναι κοινά με την εξαγωγή της λίστας (listings.LISTINGS)
+    invoices_qs = listings.LISTINGS['invoices'].queryset(request.GET, request.user)
 
-    # Εφαρμόζουμε τους κανόνες δικαιωμάτων
-    if not user.is_superuser:
-        if user.groups.filter(name='Πωλητές').exists():
-            try:
-                invoices_qs = invoices_qs.filter(customer__sales_rep=user.salesrepresentative)
-            except SalesRepresentative.DoesNotExist:
-                invoices_qs = Invoice.objects.none()
-        # Οι ομάδες 'Λογιστήριο' και 'Αποθήκη' μπορούν να βλέπουν όλα τα τιμολόγια.
-
-    # Η υπόλοιπη λογική των φίλτρων παραμένει ίδια
     query_text = request.GET.get('q', '').strip()
     customer_filter_id = request.GET.get('customer_filter', None)
     status_filter = request.GET.get('status_filter', 'all')
     date_from_str = request.GET.get('date_from', None)
     date_to_str = request.GET.get('date_to', None)
-    due_filter = request.GET.get('due', None)
-
-    if query_text:
-        invoices_qs = invoices_qs.filter(invoice_number__icontains=query_text)
-    if customer_filter_id:
-        invoices_qs = invoices_qs.filter(customer_id=customer_filter_id)
-    if status_filter != 'all':
-        invoices_qs = invoices_qs.filter(status=status_filter)
-    if date_from_str:
-        try:
-            invoices_qs = invoices_qs.filter(issue_date__gte=date_from_str)
-        except: pass
-    if date_to_str:
-        try:
-            invoices_qs = invoices_qs.filter(issue_date__lte=date_to_str)
-        except: pass
-            
-    today = timezone.now().date()
-    if due_filter == 'soon':
-        due_date_threshold = today + timedelta(days=7)
-        invoices_qs = invoices_qs.filter(
-            status=Invoice.STATUS_ISSUED,
-            due_date__gte=today,
-            due_date__lte=due_date_threshold
-        ).order_by('due_date')
-    elif due_filter == 'overdue':
-        invoices_qs = invoices_qs.filter(
-            status=Invoice.STATUS_ISSUED,
-            due_date__lt=today
-        ).order_by('due_date')
-    else:
-        invoices_qs = invoices_qs.order_by('-issue_date', '-pk')
 
     paginator = Paginator(invoices_qs, 20)
     page_number = request.GET.get('page')
@@ -2231,7 +1574,7 @@ def invoice_cancel_view(request, pk):
         with transaction.atomic():
             # 1. Ακύρωση του Τιμολογίου
             invoice.status = Invoice.STATUS_CANCELLED
-            invoice.save(update_fields=['status'])
+            invoice.save(update_fields=['status', 'updated_at'])
 
             # 2. Αντιλογισμός του ποσού από το υπόλοιπο του πελάτη
             invoice.customer.balance -= invoice.total_amount
@@ -2266,44 +1609,9 @@ def invoice_cancel_view(request, pk):
 
     return redirect('invoice_detail', pk=invoice.pk)
 @login_required
+@reporting_database
 def export_invoices_to_excel(request):
-    # Εδώ θα μπορούσαμε να εφαρμόσουμε τα ίδια φίλτρα που έχει η λίστας μας
-    invoices_qs = Invoice.objects.select_related('customer', 'order').all()
-
-    data_for_export = []
-    for invoice in invoices_qs:
-        data_for_export.append({
-            'Αρ. Τιμολογίου': invoice.invoice_number,
-            'Ημερομηνία Έκδοσης': invoice.issue_date,
-            'Πελάτης': str(invoice.customer),
-            'Κατάσταση': invoice.get_status_display(),
-            'Υποσύνολο (€)': invoice.subtotal,
-            'ΦΠΑ (€)': invoice.vat_amount,
-            'Τελικό Σύνολο (€)': invoice.total_amount,
-            'Σχετ. Παραγγελία': invoice.order.order_number if invoice.order else '',
-        })
-
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν τιμολόγια για εξαγωγή.")
-        return redirect('invoice_list')
-
-    df = pd.DataFrame(data_for_export)
-    excel_buffer = io.BytesIO()
-
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Τιμολόγια')
-        worksheet = writer.sheets['Τιμολόγια']
-        for idx, col in enumerate(df):
-            series = df[col]
-            max_len = max((series.astype(str).map(len).max(), len(str(series.name)))) + 2
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="invoices_export.xlsx"'
-    return response
+    return _export_listing(request, 'invoices', 'invoice_list')
 @login_required
 def invoice_pdf_view(request, pk):
     if not WEASYPRINT_AVAILABLE:
@@ -2323,11 +1631,11 @@ def invoice_pdf_view(request, pk):
         'company_info': company_info,
     }
 
-    html_string = render_to_string('core/invoice_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-    response = HttpResponse(html.write_pdf(), content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="invoice_{invoice.invoice_number}.pdf"'
-    return response
+    def render_pdf():
+        html_string = render_to_string('core/invoice_pdf.html', context)
+        return HTML(string=html_string, base_url=request.build_absolute_uri('/')).write_pdf()
+
+    return pdf_cache.pdf_response(request, invoice, 'core/invoice_pdf.html', render_pdf, f"invoice_{invoice.invoice_number}.pdf", depends_on=[invoice.customer])
 @staff_member_required # Μόνο οι διαχειριστές μπορούν να δουν τη λίστα
 def sales_rep_list_view(request):
     sales_reps = SalesRepresentative.objects.select_related('user').all()
@@ -2467,6 +1775,7 @@ def create_credit_note_from_invoice(request, invoice_pk):
                     total_subtotal = Decimal('0.00')
                     total_vat = Decimal('0.00')
                     items_returned = False
+                    returned_stock = []
 
                     for item_form in formset:
                         cleaned_data = item_form.cleaned_data
@@ -2492,11 +1801,8 @@ def create_credit_note_from_invoice(request, invoice_pk):
                                 vat_amount=line_vat       # <--- Προσθήκη
                             )
                             
-                            # Το stock θα επιστραφεί από το signal του Product που έχεις ήδη (αν το έχεις ορίσει)
-                            # ή θα έπρεπε να προστεθεί εδώ η λογική:
-                            if cn_item.product:
-                                cn_item.product.stock_quantity += cn_item.quantity
-                                cn_item.product.save(update_fields=['stock_quantity'])
+                            if cn_item.product_id:
+                                returned_stock.append((cn_item.product_id, cn_item.quantity))
                             
                             total_subtotal += line_total
                             total_vat += line_vat
@@ -2506,6 +1812,11 @@ def create_credit_note_from_invoice(request, invoice_pk):
                         # Χρησιμοποιούμε transaction.set_rollback(True) για να ακυρώσουμε τη συναλλαγή
                         transaction.set_rollback(True)
                     else:
+                        # Οι επιστροφές γυρίζουν στο απόθεμα όλες μαζί (ένα UPDATE)
+                        StockMovement.record_document(
+                            returned_stock, StockMovement.MovementType.CREDIT_RETURN,
+                            document=credit_note, document_number=credit_note.credit_note_number
+                        )
                         credit_note.subtotal = total_subtotal
                         credit_note.vat_amount = total_vat
                         credit_note.total_amount = total_subtotal + total_vat
@@ -2517,7 +1828,7 @@ def create_credit_note_from_invoice(request, invoice_pk):
                         customer_to_update.save(update_fields=['balance'])
                         
                         original_invoice.status = Invoice.STATUS_CREDITED
-                        original_invoice.save(update_fields=['status'])
+                        original_invoice.save(update_fields=['status', 'updated_at'])
 
                         messages.success(request, f"Το πιστωτικό τιμολόγιο {credit_note.credit_note_number} δημιουργήθηκε επιτυχώς.")
                         return redirect('credit_note_detail', pk=credit_note.pk)
@@ -2581,26 +1892,17 @@ def credit_note_pdf_view(request, pk):
         'company_info': company_info,
     }
 
-    html_string = render_to_string('core/credit_note_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
+    def render_pdf():
+        html_string = render_to_string('core/credit_note_pdf.html', context)
+        return HTML(string=html_string, base_url=request.build_absolute_uri('/')).write_pdf()
 
-    response = HttpResponse(html.write_pdf(), content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="credit_note_{credit_note.credit_note_number}.pdf"'
-    return response
+    return pdf_cache.pdf_response(request, credit_note, 'core/credit_note_pdf.html', render_pdf, f"credit_note_{credit_note.credit_note_number}.pdf", depends_on=[credit_note.customer])
 @login_required
 def credit_note_list_view(request):
-    user = request.user
-    credit_notes_qs = CreditNote.objects.select_related('customer', 'original_invoice').all()
+    # Τα φίλτρα και τα δικαιώματα είναι κοινά με την εξαγωγή της λίστας (listings.LISTINGS)
+    credit_notes_qs = listings.LISTINGS['credit_notes'].queryset(request.GET, request.user)
 
-    # Εφαρμόζουμε τα δικαιώματα πρόσβασης
-    if not user.is_superuser:
-        if user.groups.filter(name='Πωλητές').exists():
-            try:
-                credit_notes_qs = credit_notes_qs.filter(customer__sales_rep=user.salesrepresentative)
-            except SalesRepresentative.DoesNotExist:
-                credit_notes_qs = CreditNote.objects.none()
-
-    paginator = Paginator(credit_notes_qs.order_by('-issue_date', '-pk'), 20)
+    paginator = Paginator(credit_notes_qs, 20)
     page_number = request.GET.get('page')
     credit_notes_page = paginator.get_page(page_number)
 
@@ -2652,6 +1954,7 @@ def retail_pos_view(request):
                     total_subtotal = Decimal('0.00')
                     total_vat = Decimal('0.00')
                     items_added = False
+                    stock_lines = []
 
                     for item_form in formset:
                         if item_form.cleaned_data and item_form.cleaned_data.get('product'):
@@ -2660,9 +1963,6 @@ def retail_pos_view(request):
                             quantity = item_form.cleaned_data['quantity']
                             discount = item_form.cleaned_data.get('discount_percentage', 0)
 
-                            if quantity > product.stock_quantity:
-                                messages.error(request, f"Το απόθεμα για το προϊόν '{product.name}' δεν επαρκεί (Διαθέσιμο: {product.stock_quantity}).")
-                                raise Exception("Insufficient stock")
 
                             base_price = product.price # Αυτή είναι η καθαρή τιμή
                             price_after_discount = base_price * (Decimal('1') - (discount / Decimal('100')))
@@ -2678,8 +1978,7 @@ def retail_pos_view(request):
                                 final_price=line_final_price, subtotal=line_subtotal, vat_amount=line_vat
                             )
 
-                            product.stock_quantity -= quantity
-                            product.save(update_fields=['stock_quantity'])
+                            stock_lines.append((product, -quantity))
 
                             total_subtotal += line_subtotal
                             total_vat += line_vat
@@ -2688,6 +1987,21 @@ def retail_pos_view(request):
                          messages.error(request, "Πρέπει να προσθέσετε τουλάχιστον ένα προϊόν.")
                          raise Exception("No items added")
 
+                    # Όλες οι γραμμές αφαιρούνται από το απόθεμα με ένα UPDATE. Ο έλεγχος γίνεται
+                    # πάνω στα κλειδωμένα υπόλοιπα: η λιανική δεν μπορεί να πάρει ποσότητα
+                    # δεσμευμένη από παραγγελίες (διαθέσιμο = απόθεμα − δεσμευμένα).
+                    new_stock = StockMovement.record_document(
+                        stock_lines, StockMovement.MovementType.RETAIL_SALE,
+                        document=receipt, document_number=receipt.receipt_number
+                    )
+                    short_available = dict(
+                        Product.objects.filter(pk__in=new_stock, available_quantity__lt=0).values_list('pk', 'available_quantity')
+                    )
+                    for product, quantity in stock_lines:
+                        if product.pk in short_available:
+                            messages.error(request, f"Το απόθεμα για το προϊόν '{product.name}' δεν επαρκεί (Διαθέσιμο: {short_available[product.pk] - quantity}).")
+                            raise Exception("Insufficient stock")
+
                     receipt.subtotal = total_subtotal
                     receipt.vat_amount = total_vat
                     receipt.total_amount = total_subtotal + total_vat
@@ -2722,7 +2036,7 @@ def retail_pos_view(request):
     return render(request, 'core/retail_pos_form.html', context)
 @staff_member_required
 def retail_receipt_list_view(request):
-    receipts_qs = RetailReceipt.objects.select_related('customer').order_by('-issue_date', '-pk')
+    receipts_qs = listings.LISTINGS['retail_receipts'].queryset(request.GET)
     
     paginator = Paginator(receipts_qs, 25) # 25 αποδείξεις ανά σελίδα
     page_number = request.GET.get('page')
@@ -2747,13 +2061,11 @@ def retail_receipt_delete_view(request, pk):
     try:
         with transaction.atomic():
             # Κρίσιμο βήμα: Επαναφορά του αποθέματος για κάθε είδος της απόδειξης
-            for item in receipt.items.all():
-                if item.product:
-                    # Χρησιμοποιούμε select_for_update για να "κλειδώσουμε" το προϊόν
-                    # και να αποφύγουμε race conditions.
-                    product_to_update = Product.objects.select_for_update().get(pk=item.product.pk)
-                    product_to_update.stock_quantity += item.quantity
-                    product_to_update.save(update_fields=['stock_quantity'])
+            StockMovement.record_document(
+                receipt.items.filter(product__isnull=False).values_list('product_id', 'quantity'),
+                StockMovement.MovementType.RETAIL_REVERSAL,
+                document=receipt, document_number=receipt.receipt_number
+            )
 
             # Διαγραφή της απόδειξης
             receipt.delete()
@@ -2788,112 +2100,19 @@ def retail_receipt_pdf_view(request, pk):
         'receipt': receipt,
         'company_info': company_info,
     }
-    html_string = render_to_string('core/retail_receipt_pdf.html', context)
-    html = HTML(string=html_string)
-    
-    response = HttpResponse(html.write_pdf(), content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="receipt_{receipt.receipt_number}.pdf"'
-    return response
+    def render_pdf():
+        html_string = render_to_string('core/retail_receipt_pdf.html', context)
+        return HTML(string=html_string).write_pdf()
+
+    return pdf_cache.pdf_response(request, receipt, 'core/retail_receipt_pdf.html', render_pdf, f"receipt_{receipt.receipt_number}.pdf", depends_on=[receipt.customer])
 @login_required
+@reporting_database
 def export_retail_receipts_to_excel(request):
-    """
-    Εξάγει μια λίστα με τις αποδείξεις λιανικής σε αρχείο Excel.
-    """
-    receipts_qs = RetailReceipt.objects.select_related('customer').all().order_by('-issue_date')
-
-    data_for_export = []
-    for receipt in receipts_qs:
-        data_for_export.append({
-            'Αρ. Απόδειξης': receipt.receipt_number,
-            'Ημερομηνία & Ώρα': receipt.issue_date.strftime('%Y-%m-%d %H:%M:%S'),
-            'Πελάτης': str(receipt.customer),
-            'Καθαρή Αξία (€)': receipt.subtotal,
-            'Ποσό ΦΠΑ (€)': receipt.vat_amount,
-            'Τελικό Ποσό (€)': receipt.total_amount,
-            'Κατάσταση': receipt.get_status_display(),
-        })
-    
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν αποδείξεις λιανικής για εξαγωγή.")
-        return redirect(request.META.get('HTTP_REFERER', 'retail_receipt_list'))
-
-    df = pd.DataFrame(data_for_export)
-    excel_buffer = io.BytesIO()
-
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Αποδείξεις Λιανικής')
-        worksheet = writer.sheets['Αποδείξεις Λιανικής']
-        
-        for idx, col in enumerate(df.columns):
-            series = df[col]
-            # --- ΕΔΩ ΕΙΝΑΙ Η ΔΙΟΡΘΩΣΗ ---
-            # Διορθώθηκε η συντακτική δομή του υπολογισμού max_len
-            max_len = max(
-                series.astype(str).map(len).max(),
-                len(str(series.name))
-            ) + 2
-            # --- ΤΕΛΟΣ ΔΙΟΡΘΩΣΗΣ ---
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="retail_receipts_export.xlsx"'
-    return response
+    return _export_listing(request, 'retail_receipts', 'retail_receipt_list')
 @login_required
+@reporting_database
 def export_credit_notes_to_excel(request):
-    """
-    Εξάγει μια λίστα με τα πιστωτικά τιμολόγια σε αρχείο Excel.
-    """
-    credit_notes_qs = CreditNote.objects.select_related('customer', 'original_invoice').all().order_by('-issue_date')
-
-    # Εδώ θα μπορούσαμε να προσθέσουμε τα φίλτρα από τη σελίδα της λίστας, αν υπήρχαν.
-    # Προς το παρόν, εξάγει όλα τα πιστωτικά.
-
-    data_for_export = []
-    for cn in credit_notes_qs:
-        data_for_export.append({
-            'Αρ. Πιστωτικού': cn.credit_note_number,
-            'Ημερομηνία Έκδοσης': cn.issue_date,
-            'Πελάτης': str(cn.customer),
-            'Αρχικό Τιμολόγιο': cn.original_invoice.invoice_number if cn.original_invoice else '-',
-            'Αιτιολογία': cn.reason,
-            'Καθαρή Αξία (€)': cn.subtotal,
-            'Ποσό ΦΠΑ (€)': cn.vat_amount,
-            'Συνολική Πίστωση (€)': cn.total_amount,
-            'Κατάσταση': cn.get_status_display(),
-        })
-    
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν πιστωτικά τιμολόγια για εξαγωγή.")
-        return redirect(request.META.get('HTTP_REFERER', 'credit_note_list'))
-
-    df = pd.DataFrame(data_for_export)
-    excel_buffer = io.BytesIO()
-
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Πιστωτικά Τιμολόγια')
-        worksheet = writer.sheets['Πιστωτικά Τιμολόγια']
-        
-        for idx, col in enumerate(df.columns):
-            series = df[col]
-            if 'Ημερομηνία' in str(series.name):
-                max_len = 20
-            else:
-                max_len = max(
-                    series.astype(str).map(len).max(),
-                    len(str(series.name))
-                ) + 2
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="credit_notes_export.xlsx"'
-    return response
-
+    return _export_listing(request, 'credit_notes', 'credit_note_list')
 @login_required
 def delivery_note_list(request):
     notes_qs = DeliveryNote.objects.select_related('customer__parent', 'order', 'invoice').all()
@@ -2996,12 +2215,11 @@ def delivery_note_pdf_view(request, pk):
         'company_info': company_info,
     }
 
-    html_string = render_to_string('core/delivery_note_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
+    def render_pdf():
+        html_string = render_to_string('core/delivery_note_pdf.html', context)
+        return HTML(string=html_string, base_url=request.build_absolute_uri('/')).write_pdf()
 
-    response = HttpResponse(html.write_pdf(), content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="DA_{delivery_note.delivery_note_number}.pdf"'
-    return response
+    return pdf_cache.pdf_response(request, delivery_note, 'core/delivery_note_pdf.html', render_pdf, f"DA_{delivery_note.delivery_note_number}.pdf", depends_on=[delivery_note.customer, delivery_note.customer.parent])
 @login_required
 def delivery_note_edit_view(request, pk):
     """
@@ -3285,6 +2503,8 @@ def reporting_hub_view(request):
     return render(request, 'core/reporting_hub.html', {'title': 'Κέντρο Αναφορών'})
 
 @login_required
+@reporting_database
+@background_report
 def report_sales_by_month_view(request):
     # Δημιουργούμε μια λίστα με τους τελευταίους 12 μήνες, με αρχική αξία 0
     sales_by_month = {}
@@ -3295,18 +2515,26 @@ def report_sales_by_month_view(request):
         # Το κλειδί είναι η αρχή του μήνα (π.χ. '2025-06-01')
         sales_by_month[month_date.replace(day=1)] = Decimal('0.00')
 
-    # Παίρνουμε τα πραγματικά δεδομένα από τη βάση
-    sales_data_from_db = Invoice.objects.filter(
-        status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID],
-        issue_date__gte=list(sales_by_month.keys())[-1] # Από τον παλαιότερο μήνα και μετά
-    ).annotate(
-        month=TruncMonth('issue_date')
-    ).values('month').annotate(total_sales=Sum('total_amount')).order_by('month')
-
-    # Ενημερώνουμε το λεξικό μας με τις πραγματικές πωλήσεις
-    for entry in sales_data_from_db:
-        if entry['month'] in sales_by_month:
-            sales_by_month[entry['month']] = entry['total_sales']
+    oldest_month = list(sales_by_month.keys())[-1]
+
+    def compute():
+        # Παίρνουμε τα πραγματικά δεδομένα από τον πίνακα πωλήσεων (τιμολόγια μείον πιστωτικά, με ΦΠΑ)
+        # Ομαδοποίηση ανά ημέρα (πάνω στο index της ημερομηνίας) και άθροιση ανά μήνα εδώ
+        sales_data_from_db = DailySalesFact.objects.filter(
+            date__gte=oldest_month # Από τον παλαιότερο μήνα και μετά
+        ).values('date').annotate(total_sales=Sum(F('net_amount') + F('vat_amount'))).order_by('date')
+
+        # Ενημερώνουμε το λεξικό μας με τις πραγματικές πωλήσεις
+        totals = dict(sales_by_month)
+        for entry in sales_data_from_db:
+            month = entry['date'].replace(day=1)
+            if month in totals:
+                totals[month] += entry['total_sales']
+        return {month: total.quantize(Decimal('0.01')) for month, total in totals.items()}
+
+    sales_by_month = report_cache.get_or_compute(
+        'sales_by_month', {'from': oldest_month}, compute, date_from=oldest_month, user=request.user
+    )
 
     # Ταξινομούμε τους μήνες χρονολογικά για το γράφημα και τον πίνακα
     sorted_months = sorted(sales_by_month.items())
@@ -3324,8 +2552,73 @@ def report_sales_by_month_view(request):
         'data': json.dumps(data_points),
         'table_data': table_data, # Νέα προσθήκη για τον πίνακα
     }
-    return render(request, 'core/report_sales_by_month.html', context)
+    table = (['Μήνας', 'Σύνολο Πωλήσεων (€)'], [(row['month'].strftime('%m/%Y'), row['sales']) for row in table_data])
+    chart = {'labels': labels, 'data': data_points}
+    return report_response(request, 'core/report_sales_by_month.html', context, table=table, chart=chart)
+CUSTOMER_BALANCE_PAGE_SIZE = 100
+
+
+AGING_PAGE_SIZE = 100
+
+
 @login_required
+@reporting_database
+@background_report
+def report_aging_view(request):
+    today = timezone.now().date()
+    as_of_str = request.GET.get('as_of', today.strftime('%Y-%m-%d'))
+    try:
+        as_of = datetime.date.fromisoformat(as_of_str)
+    except ValueError:
+        as_of = today
+        as_of_str = today.strftime('%Y-%m-%d')
+    group_by = request.GET.get('group_by', 'customer')
+    if group_by not in aging.DIMENSIONS:
+        group_by = 'customer'
+
+    # Το υπόλοιπο κάθε τιμολογίου είναι το τρέχον, οπότε κάθε αλλαγή (οποιασδήποτε ημερομηνίας) ακυρώνει την εγγραφή
+    aging_rows = report_cache.get_or_compute(
+        'aging', {'as_of': as_of_str, 'group_by': group_by},
+        lambda: aging.aging_by(group_by, as_of=as_of), user=request.user
+    )
+
+    table = (
+        [aging.DIMENSIONS[group_by], 'Κωδικός'] + [label for _, label, _, _ in aging.BUCKETS] + ['Σύνολο (€)', 'Τιμολόγια'],
+        [[row['label'], row['code']] + [row[key] for key, _, _, _ in aging.BUCKETS] + [row['total'], row['invoice_count']]
+         for row in aging_rows]
+    )
+    if request.GET.get('export') == 'xlsx':
+        response = HttpResponse(
+            table_to_excel(*table, sheet_name='Ενηλικίωση'),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        response['Content-Disposition'] = f'attachment; filename="aging_{group_by}_{as_of_str}.xlsx"'
+        return response
+
+    totals = aging.totals(aging_rows)
+    aging_page = Paginator(aging_rows, AGING_PAGE_SIZE).get_page(request.GET.get('page'))
+    aging_page.object_list = [
+        dict(row, buckets=[row[key] for key, _, _, _ in aging.BUCKETS]) for row in aging_page.object_list
+    ]
+    context = {
+        'title': 'Αναφορά - Ενηλικίωση Απαιτήσεων',
+        'aging_rows': aging_page,
+        'bucket_labels': [label for _, label, _, _ in aging.BUCKETS],
+        'bucket_totals': [totals[key] for key, _, _, _ in aging.BUCKETS],
+        'grand_total': totals['total'],
+        'overdue_total': totals['overdue'],
+        'as_of_value': as_of_str,
+        'group_by_value': group_by,
+        'group_by_label': aging.DIMENSIONS[group_by],
+        'dimensions': aging.DIMENSIONS,
+        'export_query': urlencode({'as_of': as_of_str, 'group_by': group_by, 'export': 'xlsx'}),
+    }
+    return report_response(request, 'core/report_aging.html', context, table=table)
+
+
+@login_required
+@reporting_database
+@background_report
 def report_customer_balance_view(request):
     today = timezone.now().date()
     default_from = today.replace(day=1)
@@ -3337,40 +2630,43 @@ def report_customer_balance_view(request):
     customer_id = request.GET.get('customer')
     sales_rep_id = request.GET.get('sales_rep')
 
-    customers_qs = Customer.objects.filter(is_branch=False)
+    # Ο επιλεγμένος πελάτης εμφανίζεται ακόμα κι αν είναι υποκατάστημα (η αναζήτηση τα επιστρέφει)·
+    # χωρίς επιλογή η λίστα έχει μόνο τους κεντρικούς πελάτες.
+    if customer_id:
+        customers_qs = Customer.objects.filter(pk=customer_id)
+    else:
+        customers_qs = Customer.objects.filter(is_branch=False)
 
     if sales_rep_id:
         customers_qs = customers_qs.filter(sales_rep_id=sales_rep_id)
-    
-    # --- ΑΛΛΑΓΗ: Φιλτράρουμε με βάση το ID του πελάτη ---
-    if customer_id:
-        customers_qs = customers_qs.filter(pk=customer_id)
-
-    report_data = []
-    # (Η υπόλοιπη λογική υπολογισμού παραμένει ακριβώς ίδια)
-    for customer in customers_qs:
-        debits_before = customer.invoices.filter(status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID], issue_date__lt=date_from_str).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-        payments_before = customer.payments.filter(status=Payment.STATUS_ACTIVE, payment_date__lt=date_from_str).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-        credits_before = customer.credit_notes.filter(status=CreditNote.Status.ISSUED, issue_date__lt=date_from_str).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-        balance_brought_forward = debits_before - (payments_before + credits_before)
-        debits_in_period = customer.invoices.filter(status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID], issue_date__range=[date_from_str, date_to_str]).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-        payments_in_period = customer.payments.filter(status=Payment.STATUS_ACTIVE, payment_date__range=[date_from_str, date_to_str]).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-        credits_in_period = customer.credit_notes.filter(status=CreditNote.Status.ISSUED, issue_date__range=[date_from_str, date_to_str]).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-        credit_in_period = payments_in_period + credits_in_period
-        closing_balance = balance_brought_forward + debits_in_period - credit_in_period
-        
-        # Τώρα δεν χρειάζεται ο έλεγχος, αφού θα φέρνουμε πάντα αποτελέσματα (εκτός αν δεν επιλεγεί πελάτης)
-        report_data.append({
-            'customer': customer, 'opening_balance': balance_brought_forward,
-            'debit_in_period': debits_in_period, 'credit_in_period': credit_in_period,
-            'closing_balance': closing_balance
-        })
 
-    report_data.sort(key=lambda x: x['closing_balance'], reverse=True)
+    # Όλα τα ποσά υπολογίζονται σε μία ερώτηση για όλους τους πελάτες. Η σελιδοποίηση γίνεται
+    # πάνω στη λίστα, ώστε η (βαριά) ερώτηση να μην ξανατρέχει για το COUNT.
+    def compute():
+        annotated_qs = annotate_period_balances(
+            customers_qs.only('pk', 'is_branch', 'company_name', 'first_name', 'last_name'), date_from_str, date_to_str
+        ).order_by('-closing_balance', 'pk')
+        # Μόνο απλές τιμές στις γραμμές, ώστε το αποθηκευμένο αποτέλεσμα να φορτώνει γρήγορα
+        return [
+            {
+                'customer_id': customer.pk, 'customer_name': str(customer), 'opening_balance': customer.opening_balance,
+                'debit_in_period': customer.debit_in_period, 'credit_in_period': customer.credit_in_period,
+                'closing_balance': customer.closing_balance
+            }
+            for customer in annotated_qs
+        ]
+
+    # Το υπόλοιπο έναρξης εξαρτάται από όλο το παρελθόν, οπότε το διάστημα δεν έχει αρχή
+    report_rows = report_cache.get_or_compute(
+        'customer_balance',
+        {'date_from': date_from_str, 'date_to': date_to_str, 'customer': customer_id, 'sales_rep': sales_rep_id},
+        compute, date_to=date_to_str, user=request.user
+    )
+    report_data = Paginator(report_rows, CUSTOMER_BALANCE_PAGE_SIZE).get_page(request.GET.get('page'))
     
     all_sales_reps = SalesRepresentative.objects.select_related('user').all()
-    # --- ΠΡΟΣΘΗΚΗ: Παίρνουμε όλους τους πελάτες για το Select2 ---
-    all_customers = Customer.objects.filter(is_branch=False).order_by('company_name', 'last_name')
+    # Ο πελάτης επιλέγεται με AJAX αναζήτηση - εδώ φορτώνεται μόνο ο ήδη επιλεγμένος
+    selected_customer = Customer.objects.filter(pk=customer_id).first() if customer_id else None
 
     context = {
         'title': 'Αναφορά - Κίνηση Πελατών ανά Περίοδο',
@@ -3379,11 +2675,17 @@ def report_customer_balance_view(request):
         'date_to_value': date_to_str,
         'all_sales_reps': all_sales_reps,
         'sales_rep_id_value': int(sales_rep_id) if sales_rep_id else None,
-        'all_customers': all_customers, # <-- Προσθήκη για το Select2
+        'selected_customer': selected_customer,
         'customer_id_value': int(customer_id) if customer_id else None,
     }
-    return render(request, 'core/report_customer_balance.html', context)
+    table = (
+        ['Πελάτης', 'Υπόλοιπο Έναρξης (€)', 'Χρεώσεις Περιόδου (€)', 'Πιστώσεις Περιόδου (€)', 'Υπόλοιπο Λήξης (€)'],
+        [(row['customer_name'], row['opening_balance'], row['debit_in_period'], row['credit_in_period'], row['closing_balance']) for row in report_rows]
+    )
+    return report_response(request, 'core/report_customer_balance.html', context, table=table)
 @login_required
+@reporting_database
+@background_report
 def report_vat_analysis_view(request):
     """
     Δημιουργεί την αναφορά ανάλυσης ΦΠΑ για μια δεδομένη χρονική περίοδο.
@@ -3393,38 +2695,24 @@ def report_vat_analysis_view(request):
     date_from_str = request.GET.get('date_from', today.replace(day=1).strftime('%Y-%m-%d'))
     date_to_str = request.GET.get('date_to', today.strftime('%Y-%m-%d'))
 
-    # 1. Υπολογισμός του ΦΠΑ εκροών (από Τιμολόγια)
-    output_vat_qs = InvoiceItem.objects.filter(
-        invoice__status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID],
-        invoice__issue_date__range=[date_from_str, date_to_str]
-    )
-    output_summary = output_vat_qs.values('vat_percentage').annotate(
-        total_net=Sum('total_price'), 
-        total_vat=Sum('vat_amount')
-    ).order_by('vat_percentage')
-
-    # 2. Υπολογισμός του ΦΠΑ εισροών (μείωση από Πιστωτικά)
-    input_vat_qs = CreditNoteItem.objects.filter(
-        credit_note__status=CreditNote.Status.ISSUED,
-        credit_note__issue_date__range=[date_from_str, date_to_str]
-    )
-    input_summary = input_vat_qs.values('vat_percentage').annotate(
-        total_net=Sum('total_price'), 
-        total_vat=Sum('vat_amount')
-    ).order_by('vat_percentage')
-
-    # 3. Συνδυασμός των αποτελεσμάτων σε ένα λεξικό
-    final_analysis = defaultdict(lambda: {'net': Decimal(0), 'vat': Decimal(0)})
-    
-    for item in output_summary:
-        rate = item['vat_percentage']
-        final_analysis[rate]['net'] += item['total_net']
-        final_analysis[rate]['vat'] += item['total_vat']
+    # Τα πιστωτικά είναι ήδη αρνητικά στον πίνακα πωλήσεων, οπότε το άθροισμα ανά συντελεστή
+    # δίνει κατευθείαν τον ΦΠΑ εκροών μείον τις επιστροφές
+    def compute():
+        summary = DailySalesFact.objects.filter(
+            date__range=[date_from_str, date_to_str]
+        ).values('vat_rate').annotate(
+            total_net=Sum('net_amount'),
+            total_vat=Sum('vat_amount')
+        ).order_by('vat_rate')
+        return {
+            item['vat_rate']: {'net': item['total_net'].quantize(Decimal('0.01')), 'vat': item['total_vat'].quantize(Decimal('0.01'))}
+            for item in summary
+        }
 
-    for item in input_summary:
-        rate = item['vat_percentage']
-        final_analysis[rate]['net'] -= item['total_net'] # Αφαιρούμε την αξία
-        final_analysis[rate]['vat'] -= item['total_vat'] # Αφαιρούμε τον ΦΠΑ
+    final_analysis = report_cache.get_or_compute(
+        'vat_analysis', {'date_from': date_from_str, 'date_to': date_to_str}, compute,
+        date_from=date_from_str, date_to=date_to_str, user=request.user
+    )
 
     # Μετατροπή σε λίστα και υπολογισμός συνόλων
     analysis_list = [{'rate': rate, 'data': data} for rate, data in sorted(final_analysis.items())]
@@ -3440,10 +2728,16 @@ def report_vat_analysis_view(request):
         'date_from_value': date_from_str,
         'date_to_value': date_to_str,
     }
-    return render(request, 'core/report_vat_analysis.html', context)
+    table = (
+        ['Συντελεστής ΦΠΑ (%)', 'Καθαρή Αξία (€)', 'Ποσό ΦΠΑ (€)'],
+        [(item['rate'], item['data']['net'], item['data']['vat']) for item in analysis_list]
+    )
+    return report_response(request, 'core/report_vat_analysis.html', context, table=table)
 
 
 @login_required
+@reporting_database
+@background_report
 def report_profitability_view(request):
     today = timezone.now().date()
     default_from = today.replace(day=1)
@@ -3453,52 +2747,44 @@ def report_profitability_view(request):
     
     # --- ΝΕΑ ΠΡΟΣΘΗΚΗ: Παίρνουμε το ID του προϊόντος από το φίλτρο ---
     product_id = request.GET.get('product')
-
-    # Το βασικό queryset
-    items_qs = InvoiceItem.objects.filter(
-        invoice__status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID],
-        invoice__issue_date__range=[date_from_str, date_to_str],
-        product__cost_price__isnull=False,
-        product__cost_price__gt=0
+    group_by = request.GET.get('group_by', 'product')
+    if group_by not in profitability.DIMENSIONS:
+        group_by = 'product'
+
+    def compute():
+        # Κάθε γραμμή κοστολογείται με το μέσο σταθμικό κόστος της ημέρας της (βλ. core/profitability.py)
+        cube = profitability.margin_cube(date_from_str, date_to_str, product_id=product_id)
+        return profitability.margin_by(cube, group_by)
+
+    profit_data = report_cache.get_or_compute(
+        'profitability', {'date_from': date_from_str, 'date_to': date_to_str, 'product': product_id, 'group_by': group_by},
+        compute, date_from=date_from_str, date_to=date_to_str, user=request.user
     )
 
-    # --- ΝΕΑ ΠΡΟΣΘΗΚΗ: Εφαρμόζουμε το φίλτρο του προϊόντος αν υπάρχει ---
-    if product_id:
-        items_qs = items_qs.filter(product_id=product_id)
-
-    # Η υπόλοιπη λογική παραμένει ως έχει
-    profit_data = items_qs.values(
-        'product__name', 'product__code'
-    ).annotate(
-        total_quantity=Coalesce(Sum('quantity'), Decimal('0.0')),
-        total_revenue=Coalesce(Sum(F('quantity') * F('unit_price') * (Decimal(1) - F('discount_percentage') / 100)), Decimal('0.0')),
-        total_cost=Coalesce(Sum(F('quantity') * F('product__cost_price')), Decimal('0.0'))
-    ).annotate(
-        total_profit=F('total_revenue') - F('total_cost')
-    ).annotate(
-        profit_margin=Case(
-            When(total_revenue__gt=0, 
-                 then=ExpressionWrapper((F('total_revenue') - F('total_cost')) * 100 / F('total_revenue'), output_field=DecimalField())),
-            default=Value(Decimal('0.0')),
-            output_field=DecimalField()
-        )
-    ).order_by('-total_profit')
-
-    # --- ΝΕΑ ΠΡΟΣΘΗΚΗ: Παίρνουμε όλα τα προϊόντα για το dropdown ---
-    all_products = Product.objects.filter(is_active=True).order_by('name')
+    # Στο dropdown μόνο το επιλεγμένο προϊόν· τα υπόλοιπα φέρνει το select2 με AJAX
+    selected_product = Product.objects.filter(pk=product_id).first() if product_id else None
 
     context = {
-        'title': 'Αναφορά - Ανάλυση Κερδοφορίας ανά Προϊόν',
+        'title': 'Αναφορά - Ανάλυση Κερδοφορίας',
         'profit_data': profit_data,
         'date_from_value': date_from_str,
         'date_to_value': date_to_str,
-        'all_products': all_products, # <-- Προσθήκη για το Select2
-        'product_id_value': int(product_id) if product_id else None,
-    }
-    return render(request, 'core/report_profitability.html', context)
+        'selected_product': selected_product,
+        'group_by_value': group_by,
+        'group_by_label': profitability.DIMENSIONS[group_by],
+        'dimensions': profitability.DIMENSIONS,
+    }
+    table = (
+        [profitability.DIMENSIONS[group_by], 'Κωδικός', 'Ποσότητα', 'Τζίρος (€)', 'Κόστος (€)', 'Μικτό Κέρδος (€)', 'Περιθώριο (%)'],
+        [(row['label'], row['code'], row['total_quantity'], row['total_revenue'], row['total_cost'],
+          row['total_profit'], row['profit_margin']) for row in profit_data]
+    )
+    return report_response(request, 'core/report_profitability.html', context, table=table)
 
 
 @login_required
+@reporting_database
+@background_report
 def report_sales_by_rep_view(request):
     today = timezone.now().date()
     default_from = today.replace(day=1)
@@ -3506,23 +2792,40 @@ def report_sales_by_rep_view(request):
     date_from_str = request.GET.get('date_from', default_from.strftime('%Y-%m-%d'))
     date_to_str = request.GET.get('date_to', today.strftime('%Y-%m-%d'))
 
-    # --- ΝΕΑ ΛΟΓΙΚΗ: ΞΕΚΙΝΑΜΕ ΑΠΟ ΤΙΣ ΠΡΟΜΗΘΕΙΕΣ ---
-    
-    # Το βασικό μας query ξεκινάει από το μοντέλο Commission
-    sales_data = Commission.objects.filter(
-        # Φιλτράρουμε τις προμήθειες με βάση την ημερομηνία του Τιμολογίου τους
-        invoice__issue_date__range=[date_from_str, date_to_str]
-    ).values(
-        # Ομαδοποιούμε ανά πωλητή
-        'sales_rep__user__first_name',
-        'sales_rep__user__last_name'
-    ).annotate(
-        # Αθροίζουμε τα πεδία που θέλουμε
-        invoice_count=Count('invoice__id', distinct=True), # Μετράμε τα μοναδικά τιμολόγια
-        total_net_sales=Sum('invoice__subtotal'),      # Παίρνουμε το τζίρο από το σχετικό τιμολόγιο
-        total_commission=Sum('calculated_amount')      # Παίρνουμε την προμήθεια από την ίδια την εγγραφή
-    ).order_by('-total_net_sales')
-    # --- ΤΕΛΟΣ ΝΕΑΣ ΛΟΓΙΚΗΣ ---
+    def compute():
+        # Ο τζίρος έρχεται από τον πίνακα πωλήσεων (τρέχων πωλητής του πελάτη ή του κεντρικού του)
+        sales_data = list(DailySalesFact.objects.filter(
+            date__range=[date_from_str, date_to_str],
+            sales_rep__isnull=False
+        ).values(
+            # Ομαδοποιούμε ανά πωλητή
+            'sales_rep_id',
+            'sales_rep__user__first_name',
+            'sales_rep__user__last_name'
+        ).annotate(
+            total_net_sales=Sum('net_amount')
+        ).order_by('-total_net_sales'))
+
+        # Τα τιμολόγια που μετράνε στον τζίρο: ίδιες καταστάσεις και ίδιος πωλητής με τον πίνακα πωλήσεων
+        invoice_counts = dict(Invoice.objects.filter(
+            issue_date__range=[date_from_str, date_to_str],
+            status__in=DailySalesFact.INVOICE_STATUSES, items__isnull=False,
+        ).values(
+            rep_id=Coalesce('customer__sales_rep_id', 'customer__parent__sales_rep_id')
+        ).annotate(invoice_count=Count('pk', distinct=True)).order_by().values_list('rep_id', 'invoice_count'))
+        # Οι προμήθειες σε μία ομαδοποιημένη ερώτηση
+        commissions = dict(Commission.objects.filter(
+            invoice__issue_date__range=[date_from_str, date_to_str]
+        ).values('sales_rep_id').annotate(total_commission=Sum('calculated_amount')).order_by().values_list('sales_rep_id', 'total_commission'))
+        for row in sales_data:
+            row['invoice_count'] = invoice_counts.get(row['sales_rep_id'], 0)
+            row['total_commission'] = commissions.get(row['sales_rep_id'])
+        return sales_data
+
+    sales_data = report_cache.get_or_compute(
+        'sales_by_rep', {'date_from': date_from_str, 'date_to': date_to_str}, compute,
+        date_from=date_from_str, date_to=date_to_str, user=request.user
+    )
 
     context = {
         'title': 'Αναφορά - Πωλήσεις ανά Πωλητή',
@@ -3530,8 +2833,15 @@ def report_sales_by_rep_view(request):
         'date_from_value': date_from_str,
         'date_to_value': date_to_str,
     }
-    return render(request, 'core/report_sales_by_rep.html', context)
+    table = (
+        ['Πωλητής', 'Πλήθος Τιμολογίων', 'Τζίρος (Καθαρή Αξία, €)', 'Προμήθειες (€)'],
+        [(f"{row['sales_rep__user__first_name']} {row['sales_rep__user__last_name']}", row['invoice_count'],
+          row['total_net_sales'], row['total_commission'] or Decimal('0.00')) for row in sales_data]
+    )
+    return report_response(request, 'core/report_sales_by_rep.html', context, table=table)
 @login_required
+@reporting_database
+@background_report
 def report_sales_by_city_view(request):
     today = timezone.now().date()
     default_from = today.replace(day=1)
@@ -3539,15 +2849,21 @@ def report_sales_by_city_view(request):
     date_from_str = request.GET.get('date_from', default_from.strftime('%Y-%m-%d'))
     date_to_str = request.GET.get('date_to', today.strftime('%Y-%m-%d'))
 
-    # Ομαδοποιούμε τα τιμολόγια ανά πόλη του πελάτη και αθροίζουμε την καθαρή αξία
-    sales_by_city = Invoice.objects.filter(
-        status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID],
-        issue_date__range=[date_from_str, date_to_str]
-    ).values(
-        'customer__city' # Ομαδοποίηση βάσει της πόλης του πελάτη
-    ).annotate(
-        total_net_sales=Sum('subtotal')
-    ).order_by('-total_net_sales')
+    def compute():
+        # Ομαδοποιούμε τα τιμολόγια ανά πόλη του πελάτη και αθροίζουμε την καθαρή αξία
+        sales_by_city = DailySalesFact.objects.filter(
+            date__range=[date_from_str, date_to_str]
+        ).values(
+            'customer__city' # Ομαδοποίηση βάσει της πόλης του πελάτη
+        ).annotate(
+            total_net_sales=Sum('net_amount')
+        ).order_by('-total_net_sales')
+        return list(sales_by_city)
+
+    sales_by_city = report_cache.get_or_compute(
+        'sales_by_city', {'date_from': date_from_str, 'date_to': date_to_str}, compute,
+        date_from=date_from_str, date_to=date_to_str, user=request.user
+    )
 
     context = {
         'title': 'Αναφορά - Πωλήσεις ανά Πόλη',
@@ -3555,7 +2871,48 @@ def report_sales_by_city_view(request):
         'date_from_value': date_from_str,
         'date_to_value': date_to_str,
     }
-    return render(request, 'core/report_sales_by_city.html', context)
+    table = (
+        ['Πόλη', 'Τζίρος (Καθαρή Αξία, €)'],
+        [(row['customer__city'] or '(Χωρίς Πόλη)', row['total_net_sales']) for row in sales_by_city]
+    )
+    return report_response(request, 'core/report_sales_by_city.html', context, table=table)
+
+
+@login_required
+@reporting_database
+@require_GET
+def report_pivot_view(request):
+    """
+    Ad-hoc pivot πωλήσεων (βλ. core/pivot.py), π.χ.
+    ?dimensions=city,rep,quarter&measures=net,margin&date_from=2025-01-01&date_to=2025-12-31&format=csv
+    Επιστρέφει JSON (προεπιλογή) ή CSV, σε ροή.
+    """
+    today = timezone.now().date()
+    dimensions = [name for name in request.GET.get('dimensions', '').split(',') if name]
+    measures = [name for name in request.GET.get('measures', 'net').split(',') if name]
+    output = request.GET.get('format', 'json')
+    try:
+        pivot.validate(dimensions, measures)
+        date_from = datetime.date.fromisoformat(request.GET.get('date_from', today.replace(day=1).isoformat()))
+        date_to = datetime.date.fromisoformat(request.GET.get('date_to', today.isoformat()))
+        if output not in ('json', 'csv'):
+            raise ValueError("Το format πρέπει να είναι json ή csv.")
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    result = report_cache.get_or_compute(
+        'pivot',
+        {'dimensions': dimensions, 'measures': measures, 'date_from': date_from.isoformat(), 'date_to': date_to.isoformat()},
+        lambda: pivot.pivot(dimensions, measures, date_from, date_to),
+        date_from=date_from, date_to=date_to, user=request.user
+    )
+    if output == 'csv':
+        response = StreamingHttpResponse(pivot.csv_lines(result), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="pivot_{date_from}_{date_to}.csv"'
+        return response
+    return StreamingHttpResponse(pivot.json_chunks(result), content_type='application/json')
+
+
 @login_required
 def order_create_from_invoice_view(request, pk):
     """
@@ -3752,50 +3109,58 @@ def ajax_send_invoice_email(request, pk):
 def ajax_product_history_view(request, pk):
     product = get_object_or_404(Product, pk=pk)
 
-    history_log = []
+    # Μία ερώτηση στο StockMovement (index product/timestamp), σελιδοποιημένη χωρίς COUNT
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    offset = (page - 1) * PRODUCT_HISTORY_PAGE_SIZE
+    movements = list(
+        StockMovement.objects.filter(product=product)
+        .select_related('content_type')
+        .order_by('-timestamp', '-id')[offset:offset + PRODUCT_HISTORY_PAGE_SIZE + 1]
+    )
+    has_more = len(movements) > PRODUCT_HISTORY_PAGE_SIZE
 
-    # Πωλήσεις (από τιμολογημένα είδη)
-    sales = InvoiceItem.objects.filter(product=product, invoice__status__in=[Invoice.STATUS_ISSUED, Invoice.STATUS_PAID])
-    for item in sales:
+    history_log = []
+    for movement in movements[:PRODUCT_HISTORY_PAGE_SIZE]:
         history_log.append({
-            'date': item.invoice.issue_date,
-            'type': 'Πώληση',
-            'quantity': -item.quantity, # Αρνητικό γιατί μειώνει το απόθεμα
-            'document': item.invoice,
-            'document_number': item.invoice.invoice_number,
-            'url_name': 'invoice_detail'
+            'date': movement.timestamp,
+            'type': movement.get_movement_type_display(),
+            'quantity': movement.quantity,
+            'balance_after': movement.balance_after,
+            'document_number': movement.document_number or '-',
+            'url': _stock_movement_document_url(movement),
         })
 
-    # Επιστροφές (από πιστωτικά)
-    returns = CreditNoteItem.objects.filter(product=product, credit_note__status=CreditNote.Status.ISSUED)
-    for item in returns:
-        history_log.append({
-            'date': item.credit_note.issue_date,
-            'type': 'Επιστροφή',
-            'quantity': item.quantity, # Θετικό γιατί αυξάνει το απόθεμα
-            'document': item.credit_note,
-            'document_number': item.credit_note.credit_note_number,
-            'url_name': 'credit_note_detail'
-        })
+    context = {
+        'history_log': history_log,
+        'product': product,
+        'next_page': page + 1 if has_more else None,
+        'previous_page': page - 1 if page > 1 else None,
+    }
+    html = render_to_string('core/partials/_product_history_table.html', context)
+    return JsonResponse({'html': html})
 
-    # Παραλαβές
-    receipts = StockReceipt.objects.filter(product=product)
-    for item in receipts:
-        history_log.append({
-            'date': item.date_received.date(),
-            'type': 'Παραλαβή',
-            'quantity': item.quantity_added,
-            'document': item,
-            'document_number': f"Παραλαβή #{item.pk}",
-            'url_name': 'stock_receipt_list' # Δεν υπάρχει detail view, οπότε πάμε στη λίστα
-        })
 
-    # Ταξινόμηση όλων των κινήσεων χρονολογικά
-    history_log.sort(key=lambda x: x['date'], reverse=True)
+PRODUCT_HISTORY_PAGE_SIZE = 50
 
-    context = {'history_log': history_log, 'product': product}
-    html = render_to_string('core/partials/_product_history_table.html', context)
-    return JsonResponse({'html': html})
+# Σε ποια σελίδα οδηγεί το παραστατικό κάθε κίνησης (None = σελίδα χωρίς pk)
+STOCK_MOVEMENT_DOCUMENT_URLS = {
+    'order': 'order_detail',
+    'creditnote': 'credit_note_detail',
+    'retailreceipt': 'retail_receipt_detail',
+    'stockreceipt': None,
+}
+
+
+def _stock_movement_document_url(movement):
+    if not movement.content_type_id or movement.content_type.model not in STOCK_MOVEMENT_DOCUMENT_URLS:
+        return None
+    url_name = STOCK_MOVEMENT_DOCUMENT_URLS[movement.content_type.model]
+    if url_name is None:
+        return reverse('stock_receipt_list')
+    return reverse(url_name, args=[movement.object_id])
 @login_required
 def supplier_list_view(request):
     suppliers = Supplier.objects.all()
@@ -3862,7 +3227,7 @@ def supplier_delete_view(request, pk):
 # --- VIEWS ΓΙΑ ΕΝΤΟΛΕΣ ΑΓΟΡΑΣ ---
 @login_required
 def purchase_order_list_view(request):
-    purchase_orders = PurchaseOrder.objects.select_related('supplier').all()
+    purchase_orders = listings.LISTINGS['purchase_orders'].queryset(request.GET)
     title = 'Λίστα Εντολών Αγοράς'
     
     # Θα προσθέσουμε φίλτρα εδώ αργότερα
@@ -3979,45 +3344,88 @@ def purchase_order_pdf_view(request, pk):
         'company_info': company_info,
     }
 
-    html_string = render_to_string('core/purchase_order_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-    
-    response = HttpResponse(html.write_pdf(), content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="PO_{po.po_number}.pdf"'
-    return response
+    def render_pdf():
+        html_string = render_to_string('core/purchase_order_pdf.html', context)
+        return HTML(string=html_string, base_url=request.build_absolute_uri('/')).write_pdf()
+
+    return pdf_cache.pdf_response(request, po, 'core/purchase_order_pdf.html', render_pdf, f"PO_{po.po_number}.pdf", depends_on=[po.supplier])
 @login_required
+@reporting_database
 def export_purchase_orders_excel(request):
-    # Εδώ θα μπορούσαμε να εφαρμόσουμε τα φίλτρα της λίστας αν υπήρχαν
-    pos = PurchaseOrder.objects.select_related('supplier').all().order_by('-order_date')
-
-    data_for_export = []
-    for po in pos:
-        data_for_export.append({
-            'Αρ. Εντολής': po.po_number,
-            'Ημερομηνία': po.order_date,
-            'Προμηθευτής': po.supplier.name,
-            'Κατάσταση': po.get_status_display(),
-            'Συνολικό Ποσό (€)': po.total_amount,
-        })
-    
-    if not data_for_export:
-        messages.warning(request, "Δεν βρέθηκαν εντολές αγοράς για εξαγωγή.")
-        return redirect('purchase_order_list')
-
-    df = pd.DataFrame(data_for_export)
-    excel_buffer = io.BytesIO()
-
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Εντολές Αγοράς')
-        worksheet = writer.sheets['Εντολές Αγοράς']
-        for idx, col in enumerate(df):
-            series = df[col]
-            max_len = max((series.astype(str).map(len).max(), len(str(series.name)))) + 2
-            worksheet.column_dimensions[get_column_letter(idx + 1)].width = max_len
-            
-    response = HttpResponse(
-        excel_buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="purchase_orders_export.xlsx"'
-    return response        
\ No newline at end of file
+    return _export_listing(request, 'purchase_orders', 'purchase_order_list')
+@require_GET
+def metrics_view(request):
+    """
+    Οι μετρήσεις του RequestMetricsMiddleware σε Prometheus text format, ενωμένες από όλους τους workers.
+    Δεν απαιτεί login (το scrape γίνεται από τον Prometheus): επιτρέπεται με "Authorization: Bearer
+    <REQUEST_METRICS_TOKEN>" ή από διεύθυνση του REQUEST_METRICS_ALLOWED_IPS, αλλιώς 401.
+    """
+    if not metrics.enabled():
+        raise Http404("Οι μετρήσεις είναι απενεργοποιημένες.")
+    token = getattr(settings, 'REQUEST_METRICS_TOKEN', '')
+    authorized = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+    if not authorized and request.META.get('REMOTE_ADDR') not in getattr(settings, 'REQUEST_METRICS_ALLOWED_IPS', ()):
+        return HttpResponse("Unauthorized", status=401, content_type='text/plain')
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _report_job_for(request, pk):
+    """
+    Ο χρήστης βλέπει μόνο τις δικές του αναφορές (το προσωπικό όλες), και τις εξαγωγές άλλων
+    με τα ίδια δεδομένα που θα έβλεπε κι ο ίδιος (ίδιο scope).
+    """
+    if request.user.is_staff:
+        jobs = ReportJob.objects.all()
+    else:
+        jobs = ReportJob.objects.filter(Q(requested_by=request.user) | Q(scope__in=listings.scopes(request.user)))
+    return get_object_or_404(jobs, pk=pk)
+
+
+@login_required
+def report_job_detail_view(request, pk):
+    """Σελίδα αναμονής μιας αναφοράς στο παρασκήνιο· ρωτάει το status endpoint μέχρι να τελειώσει."""
+    job = _report_job_for(request, pk)
+    context = {
+        'title': f'Αναφορά στο Παρασκήνιο #{job.pk}',
+        'job': job,
+        'report_url': f"{reverse(job.report)}?{urlencode(job.params)}",
+    }
+    return render(request, 'core/report_job_detail.html', context)
+
+
+@login_required
+def report_job_status_view(request, pk):
+    job = _report_job_for(request, pk)
+    data = {
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'finished': job.is_finished,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+    }
+    if job.status == ReportJob.Status.DONE:
+        if not job.scope:
+            # Οι εξαγωγές έχουν μόνο αρχείο
+            data['result_url'] = reverse('report_job_result', args=[job.pk])
+            data['chart'] = job.result_chart
+        if job.result_file:
+            data['excel_url'] = reverse('report_job_excel', args=[job.pk])
+            data['file_format'] = os.path.splitext(job.result_file.name)[1].lstrip('.').upper()
+    return JsonResponse(data)
+
+
+@login_required
+def report_job_result_view(request, pk):
+    job = _report_job_for(request, pk)
+    if job.status != ReportJob.Status.DONE:
+        raise Http404("Η αναφορά δεν έχει ολοκληρωθεί.")
+    return HttpResponse(job.result_html)
+
+
+@login_required
+def report_job_excel_view(request, pk):
+    job = _report_job_for(request, pk)
+    if job.status != ReportJob.Status.DONE or not job.result_file:
+        raise Http404("Δεν υπάρχει αρχείο για αυτή την αναφορά.")
+    extension = os.path.splitext(job.result_file.name)[1]
+    return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=f"{job.report}-{job.pk}{extension}")
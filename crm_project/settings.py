@@ -1,6 +1,7 @@
 ﻿# crm_project/settings.py
 
 from pathlib import Path
+import tempfile
 import os # Προστέθηκε για το os.path.join αν δεν χρησιμοποιείς Path για templates DIRS
 from dotenv import load_dotenv
 
@@ -33,15 +34,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'crum.CurrentRequestUserMiddleware',
+    'core.middleware.ActivityLogBufferMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'crm_project.urls'
@@ -81,6 +84,15 @@ DATABASES = {
         'PORT': '5432',  
     }
 }
+# Replica μόνο για ανάγνωση (π.χ. streaming replication του PostgreSQL) για τις αναφορές/εξαγωγές.
+# Ενεργοποιείται με REPLICA_DB_HOST· βλ. REPORTING_DATABASE και core/db_routing.py.
+if os.getenv('REPLICA_DB_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('REPLICA_DB_HOST'),
+        'PORT': os.getenv('REPLICA_DB_PORT', DATABASES['default']['PORT']),
+    }
+DATABASE_ROUTERS = ['core.db_routing.ReplicaRouter']
 #DATABASES = {
     #'default': {
         #'ENGINE': 'django.db.backends.sqlite3',
@@ -147,4 +159,47 @@ LOGOUT_REDIRECT_URL = 'home'       # Όνομα URL για ανακατεύθυ
 LOGIN_URL = '/accounts/login/'     # Το URL της σελίδας εισόδου
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Ιστορικό ενεργειών: πόσους μήνες κρατάμε στη βάση πριν το archive_activity_log
+# τους μεταφέρει σε αρχεία .jsonl.gz
+ACTIVITY_LOG_RETENTION_MONTHS = 12
+ACTIVITY_LOG_ARCHIVE_DIR = os.path.join(MEDIA_ROOT, 'activity_log_archive')
+# Μετρήσεις ανά view (χρόνος, SQL, N+1) στο /metrics σε μορφή Prometheus.
+# Κάθε worker γράφει τα αθροίσματά του στο REQUEST_METRICS_DIR και το /metrics τα ενώνει.
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'False') == 'True'
+REQUEST_METRICS_DIR = os.getenv('REQUEST_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'crm_request_metrics'))
+# Το /metrics απαντά μόνο με "Authorization: Bearer <REQUEST_METRICS_TOKEN>" ή σε διευθύνσεις του
+# REQUEST_METRICS_ALLOWED_IPS (REMOTE_ADDR: πίσω από proxy είναι η διεύθυνση του proxy).
+REQUEST_METRICS_TOKEN = os.getenv('REQUEST_METRICS_TOKEN', '')
+REQUEST_METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('REQUEST_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+REQUEST_METRICS_N_PLUS_ONE_THRESHOLD = 5  # Από πόσες ίδιες ερωτήσεις σε ένα request θεωρείται N+1
+# Cache αποτελεσμάτων αναφορών: μια εγγραφή σβήνεται όταν αλλάξει παραστατικό μέσα στο διάστημά της,
+# και σε κάθε περίπτωση μετά από REPORT_CACHE_TIMEOUT δευτερόλεπτα (π.χ. για αλλαγές σε ονόματα/πόλεις πελατών).
+REPORT_CACHE_ENABLED = os.getenv('REPORT_CACHE_ENABLED', 'True') == 'True'
+REPORT_CACHE_TIMEOUT = 60 * 60
+# Αναφορές στο παρασκήνιο (?async=1): τις εκτελεί η εντολή run_report_jobs. Τα αποτελέσματα
+# (HTML/Excel) σβήνονται μετά από REPORT_JOB_RETENTION_DAYS ημέρες.
+REPORT_JOB_WORKERS = 2
+REPORT_JOB_RETENTION_DAYS = 7
+# Εξαγωγές στο παρασκήνιο: με ?async=1 ή όταν ξεπερνούν τις EXPORT_BACKGROUND_ROWS γραμμές. Ίδια εξαγωγή
+# (φίλτρα και εύρος δεδομένων του χρήστη) ξαναχρησιμοποιεί το αρχείο για EXPORT_JOB_FRESHNESS_SECONDS.
+EXPORT_BACKGROUND_ROWS = 20000
+EXPORT_JOB_FRESHNESS_SECONDS = 15 * 60
+# Εξαγωγή λογιστικού ημερολογίου (εντολή export_journal): λογαριασμοί του λογιστικού σχεδίου
+# και πόσο πίσω από τον δείκτη ξαναελέγχονται παραστατικά (για transactions που έγιναν commit αργότερα).
+JOURNAL_ACCOUNTS = {
+    'customers': '30.00',  # Πελάτες
+    'sales': '70.00',      # Πωλήσεις εμπορευμάτων
+    'vat': '54.00',        # ΦΠΑ
+    'cash': '38.00',       # Ταμείο
+    'bank': '38.03',       # Καταθέσεις όψεως (τράπεζα, κάρτες, επιταγές)
+}
+JOURNAL_EXPORT_OVERLAP_SECONDS = 5 * 60
+# PDF παραστατικών: αποθηκεύονται στον δίσκο ανά έκδοση (βλ. core/pdf_cache.py) και σερβίρονται με ETag.
+# Ο φάκελος πρέπει να είναι κοινός για όλους τους workers.
+PDF_CACHE_ENABLED = os.getenv('PDF_CACHE_ENABLED', 'True') == 'True'
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'crm_pdf_cache'))
+# Οι report_*/export_* views διαβάζουν από αυτό το alias του DATABASES ('default' = χωρίς replica).
+# Μετά από εγγραφή ο χρήστης διαβάζει από την κύρια βάση για REPORTING_DATABASE_STICKY_SECONDS.
+REPORTING_DATABASE = os.getenv('REPORTING_DATABASE', 'replica' if 'replica' in DATABASES else 'default')
+REPORTING_DATABASE_STICKY_SECONDS = 30
@@ -0,0 +1,14 @@
+# crm_project/test_settings.py
+# Ρυθμίσεις για τα tests με δύο τοπικές βάσεις SQLite ('default' και 'replica'), ώστε να
+# τρέχουν και τα tests της δρομολόγησης στο replica (core/db_routing.py):
+#   DJANGO_SETTINGS_MODULE=crm_project.test_settings python manage.py test core
+from .settings import *  # noqa: F401,F403
+
+SECRET_KEY = SECRET_KEY or 'test-only-secret-key'
+
+DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'test_db.sqlite3'},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'test_replica.sqlite3'},
+}
+# Το REPORTING_DATABASE μένει 'default' (ορίζεται πριν από αυτές τις βάσεις), ώστε το allow_migrate
+# να φτιάχνει πίνακες και στο 'replica'· τα tests της δρομολόγησης το αλλάζουν με override_settings.